@@ -0,0 +1,478 @@
+# pyright: reportMissingImports=false
+
+"""Benchmark exported GGUF quantization levels and pick the fastest one within a quality budget.
+
+For every GGUF file (one per quantization level) this measures:
+
+- perplexity on a held-out slice of the validation JSONL (``llama-perplexity``)
+- prompt-eval and generation tokens/sec on CPU (``llama-bench``)
+- model load time and peak RSS of ``llama-server``
+- task metrics on the same validation slice through ``LexiLingoClient``
+  (grammar exact match, vocabulary level accuracy, fluency MAE, dialogue /
+  explanation token F1), decoded greedily
+
+Quants are compared against a reference level (F16 if exported, otherwise the
+largest file). A quant is inside the budget when its perplexity is at most
+``--max-ppl-increase`` above the reference and no task metric drops more than
+``--max-metric-drop``. The report ranks in-budget quants by generation speed;
+the first one is the recommendation.
+
+Usage (from repo root):
+  python benchmark/benchmark_gguf_quants.py \\
+      --gguf-dir exports/gguf --name qwen-grammar \\
+      --val datasets/datasets/val.jsonl --n-per-task 40 \\
+      --report-json reports/gguf_quants_qwen.json
+
+  # Or list the files explicitly
+  python benchmark/benchmark_gguf_quants.py \\
+      --models exports/gguf/qwen-grammar-q4_k_m.gguf,exports/gguf/qwen-grammar-q8_0.gguf \\
+      --val datasets/datasets/val.jsonl
+
+Notes:
+- Validation rows may use either ``{"task", "input", "output"}`` or
+  ``{"task", "messages": [...]}`` (see scripts/merge_explanation_data.py).
+- The held-out slice is sampled per task with a fixed seed, so every quant sees
+  exactly the same prompts and perplexity text.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmark.common import peak_rss
+from export.lexilingo_client import LexiLingoClient, LexiLingoServerClient
+
+TASKS = ("grammar", "vocabulary", "fluency", "dialogue", "explanation")
+
+# Metric name per task and whether higher is better
+TASK_METRICS: dict[str, tuple[str, bool]] = {
+    "grammar": ("exact_match", True),
+    "vocabulary": ("level_accuracy", True),
+    "fluency": ("score_mae", False),
+    "dialogue": ("dialogue_f1", True),
+    "explanation": ("explanation_f1", True),
+}
+
+_QUANT_RE = re.compile(r"-((?:i?q\d[\w]*)|f16|bf16|f32)\.gguf$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ValSample:
+    task: str
+    input: str
+    reference: Any
+    text: str  # prompt + reference, used for perplexity
+
+
+@dataclass
+class QuantResult:
+    quantization: str
+    path: str
+    size_mb: float
+    perplexity: float | None = None
+    prompt_tps: float | None = None
+    gen_tps: float | None = None
+    load_seconds: float | None = None
+    peak_rss_mb: float | None = None
+    task_metrics: dict[str, float] = field(default_factory=dict)
+    task_latency_ms_p50: float | None = None
+    within_budget: bool | None = None
+    budget_violations: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+# =============================================================================
+# Validation data
+# =============================================================================
+def _row_to_sample(row: dict[str, Any]) -> ValSample | None:
+    task = row.get("task", "")
+    if task not in TASK_METRICS:
+        return None
+    if "messages" in row:
+        user = next((m["content"] for m in row["messages"] if m.get("role") == "user"), "")
+        reference: Any = next((m["content"] for m in row["messages"] if m.get("role") == "assistant"), "")
+    else:
+        user = row.get("input", "")
+        reference = row.get("output", "")
+    user = str(user).strip()
+    if not user or reference in ("", None):
+        return None
+    ref_text = reference if isinstance(reference, str) else json.dumps(reference, ensure_ascii=False)
+    return ValSample(task=task, input=user, reference=reference, text=f"{user}\n{ref_text}")
+
+
+def load_val_slice(val_path: Path, n_per_task: int, seed: int = 42) -> list[ValSample]:
+    """Deterministic per-task sample of the validation JSONL (reservoir sampling, one pass)."""
+    rng = random.Random(seed)
+    reservoirs: dict[str, list[ValSample]] = {}
+    seen: Counter[str] = Counter()
+    with open(val_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            sample = _row_to_sample(json.loads(line))
+            if sample is None:
+                continue
+            seen[sample.task] += 1
+            bucket = reservoirs.setdefault(sample.task, [])
+            if len(bucket) < n_per_task:
+                bucket.append(sample)
+            else:
+                j = rng.randrange(seen[sample.task])
+                if j < n_per_task:
+                    bucket[j] = sample
+    samples = [s for task in TASKS for s in reservoirs.get(task, [])]
+    if not samples:
+        raise ValueError(f"No usable validation rows in {val_path}")
+    return samples
+
+
+# =============================================================================
+# Task metrics
+# =============================================================================
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+def _token_f1(prediction: str, reference: str) -> float:
+    pred, ref = _normalize(prediction).split(), _normalize(reference).split()
+    if not pred or not ref:
+        return float(pred == ref)
+    common = sum((Counter(pred) & Counter(ref)).values())
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(pred), common / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _reference_field(reference: Any, keys: tuple[str, ...]) -> Any:
+    if isinstance(reference, dict):
+        for key in keys:
+            if key in reference:
+                return reference[key]
+        return json.dumps(reference, ensure_ascii=False)
+    return reference
+
+
+_EXPLANATION_INPUT = re.compile(r"\s*Error:\s*(.*?)\s*→\s*Correct:\s*(.*?)\s*$", re.DOTALL)
+
+
+def _score_sample(client: LexiLingoClient, sample: ValSample) -> float:
+    if sample.task == "grammar":
+        ref = str(_reference_field(sample.reference, ("corrected", "corrected_sentence", "correction", "output")))
+        pred = client.correct_grammar(sample.input).corrected_sentence
+        return float(_normalize(pred) == _normalize(ref.strip().split("\n")[0]))
+    if sample.task == "vocabulary":
+        ref = str(_reference_field(sample.reference, ("level", "cefr_level")))
+        match = re.search(r"\b([ABC][12])\b", ref.upper())
+        return float(bool(match) and client.classify_vocabulary(sample.input).level == match.group(1))
+    if sample.task == "fluency":
+        ref = _reference_field(sample.reference, ("fluency_score", "score"))
+        numbers = re.findall(r"\d+\.?\d*", str(ref))
+        ref_score = float(numbers[0]) if numbers else 0.0
+        return abs(client.analyze_fluency(sample.input).score - ref_score)
+    if sample.task == "dialogue":
+        ref = str(_reference_field(sample.reference, ("response", "reply", "output")))
+        return _token_f1(client.generate_dialogue(sample.input).response, ref)
+    # explanation: input holds "Error: ... → Correct: ..."
+    match = _EXPLANATION_INPUT.match(sample.input)
+    error_text, correct_text = match.groups() if match else (sample.input, "")
+    pred = client.explain_error(error_text, correct_text).explanation
+    return _token_f1(pred, str(_reference_field(sample.reference, ("explanation", "output"))))
+
+
+class _GreedyBackend:
+    """Server backend wrapper forcing temperature 0 so quants are compared on identical decoding."""
+
+    def __init__(self, server: LexiLingoServerClient):
+        self.server = server
+        self.latencies_ms: list[float] = []
+
+    def query(self, prompt: str, max_tokens: int = 256, timeout: float = 120) -> str:
+        started = time.perf_counter()
+        try:
+            return self.server.query(prompt, max_tokens=max_tokens, temperature=0.0, timeout=timeout)
+        finally:
+            self.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+
+# =============================================================================
+# llama.cpp tools
+# =============================================================================
+def _tool(llama_dir: str, name: str) -> str:
+    return os.path.expanduser(f"{llama_dir}/{name}")
+
+
+def run_perplexity(model: str, text_file: Path, args: argparse.Namespace) -> float:
+    cmd = [
+        _tool(args.llama_dir, "llama-perplexity"),
+        "-m", model,
+        "-f", str(text_file),
+        "-c", str(args.ctx),
+        "-t", str(args.threads),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=args.tool_timeout)
+    output = result.stdout + result.stderr
+    match = re.search(r"Final estimate:\s*PPL\s*=\s*([\d.]+)", output)
+    if result.returncode != 0 or not match:
+        raise RuntimeError(f"llama-perplexity failed: {output.strip()[-300:]}")
+    return float(match.group(1))
+
+
+def run_llama_bench(model: str, args: argparse.Namespace) -> tuple[float, float]:
+    """Return (prompt-eval tok/s, generation tok/s) on CPU."""
+    cmd = [
+        _tool(args.llama_dir, "llama-bench"),
+        "-m", model,
+        "-p", str(args.bench_prompt),
+        "-n", str(args.bench_gen),
+        "-t", str(args.threads),
+        "-ngl", "0",
+        "-o", "json",
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=args.tool_timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"llama-bench failed: {result.stderr.strip()[-300:]}")
+    prompt_tps = gen_tps = 0.0
+    for entry in json.loads(result.stdout):
+        if entry.get("n_prompt", 0) > 0 and entry.get("n_gen", 0) == 0:
+            prompt_tps = float(entry["avg_ts"])
+        elif entry.get("n_gen", 0) > 0 and entry.get("n_prompt", 0) == 0:
+            gen_tps = float(entry["avg_ts"])
+    return prompt_tps, gen_tps
+
+
+def _run_tasks(model: str, samples: list[ValSample], args: argparse.Namespace, result: QuantResult) -> None:
+    started = time.perf_counter()
+    server = LexiLingoServerClient(
+        model,
+        port=args.port,
+        llama_dir=args.llama_dir,
+        startup_timeout=args.load_timeout,
+    )
+    result.load_seconds = round(time.perf_counter() - started, 2)
+    backend = _GreedyBackend(server)
+    client = LexiLingoClient.from_backend(backend)
+    scores: dict[str, list[float]] = {}
+    try:
+        for idx, sample in enumerate(samples):
+            try:
+                scores.setdefault(sample.task, []).append(_score_sample(client, sample))
+            except Exception as e:
+                result.errors.append(f"{sample.task}: {e}")
+            print(f"\r  tasks {idx + 1:4}/{len(samples)}", end="", flush=True)
+        print()
+        if server.server_process:
+            result.peak_rss_mb = round(peak_rss(server.server_process.pid) / 1024 / 1024, 1)
+    finally:
+        server.stop_server()
+
+    for task, values in scores.items():
+        result.task_metrics[TASK_METRICS[task][0]] = round(statistics.mean(values), 4)
+    if backend.latencies_ms:
+        result.task_latency_ms_p50 = round(statistics.median(backend.latencies_ms), 1)
+
+
+def benchmark_quant(quantization: str, model: str, samples: list[ValSample], ppl_file: Path,
+                    args: argparse.Namespace) -> QuantResult:
+    print(f"\n=== {quantization} ({Path(model).name}) ===")
+    result = QuantResult(
+        quantization=quantization,
+        path=model,
+        size_mb=round(Path(model).stat().st_size / 1024 / 1024, 1),
+    )
+    steps = [
+        ("perplexity", lambda: setattr(result, "perplexity", round(run_perplexity(model, ppl_file, args), 4))),
+        ("llama-bench", lambda: _set_bench(result, *run_llama_bench(model, args))),
+        ("tasks", lambda: _run_tasks(model, samples, args, result)),
+    ]
+    for name, step in steps:
+        if name in args.skip:
+            continue
+        try:
+            step()
+        except Exception as e:
+            result.errors.append(f"{name}: {e}")
+            print(f"  {name} failed: {e}")
+    return result
+
+
+def _set_bench(result: QuantResult, prompt_tps: float, gen_tps: float) -> None:
+    result.prompt_tps = round(prompt_tps, 1)
+    result.gen_tps = round(gen_tps, 1)
+
+
+# =============================================================================
+# Ranking
+# =============================================================================
+def apply_budget(results: list[QuantResult], reference: QuantResult,
+                 max_ppl_increase: float, max_metric_drop: float) -> None:
+    for r in results:
+        r.budget_violations = []
+        if r is reference:
+            r.within_budget = True
+            continue
+        if r.perplexity is not None and reference.perplexity:
+            increase = r.perplexity / reference.perplexity - 1
+            if increase > max_ppl_increase:
+                r.budget_violations.append(f"ppl +{increase * 100:.1f}%")
+        for key, higher_is_better in TASK_METRICS.values():
+            if key not in r.task_metrics or key not in reference.task_metrics:
+                continue
+            delta = r.task_metrics[key] - reference.task_metrics[key]
+            drop = -delta if higher_is_better else delta
+            if drop > max_metric_drop:
+                r.budget_violations.append(f"{key} {delta:+.3f}")
+        if r.errors:
+            r.budget_violations.append("errors")
+        r.within_budget = not r.budget_violations
+
+
+def rank(results: list[QuantResult]) -> list[QuantResult]:
+    """In-budget first, then by generation speed (fallback: smaller file)."""
+    return sorted(results, key=lambda r: (not r.within_budget, -(r.gen_tps or 0.0), r.size_mb))
+
+
+def _pick_reference(results: list[QuantResult], name: str | None) -> QuantResult:
+    by_name = {r.quantization.upper(): r for r in results}
+    if name and name.upper() in by_name:
+        return by_name[name.upper()]
+    return by_name.get("F16") or max(results, key=lambda r: r.size_mb)
+
+
+def _print_report(ranked: list[QuantResult], reference: QuantResult) -> None:
+    keys = sorted({k for r in ranked for k in r.task_metrics})
+    print("\n" + "=" * 100)
+    header = f"{'#':>2s} {'quant':8s} {'MB':>7s} {'ppl':>8s} {'pp t/s':>8s} {'tg t/s':>7s} {'load s':>7s} {'RSS MB':>7s}"
+    print(header + "".join(f" {k[:12]:>12s}" for k in keys) + "  budget")
+    print("-" * 100)
+    for i, r in enumerate(ranked, 1):
+        def f(v, fmt):
+            return format(v, fmt) if v is not None else "-"
+        budget = "ref" if r is reference else ("ok" if r.within_budget else ", ".join(r.budget_violations))
+        print(
+            f"{i:2d} {r.quantization:8s} {r.size_mb:7.1f} {f(r.perplexity, '8.3f'):>8s} "
+            f"{f(r.prompt_tps, '8.1f'):>8s} {f(r.gen_tps, '7.1f'):>7s} {f(r.load_seconds, '7.2f'):>7s} "
+            f"{f(r.peak_rss_mb, '7.1f'):>7s}"
+            + "".join(f" {r.task_metrics.get(k, float('nan')):12.4f}" for k in keys)
+            + f"  {budget}"
+        )
+
+
+def _quant_name(path: str) -> str:
+    match = _QUANT_RE.search(Path(path).name)
+    return match.group(1).upper() if match else Path(path).stem
+
+
+def run_quant_benchmark(models: dict[str, str], val_path: str, **overrides: Any) -> dict[str, Any]:
+    """
+    Benchmark {quantization: gguf_path} and return the ranked report as a dict.
+
+    Keyword overrides use the CLI option names (e.g. n_per_task=20, llama_dir=...).
+    Used by export/export_mobile.py after a multi-quant GGUF export.
+    """
+    args = _build_parser().parse_args(["--val", str(val_path)])
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    return _run(models, args)
+
+
+def _run(models: dict[str, str], args: argparse.Namespace) -> dict[str, Any]:
+    if isinstance(args.skip, str):
+        args.skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    samples = load_val_slice(Path(args.val), args.n_per_task, args.seed)
+    print(f"Validation slice: {dict(Counter(s.task for s in samples))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ppl_file = Path(tmp) / "heldout.txt"
+        ppl_file.write_text("\n\n".join(s.text for s in samples), encoding="utf-8")
+        results = [benchmark_quant(q, path, samples, ppl_file, args) for q, path in models.items()]
+
+    reference = _pick_reference(results, args.reference)
+    apply_budget(results, reference, args.max_ppl_increase, args.max_metric_drop)
+    ranked = rank(results)
+    _print_report(ranked, reference)
+
+    recommended = next((r for r in ranked if r.within_budget), None)
+    if recommended:
+        print(f"\nRecommended: {recommended.quantization} ({recommended.path})")
+    else:
+        print("\nNo quantization stays inside the quality budget")
+
+    report = {
+        "val": str(args.val),
+        "samples": len(samples),
+        "reference": reference.quantization,
+        "budget": {"max_ppl_increase": args.max_ppl_increase, "max_metric_drop": args.max_metric_drop},
+        "recommended": recommended.quantization if recommended else None,
+        "ranked": [asdict(r) for r in ranked],
+    }
+    if args.report_json:
+        args.report_json = Path(args.report_json)
+        args.report_json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report saved to {args.report_json}")
+    return report
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Rank exported GGUF quantizations by speed within a quality budget.")
+    parser.add_argument("--models", type=str, default=None, help="Comma-separated GGUF files")
+    parser.add_argument("--gguf-dir", type=Path, default=None, help="Directory of exported GGUF files")
+    parser.add_argument("--name", type=str, default=None, help="Model name prefix inside --gguf-dir (e.g. qwen-grammar)")
+    parser.add_argument("--val", type=Path, required=True, help="Validation JSONL")
+    parser.add_argument("--n-per-task", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reference", type=str, default=None, help="Reference quant (default: F16 or largest file)")
+    parser.add_argument("--max-ppl-increase", type=float, default=0.05, help="Allowed relative perplexity increase")
+    parser.add_argument("--max-metric-drop", type=float, default=0.02, help="Allowed absolute drop per task metric")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--ctx", type=int, default=512, help="Perplexity context size")
+    parser.add_argument("--bench-prompt", type=int, default=512)
+    parser.add_argument("--bench-gen", type=int, default=128)
+    parser.add_argument("--skip", type=str, default="", help="Comma-separated steps to skip: perplexity,llama-bench,tasks")
+    parser.add_argument("--port", type=int, default=0, help="llama-server port (0 = any free port)")
+    parser.add_argument("--load-timeout", type=float, default=120.0)
+    parser.add_argument("--tool-timeout", type=float, default=1800.0)
+    parser.add_argument("--llama-dir", type=str, default="~/Projects/llama.cpp")
+    parser.add_argument("--report-json", type=Path, default=None)
+    return parser
+
+
+def main() -> None:
+    parser = _build_parser()
+    args = parser.parse_args()
+
+    if args.models:
+        paths = [p.strip() for p in args.models.split(",") if p.strip()]
+    elif args.gguf_dir:
+        pattern = f"{args.name}-*.gguf" if args.name else "*.gguf"
+        paths = sorted(str(p) for p in args.gguf_dir.glob(pattern))
+    else:
+        parser.error("Pass --models or --gguf-dir")
+    if not paths:
+        parser.error("No GGUF files found")
+
+    _run({_quant_name(p): p for p in paths}, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+# pyright: reportMissingImports=false
+
+"""Load generator and latency/throughput benchmark for a deployed LexiLingo GGUF.
+
+Drives the ``LexiLingoClient`` task methods (fluency, vocabulary, grammar,
+dialogue, explanation) against a llama-server with two workload shapes:
+
+- closed loop: N workers issue requests back-to-back (``--concurrency 1,2,4,8``)
+- open loop: Poisson arrivals at a fixed offered rate (``--qps 0.5,1,2,4``);
+  latency is measured from the scheduled arrival so queueing delay is included
+
+Every request is streamed, so the report contains TTFT, decode tokens/sec and
+p50/p95/p99 latency per task, plus the saturation point of each sweep.
+
+Usage (from repo root):
+  python benchmark/benchmark_lexilingo_load.py \\
+      --model exports/gguf/qwen-grammar-q4_k_m.gguf \\
+      --mode both --concurrency 1,2,4 --qps 0.5,1,2 --duration 60 \\
+      --label q4_k_m --report-json reports/load_q4_k_m.json
+
+  # Attach to an already running server (e.g. started with custom flags)
+  python benchmark/benchmark_lexilingo_load.py --base-url http://localhost:8080 --label q8_0-np4
+
+Notes:
+- Token counts are the number of streamed chunks; llama-server emits one token
+  per chunk, so this equals generated tokens.
+- Saturation (open loop) is the first offered rate whose achieved throughput falls
+  below ``--saturation-ratio`` of the offered rate or whose p95 exceeds ``--slo-p95-ms``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmark.common import percentile
+from export.lexilingo_client import LexiLingoClient, LexiLingoServerClient
+
+_TASKS: dict[str, Callable[[LexiLingoClient, str], Any]] = {
+    "fluency": lambda c, s: c.analyze_fluency(s),
+    "vocabulary": lambda c, s: c.classify_vocabulary(s),
+    "grammar": lambda c, s: c.correct_grammar(s),
+    "dialogue": lambda c, s: c.generate_dialogue(s),
+    "explanation": lambda c, s: c.explain_error(s, s),
+}
+
+_DEFAULT_SENTENCES = [
+    "The cat sat on the mat.",
+    "I goes to school every day.",
+    "She don't like apples.",
+    "The phenomenon is fascinating.",
+    "Yesterday I go to the market with my mother.",
+    "What's the weather like today?",
+    "We should discuss the opportunity before the meeting.",
+    "He have two brother and one sister.",
+]
+
+
+@dataclass(frozen=True)
+class RequestResult:
+    step: str
+    task: str
+    ok: bool
+    latency_ms: float
+    ttft_ms: float
+    tokens: int
+    queue_ms: float
+    error: str | None = None
+
+
+class InstrumentedBackend:
+    """Streaming backend that records TTFT/token counts for the calling thread."""
+
+    def __init__(self, server: LexiLingoServerClient):
+        self.server = server
+        self._local = threading.local()
+
+    def query(self, prompt: str, max_tokens: int = 256, **kwargs: Any) -> str:
+        started = time.perf_counter()
+        ttft = None
+        pieces: list[str] = []
+        for piece in self.server.stream(prompt, max_tokens=max_tokens, **kwargs):
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            pieces.append(piece)
+        self._local.ttft = ttft if ttft is not None else time.perf_counter() - started
+        self._local.tokens = len(pieces)
+        return "".join(pieces)
+
+    def last_metrics(self) -> tuple[float, int]:
+        return getattr(self._local, "ttft", 0.0), getattr(self._local, "tokens", 0)
+
+    def stop_server(self) -> None:
+        self.server.stop_server()
+
+
+def _load_sentences(dataset: Path | None) -> list[str]:
+    if dataset is None:
+        return list(_DEFAULT_SENTENCES)
+    sentences: list[str] = []
+    with open(dataset, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()] if dataset.suffix == ".jsonl" else json.load(f)
+    for row in rows:
+        text = row.get("input") or row.get("text") if isinstance(row, dict) else row
+        if text:
+            sentences.append(str(text).split(" | ")[0].strip())
+    if not sentences:
+        raise ValueError(f"No sentences found in {dataset}")
+    return sentences
+
+
+def _one_request(
+    client: LexiLingoClient,
+    backend: InstrumentedBackend,
+    step: str,
+    task: str,
+    sentence: str,
+    scheduled_at: float | None = None,
+) -> RequestResult:
+    started = time.perf_counter()
+    queue_ms = (started - scheduled_at) * 1000 if scheduled_at is not None else 0.0
+    try:
+        _TASKS[task](client, sentence)
+        ttft, tokens = backend.last_metrics()
+        latency_ms = (time.perf_counter() - started) * 1000 + queue_ms
+        return RequestResult(step, task, True, latency_ms, ttft * 1000 + queue_ms, tokens, queue_ms)
+    except Exception as e:
+        latency_ms = (time.perf_counter() - started) * 1000 + queue_ms
+        return RequestResult(step, task, False, latency_ms, float("nan"), 0, queue_ms, str(e))
+
+
+def _run_closed_loop(
+    client: LexiLingoClient,
+    backend: InstrumentedBackend,
+    tasks: list[str],
+    sentences: list[str],
+    concurrency: int,
+    duration: float,
+) -> tuple[list[RequestResult], float]:
+    step = f"closed:c={concurrency}"
+    results: list[RequestResult] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id: int) -> None:
+        rng = random.Random(worker_id)
+        task_cycle = itertools.cycle(tasks)
+        while time.perf_counter() < deadline:
+            result = _one_request(client, backend, step, next(task_cycle), rng.choice(sentences))
+            with lock:
+                results.append(result)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def _run_open_loop(
+    client: LexiLingoClient,
+    backend: InstrumentedBackend,
+    tasks: list[str],
+    sentences: list[str],
+    qps: float,
+    duration: float,
+    max_workers: int,
+    seed: int,
+) -> tuple[list[RequestResult], float]:
+    step = f"open:qps={qps:g}"
+    rng = random.Random(seed)
+    task_cycle = itertools.cycle(tasks)
+    futures = []
+    started = time.perf_counter()
+    next_arrival = started
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            next_arrival += rng.expovariate(qps)
+            if next_arrival - started > duration:
+                break
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(
+                _one_request, client, backend, step, next(task_cycle), rng.choice(sentences), next_arrival
+            ))
+        results = [f.result() for f in futures]
+    return results, time.perf_counter() - started
+
+
+def _summarize_results(results: list[RequestResult], elapsed: float) -> dict[str, Any]:
+    ok = [r for r in results if r.ok]
+    latencies = [r.latency_ms for r in ok]
+    ttfts = [r.ttft_ms for r in ok]
+    decode_rates = [
+        r.tokens / ((r.latency_ms - r.ttft_ms) / 1000.0)
+        for r in ok
+        if r.tokens > 1 and r.latency_ms > r.ttft_ms
+    ]
+    tokens = sum(r.tokens for r in ok)
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        "throughput_tokens_per_sec": tokens / elapsed if elapsed > 0 else 0.0,
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p95": percentile(latencies, 95),
+        "latency_ms_p99": percentile(latencies, 99),
+        "ttft_ms_p50": percentile(ttfts, 50),
+        "ttft_ms_p95": percentile(ttfts, 95),
+        "decode_tokens_per_sec_mean": statistics.mean(decode_rates) if decode_rates else 0.0,
+        "queue_ms_mean": statistics.mean(r.queue_ms for r in ok) if ok else 0.0,
+    }
+
+
+def _summarize_step(results: list[RequestResult], elapsed: float) -> dict[str, Any]:
+    summary = _summarize_results(results, elapsed)
+    summary["elapsed_s"] = elapsed
+    summary["per_task"] = {
+        task: _summarize_results([r for r in results if r.task == task], elapsed)
+        for task in sorted({r.task for r in results})
+    }
+    return summary
+
+
+def _find_saturation(steps: list[dict[str, Any]], ratio: float, slo_p95_ms: float | None) -> dict[str, Any]:
+    """Return the last healthy and first saturated step of a sweep."""
+    last_ok = None
+    for step in steps:
+        if step["kind"] == "open":
+            offered = step["offered_qps"]
+            saturated = step["throughput_rps"] < offered * ratio
+        else:
+            prev = last_ok["throughput_rps"] if last_ok else 0.0
+            # Closed loop: thêm worker mà throughput không tăng đáng kể => đã bão hoà
+            saturated = last_ok is not None and step["throughput_rps"] < prev * (2 - ratio)
+        if slo_p95_ms is not None and step["latency_ms_p95"] > slo_p95_ms:
+            saturated = True
+        if saturated:
+            return {"saturated_at": step["step"], "last_healthy": last_ok["step"] if last_ok else None}
+        last_ok = step
+    return {"saturated_at": None, "last_healthy": last_ok["step"] if last_ok else None}
+
+
+def _print_step(step: dict[str, Any]) -> None:
+    print(
+        f"  {step['step']:16s} req={step['requests']:5d} err={step['errors']:3d} "
+        f"rps={step['throughput_rps']:6.2f} tok/s={step['throughput_tokens_per_sec']:7.1f} "
+        f"p50={step['latency_ms_p50']:7.0f} p95={step['latency_ms_p95']:7.0f} p99={step['latency_ms_p99']:7.0f} "
+        f"ttft50={step['ttft_ms_p50']:6.0f}"
+    )
+    for task, s in step["per_task"].items():
+        print(
+            f"      {task:12s} n={s['requests']:4d} p50={s['latency_ms_p50']:7.0f} "
+            f"p95={s['latency_ms_p95']:7.0f} p99={s['latency_ms_p99']:7.0f} "
+            f"ttft50={s['ttft_ms_p50']:6.0f} dec={s['decode_tokens_per_sec_mean']:5.1f} tok/s"
+        )
+
+
+def _parse_list(raw: str, cast: Callable[[str], Any]) -> list[Any]:
+    return [cast(x) for x in raw.split(",") if x.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load benchmark for LexiLingoClient task methods.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--model", type=str, help="GGUF model; starts a llama-server for the run")
+    target.add_argument("--base-url", type=str, help="Attach to an already running llama-server")
+    parser.add_argument("--llama-dir", type=str, default="~/Projects/llama.cpp")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tasks", type=str, default="fluency,vocabulary,grammar,dialogue")
+    parser.add_argument("--dataset", type=Path, default=None, help="JSON/JSONL with 'input' or 'text' fields")
+    parser.add_argument("--mode", type=str, default="both", choices=["closed", "open", "both"])
+    parser.add_argument("--concurrency", type=str, default="1,2,4,8", help="Closed-loop worker counts")
+    parser.add_argument("--qps", type=str, default="0.5,1,2,4", help="Open-loop offered rates")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per step")
+    parser.add_argument("--max-workers", type=int, default=64, help="Open-loop max in-flight requests")
+    parser.add_argument("--saturation-ratio", type=float, default=0.9)
+    parser.add_argument("--slo-p95-ms", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", type=str, default="", help="Free-form label (quantization, server flags)")
+    parser.add_argument("--report-json", type=Path, default=None)
+    args = parser.parse_args()
+
+    tasks = [t for t in _parse_list(args.tasks, str) if t]
+    unknown = [t for t in tasks if t not in _TASKS]
+    if unknown:
+        parser.error(f"Unknown tasks: {unknown}")
+    sentences = _load_sentences(args.dataset)
+
+    if args.base_url:
+        url = urlparse(args.base_url)
+        server = LexiLingoServerClient("", host=url.hostname or "localhost", port=url.port or 80, auto_start=False)
+    else:
+        server = LexiLingoServerClient(args.model, port=args.port, llama_dir=args.llama_dir)
+    backend = InstrumentedBackend(server)
+    client = LexiLingoClient.from_backend(backend, mode="server", owns_backend=args.base_url is None)
+
+    report: dict[str, Any] = {
+        "label": args.label,
+        "model": args.model,
+        "base_url": server.base_url,
+        "tasks": tasks,
+        "duration_s": args.duration,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "closed_loop": [],
+        "open_loop": [],
+    }
+    try:
+        # Warm-up: nạp prompt cache / page-in model trước khi đo
+        for task in tasks:
+            _one_request(client, backend, "warmup", task, sentences[0])
+
+        if args.mode in ("closed", "both"):
+            print("\nClosed loop:")
+            for c in _parse_list(args.concurrency, int):
+                results, elapsed = _run_closed_loop(client, backend, tasks, sentences, c, args.duration)
+                step = {"kind": "closed", "step": f"c={c}", "concurrency": c, **_summarize_step(results, elapsed)}
+                report["closed_loop"].append(step)
+                _print_step(step)
+            report["closed_loop_saturation"] = _find_saturation(
+                report["closed_loop"], args.saturation_ratio, args.slo_p95_ms
+            )
+
+        if args.mode in ("open", "both"):
+            print("\nOpen loop (Poisson):")
+            for qps in _parse_list(args.qps, float):
+                results, elapsed = _run_open_loop(
+                    client, backend, tasks, sentences, qps, args.duration, args.max_workers, args.seed
+                )
+                step = {"kind": "open", "step": f"qps={qps:g}", "offered_qps": qps, **_summarize_step(results, elapsed)}
+                report["open_loop"].append(step)
+                _print_step(step)
+            report["open_loop_saturation"] = _find_saturation(
+                report["open_loop"], args.saturation_ratio, args.slo_p95_ms
+            )
+    finally:
+        client.close()
+
+    for key in ("closed_loop_saturation", "open_loop_saturation"):
+        if key in report:
+            sat = report[key]
+            print(f"\n{key}: last healthy={sat['last_healthy']}  saturated at={sat['saturated_at']}")
+
+    if args.report_json:
+        args.report_json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport saved to {args.report_json}")
+
+
+if __name__ == "__main__":
+    main()
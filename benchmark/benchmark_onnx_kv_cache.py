@@ -0,0 +1,256 @@
+# pyright: reportMissingImports=false
+
+"""Benchmark ONNX decoder exports on CPU: KV cache vs no cache, FP32 vs int8, vs GGUF.
+
+Runs greedy decoding directly with ``onnxruntime`` so both modes use the same graph:
+
+- ``kv-cache``: prefill once, then feed one token per step with ``past_key_values``
+- ``no-cache``: feed the whole sequence every step with an empty past (what a
+  decoder without KV-cache reuse does)
+
+Per-token decode latency (p50/p95), first-token latency and tokens/sec are
+reported per ONNX directory (e.g. the FP32 export and its ``-int8`` copy from
+``export_mobile.py --format onnx-kv``). With ``--gguf``, the same prompts go
+through ``llama-server`` and its ``timings`` give the GGUF per-token latency.
+
+Prompts are rendered once with the chat template of the first ONNX directory's
+tokenizer and sent verbatim to both runtimes (llama-server's raw ``/completion``,
+not ``/v1/chat/completions``), so every side decodes the same prompt tokens.
+
+Usage (from repo root):
+  python benchmark/benchmark_onnx_kv_cache.py \\
+      --onnx exports/onnx/qwen-grammar,exports/onnx/qwen-grammar-int8 \\
+      --gguf exports/gguf/qwen-grammar-q4_k_m.gguf \\
+      --max-tokens 32 --report-json reports/onnx_kv_cache.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmark.common import DEFAULT_SENTENCES, chat_prompts, percentile
+from export.lexilingo_client import LexiLingoServerClient
+
+_ORT_TYPES = {"tensor(float)": "float32", "tensor(float16)": "float16"}
+
+
+class OnnxDecoder:
+    """Greedy decoder over a merged optimum decoder (model.onnx with past_key_values)."""
+
+    def __init__(self, model_dir: Path, threads: int):
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.np = np
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(model_dir / "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.inputs = {i.name: i for i in self.session.get_inputs()}
+        self.past_names = [n for n in self.inputs if n.startswith("past_key_values")]
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        if not self.past_names:
+            raise ValueError(f"{model_dir} has no past_key_values inputs (exported without KV cache)")
+        # [batch, kv_heads, past_len, head_dim]: kv_heads / head_dim are fixed in the export
+        shape = self.inputs[self.past_names[0]].shape
+        self.kv_heads, self.head_dim = int(shape[1]), int(shape[3])
+        self.kv_dtype = _ORT_TYPES.get(self.inputs[self.past_names[0]].type, "float32")
+        eos = self.tokenizer.eos_token_id
+        self.eos_ids = set(eos if isinstance(eos, list) else [eos])
+
+    def _empty_past(self) -> dict[str, Any]:
+        empty = self.np.zeros((1, self.kv_heads, 0, self.head_dim), dtype=self.kv_dtype)
+        return {name: empty for name in self.past_names}
+
+    def _feed(self, ids: list[int], past: dict[str, Any], total_len: int) -> dict[str, Any]:
+        np = self.np
+        feed = {"input_ids": np.array([ids], dtype=np.int64)}
+        if "attention_mask" in self.inputs:
+            feed["attention_mask"] = np.ones((1, total_len), dtype=np.int64)
+        if "position_ids" in self.inputs:
+            feed["position_ids"] = np.arange(total_len - len(ids), total_len, dtype=np.int64)[None, :]
+        if "use_cache_branch" in self.inputs:
+            feed["use_cache_branch"] = np.array([total_len > len(ids)], dtype=bool)
+        feed.update(past)
+        return feed
+
+    def prefill_logits(self, prompt: str) -> Any:
+        """Next-token logits after the prompt (one forward pass, empty past)."""
+        ids = self.tokenizer(prompt)["input_ids"]
+        outputs = self.session.run(None, self._feed(ids, self._empty_past(), len(ids)))
+        return outputs[0][0, -1]
+
+    def generate(self, prompt: str, max_tokens: int, use_cache: bool) -> tuple[list[int], list[float]]:
+        """Return (generated ids, per-step latency ms); step 0 is prefill + first token."""
+        ids = self.tokenizer(prompt)["input_ids"]
+        sequence = list(ids)
+        past = self._empty_past()
+        generated: list[int] = []
+        step_ms: list[float] = []
+        step_ids = ids
+        for _ in range(max_tokens):
+            started = time.perf_counter()
+            if use_cache:
+                outputs = self.session.run(None, self._feed(step_ids, past, len(sequence)))
+            else:
+                outputs = self.session.run(None, self._feed(sequence, self._empty_past(), len(sequence)))
+            step_ms.append((time.perf_counter() - started) * 1000)
+
+            token = int(outputs[0][0, -1].argmax())
+            generated.append(token)
+            if token in self.eos_ids:
+                break
+            sequence.append(token)
+            step_ids = [token]
+            if use_cache:
+                named = dict(zip(self.output_names, outputs))
+                past = {name: named[name.replace("past_key_values", "present")] for name in self.past_names}
+        return generated, step_ms
+
+
+def _summarize_steps(runs: list[tuple[list[int], list[float]]]) -> dict[str, Any]:
+    first = [steps[0] for _, steps in runs if steps]
+    decode = [ms for _, steps in runs for ms in steps[1:]]
+    tokens = sum(len(ids) for ids, _ in runs)
+    total_ms = sum(sum(steps) for _, steps in runs)
+    return {
+        "prompts": len(runs),
+        "tokens": tokens,
+        "first_token_ms_p50": percentile(first, 50),
+        "per_token_ms_p50": percentile(decode, 50),
+        "per_token_ms_p95": percentile(decode, 95),
+        "tokens_per_sec": tokens / (total_ms / 1000.0) if total_ms else 0.0,
+    }
+
+
+def _bench_onnx(model_dir: Path, prompts: list[str], args: argparse.Namespace) -> dict[str, Any]:
+    info_file = model_dir / "onnx_export_info.json"
+    info = json.loads(info_file.read_text()) if info_file.exists() else {}
+    decoder = OnnxDecoder(model_dir, args.threads)
+    summary: dict[str, Any] = {"export_info": info}
+    outputs: dict[str, list[list[int]]] = {}
+    for mode, use_cache in (("kv-cache", True), ("no-cache", False)):
+        print(f"\n=== {model_dir.name} [{mode}] ===")
+        decoder.generate(prompts[0], 4, use_cache)  # warmup
+        runs = []
+        for idx, prompt in enumerate(prompts):
+            runs.append(decoder.generate(prompt, args.max_tokens, use_cache))
+            print(f"\r  {idx + 1:4}/{len(prompts)}", end="", flush=True)
+        print()
+        summary[mode] = _summarize_steps(runs)
+        outputs[mode] = [ids for ids, _ in runs]
+    # Greedy with and without cache must produce the same tokens
+    same = sum(1 for a, b in zip(outputs["kv-cache"], outputs["no-cache"]) if a == b)
+    summary["cache_output_match_rate"] = same / max(1, len(prompts))
+    with_cache = summary["kv-cache"]["per_token_ms_p50"]
+    summary["kv_cache_speedup"] = summary["no-cache"]["per_token_ms_p50"] / with_cache if with_cache else None
+    return summary
+
+
+def _raw_completion(client: LexiLingoServerClient, prompt: str, max_tokens: int) -> dict[str, Any]:
+    """Greedy /completion on an already templated prompt (no server-side chat template)."""
+    response = requests.post(
+        f"{client.base_url}/completion",
+        json={"prompt": prompt, "n_predict": max_tokens, "temperature": 0.0, "top_k": 1, "cache_prompt": False},
+        timeout=120,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _bench_gguf(model: str, prompts: list[str], args: argparse.Namespace) -> dict[str, Any]:
+    print(f"\n=== {Path(model).name} [llama-server] ===")
+    client = LexiLingoServerClient(model, port=args.port, llama_dir=args.llama_dir, startup_timeout=120)
+    per_token: list[float] = []
+    first: list[float] = []
+    tokens = 0
+    total_ms = 0.0
+    try:
+        _raw_completion(client, prompts[0], 4)  # warmup
+        for prompt in prompts:
+            timings = _raw_completion(client, prompt, args.max_tokens).get("timings") or {}
+            if timings.get("predicted_n"):
+                per_token.append(float(timings["predicted_per_token_ms"]))
+                tokens += int(timings["predicted_n"])
+            first.append(float(timings.get("prompt_ms") or 0.0))
+            total_ms += float(timings.get("prompt_ms") or 0.0) + float(timings.get("predicted_ms") or 0.0)
+    finally:
+        client.stop_server()
+    return {
+        "gguf": {
+            "prompts": len(prompts),
+            "tokens": tokens,
+            "first_token_ms_p50": percentile(first, 50),
+            "per_token_ms_p50": percentile(per_token, 50),
+            "per_token_ms_p95": percentile(per_token, 95),
+            "tokens_per_sec": tokens / (total_ms / 1000.0) if total_ms else 0.0,
+        }
+    }
+
+
+def _print_summary(results: dict[str, dict[str, Any]]) -> None:
+    print("\n" + "=" * 88)
+    print(f"{'model':30s} {'mode':10s} {'first ms':>9s} {'tok ms p50':>11s} {'p95':>8s} {'tok/s':>8s}")
+    print("-" * 88)
+    for name, summary in results.items():
+        for mode in ("kv-cache", "no-cache", "gguf"):
+            if mode in summary:
+                s = summary[mode]
+                print(
+                    f"{name[:30]:30s} {mode:10s} {s['first_token_ms_p50']:9.1f} {s['per_token_ms_p50']:11.2f} "
+                    f"{s['per_token_ms_p95']:8.2f} {s['tokens_per_sec']:8.1f}"
+                )
+        if summary.get("kv_cache_speedup"):
+            print(f"{'':30s} kv-cache speedup {summary['kv_cache_speedup']:.2f}x, "
+                  f"output match {summary['cache_output_match_rate'] * 100:.0f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CPU latency of ONNX KV-cache decoders vs no cache and GGUF.")
+    parser.add_argument("--onnx", type=str, required=True, help="Comma-separated ONNX model directories")
+    parser.add_argument("--gguf", type=str, default=None, help="GGUF file to compare through llama-server")
+    parser.add_argument("--n", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--llama-dir", type=str, default="~/Projects/llama.cpp")
+    parser.add_argument("--report-json", type=Path, default=None)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    model_dirs = [Path(p.strip()) for p in args.onnx.split(",") if p.strip()]
+    tokenizer = AutoTokenizer.from_pretrained(str(model_dirs[0]))
+    prompts = chat_prompts(tokenizer, [f"Correct this sentence: {s}" for s in DEFAULT_SENTENCES[:args.n]])
+    results: dict[str, dict[str, Any]] = {}
+    for model_dir in model_dirs:
+        results[model_dir.name] = _bench_onnx(model_dir, prompts, args)
+    if args.gguf:
+        results[Path(args.gguf).name] = _bench_gguf(args.gguf, prompts, args)
+
+    _print_summary(results)
+
+    if args.report_json:
+        args.report_json.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump({"max_tokens": args.max_tokens, "threads": args.threads, "results": results}, f, indent=2)
+        print(f"\nReport saved to {args.report_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# pyright: reportMissingImports=false
+
+"""Benchmark speculative decoding for the Qwen grammar llama-server.
+
+Starts ``llama-server`` once without a draft model and once per ``--draft-max``
+value with ``-md <draft>``, sends the same grammar-correction prompts greedily
+(temperature 0) and compares:
+
+- generation tokens/sec (from llama-server ``timings`` when available)
+- draft acceptance rate (``draft_n_accepted / draft_n``)
+- end-to-end latency per prompt
+- whether the drafted output matches the baseline output
+
+Usage (from repo root):
+  python benchmark/benchmark_speculative_decoding.py \\
+      --model exports/gguf/qwen-grammar-q4_k_m.gguf \\
+      --draft-model exports/gguf/qwen-draft-q4_k_m.gguf \\
+      --draft-max 4,8,16 --n 50 --report-json reports/speculative.json
+
+Notes:
+- llama.cpp only accepts a draft model whose vocabulary matches the target model.
+  SmolLM2 and Qwen2.5 use different tokenizers, so pair the Qwen grammar model with
+  a smaller Qwen2.5 GGUF (e.g. the 0.5B export as draft for the 1.5B dev model).
+- Prompts come from ``--dataset`` (grammar JSON/JSONL rows with ``input``) or a
+  built-in set of learner sentences.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmark.common import DEFAULT_SENTENCES, percentile
+from export.lexilingo_client import LexiLingoServerClient
+
+
+@dataclass(frozen=True)
+class PromptRun:
+    config: str
+    index: int
+    latency_ms: float
+    predicted_n: int
+    predicted_ms: float
+    draft_n: int
+    draft_n_accepted: int
+    output: str
+
+
+def _load_sentences(dataset: Path | None, n: int) -> list[str]:
+    if dataset is None:
+        base = DEFAULT_SENTENCES
+        return [base[i % len(base)] for i in range(n)]
+
+    rows: list[dict[str, Any]] = []
+    with open(dataset, "r", encoding="utf-8") as f:
+        if dataset.suffix == ".jsonl":
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = json.load(f)
+    sentences = [
+        str(row.get("input", "")).strip()
+        for row in rows
+        if row.get("task", "grammar") == "grammar" and row.get("input")
+    ]
+    if not sentences:
+        raise ValueError(f"No grammar inputs found in {dataset}")
+    return sentences[:n]
+
+
+def _run_config(
+    name: str,
+    model: str,
+    sentences: list[str],
+    args: argparse.Namespace,
+    draft_model: str | None = None,
+    draft_max: int = 16,
+) -> list[PromptRun]:
+    print(f"\n=== {name} ===")
+    client = LexiLingoServerClient(
+        model,
+        port=args.port,
+        llama_dir=args.llama_dir,
+        draft_model_path=draft_model,
+        draft_max=draft_max,
+        draft_min=args.draft_min,
+    )
+    runs: list[PromptRun] = []
+    try:
+        for _ in range(args.warmup):
+            client.complete(f"Correct this sentence: {sentences[0]}", args.max_tokens, temperature=0.0)
+
+        for idx, sentence in enumerate(sentences):
+            started = time.perf_counter()
+            data = client.complete(f"Correct this sentence: {sentence}", args.max_tokens, temperature=0.0)
+            latency_ms = (time.perf_counter() - started) * 1000
+
+            timings = data.get("timings") or {}
+            usage = data.get("usage") or {}
+            predicted_n = int(timings.get("predicted_n") or usage.get("completion_tokens") or 0)
+            predicted_ms = float(timings.get("predicted_ms") or latency_ms)
+            runs.append(PromptRun(
+                config=name,
+                index=idx,
+                latency_ms=latency_ms,
+                predicted_n=predicted_n,
+                predicted_ms=predicted_ms,
+                draft_n=int(timings.get("draft_n") or 0),
+                draft_n_accepted=int(timings.get("draft_n_accepted") or 0),
+                output=data["choices"][0]["message"]["content"],
+            ))
+            print(f"\r  {idx + 1:4}/{len(sentences)}  lat={latency_ms:6.0f}ms", end="", flush=True)
+        print()
+    finally:
+        client.stop_server()
+    return runs
+
+
+def _summarize(runs: list[PromptRun], baseline: list[PromptRun] | None) -> dict[str, Any]:
+    latencies = [r.latency_ms for r in runs]
+    predicted_n = sum(r.predicted_n for r in runs)
+    predicted_ms = sum(r.predicted_ms for r in runs)
+    draft_n = sum(r.draft_n for r in runs)
+    accepted = sum(r.draft_n_accepted for r in runs)
+    summary: dict[str, Any] = {
+        "prompts": len(runs),
+        "tokens_generated": predicted_n,
+        "tokens_per_sec": predicted_n / (predicted_ms / 1000.0) if predicted_ms else 0.0,
+        "latency_ms_mean": statistics.mean(latencies) if latencies else float("nan"),
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p95": percentile(latencies, 95),
+        "draft_tokens": draft_n,
+        "draft_accepted": accepted,
+        "acceptance_rate": accepted / draft_n if draft_n else None,
+    }
+    if baseline:
+        matches = sum(1 for a, b in zip(runs, baseline) if a.output.strip() == b.output.strip())
+        summary["output_match_rate"] = matches / max(1, min(len(runs), len(baseline)))
+        base_tps = _summarize(baseline, None)["tokens_per_sec"]
+        summary["speedup"] = summary["tokens_per_sec"] / base_tps if base_tps else None
+    return summary
+
+
+def _print_summary(summaries: dict[str, dict[str, Any]]) -> None:
+    print("\n" + "=" * 86)
+    print(f"{'config':18s} {'tok/s':>8s} {'speedup':>8s} {'accept':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'match':>7s}")
+    print("-" * 86)
+    for name, s in summaries.items():
+        speedup = f"{s['speedup']:.2f}x" if s.get("speedup") else "-"
+        accept = f"{s['acceptance_rate'] * 100:.1f}%" if s.get("acceptance_rate") is not None else "-"
+        match = f"{s['output_match_rate'] * 100:.0f}%" if "output_match_rate" in s else "-"
+        print(
+            f"{name:18s} {s['tokens_per_sec']:8.1f} {speedup:>8s} {accept:>8s} "
+            f"{s['latency_ms_p50']:9.0f} {s['latency_ms_p95']:9.0f} {match:>7s}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Speculative decoding benchmark for the LexiLingo grammar server.")
+    parser.add_argument("--model", type=str, required=True, help="Target GGUF (Qwen grammar)")
+    parser.add_argument("--draft-model", type=str, required=True, help="Draft GGUF sharing the target vocabulary")
+    parser.add_argument("--draft-max", type=str, default="4,8,16", help="Comma-separated draft lengths to test")
+    parser.add_argument("--draft-min", type=int, default=0)
+    parser.add_argument("--dataset", type=Path, default=None, help="Grammar JSON/JSONL with 'input' fields")
+    parser.add_argument("--n", type=int, default=32)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--llama-dir", type=str, default="~/Projects/llama.cpp")
+    parser.add_argument("--report-json", type=Path, default=None)
+    args = parser.parse_args()
+
+    sentences = _load_sentences(args.dataset, args.n)
+    draft_lengths = [int(x) for x in args.draft_max.split(",") if x.strip()]
+
+    all_runs: dict[str, list[PromptRun]] = {"baseline": _run_config("baseline", args.model, sentences, args)}
+    for k in draft_lengths:
+        name = f"draft_max={k}"
+        all_runs[name] = _run_config(name, args.model, sentences, args, args.draft_model, k)
+
+    baseline = all_runs["baseline"]
+    summaries = {
+        name: _summarize(runs, None if name == "baseline" else baseline)
+        for name, runs in all_runs.items()
+    }
+    _print_summary(summaries)
+
+    if args.report_json:
+        args.report_json.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "model": args.model,
+            "draft_model": args.draft_model,
+            "max_tokens": args.max_tokens,
+            "summaries": summaries,
+            "runs": {name: [asdict(r) for r in runs] for name, runs in all_runs.items()},
+        }
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport saved to {args.report_json}")
+
+
+if __name__ == "__main__":
+    main()
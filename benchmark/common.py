@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmark scripts and export verification.
+
+- ``DEFAULT_SENTENCES``: built-in learner sentences with grammar errors
+- ``percentile``: linear-interpolated percentile of latency samples
+- ``peak_rss``: peak resident memory of a running process (e.g. llama-server)
+- ``chat_prompts``: prompts with the tokenizer's chat template applied, i.e. the
+  text llama-server's ``/v1/chat/completions`` would feed the model, so raw
+  ``/completion`` calls and in-process runtimes see the same tokens
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+DEFAULT_SENTENCES = [
+    "She don't like apples.",
+    "I goes to school every day.",
+    "Yesterday I go to the market with my mother.",
+    "He have two brother and one sister.",
+    "I have been study English for two year.",
+    "The book what I read yesterday was interesting.",
+    "I want improve my English speaking.",
+    "There is many people in the park today.",
+    "My father work in a hospital since 2010.",
+    "We was very tired after the long trip.",
+    "She is more taller than her sister.",
+    "I am interesting in learning new languages.",
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    """p-th percentile (0-100) with linear interpolation; NaN for no samples."""
+    if not values:
+        return float("nan")
+    values_sorted = sorted(values)
+    k = (len(values_sorted) - 1) * (p / 100.0)
+    f = int(k)
+    c = min(f + 1, len(values_sorted) - 1)
+    return float(values_sorted[f] + (values_sorted[c] - values_sorted[f]) * (k - f))
+
+
+def peak_rss(pid: int) -> int:
+    """Peak resident set size (VmHWM, bytes) of a running process; 0 if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def chat_prompts(tokenizer: Any, prompts: list[str]) -> list[str]:
+    """Single-turn user prompts rendered with the chat template (unchanged if the tokenizer has none)."""
+    if not getattr(tokenizer, "chat_template", None):
+        return list(prompts)
+    return [
+        tokenizer.apply_chat_template([{"role": "user", "content": p}], tokenize=False, add_generation_prompt=True)
+        for p in prompts
+    ]
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Bulk Inference Job Runner - Chạy LexiLingoClient trên file JSONL lớn
+=====================================================================
+Dùng để re-grade hàng chục nghìn câu learner đã lưu trữ:
+
+1. Stream input JSONL từng dòng (không load toàn bộ vào RAM)
+2. Gửi song song tới LexiLingoClient với số worker giới hạn
+3. Ghi kết quả ngay khi có (theo đúng thứ tự input) ra output JSONL
+4. Checkpoint offset để chạy lại tiếp tục từ chỗ đã dừng
+5. Retry với exponential backoff; lỗi cuối cùng được ghi lại thay vì dừng job
+
+Usage:
+    python export/bulk_inference.py \\
+        --model exports/gguf/qwen-grammar-q4_k_m.gguf \\
+        --task grammar \\
+        --input archive/learner_sentences.jsonl \\
+        --output archive/learner_sentences.graded.jsonl \\
+        --concurrency 4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from export.lexilingo_client import LexiLingoClient
+
+
+# Task -> hàm gọi client cho một dòng input
+TASK_HANDLERS: Dict[str, Callable] = {
+    "fluency": lambda client, text, row: client.analyze_fluency(text),
+    "vocabulary": lambda client, text, row: client.classify_vocabulary(text),
+    "grammar": lambda client, text, row: client.correct_grammar(text),
+    "dialogue": lambda client, text, row: client.generate_dialogue(text),
+    "explanation": lambda client, text, row: client.explain_error(text, row.get("corrected", "")),
+}
+
+
+class JobCheckpoint:
+    """
+    Lưu vị trí đã xử lý xong của job.
+
+    input_offset: byte offset trong input ngay sau dòng cuối cùng đã ghi kết quả
+    output_size: kích thước output tương ứng (phần ghi dư sau crash sẽ bị cắt)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.input_offset = 0
+        self.output_size = 0
+        self.lines_done = 0
+        self.errors = 0
+
+    def load(self) -> bool:
+        if not self.path.exists():
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.input_offset = int(data.get("input_offset", 0))
+        self.output_size = int(data.get("output_size", 0))
+        self.lines_done = int(data.get("lines_done", 0))
+        self.errors = int(data.get("errors", 0))
+        return True
+
+    def save(self):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "input_offset": self.input_offset,
+                "output_size": self.output_size,
+                "lines_done": self.lines_done,
+                "errors": self.errors,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+class BulkInferenceRunner:
+    """
+    Stream JSONL input qua LexiLingoClient với concurrency, retry và checkpoint.
+
+    Args:
+        client: LexiLingoClient (hoặc object có các task methods tương tự)
+        task: fluency | vocabulary | grammar | dialogue | explanation
+        concurrency: Số request chạy song song
+        retries: Số lần retry sau lần gọi đầu tiên
+        backoff: Thời gian chờ cơ sở (giây) cho exponential backoff
+        text_field: Tên field chứa câu input trong mỗi dòng JSON
+        checkpoint_every: Lưu checkpoint sau mỗi N dòng đã ghi
+    """
+
+    def __init__(self,
+                 client,
+                 task: str,
+                 concurrency: int = 4,
+                 retries: int = 3,
+                 backoff: float = 1.0,
+                 text_field: str = "input",
+                 checkpoint_every: int = 100,
+                 progress_interval: float = 5.0):
+        if task not in TASK_HANDLERS:
+            raise ValueError(f"Invalid task: {task}. Use one of {sorted(TASK_HANDLERS)}")
+        self.client = client
+        self.task = task
+        self.handler = TASK_HANDLERS[task]
+        self.concurrency = max(1, int(concurrency))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.text_field = text_field
+        self.checkpoint_every = max(1, int(checkpoint_every))
+        self.progress_interval = progress_interval
+
+    def _process_line(self, line_no: int, raw: bytes) -> Dict:
+        """Xử lý một dòng với retry; luôn trả về record (status ok/error)."""
+        record = {"line": line_no, "task": self.task}
+        try:
+            row = json.loads(raw)
+        except ValueError as e:  # JSONDecodeError hoặc bytes không phải UTF-8
+            record.update({"status": "error", "error": f"Invalid JSON: {e}", "attempts": 0})
+            return record
+
+        if isinstance(row, str):
+            row = {self.text_field: row}
+        if not isinstance(row, dict):
+            record.update({
+                "status": "error",
+                "error": f"Expected a JSON object or string, got {type(row).__name__}",
+                "attempts": 0,
+            })
+            return record
+        if "id" in row:
+            record["id"] = row["id"]
+        text = str(row.get(self.text_field, "")).strip()
+        record["input"] = text
+        if not text:
+            record.update({"status": "error", "error": f"Missing field '{self.text_field}'", "attempts": 0})
+            return record
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                result = self.handler(self.client, text, row)
+                record.update({
+                    "status": "ok",
+                    "result": asdict(result),
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "attempts": attempt + 1,
+                })
+                return record
+            except Exception as e:
+                last_error = e
+                if attempt < self.retries:
+                    delay = self.backoff * (2 ** attempt)
+                    time.sleep(delay + random.uniform(0, delay * 0.1))
+
+        record.update({"status": "error", "error": str(last_error), "attempts": self.retries + 1})
+        return record
+
+    def run(self, input_path: Path, output_path: Path, checkpoint_path: Optional[Path] = None,
+            resume: bool = True) -> Dict:
+        """Chạy job; trả về thống kê cuối cùng."""
+        input_path = Path(input_path)
+        output_path = Path(output_path)
+        checkpoint = JobCheckpoint(Path(checkpoint_path or f"{output_path}.ckpt.json"))
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        resumed = resume and checkpoint.load()
+        output_size = output_path.stat().st_size if output_path.exists() else 0
+        if resumed and output_size < checkpoint.output_size:
+            # Output bị xóa / cắt ngắn sau checkpoint: truncate sẽ chèn byte NUL vào JSONL
+            print(f"⚠️  {output_path} has {output_size:,} bytes, checkpoint expects "
+                  f"{checkpoint.output_size:,}; restarting from line 0")
+            resumed = False
+        if resumed:
+            print(f"⏩ Resuming at line {checkpoint.lines_done:,} (offset {checkpoint.input_offset:,})")
+        else:
+            checkpoint = JobCheckpoint(checkpoint.path)
+            if output_path.exists():
+                output_path.unlink()
+
+        total_bytes = input_path.stat().st_size
+        start_offset = checkpoint.input_offset
+        started = time.monotonic()
+        last_report = started
+        session_done = 0
+
+        with open(input_path, "rb") as fin, open(output_path, "ab") as fout, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # Bỏ phần output ghi sau checkpoint cuối (chưa được xác nhận)
+            fout.truncate(checkpoint.output_size)
+            fout.seek(checkpoint.output_size)
+            fin.seek(start_offset)
+
+            pending: Dict[int, tuple] = {}  # line_no -> (future, end_offset)
+            next_to_write = checkpoint.lines_done
+            line_no = checkpoint.lines_done
+            max_in_flight = self.concurrency * 2
+            exhausted = False
+
+            while not exhausted or pending:
+                # Nạp thêm dòng cho đến khi đầy cửa sổ in-flight
+                while not exhausted and len(pending) < max_in_flight:
+                    raw = fin.readline()
+                    if not raw:
+                        exhausted = True
+                        break
+                    if not raw.strip():
+                        continue
+                    future: Future = pool.submit(self._process_line, line_no, raw)
+                    pending[line_no] = (future, fin.tell())
+                    line_no += 1
+
+                if next_to_write not in pending:
+                    # Không còn dòng nào đang chờ
+                    break
+
+                # Ghi kết quả theo đúng thứ tự input
+                future, end_offset = pending.pop(next_to_write)
+                record = future.result()
+                fout.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                next_to_write += 1
+                session_done += 1
+                checkpoint.lines_done = next_to_write
+                checkpoint.input_offset = end_offset
+                if record["status"] != "ok":
+                    checkpoint.errors += 1
+
+                if checkpoint.lines_done % self.checkpoint_every == 0:
+                    fout.flush()
+                    os.fsync(fout.fileno())
+                    checkpoint.output_size = fout.tell()
+                    checkpoint.save()
+
+                now = time.monotonic()
+                if now - last_report >= self.progress_interval:
+                    self._print_progress(checkpoint, start_offset, total_bytes, session_done, now - started)
+                    last_report = now
+
+            fout.flush()
+            os.fsync(fout.fileno())
+            checkpoint.output_size = fout.tell()
+            checkpoint.save()
+
+        elapsed = time.monotonic() - started
+        self._print_progress(checkpoint, start_offset, total_bytes, session_done, elapsed)
+        print()
+        return {
+            "lines_done": checkpoint.lines_done,
+            "errors": checkpoint.errors,
+            "session_lines": session_done,
+            "elapsed_seconds": round(elapsed, 2),
+            "lines_per_sec": round(session_done / elapsed, 2) if elapsed > 0 else 0.0,
+            "checkpoint": str(checkpoint.path),
+        }
+
+    @staticmethod
+    def _print_progress(checkpoint: JobCheckpoint, start_offset: int, total_bytes: int,
+                        session_done: int, elapsed: float):
+        rate = session_done / elapsed if elapsed > 0 else 0.0
+        bytes_done = checkpoint.input_offset - start_offset
+        bytes_left = max(0, total_bytes - checkpoint.input_offset)
+        # ETA ước lượng theo tốc độ byte (không cần đếm trước số dòng)
+        eta = bytes_left / (bytes_done / elapsed) if bytes_done > 0 and elapsed > 0 else float("inf")
+        pct = checkpoint.input_offset / max(1, total_bytes) * 100
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta != float("inf") else "--:--:--"
+        print(
+            f"\r  {pct:5.1f}%  lines={checkpoint.lines_done:,}  errors={checkpoint.errors:,}  "
+            f"{rate:6.1f} lines/s  ETA {eta_text}",
+            end="", flush=True,
+        )
+
+
+# =============================================================================
+# CLI Interface
+# =============================================================================
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run LexiLingo tasks over a JSONL file with concurrency, retries and resume"
+    )
+    parser.add_argument("--model", type=str, required=True, help="Path to GGUF model file")
+    parser.add_argument("--mode", type=str, default="server", choices=["server", "cli"])
+    parser.add_argument("--llama-dir", type=str, default="~/Projects/llama.cpp")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--task", type=str, required=True, choices=sorted(TASK_HANDLERS))
+    parser.add_argument("--input", type=str, required=True, help="Input JSONL (one object or string per line)")
+    parser.add_argument("--output", type=str, required=True, help="Output JSONL")
+    parser.add_argument("--text-field", type=str, default="input", help="Field holding the sentence")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="Base backoff seconds")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Checkpoint file (default: <output>.ckpt.json)")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--restart", action="store_true", help="Ignore existing checkpoint and start over")
+
+    args = parser.parse_args()
+
+    with LexiLingoClient(args.model, mode=args.mode, llama_dir=args.llama_dir, port=args.port) as client:
+        runner = BulkInferenceRunner(
+            client,
+            args.task,
+            concurrency=args.concurrency,
+            retries=args.retries,
+            backoff=args.backoff,
+            text_field=args.text_field,
+            checkpoint_every=args.checkpoint_every,
+        )
+        stats = runner.run(
+            Path(args.input),
+            Path(args.output),
+            Path(args.checkpoint) if args.checkpoint else None,
+            resume=not args.restart,
+        )
+
+    print(f"\n✅ Done: {stats['lines_done']:,} lines ({stats['errors']:,} errors), "
+          f"{stats['lines_per_sec']} lines/s")
+
+
+if __name__ == "__main__":
+    main()
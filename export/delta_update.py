@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Delta Updates - Manifest + binary patch giữa hai release model cho mobile
+==========================================================================
+Thay vì ship lại toàn bộ GGUF / mlpackage mỗi lần refresh model:
+
+1. Manifest: mỗi artifact được chia chunk và hash (SHA-256)
+   - GGUF: một chunk cho mỗi tensor (đọc offset bằng gguf-py) + header / padding
+   - File khác (Core ML weight.bin, ONNX, CTranslate2): chunk cố định 4 MB
+2. Delta: so manifest mới với manifest release trước. Chunk có hash đã tồn tại
+   trên device -> "copy" từ file cũ; chunk mới -> byte đi kèm trong data.bin.
+   Retrain chỉ adapter -> base GGUF chỉ gồm lệnh copy, chỉ tensor thay đổi được tải.
+3. Apply / verify trên máy: dựng lại release mới từ release cũ + patch, kiểm tra
+   hash từng chunk và toàn file.
+
+Layout patch (<release_dir>/delta-from-<old>/):
+    patch.json  - file -> danh sách segment ["copy", old_file, offset, length] | ["data", offset, length]
+    data.bin    - byte của các chunk mới
+
+Usage:
+    # Manifest của release hiện tại
+    python export/delta_update.py manifest --root ./exports --version 2026.10.2 \\
+        --artifacts gguf/qwen-grammar-q4_k_m.gguf,coreml/qwen-grammar.mlpackage
+
+    # Patch so với release trước (chỉ cần manifest cũ)
+    python export/delta_update.py diff --root ./exports --new ./exports/release/manifest.json \\
+        --old ./releases/2026.10.1/manifest.json --output ./exports/release/delta-from-2026.10.1
+
+    # Trên device / máy test
+    python export/delta_update.py apply --old-root ./models/2026.10.1 \\
+        --patch ./delta-from-2026.10.1 --output ./models/2026.10.2
+    python export/delta_update.py verify --root ./models/2026.10.2 --manifest ./manifest.json
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+_READ_CHUNK = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MANIFEST_VERSION = 1
+
+
+# =============================================================================
+# Chunking + hashing
+# =============================================================================
+def _hash_range(f, offset: int, length: int) -> str:
+    digest = hashlib.sha256()
+    f.seek(offset)
+    remaining = length
+    while remaining > 0:
+        block = f.read(min(_READ_CHUNK, remaining))
+        if not block:
+            raise ValueError(f"Unexpected end of file at {f.tell()}")
+        digest.update(block)
+        remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _gguf_ranges(path: Path) -> Optional[List[Tuple[str, int, int]]]:
+    """(tên, offset, length) của từng tensor trong file GGUF; None nếu không đọc được."""
+    try:
+        from gguf import GGUFReader
+    except ImportError:
+        return None
+    try:
+        reader = GGUFReader(str(path))
+        ranges = [(t.name, int(t.data_offset), int(t.n_bytes)) for t in reader.tensors]
+        del reader
+    except (ValueError, OSError) as e:
+        print(f"   {path.name}: cannot read GGUF tensors ({e}); using fixed-size chunks")
+        return None
+    return sorted(ranges, key=lambda r: r[1])
+
+
+def chunk_ranges(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[str, int, int]]:
+    """
+    Chia file thành các đoạn liên tiếp phủ toàn bộ file.
+
+    GGUF: header, từng tensor (theo tên) và phần padding giữa các tensor, nên
+    tensor không đổi giữ nguyên hash dù tensor khác thay đổi.
+    """
+    size = path.stat().st_size
+    tensors = _gguf_ranges(path) if path.suffix == ".gguf" else None
+    if not tensors:
+        return [(f"#{i}", offset, min(chunk_size, size - offset))
+                for i, offset in enumerate(range(0, size, chunk_size))]
+
+    ranges = []
+    position = 0
+    for name, offset, length in tensors:
+        if offset > position:
+            ranges.append(("__header__" if position == 0 else f"__pad_{len(ranges)}__", position, offset - position))
+        ranges.append((name, offset, length))
+        position = offset + length
+    if position < size:
+        ranges.append(("__tail__", position, size - position))
+    return ranges
+
+
+def file_manifest(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Size, SHA-256 toàn file và danh sách chunk (name, offset, length, sha256)."""
+    whole = hashlib.sha256()
+    chunks = []
+    with open(path, "rb") as f:
+        for name, offset, length in chunk_ranges(path, chunk_size):
+            chunks.append({"name": name, "offset": offset, "length": length,
+                           "sha256": _hash_range(f, offset, length)})
+        f.seek(0)
+        for block in iter(lambda: f.read(_READ_CHUNK), b""):
+            whole.update(block)
+    return {"size": path.stat().st_size, "sha256": whole.hexdigest(), "chunks": chunks}
+
+
+def _artifact_files(root: Path, artifact: str) -> List[str]:
+    """File (tương đối với root) của một artifact: một file hoặc cả thư mục."""
+    path = root / artifact
+    if path.is_dir():
+        return sorted(p.relative_to(root).as_posix() for p in path.rglob("*") if p.is_file())
+    return [Path(artifact).as_posix()]
+
+
+def build_manifest(root: str, artifacts: List[str], version: str,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """
+    Manifest của một release.
+
+    Args:
+        root: Thư mục gốc của release (đường dẫn trong manifest tương đối với root)
+        artifacts: File / thư mục artifact (tương đối với root hoặc tuyệt đối trong root)
+        version: Tên release
+    """
+    root_path = Path(root).resolve()
+    files = {}
+    for artifact in artifacts:
+        artifact_path = Path(artifact)
+        if artifact_path.is_absolute():
+            artifact = artifact_path.resolve().relative_to(root_path).as_posix()
+        for rel in _artifact_files(root_path, artifact):
+            files[rel] = file_manifest(root_path / rel, chunk_size)
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "chunk_size": chunk_size,
+        "files": files,
+    }
+
+
+# =============================================================================
+# Diff / apply / verify
+# =============================================================================
+def create_delta(root: str, new_manifest: Dict, old_manifest: Dict, patch_dir: str) -> Dict:
+    """
+    Ghi patch để dựng release new_manifest từ release old_manifest.
+
+    Chunk được tìm theo hash trong mọi file của release cũ (tensor chuyển file
+    hay đổi vị trí vẫn được copy). Chỉ cần manifest cũ, không cần file cũ.
+
+    Returns:
+        Thống kê: full_bytes, download_bytes, changed/reused chunks
+    """
+    old_chunks: Dict[str, Tuple[str, int]] = {}
+    for rel, entry in old_manifest["files"].items():
+        for chunk in entry["chunks"]:
+            old_chunks.setdefault(chunk["sha256"], (rel, chunk["offset"]))
+
+    out = Path(patch_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    files = {}
+    stats = {"full_bytes": 0, "download_bytes": 0, "reused_chunks": 0, "changed_chunks": 0, "changed": {}}
+    with open(out / "data.bin", "wb") as data:
+        for rel, entry in new_manifest["files"].items():
+            stats["full_bytes"] += entry["size"]
+            old = old_manifest["files"].get(rel)
+            if old and old["sha256"] == entry["sha256"]:
+                files[rel] = {"size": entry["size"], "sha256": entry["sha256"], "unchanged": True}
+                stats["reused_chunks"] += len(entry["chunks"])
+                continue
+
+            segments: List[list] = []
+            changed = []
+            with open(Path(root) / rel, "rb") as f:
+                for chunk in entry["chunks"]:
+                    source = old_chunks.get(chunk["sha256"])
+                    if source is not None:
+                        last = segments[-1] if segments else None
+                        # Gộp các copy liên tiếp trong cùng file cũ
+                        if last and last[0] == "copy" and last[1] == source[0] and last[2] + last[3] == source[1]:
+                            last[3] += chunk["length"]
+                        else:
+                            segments.append(["copy", source[0], source[1], chunk["length"]])
+                        stats["reused_chunks"] += 1
+                        continue
+
+                    f.seek(chunk["offset"])
+                    start = data.tell()
+                    remaining = chunk["length"]
+                    while remaining > 0:
+                        block = f.read(min(_READ_CHUNK, remaining))
+                        data.write(block)
+                        remaining -= len(block)
+                    last = segments[-1] if segments else None
+                    if last and last[0] == "data" and last[1] + last[2] == start:
+                        last[2] += chunk["length"]
+                    else:
+                        segments.append(["data", start, chunk["length"]])
+                    changed.append(chunk["name"])
+                    stats["changed_chunks"] += 1
+                    stats["download_bytes"] += chunk["length"]
+            files[rel] = {"size": entry["size"], "sha256": entry["sha256"], "segments": segments}
+            stats["changed"][rel] = changed
+
+    patch = {
+        "from": old_manifest.get("version"),
+        "to": new_manifest.get("version"),
+        "files": files,
+        "removed": sorted(set(old_manifest["files"]) - set(new_manifest["files"])),
+        "stats": {k: v for k, v in stats.items() if k != "changed"},
+    }
+    with open(out / "patch.json", "w") as f:
+        json.dump(patch, f, indent=2)
+    with open(out / "manifest.json", "w") as f:
+        json.dump(new_manifest, f, indent=2)
+    return stats
+
+
+def apply_delta(old_root: str, patch_dir: str, output_root: str) -> List[str]:
+    """
+    Dựng release mới vào output_root từ release cũ (old_root) + patch.
+
+    File không đổi được hardlink (copy nếu không link được). Mỗi file dựng xong
+    được kiểm tra SHA-256 trước khi đổi tên vào vị trí cuối.
+
+    output_root phải khác old_root: patch đọc file cũ trong lúc ghi file mới.
+
+    Returns:
+        Danh sách file đã ghi (tương đối với output_root)
+    """
+    patch_path = Path(patch_dir)
+    with open(patch_path / "patch.json", "r") as f:
+        patch = json.load(f)
+    old = Path(old_root)
+    out = Path(output_root)
+    if out.resolve() == old.resolve():
+        raise ValueError(f"output_root must differ from old_root ({old}): patching in place "
+                         "would overwrite files the patch still reads")
+    written = []
+
+    with open(patch_path / "data.bin", "rb") as data:
+        for rel, entry in patch["files"].items():
+            target = out / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if entry.get("unchanged"):
+                if target.exists():
+                    target.unlink()
+                try:
+                    os.link(old / rel, target)
+                except OSError:
+                    shutil.copy2(old / rel, target)
+                written.append(rel)
+                continue
+
+            tmp = target.with_name(target.name + ".partial")
+            digest = hashlib.sha256()
+            with open(tmp, "wb") as dst:
+                for segment in entry["segments"]:
+                    if segment[0] == "copy":
+                        _, source, offset, length = segment
+                        src = open(old / source, "rb")
+                    else:
+                        _, offset, length = segment
+                        src = data
+                    try:
+                        src.seek(offset)
+                        remaining = length
+                        while remaining > 0:
+                            block = src.read(min(_READ_CHUNK, remaining))
+                            if not block:
+                                raise ValueError(f"{rel}: source ended early ({segment[:2]})")
+                            dst.write(block)
+                            digest.update(block)
+                            remaining -= len(block)
+                    finally:
+                        if src is not data:
+                            src.close()
+            if digest.hexdigest() != entry["sha256"]:
+                tmp.unlink()
+                raise ValueError(f"{rel}: checksum mismatch after patching")
+            os.replace(tmp, target)
+            written.append(rel)
+    return written
+
+
+def verify_release(root: str, manifest: Dict) -> Dict[str, List[str]]:
+    """Kiểm tra từng chunk của mọi file theo manifest; trả {file: [chunk lỗi]} (rỗng = OK)."""
+    problems: Dict[str, List[str]] = {}
+    for rel, entry in manifest["files"].items():
+        path = Path(root) / rel
+        if not path.exists():
+            problems[rel] = ["missing"]
+            continue
+        if path.stat().st_size != entry["size"]:
+            problems[rel] = [f"size {path.stat().st_size} != {entry['size']}"]
+            continue
+        with open(path, "rb") as f:
+            bad = [c["name"] for c in entry["chunks"] if _hash_range(f, c["offset"], c["length"]) != c["sha256"]]
+        if bad:
+            problems[rel] = bad
+    return problems
+
+
+def package_release(output_dir: str, artifacts: List[str], version: Optional[str] = None,
+                    previous_manifest: Optional[str] = None) -> Dict:
+    """
+    Manifest cho các artifact trong output_dir, kèm delta so với release trước.
+
+    Ghi <output_dir>/release/manifest.json và (nếu có previous_manifest)
+    <output_dir>/release/delta-from-<version cũ>/.
+    """
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    release_dir = Path(output_dir) / "release"
+    release_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"\n📦 Building release manifest {version} ({len(artifacts)} artifact(s))...")
+    manifest = build_manifest(output_dir, artifacts, version)
+    with open(release_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    total = sum(e["size"] for e in manifest["files"].values())
+    result = {"version": version, "manifest": str(release_dir / "manifest.json"),
+              "files": len(manifest["files"]), "full_mb": round(total / 1024 / 1024, 1)}
+
+    if previous_manifest:
+        with open(previous_manifest, "r") as f:
+            old = json.load(f)
+        patch_dir = release_dir / f"delta-from-{old.get('version', 'previous')}"
+        stats = create_delta(output_dir, manifest, old, str(patch_dir))
+        result["delta"] = {
+            "path": str(patch_dir),
+            "download_mb": round(stats["download_bytes"] / 1024 / 1024, 2),
+            "changed_chunks": stats["changed_chunks"],
+            "reused_chunks": stats["reused_chunks"],
+            "changed_files": {rel: len(names) for rel, names in stats["changed"].items()},
+        }
+        print(f"   Delta vs {old.get('version')}: {result['delta']['download_mb']} MB "
+              f"of {result['full_mb']} MB ({stats['changed_chunks']} changed chunk(s))")
+    return result
+
+
+# =============================================================================
+# CLI Interface
+# =============================================================================
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chunk manifests and delta patches for model releases")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("manifest", help="Write the manifest of a release")
+    p.add_argument("--root", required=True)
+    p.add_argument("--artifacts", required=True, help="Comma-separated files/directories relative to --root")
+    p.add_argument("--version", required=True)
+    p.add_argument("--output", default=None, help="Default: <root>/release/manifest.json")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    p = sub.add_parser("diff", help="Create a delta patch between two manifests")
+    p.add_argument("--root", required=True, help="Directory holding the new release files")
+    p.add_argument("--new", required=True, help="New manifest.json")
+    p.add_argument("--old", required=True, help="Previous release manifest.json")
+    p.add_argument("--output", required=True, help="Patch directory")
+
+    p = sub.add_parser("apply", help="Rebuild the new release from the old one and a patch")
+    p.add_argument("--old-root", required=True)
+    p.add_argument("--patch", required=True)
+    p.add_argument("--output", required=True, help="New release directory (must differ from --old-root)")
+
+    p = sub.add_parser("verify", help="Check every chunk of a release against its manifest")
+    p.add_argument("--root", required=True)
+    p.add_argument("--manifest", required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "manifest":
+        artifacts = [a.strip() for a in args.artifacts.split(",") if a.strip()]
+        manifest = build_manifest(args.root, artifacts, args.version, args.chunk_size)
+        output = Path(args.output or Path(args.root) / "release" / "manifest.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Manifest: {output} ({len(manifest['files'])} files)")
+
+    elif args.command == "diff":
+        with open(args.new, "r") as f:
+            new = json.load(f)
+        with open(args.old, "r") as f:
+            old = json.load(f)
+        stats = create_delta(args.root, new, old, args.output)
+        print(f"Patch: {args.output}")
+        print(f"   Download: {stats['download_bytes'] / 1024 / 1024:.2f} MB "
+              f"of {stats['full_bytes'] / 1024 / 1024:.2f} MB")
+        for rel, names in stats["changed"].items():
+            print(f"   {rel}: {len(names)} changed chunk(s)")
+
+    elif args.command == "apply":
+        written = apply_delta(args.old_root, args.patch, args.output)
+        print(f"Wrote {len(written)} file(s) to {args.output}")
+        manifest_file = Path(args.patch) / "manifest.json"
+        if manifest_file.exists():
+            with open(manifest_file, "r") as f:
+                problems = verify_release(args.output, json.load(f))
+            if problems:
+                print(f"Verification failed: {problems}")
+                sys.exit(1)
+            print("Verified against manifest")
+
+    elif args.command == "verify":
+        with open(args.manifest, "r") as f:
+            problems = verify_release(args.root, json.load(f))
+        for rel, bad in problems.items():
+            print(f"   {rel}: {', '.join(bad[:10])}")
+        print("OK" if not problems else f"{len(problems)} file(s) failed")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
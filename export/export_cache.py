@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Content-addressed Export Cache
+==============================
+Skips re-exporting models whose weights did not change.
+
+Each artifact is keyed by:
+- a SHA-256 digest of the source model files (relative paths + contents)
+- the export format and its parameters (quantization, compute units, ...)
+- the version of the tool doing the conversion (llama.cpp commit, coremltools, optimum)
+
+Artifacts are stored once under <cache_dir>/objects/. On a hit, GGUF files are
+hardlinked (or copied when hardlinks are not possible) into the export output
+directory; Core ML / ONNX directories are copied.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def _package_version(name: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return "unknown"
+
+
+def llama_cpp_version() -> str:
+    """llama.cpp git commit (or a fingerprint of the convert/quantize tools)."""
+    llama_cpp_path = Path(os.environ.get("LLAMA_CPP_PATH", "llama.cpp"))
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(llama_cpp_path), "rev-parse", "HEAD"],
+            capture_output=True, text=True, timeout=10
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            return result.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+    fingerprint = hashlib.sha256()
+    for tool in (llama_cpp_path / "convert_hf_to_gguf.py",
+                 llama_cpp_path / "build" / "bin" / "llama-quantize"):
+        if tool.exists():
+            stat = tool.stat()
+            fingerprint.update(f"{tool.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return fingerprint.hexdigest()[:16]
+
+
+TOOL_VERSIONS: Dict[str, Callable[[], str]] = {
+    "gguf": llama_cpp_version,
+    "gguf-lora": llama_cpp_version,
+    "coreml": lambda: _package_version("coremltools"),
+    "onnx": lambda: _package_version("optimum"),
+    "ctranslate2": lambda: _package_version("ctranslate2"),
+}
+
+
+class ExportCache:
+    """
+    Content-addressed cache for exported model artifacts.
+
+    Args:
+        cache_dir: Directory holding objects/ and the file-hash index
+
+    Example:
+        cache = ExportCache("./exports/.export_cache")
+        path = cache.run("qwen_gguf", "./outputs/qwen-grammar", "gguf",
+                         {"quantization": "Q4_K_M"}, "./exports/gguf",
+                         lambda: export_to_gguf(...))
+        print(cache.report)  # {"qwen_gguf": "hit"}
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.cache_dir / "file_hashes.json"
+        self.report: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._tool_versions: Dict[str, str] = {}
+        self._source_digests: Dict[str, str] = {}
+        self._digest_locks: Dict[str, threading.Lock] = {}
+        self._file_index = self._load_index()
+
+    # ------------------------------------------------------------------
+    # Hashing
+    # ------------------------------------------------------------------
+    def _load_index(self) -> Dict:
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, "r") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _save_index(self):
+        tmp = self.index_file.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._file_index, f)
+        os.replace(tmp, self.index_file)
+
+    def _file_digest(self, path: Path) -> str:
+        """SHA-256 of a file, reused while (size, mtime) are unchanged."""
+        stat = path.stat()
+        entry_key = str(path.resolve())
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._file_index.get(entry_key)
+        if entry and entry.get("stamp") == stamp:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._file_index[entry_key] = {"stamp": stamp, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def source_digest(self, model_path: str) -> str:
+        """Digest of every file under model_path (or of the file itself)."""
+        model_path = str(Path(model_path).resolve())
+        with self._lock:
+            if model_path in self._source_digests:
+                return self._source_digests[model_path]
+            path_lock = self._digest_locks.setdefault(model_path, threading.Lock())
+
+        # Hash outside self._lock so other models' steps keep running; the
+        # per-path lock stops two steps from hashing the same model twice
+        with path_lock:
+            with self._lock:
+                if model_path in self._source_digests:
+                    return self._source_digests[model_path]
+
+            root = Path(model_path)
+            files = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())
+            digest = hashlib.sha256()
+            for path in files:
+                rel = path.name if root.is_file() else path.relative_to(root).as_posix()
+                digest.update(rel.encode("utf-8") + b"\0")
+                digest.update(self._file_digest(path).encode("ascii") + b"\0")
+            with self._lock:
+                self._save_index()
+                self._source_digests[model_path] = digest.hexdigest()
+                return self._source_digests[model_path]
+
+    def tool_version(self, fmt: str) -> str:
+        with self._lock:
+            if fmt not in self._tool_versions:
+                self._tool_versions[fmt] = TOOL_VERSIONS.get(fmt, lambda: "unknown")()
+            return self._tool_versions[fmt]
+
+    def key(self, model_path: str, fmt: str, params: Dict) -> str:
+        payload = json.dumps({
+            "source": self.source_digest(model_path),
+            "format": fmt,
+            "params": params,
+            "tool": self.tool_version(fmt),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Store / materialize
+    # ------------------------------------------------------------------
+    def _entry_dir(self, key: str) -> Path:
+        return self.objects_dir / key[:2] / key
+
+    @staticmethod
+    def _link_or_copy(src: Path, dst: Path):
+        """
+        Hardlink a file (copy if linking fails); directories are always copied.
+
+        Tools such as coremltools/optimum rewrite files inside an existing output
+        directory in place, which would corrupt hardlinked cache objects.
+        """
+        if dst.exists() or dst.is_symlink():
+            if dst.is_dir() and not dst.is_symlink():
+                shutil.rmtree(dst)
+            else:
+                dst.unlink()
+        dst.parent.mkdir(parents=True, exist_ok=True)
+
+        def link(s, d):
+            try:
+                os.link(s, d)
+            except OSError:
+                shutil.copy2(s, d)
+
+        if src.is_dir():
+            shutil.copytree(src, dst)
+        else:
+            link(src, dst)
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Cached artifact path for key, or None."""
+        meta_file = self._entry_dir(key) / "meta.json"
+        if not meta_file.exists():
+            return None
+        with open(meta_file, "r") as f:
+            meta = json.load(f)
+        artifact = self._entry_dir(key) / meta["filename"]
+        return artifact if artifact.exists() else None
+
+    def store(self, key: str, artifact_path: str, info: Optional[Dict] = None):
+        """Add an exported artifact (file or directory) to the cache."""
+        artifact = Path(artifact_path)
+        entry = self._entry_dir(key)
+        if entry.exists():
+            shutil.rmtree(entry)
+        entry.mkdir(parents=True)
+        self._link_or_copy(artifact, entry / artifact.name)
+        with open(entry / "meta.json", "w") as f:
+            json.dump({"filename": artifact.name, **(info or {})}, f, indent=2)
+
+    def materialize(self, key: str, output_dir: str) -> Optional[str]:
+        """Link a cached artifact into output_dir; returns its new path."""
+        cached = self.lookup(key)
+        if cached is None:
+            return None
+        dest = Path(output_dir) / cached.name
+        if dest.exists() and not dest.is_dir() and os.path.samefile(cached, dest):
+            return str(dest)
+        self._link_or_copy(cached, dest)
+        return str(dest)
+
+    def run(self,
+            result_key: str,
+            model_path: str,
+            fmt: str,
+            params: Dict,
+            output_dir: str,
+            export_fn: Callable[[], Optional[str]],
+            validate: Optional[Callable[[Path], bool]] = None) -> Optional[str]:
+        """
+        Return a cached artifact for (model, format, params) or run export_fn and cache it.
+
+        validate(path) -> False keeps an artifact out of the cache (e.g. an FP16
+        file returned for a Q4_K_M request); it is still returned to the caller.
+        The outcome ("hit" / "miss" / "uncached" / "failed") is recorded in
+        self.report[result_key].
+        """
+        key = self.key(model_path, fmt, params)
+        cached = self.materialize(key, output_dir)
+        if cached:
+            print(f"   Cache hit ({key[:12]}): {cached}")
+            self.record(result_key, "hit")
+            return cached
+
+        result = export_fn()
+        if result and Path(result).exists() and validate is not None and not validate(Path(result)):
+            print(f"   Not caching {result}: does not match {fmt} {params}")
+            self.record(result_key, "uncached")
+        elif result and Path(result).exists():
+            self.store(key, result, {"format": fmt, "params": params, "source": str(model_path)})
+            self.record(result_key, "miss")
+        else:
+            self.record(result_key, "failed")
+        return result
+
+    def record(self, result_key: str, outcome: str):
+        with self._lock:
+            self.report[result_key] = outcome
+
+    def summary(self) -> Dict:
+        hits = sum(1 for v in self.report.values() if v == "hit")
+        return {
+            "cache_dir": str(self.cache_dir),
+            "hits": hits,
+            "misses": sum(1 for v in self.report.values() if v == "miss"),
+            "artifacts": dict(self.report),
+        }
+
+
+if __name__ == "__main__":
+    # Print the source digest of a model directory (debugging cache misses)
+    if len(sys.argv) != 3:
+        print("Usage: python export/export_cache.py <cache_dir> <model_path>")
+        sys.exit(1)
+    print(ExportCache(sys.argv[1]).source_digest(sys.argv[2]))
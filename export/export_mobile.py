@@ -17,15 +17,23 @@ Supports:
 import os
 import sys
 import json
+import random
 import shutil
-import subprocess
+import hashlib
+import contextvars
+import time
+import threading
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List
 from dataclasses import dataclass
 from enum import Enum
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from export.export_cache import ExportCache
+from export.export_pipeline import ExportPipeline, StepResults, StepTimeout, print_step_report, run_logged
+from export.merge_lora_streaming import is_adapter_dir, merge_lora_streaming
+
 
 class ExportFormat(Enum):
     """Supported export formats."""
@@ -46,6 +54,16 @@ class ExportConfig:
     # GGUF settings
     gguf_quantization: str = "Q4_K_M"  # Best balance for mobile
     gguf_available_quants: List[str] = None
+    gguf_all_quants: bool = False  # Export every level in gguf_available_quants
+    gguf_parallel_jobs: int = 0    # Concurrent llama-quantize jobs (0 = auto)
+    gguf_imatrix_data: Optional[str] = None   # Unified training JSONL for imatrix calibration
+    gguf_imatrix_samples: int = 512
+    gguf_benchmark_val: Optional[str] = None  # Val JSONL: rank exported quants (benchmark/benchmark_gguf_quants.py)
+    
+    # Adapter-only export: one base GGUF + one LoRA GGUF per task
+    adapter_export: bool = False
+    adapters_dir: Optional[str] = None     # Default: <model_path>/adapters/<task>/
+    base_model_path: Optional[str] = None  # Default: base_model_name_or_path from adapter_config.json
     
     # Core ML settings
     coreml_compute_units: str = "ALL"  # CPU, GPU, NPU
@@ -54,8 +72,32 @@ class ExportConfig:
     # ONNX settings
     onnx_opset_version: int = 17
     onnx_optimize: bool = True
+    onnx_llm: bool = False  # Also export Qwen/SmolLM as merged KV-cache decoders (+ int8)
+    
+    # Whisper CTranslate2 (faster-whisper) settings
+    whisper_ct2_quantizations: List[str] = None
+    whisper_reference_audio: Optional[str] = None  # Directory of audio files for RTF
+    
+    # Verification: golden prompts through HF vs each export (export/verify_export.py)
+    verify_exports: bool = False
+    verify_max_latency_regression: float = 0.15  # vs last passing run
+    
+    # Delta-update packaging (export/delta_update.py)
+    package_release: bool = False
+    release_version: Optional[str] = None        # Default: timestamp
+    previous_manifest: Optional[str] = None      # manifest.json of the last shipped release
+    
+    # Orchestration (export/export_pipeline.py)
+    pipeline_jobs: int = 2                 # Export steps running at once (across models)
+    step_timeout: Optional[float] = 7200   # Seconds per step; external tools are killed after it
+    
+    # Export cache (skip conversions whose model files, params and tools are unchanged)
+    use_cache: bool = True
+    cache_dir: Optional[str] = None  # Default: <output_dir>/.export_cache
     
     def __post_init__(self):
+        if self.whisper_ct2_quantizations is None:
+            self.whisper_ct2_quantizations = ["int8", "int8_float16"]
         if self.gguf_available_quants is None:
             self.gguf_available_quants = [
                 "Q4_0", "Q4_1", "Q4_K_S", "Q4_K_M",  # 4-bit
@@ -68,11 +110,217 @@ class ExportConfig:
 # =============================================================================
 # GGUF Export (for llama.cpp)
 # =============================================================================
+def _llama_cpp_tools():
+    """Return (convert_script, quantize_bin) from $LLAMA_CPP_PATH."""
+    llama_cpp_path = os.environ.get("LLAMA_CPP_PATH", "llama.cpp")
+    convert_script = Path(llama_cpp_path) / "convert_hf_to_gguf.py"
+    quantize_bin = Path(llama_cpp_path) / "build" / "bin" / "llama-quantize"
+    return convert_script, quantize_bin
+
+
+def _convert_to_f16(model_path: str, fp16_file: Path, convert_script: Path) -> bool:
+    """Convert a HuggingFace model to an FP16 GGUF file."""
+    cmd = [
+        sys.executable,
+        str(convert_script),
+        model_path,
+        "--outfile", str(fp16_file),
+        "--outtype", "f16"
+    ]
+    
+    # Outputs may be hardlinks into the export cache; never write through them
+    if fp16_file.exists():
+        fp16_file.unlink()
+    
+    print(f"   Running: {' '.join(cmd)}")
+    result = run_logged(cmd)
+    
+    if result.returncode != 0:
+        print(f"   Conversion failed (exit {result.returncode}): {result.tail}")
+        return False
+    return True
+
+
+def _quantize_gguf(
+    quantize_bin: Path,
+    fp16_file: Path,
+    output_file: Path,
+    quantization: str,
+    threads: Optional[int] = None,
+    imatrix_file: Optional[Path] = None
+) -> bool:
+    """Quantize an FP16 GGUF with llama-quantize (optionally imatrix-calibrated)."""
+    cmd = [str(quantize_bin)]
+    if imatrix_file:
+        cmd += ["--imatrix", str(imatrix_file)]
+    cmd += [
+        str(fp16_file),
+        str(output_file),
+        quantization
+    ]
+    if threads:
+        cmd.append(str(threads))
+    if output_file.exists():
+        output_file.unlink()  # May be a hardlink into the export cache
+    
+    result = run_logged(cmd)
+    
+    if result.returncode != 0:
+        print(f"   Quantization to {quantization} failed (exit {result.returncode}): {result.tail}")
+        return False
+    return True
+
+
+# Prompt templates used by LexiLingoClient, so calibration text matches inference inputs
+_CALIBRATION_PROMPTS = {
+    "fluency": "Analyze the fluency of this sentence: {}",
+    "vocabulary": "Classify the vocabulary level: {}",
+    "grammar": "Correct this sentence: {}",
+    "dialogue": "User: {}",
+}
+
+
+def _calibration_key(train_path: str, n_samples: int, seed: int = 42) -> str:
+    """Identity of a calibration sample: training file (path, size, mtime) + sampling params."""
+    stat = Path(train_path).stat()
+    payload = f"{Path(train_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{n_samples}:{seed}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _row_to_calibration_text(row: Dict) -> Optional[str]:
+    """Render one unified training row (input/output or messages format) as plain text."""
+    if "messages" in row:
+        parts = [str(m.get("content", "")).strip() for m in row["messages"]]
+        text = "\n".join(p for p in parts if p)
+    else:
+        user = str(row.get("input", "")).strip()
+        if not user:
+            return None
+        output = row.get("output", "")
+        output = output if isinstance(output, str) else json.dumps(output, ensure_ascii=False)
+        template = _CALIBRATION_PROMPTS.get(row.get("task", ""), "{}")
+        text = f"{template.format(user)}\n{output}".strip()
+    return text or None
+
+
+def prepare_calibration_text(
+    train_path: str,
+    output_dir: str,
+    n_samples: int = 512,
+    seed: int = 42
+) -> Path:
+    """
+    Stratified sample of the unified training JSONL, written as imatrix calibration text.
+    
+    Each task (grammar/fluency/vocabulary/dialogue/explanation) gets an equal share.
+    The file is cached under output_dir/.calibration/ by training-file identity and
+    sampling params, so repeated exports reuse the same selection.
+    
+    Returns:
+        Path to the calibration text file
+    """
+    calib_dir = Path(output_dir) / ".calibration"
+    calib_file = calib_dir / f"calib-{_calibration_key(train_path, n_samples, seed)}.txt"
+    if calib_file.exists():
+        print(f"   Using cached calibration data: {calib_file}")
+        return calib_file
+    
+    # One pass, per-task reservoir sampling (training JSONL can be large)
+    rng = random.Random(seed)
+    reservoirs: Dict[str, List[str]] = {}
+    seen: Dict[str, int] = {}
+    with open(train_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            text = _row_to_calibration_text(row)
+            if not text:
+                continue
+            task = row.get("task", "unknown")
+            seen[task] = seen.get(task, 0) + 1
+            bucket = reservoirs.setdefault(task, [])
+            if len(bucket) < n_samples:
+                bucket.append(text)
+            else:
+                j = rng.randrange(seen[task])
+                if j < n_samples:
+                    bucket[j] = text
+    
+    if not reservoirs:
+        raise ValueError(f"No usable rows in {train_path}")
+    
+    per_task = max(1, n_samples // len(reservoirs))
+    selected = []
+    for task in sorted(reservoirs):
+        selected.extend(reservoirs[task][:per_task])
+    rng.shuffle(selected)
+    
+    calib_dir.mkdir(parents=True, exist_ok=True)
+    tmp_file = calib_file.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp_file.write_text("\n\n".join(selected) + "\n", encoding="utf-8")
+    os.replace(tmp_file, calib_file)
+    counts = {task: min(per_task, len(rows)) for task, rows in sorted(reservoirs.items())}
+    print(f"   Calibration data: {len(selected)} samples {counts} -> {calib_file}")
+    return calib_file
+
+
+def compute_imatrix(
+    fp16_file: Path,
+    calibration_file: Path,
+    output_dir: Path,
+    model_name: str,
+    model_path: str,
+    threads: Optional[int] = None
+) -> Optional[Path]:
+    """
+    Compute (or reuse) an importance matrix for fp16_file with llama-imatrix.
+    
+    The matrix is named after the model files' (size, mtime) and the calibration
+    file, so every quantization level of the same export shares one matrix.
+    """
+    root = Path(model_path)
+    files = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())
+    stamp = hashlib.sha256(calibration_file.name.encode("utf-8"))
+    for path in files:
+        stat = path.stat()
+        stamp.update(f"{path.relative_to(root) if root.is_dir() else path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    imatrix_file = output_dir / f"{model_name}-{stamp.hexdigest()[:12]}.imatrix"
+    if imatrix_file.exists():
+        print(f"   Using cached importance matrix: {imatrix_file}")
+        return imatrix_file
+    
+    imatrix_bin = Path(os.environ.get("LLAMA_CPP_PATH", "llama.cpp")) / "build" / "bin" / "llama-imatrix"
+    if not imatrix_bin.exists():
+        print(f"   llama-imatrix not found at {imatrix_bin}; quantizing without imatrix")
+        return None
+    
+    cmd = [
+        str(imatrix_bin),
+        "-m", str(fp16_file),
+        "-f", str(calibration_file),
+        "-o", str(imatrix_file),
+        "-t", str(threads or os.cpu_count() or 1)
+    ]
+    print(f"   Computing importance matrix...")
+    started = time.perf_counter()
+    result = run_logged(cmd)
+    if result.returncode != 0 or not imatrix_file.exists():
+        print(f"   imatrix failed (exit {result.returncode}): {result.tail}")
+        if imatrix_file.exists():
+            imatrix_file.unlink()
+        return None
+    print(f"   Importance matrix ready in {time.perf_counter() - started:.1f}s: {imatrix_file}")
+    return imatrix_file
+
+
 def export_to_gguf(
     model_path: str,
     output_path: str,
     quantization: str = "Q4_K_M",
-    model_name: str = "model"
+    model_name: str = "model",
+    imatrix_data: Optional[str] = None,
+    imatrix_samples: int = 512
 ) -> Optional[str]:
     """
     Export model to GGUF format for llama.cpp.
@@ -84,6 +332,8 @@ def export_to_gguf(
         output_path: Output directory
         quantization: Quantization level (Q4_K_M recommended)
         model_name: Name for output file
+        imatrix_data: Unified training JSONL; calibrate quantization with an importance matrix
+        imatrix_samples: Number of calibration samples drawn from imatrix_data
     
     Returns:
         Path to exported model or None if failed
@@ -101,45 +351,29 @@ def export_to_gguf(
     print(f"   Output: {output_file}")
     
     # Method 1: Using llama.cpp convert script
-    llama_cpp_path = os.environ.get("LLAMA_CPP_PATH", "llama.cpp")
-    convert_script = Path(llama_cpp_path) / "convert_hf_to_gguf.py"
-    quantize_bin = Path(llama_cpp_path) / "build" / "bin" / "llama-quantize"
+    convert_script, quantize_bin = _llama_cpp_tools()
     
     if convert_script.exists():
         try:
             # Step 1: Convert to FP16 GGUF
             fp16_file = output_dir / f"{model_name}-f16.gguf"
             
-            cmd = [
-                sys.executable,
-                str(convert_script),
-                model_path,
-                "--outfile", str(fp16_file),
-                "--outtype", "f16"
-            ]
-            
-            print(f"   Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"   Conversion failed: {result.stderr}")
+            if not _convert_to_f16(model_path, fp16_file, convert_script):
                 return None
             
             # Step 2: Quantize
             if quantization != "F16" and quantize_bin.exists():
-                cmd = [
-                    str(quantize_bin),
-                    str(fp16_file),
-                    str(output_file),
-                    quantization
-                ]
+                imatrix_file = None
+                if imatrix_data:
+                    calibration_file = prepare_calibration_text(imatrix_data, output_path, imatrix_samples)
+                    imatrix_file = compute_imatrix(fp16_file, calibration_file, output_dir, model_name, model_path)
                 
                 print(f"   Quantizing to {quantization}...")
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    print(f"   Quantization failed: {result.stderr}")
-                    return str(fp16_file)  # Return FP16 version
+                if not _quantize_gguf(quantize_bin, fp16_file, output_file, quantization,
+                                      imatrix_file=imatrix_file):
+                    # Not a {quantization} artifact; callers (and the export cache) must not take it as one
+                    print(f"   {quantization} quantization failed; FP16 kept at {fp16_file}")
+                    return None
                 
                 # Remove FP16 intermediate file
                 fp16_file.unlink()
@@ -151,6 +385,8 @@ def export_to_gguf(
             
             return str(output_file)
             
+        except StepTimeout:
+            raise
         except Exception as e:
             print(f"   Error: {e}")
     
@@ -173,6 +409,177 @@ def export_to_gguf(
         return None
 
 
+def export_to_gguf_multi(
+    model_path: str,
+    output_path: str,
+    quantizations: List[str],
+    model_name: str = "model",
+    max_workers: int = 0,
+    threads_per_job: int = 0,
+    keep_f16: bool = False,
+    imatrix_data: Optional[str] = None,
+    imatrix_samples: int = 512
+) -> List[Dict]:
+    """
+    Convert once, quantize many: export several GGUF quantization levels.
+    
+    The model is converted to FP16 a single time, then every requested level
+    is quantized concurrently from that file. The FP16 intermediate is removed
+    at the end unless "F16" is requested or keep_f16 is set.
+    
+    Args:
+        model_path: Path to HuggingFace model
+        output_path: Output directory
+        quantizations: Quantization levels (e.g. ["Q4_K_M", "Q8_0", "F16"])
+        model_name: Name for output files
+        max_workers: Concurrent llama-quantize jobs (0 = auto)
+        threads_per_job: Threads passed to each llama-quantize (0 = cpu_count / max_workers)
+        keep_f16: Keep the FP16 intermediate even if "F16" is not requested
+        imatrix_data: Unified training JSONL; one importance matrix is computed
+            from it and shared by every quantization level
+        imatrix_samples: Number of calibration samples drawn from imatrix_data
+    
+    Returns:
+        One row per quantization: quantization, path, size_mb, seconds, status
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    output_dir = Path(output_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    quantizations = list(dict.fromkeys(q.upper() for q in quantizations))
+    cpu_count = os.cpu_count() or 1
+    pending = [q for q in quantizations if q != "F16"]
+    if max_workers <= 0:
+        # llama-quantize scales with threads; a few concurrent jobs keep the disk busy
+        max_workers = max(1, min(len(pending), cpu_count // 4 or 1))
+    if threads_per_job <= 0:
+        threads_per_job = max(1, cpu_count // max_workers)
+    
+    print(f"\nExporting to GGUF format (multi-quant)...")
+    print(f"   Model: {model_path}")
+    print(f"   Quantizations: {', '.join(quantizations)}")
+    print(f"   Parallel jobs: {max_workers} x {threads_per_job} threads")
+    
+    convert_script, quantize_bin = _llama_cpp_tools()
+    if not convert_script.exists():
+        print("   llama.cpp not found. Set LLAMA_CPP_PATH=/path/to/llama.cpp")
+        return [
+            {"quantization": q, "path": None, "size_mb": None, "seconds": None, "status": "failed"}
+            for q in quantizations
+        ]
+    
+    rows = []
+    fp16_file = output_dir / f"{model_name}-f16.gguf"
+    
+    started = time.perf_counter()
+    converted = _convert_to_f16(model_path, fp16_file, convert_script)
+    convert_seconds = time.perf_counter() - started
+    if not converted:
+        return [
+            {"quantization": q, "path": None, "size_mb": None, "seconds": None, "status": "failed"}
+            for q in quantizations
+        ]
+    print(f"   Converted to FP16 in {convert_seconds:.1f}s")
+    
+    imatrix_file = None
+    if imatrix_data and pending:
+        calibration_file = prepare_calibration_text(imatrix_data, output_path, imatrix_samples)
+        imatrix_file = compute_imatrix(fp16_file, calibration_file, output_dir, model_name, model_path)
+    
+    def run(quantization: str) -> Dict:
+        output_file = output_dir / f"{model_name}-{quantization.lower()}.gguf"
+        job_started = time.perf_counter()
+        ok = quantize_bin.exists() and _quantize_gguf(
+            quantize_bin, fp16_file, output_file, quantization, threads_per_job, imatrix_file
+        )
+        seconds = time.perf_counter() - job_started
+        if not ok and output_file.exists():
+            output_file.unlink()  # Drop partial output
+        print(f"   {quantization}: {'done' if ok else 'failed'} in {seconds:.1f}s")
+        return {
+            "quantization": quantization,
+            "path": str(output_file) if ok else None,
+            "size_mb": round(output_file.stat().st_size / 1024 / 1024, 1) if ok else None,
+            "seconds": round(seconds, 1),
+            "status": "ok" if ok else "failed",
+        }
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # copy_context: quantize jobs log into the calling pipeline step
+        futures = [pool.submit(contextvars.copy_context().run, run, q) for q in pending]
+        results = dict(zip(pending, (f.result() for f in futures)))
+    
+    for quantization in quantizations:
+        if quantization == "F16":
+            rows.append({
+                "quantization": "F16",
+                "path": str(fp16_file),
+                "size_mb": round(fp16_file.stat().st_size / 1024 / 1024, 1),
+                "seconds": round(convert_seconds, 1),
+                "status": "ok",
+            })
+        else:
+            rows.append(results[quantization])
+    
+    if "F16" not in quantizations and not keep_f16:
+        fp16_file.unlink()
+    
+    print_gguf_table(rows)
+    return rows
+
+
+def print_gguf_table(rows: List[Dict]):
+    """Print a size/time table for multi-quant GGUF export."""
+    print(f"\n   {'Quant':8s} {'Size (MB)':>10s} {'Time (s)':>9s}  Status")
+    print(f"   {'-' * 8} {'-' * 10} {'-' * 9}  ------")
+    for row in rows:
+        size = f"{row['size_mb']:.1f}" if row["size_mb"] is not None else "-"
+        seconds = f"{row['seconds']:.1f}" if row["seconds"] is not None else "-"
+        print(f"   {row['quantization']:8s} {size:>10s} {seconds:>9s}  {row['status']}")
+
+
+def export_lora_to_gguf(
+    adapter_path: str,
+    base_model_path: str,
+    output_path: str,
+    adapter_name: str
+) -> Optional[str]:
+    """
+    Convert a PEFT LoRA adapter to a GGUF adapter (llama.cpp convert_lora_to_gguf.py).
+    
+    Adapters stay F16: they are small and llama.cpp applies them on top of a
+    quantized base at load time.
+    """
+    convert_script = Path(os.environ.get("LLAMA_CPP_PATH", "llama.cpp")) / "convert_lora_to_gguf.py"
+    if not convert_script.exists():
+        print(f"   convert_lora_to_gguf.py not found. Set LLAMA_CPP_PATH=/path/to/llama.cpp")
+        return None
+    
+    output_dir = Path(output_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"{adapter_name}-lora.gguf"
+    if output_file.exists():
+        output_file.unlink()  # May be a hardlink into the export cache
+    
+    cmd = [
+        sys.executable,
+        str(convert_script),
+        adapter_path,
+        "--base", base_model_path,
+        "--outfile", str(output_file),
+        "--outtype", "f16"
+    ]
+    print(f"   Running: {' '.join(cmd)}")
+    result = run_logged(cmd)
+    if result.returncode != 0 or not output_file.exists():
+        print(f"   Adapter conversion failed (exit {result.returncode}): {result.tail}")
+        return None
+    
+    print(f"   Adapter: {output_file} ({output_file.stat().st_size / 1024 / 1024:.1f} MB)")
+    return str(output_file)
+
+
 # =============================================================================
 # Core ML Export (for iOS)
 # =============================================================================
@@ -363,6 +770,106 @@ def export_to_onnx(
         return None
 
 
+def _onnx_has_kv_cache(onnx_file: Path) -> bool:
+    """True if the decoder graph takes past_key_values inputs (KV cache reuse)."""
+    import onnx
+    
+    graph = onnx.load(str(onnx_file), load_external_data=False).graph
+    return any(i.name.startswith("past_key_values") for i in graph.input)
+
+
+def export_to_onnx_kv(
+    model_path: str,
+    output_path: str,
+    model_name: str = "model",
+    opset_version: int = 17,
+    quantize_int8: bool = True
+) -> Optional[str]:
+    """
+    Export a causal LM to ONNX as a single merged decoder with KV cache.
+    
+    Uses optimum's "text-generation-with-past" task, whose post-processing merges
+    the prefill and decode graphs into one model.onnx that takes past_key_values.
+    With quantize_int8, a dynamically quantized copy (int8 weights, per-channel)
+    is written to <model_name>-int8/.
+    
+    An onnx_export_info.json next to each model records whether the graph
+    really has KV-cache inputs and whether it is quantized, for
+    benchmark/benchmark_onnx_kv_cache.py.
+    
+    Returns:
+        Path to the (int8 if requested) model directory or None if failed
+    """
+    output_dir = Path(output_path) / model_name
+    
+    print(f"\n🔷 Exporting to ONNX (merged decoder + KV cache)...")
+    print(f"   Model: {model_path}")
+    print(f"   Opset: {opset_version}")
+    print(f"   Output: {output_dir}")
+    
+    try:
+        from optimum.exporters.onnx import main_export
+        
+        main_export(
+            model_path,
+            output=str(output_dir),
+            task="text-generation-with-past",
+            opset=opset_version,
+            device="cpu"
+        )
+        onnx_file = output_dir / "model.onnx"
+        if not onnx_file.exists():
+            print(f"   Merged decoder not found in {output_dir}")
+            return None
+        
+        info = {
+            "has_kv_cache": _onnx_has_kv_cache(onnx_file),
+            "quantized": None,
+            "size_mb": round(sum(f.stat().st_size for f in output_dir.glob("model.onnx*")) / 1024 / 1024, 1),
+        }
+        with open(output_dir / "onnx_export_info.json", "w") as f:
+            json.dump(info, f, indent=2)
+        print(f"   KV cache inputs: {'yes' if info['has_kv_cache'] else 'NO'}  ({info['size_mb']} MB)")
+        
+        if not quantize_int8:
+            return str(output_dir)
+        
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        
+        int8_dir = Path(output_path) / f"{model_name}-int8"
+        if int8_dir.exists():
+            shutil.rmtree(int8_dir)
+        # Config, generation config and tokenizer are shared with the FP32 export
+        shutil.copytree(output_dir, int8_dir,
+                        ignore=shutil.ignore_patterns("model.onnx", "model.onnx_data", "onnx_export_info.json"))
+        
+        print("   Quantizing (dynamic int8)...")
+        quantize_dynamic(
+            str(onnx_file),
+            str(int8_dir / "model.onnx"),
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            use_external_data_format=(output_dir / "model.onnx_data").exists()
+        )
+        int8_info = {
+            "has_kv_cache": _onnx_has_kv_cache(int8_dir / "model.onnx"),
+            "quantized": "dynamic_int8",
+            "size_mb": round(sum(f.stat().st_size for f in int8_dir.glob("model.onnx*")) / 1024 / 1024, 1),
+        }
+        with open(int8_dir / "onnx_export_info.json", "w") as f:
+            json.dump(int8_info, f, indent=2)
+        print(f"   Int8 model: {int8_dir} ({int8_info['size_mb']} MB)")
+        return str(int8_dir)
+    
+    except ImportError:
+        print("   optimum / onnxruntime not installed. Install with:")
+        print("      pip install optimum[onnxruntime]")
+        return None
+    except Exception as e:
+        print(f"   Error: {e}")
+        return None
+
+
 # =============================================================================
 # Whisper Export
 # =============================================================================
@@ -400,91 +907,577 @@ def export_whisper_to_coreml(
         return None
 
 
+def measure_whisper_rtf(
+    model_dir: str,
+    audio_files: List[str],
+    compute_type: str = "int8",
+    device: str = "cpu"
+) -> Dict:
+    """
+    Real-time factor of a CTranslate2 Whisper model with faster-whisper.
+    
+    RTF = transcription time / audio duration (lower is better, < 1 is faster
+    than real time). Returns rtf, audio_seconds, transcribe_seconds, load_seconds.
+    """
+    from faster_whisper import WhisperModel
+    
+    started = time.perf_counter()
+    model = WhisperModel(model_dir, device=device, compute_type=compute_type)
+    load_seconds = time.perf_counter() - started
+    
+    # Warm up on the first file so one-time allocation is not counted
+    list(model.transcribe(audio_files[0], beam_size=1)[0])
+    
+    audio_seconds = 0.0
+    transcribe_seconds = 0.0
+    for audio in audio_files:
+        started = time.perf_counter()
+        segments, info = model.transcribe(audio, language="en")
+        list(segments)  # Segments are lazy: decoding happens while iterating
+        transcribe_seconds += time.perf_counter() - started
+        audio_seconds += info.duration
+    
+    return {
+        "rtf": round(transcribe_seconds / audio_seconds, 4) if audio_seconds else None,
+        "audio_seconds": round(audio_seconds, 2),
+        "transcribe_seconds": round(transcribe_seconds, 2),
+        "load_seconds": round(load_seconds, 2),
+        "compute_type": compute_type,
+        "device": device,
+    }
+
+
+def export_whisper_to_ctranslate2(
+    model_path: str,
+    output_path: str,
+    model_name: str = "whisper-english",
+    quantizations: Optional[List[str]] = None,
+    reference_audio: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Convert a fine-tuned Whisper checkpoint to CTranslate2 for faster-whisper.
+    
+    One model directory per quantization (<model_name>-<quantization>/). int8
+    suits CPU; int8_float16 needs a GPU (on CPU CTranslate2 falls back to int8).
+    If reference_audio (directory of .wav/.flac/.mp3 files) is given, the RTF of
+    every variant is measured and saved to ctranslate2_export_info.json.
+    
+    Returns:
+        {quantization: model directory or None if failed}
+    """
+    quantizations = quantizations or ["int8", "int8_float16"]
+    output_dir = Path(output_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    print(f"\n🎤 Exporting Whisper to CTranslate2...")
+    print(f"   Model: {model_path}")
+    print(f"   Quantizations: {', '.join(quantizations)}")
+    
+    try:
+        from ctranslate2.converters import TransformersConverter
+    except ImportError:
+        print("   ctranslate2 not installed. Install with:")
+        print("      pip install ctranslate2 faster-whisper")
+        return {q: None for q in quantizations}
+    
+    # faster-whisper reads the tokenizer and mel settings from these files
+    copy_files = [
+        name for name in ("tokenizer.json", "preprocessor_config.json")
+        if (Path(model_path) / name).exists()
+    ]
+    
+    exported: Dict[str, Optional[str]] = {}
+    for quantization in quantizations:
+        model_dir = output_dir / f"{model_name}-{quantization}"
+        try:
+            converter = TransformersConverter(model_path, copy_files=copy_files)
+            converter.convert(str(model_dir), quantization=quantization, force=True)
+            size_mb = sum(f.stat().st_size for f in model_dir.glob("*") if f.is_file()) / 1024 / 1024
+            print(f"   {quantization}: {model_dir} ({size_mb:.1f} MB)")
+            exported[quantization] = str(model_dir)
+        except Exception as e:
+            print(f"   {quantization} failed: {e}")
+            exported[quantization] = None
+    
+    if reference_audio:
+        audio_files = sorted(
+            str(f) for f in Path(reference_audio).iterdir()
+            if f.suffix.lower() in (".wav", ".flac", ".mp3")
+        )
+        if not audio_files:
+            print(f"   No reference audio in {reference_audio}; skipping RTF")
+        else:
+            info = {}
+            for quantization, model_dir in exported.items():
+                if not model_dir:
+                    continue
+                try:
+                    info[quantization] = measure_whisper_rtf(model_dir, audio_files, quantization)
+                    print(f"   {quantization}: RTF {info[quantization]['rtf']} "
+                          f"on {info[quantization]['audio_seconds']}s of audio")
+                except Exception as e:
+                    print(f"   RTF for {quantization} failed: {e}")
+            with open(output_dir / "ctranslate2_export_info.json", "w") as f:
+                json.dump({"reference_audio": reference_audio, "rtf": info}, f, indent=2)
+    
+    return exported
+
+
 # =============================================================================
 # Export All Models
 # =============================================================================
-def export_all_models(config: ExportConfig):
-    """Export all trained models to mobile formats."""
+def prepare_model_dir(model_path: str, output_dir: str, base_model: Optional[str] = None) -> str:
+    """
+    Return a mergeable HuggingFace model directory for export.
     
-    print("=" * 60)
-    print("LexiLingo Model Export Pipeline")
-    print("=" * 60)
+    If model_path is an unmerged PEFT adapter, it is merged shard by shard
+    (export/merge_lora_streaming.py) into <output_dir>/merged/<name>. The merge
+    is skipped when the adapter files are unchanged since the last run.
+    """
+    if not is_adapter_dir(model_path):
+        return model_path
     
-    results = {}
+    adapter_dir = Path(model_path)
+    merged_dir = Path(output_dir) / "merged" / adapter_dir.name
+    stamp = {
+        f.name: [f.stat().st_size, f.stat().st_mtime_ns]
+        for f in sorted(adapter_dir.iterdir()) if f.is_file()
+    }
+    stamp["base_model"] = base_model
+    stamp_file = merged_dir / "merge_source.json"
+    if stamp_file.exists():
+        with open(stamp_file, "r") as f:
+            if json.load(f) == stamp:
+                print(f"   Using merged model: {merged_dir}")
+                return str(merged_dir)
     
-    # 1. Export Qwen Grammar Model
-    qwen_path = Path(config.model_path) / "qwen-grammar"
-    if qwen_path.exists():
-        print("\nExporting Qwen Grammar Model...")
-        
-        # GGUF for llama.cpp
-        gguf_result = export_to_gguf(
-            str(qwen_path),
-            str(Path(config.output_dir) / "gguf"),
-            config.gguf_quantization,
-            "qwen-grammar"
+    merge_lora_streaming(str(adapter_dir), str(merged_dir), base_model)
+    with open(stamp_file, "w") as f:
+        json.dump(stamp, f, indent=2)
+    return str(merged_dir)
+
+
+def _cached_export(cache: Optional[ExportCache], result_key: str, model_path: Path, fmt: str,
+                   params: Dict, output_dir: str, export_fn, validate=None) -> Optional[str]:
+    """Run export_fn through the export cache (if enabled)."""
+    if cache is None:
+        return export_fn()
+    return cache.run(result_key, str(model_path), fmt, params, output_dir, export_fn, validate)
+
+
+def _is_gguf_quant(quantization: str):
+    """Validator: artifact is the {name}-{quantization}.gguf file, not an FP16 fallback."""
+    suffix = f"-{quantization.lower()}.gguf"
+    return lambda path: Path(path).name.lower().endswith(suffix)
+
+
+def _export_gguf_for_config(config: ExportConfig, model_path: Path, model_name: str,
+                            results: Dict, key: str,
+                            cache: Optional[ExportCache] = None) -> Optional[str]:
+    """Export GGUF according to config; returns the path of the primary quantization."""
+    gguf_dir = str(Path(config.output_dir) / "gguf")
+    imatrix = {}
+    if config.gguf_imatrix_data:
+        # Calibrated and uncalibrated quants must not share cache entries
+        imatrix = {"imatrix": _calibration_key(config.gguf_imatrix_data, config.gguf_imatrix_samples)}
+    if not config.gguf_all_quants:
+        return _cached_export(
+            cache, f"{key}_gguf", model_path, "gguf",
+            {"quantization": config.gguf_quantization.upper(), "name": model_name, **imatrix}, gguf_dir,
+            lambda: export_to_gguf(str(model_path), gguf_dir, config.gguf_quantization, model_name,
+                                   config.gguf_imatrix_data, config.gguf_imatrix_samples),
+            validate=_is_gguf_quant(config.gguf_quantization)
         )
-        results["qwen_gguf"] = gguf_result
-        
-        # Core ML for iOS
-        coreml_result = export_to_coreml(
-            str(qwen_path),
-            str(Path(config.output_dir) / "coreml"),
-            "qwen-grammar",
-            config.coreml_compute_units
+    
+    quants = list(dict.fromkeys(q.upper() for q in config.gguf_available_quants))
+    if config.gguf_quantization.upper() not in quants:
+        quants.insert(0, config.gguf_quantization.upper())
+    
+    # Materialize cached levels; only the misses go through convert + quantize
+    cached_rows = {}
+    keys = {}
+    if cache is not None:
+        for quantization in quants:
+            keys[quantization] = cache.key(str(model_path), "gguf",
+                                           {"quantization": quantization, "name": model_name, **imatrix})
+            path = cache.materialize(keys[quantization], gguf_dir)
+            if path:
+                cache.record(f"{key}_gguf_{quantization.lower()}", "hit")
+                cached_rows[quantization] = {
+                    "quantization": quantization,
+                    "path": path,
+                    "size_mb": round(Path(path).stat().st_size / 1024 / 1024, 1),
+                    "seconds": 0.0,
+                    "status": "cached",
+                }
+    
+    missing = [q for q in quants if q not in cached_rows]
+    fresh_rows = {}
+    if missing:
+        for row in export_to_gguf_multi(
+            str(model_path),
+            gguf_dir,
+            missing,
+            model_name,
+            max_workers=config.gguf_parallel_jobs,
+            imatrix_data=config.gguf_imatrix_data,
+            imatrix_samples=config.gguf_imatrix_samples
+        ):
+            fresh_rows[row["quantization"]] = row
+            if cache is not None:
+                result_key = f"{key}_gguf_{row['quantization'].lower()}"
+                if row["status"] == "ok":
+                    cache.store(keys[row["quantization"]], row["path"],
+                                {"format": "gguf", "quantization": row["quantization"],
+                                 "source": str(model_path)})
+                    cache.record(result_key, "miss")
+                else:
+                    cache.record(result_key, "failed")
+    elif cached_rows:
+        print(f"\n   All {len(quants)} GGUF levels for {model_name} served from cache")
+    
+    rows = [cached_rows.get(q) or fresh_rows[q] for q in quants]
+    results[f"{key}_gguf_quants"] = rows
+    
+    primary = next((r for r in rows if r["quantization"] == config.gguf_quantization.upper()), None)
+    return primary["path"] if primary else None
+
+
+def _benchmark_quants_for_config(config: ExportConfig, model_name: str, results: Dict, key: str) -> Optional[Dict]:
+    """Rank the exported GGUF levels on the validation slice (run as an exclusive step)."""
+    from benchmark.benchmark_gguf_quants import run_quant_benchmark
+    
+    exported = {r["quantization"]: r["path"] for r in results.get(f"{key}_gguf_quants") or [] if r["path"]}
+    if not exported:
+        return None
+    report = run_quant_benchmark(
+        exported,
+        config.gguf_benchmark_val,
+        report_json=str(Path(config.output_dir) / f"{model_name}-quant-benchmark.json"),
+        llama_dir=str(Path(os.environ.get("LLAMA_CPP_PATH", "llama.cpp")) / "build" / "bin")
+    )
+    return {
+        "recommended": report["recommended"],
+        "reference": report["reference"],
+        "ranking": [r["quantization"] for r in report["ranked"]],
+    }
+
+
+def _verify_for_config(config: ExportConfig, model_path: Path, model_name: str,
+                       results: Dict, key: str) -> Dict:
+    """Check parity/latency of every export of one model against the HF model."""
+    from export.verify_export import verify_exports
+    
+    exports = {}
+    for row in results.get(f"{key}_gguf_quants") or []:
+        if row["path"]:
+            exports[f"gguf-{row['quantization'].lower()}"] = row["path"]
+    if not exports and results.get(f"{key}_gguf"):
+        exports["gguf"] = results[f"{key}_gguf"]
+    onnx_path = results.get(f"{key}_onnx")
+    if onnx_path:
+        exports["onnx-int8"] = onnx_path
+        fp32_dir = Path(onnx_path).with_name(model_name)
+        if (fp32_dir / "model.onnx").exists():
+            exports["onnx"] = str(fp32_dir)
+    if results.get(f"{key}_coreml"):
+        exports["coreml"] = results[f"{key}_coreml"]
+    if not exports:
+        return {"passed": True, "exports": {}}
+    
+    try:
+        report = verify_exports(
+            str(model_path), exports, model_name,
+            str(Path(config.output_dir) / "verification"),
+            max_latency_regression=config.verify_max_latency_regression
         )
-        results["qwen_coreml"] = coreml_result
-    else:
-        print(f"   Qwen model not found at {qwen_path}")
-    
-    # 2. Export SmolLM Conversation Model
-    smolm_path = Path(config.model_path) / "smolm-conversation"
-    if smolm_path.exists():
-        print("\nExporting SmolLM Conversation Model...")
-        
-        # GGUF
-        gguf_result = export_to_gguf(
-            str(smolm_path),
-            str(Path(config.output_dir) / "gguf"),
-            config.gguf_quantization,
-            "smolm-conversation"
+    except Exception as e:
+        print(f"   Verification error: {e}")
+        return {"passed": False, "error": str(e), "exports": {}}
+    return {
+        "passed": report["passed"],
+        "exports": {
+            label: {k: entry.get(k) for k in ("status", "parity", "latency", "memory_mb", "failures")}
+            for label, entry in report["exports"].items()
+        },
+    }
+
+
+def _resolve_base_model(base_model: str) -> Optional[str]:
+    """Local path of a base model, downloading config/tokenizer/weights from the Hub if needed."""
+    if Path(base_model).exists():
+        return base_model
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(
+            base_model,
+            allow_patterns=["*.json", "*.safetensors", "*.model", "*.txt", "*.tiktoken"]
         )
-        results["smolm_gguf"] = gguf_result
+    except Exception as e:
+        print(f"   Cannot resolve base model {base_model}: {e}")
+        return None
+
+
+def _export_adapters_for_config(config: ExportConfig, cache: Optional[ExportCache] = None) -> Dict:
+    """
+    Adapter-only export: each base model once plus one LoRA GGUF per task.
+    
+    Adapters under adapters_dir are grouped by base model. Load the result with
+    LexiLingoServerClient(base, lora_adapters={task: path}) so all tasks share a
+    single resident base and switch adapters per request.
+    """
+    adapters_dir = Path(config.adapters_dir or Path(config.model_path) / "adapters")
+    if not adapters_dir.exists():
+        print(f"   Adapters directory not found at {adapters_dir}")
+        return {}
+    
+    groups: Dict[str, Dict[str, str]] = {}
+    for adapter_config in sorted(adapters_dir.glob("*/adapter_config.json")):
+        with open(adapter_config, "r") as f:
+            base = config.base_model_path or json.load(f).get("base_model_name_or_path", "")
+        groups.setdefault(base, {})[adapter_config.parent.name] = str(adapter_config.parent)
+    
+    gguf_dir = str(Path(config.output_dir) / "gguf")
+    exports = {}
+    for base, adapters in groups.items():
+        base_path = _resolve_base_model(base) if base else None
+        if not base_path:
+            print(f"   Skipping adapters {sorted(adapters)}: unknown base model")
+            continue
+        base_name = Path(base.rstrip("/")).name.lower()
         
-        # Core ML
-        coreml_result = export_to_coreml(
-            str(smolm_path),
-            str(Path(config.output_dir) / "coreml"),
-            "smolm-conversation",
-            config.coreml_compute_units
+        print(f"\nExporting {base_name} base + {len(adapters)} adapter(s)...")
+        base_gguf = _cached_export(
+            cache, f"{base_name}_base_gguf", Path(base_path), "gguf",
+            {"quantization": config.gguf_quantization.upper(), "name": base_name}, gguf_dir,
+            lambda: export_to_gguf(base_path, gguf_dir, config.gguf_quantization, base_name),
+            validate=_is_gguf_quant(config.gguf_quantization)
         )
-        results["smolm_coreml"] = coreml_result
-    else:
-        print(f"   SmolLM model not found at {smolm_path}")
+        adapter_ggufs = {
+            task: _cached_export(
+                cache, f"{base_name}_{task}_lora", Path(path), "gguf-lora",
+                {"base": base, "name": f"{base_name}-{task}"}, gguf_dir,
+                lambda path=path, task=task: export_lora_to_gguf(path, base_path, gguf_dir, f"{base_name}-{task}")
+            )
+            for task, path in adapters.items()
+        }
+        exports[base_name] = {"base": base_gguf, "adapters": adapter_ggufs}
+        
+        if base_gguf:
+            base_mb = Path(base_gguf).stat().st_size / 1024 / 1024
+            adapters_mb = sum(Path(p).stat().st_size for p in adapter_ggufs.values() if p) / 1024 / 1024
+            print(f"   Resident size: {base_mb + adapters_mb:.1f} MB shared "
+                  f"vs ~{base_mb * len(adapters):.1f} MB for {len(adapters)} merged models")
+    return exports
+
+
+def _add_llm_steps(pipeline: ExportPipeline, config: ExportConfig, cache: Optional[ExportCache],
+                   results: Dict, key: str, model_name: str) -> bool:
+    """Add prepare -> GGUF / Core ML / ONNX -> verify steps for one causal LM."""
+    source = Path(config.model_path) / model_name
+    if not source.exists():
+        print(f"   {model_name} model not found at {source}")
+        return False
+    
+    coreml_dir = str(Path(config.output_dir) / "coreml")
+    onnx_dir = str(Path(config.output_dir) / "onnx")
+    paths: Dict[str, Path] = {}
+    
+    def prepare():
+        # Merges adapter-only checkpoints (streaming) before any export
+        paths["model"] = Path(prepare_model_dir(str(source), config.output_dir, config.base_model_path))
+        return str(paths["model"])
+    
+    def gguf():
+        results[f"{key}_gguf"] = _export_gguf_for_config(config, paths["model"], model_name, results, key, cache)
+        return results[f"{key}_gguf"]
+    
+    def coreml():
+        results[f"{key}_coreml"] = _cached_export(
+            cache, f"{key}_coreml", paths["model"], "coreml",
+            {"compute_units": config.coreml_compute_units, "name": model_name}, coreml_dir,
+            lambda: export_to_coreml(str(paths["model"]), coreml_dir, model_name, config.coreml_compute_units)
+        )
+        return results[f"{key}_coreml"]
+    
+    def onnx():
+        # ONNX merged decoder with KV cache + dynamic int8
+        results[f"{key}_onnx"] = _cached_export(
+            cache, f"{key}_onnx", paths["model"], "onnx",
+            {"opset": config.onnx_opset_version, "kv_cache": True, "int8": True, "name": model_name},
+            onnx_dir,
+            lambda: export_to_onnx_kv(str(paths["model"]), onnx_dir, model_name, config.onnx_opset_version)
+        )
+        return results[f"{key}_onnx"]
+    
+    def quant_benchmark():
+        results[f"{key}_quant_benchmark"] = _benchmark_quants_for_config(config, model_name, results, key)
+        return results[f"{key}_quant_benchmark"]
     
-    # 3. Export Whisper STT Model
+    def verify():
+        results[f"{key}_verification"] = _verify_for_config(config, paths["model"], model_name, results, key)
+        return results[f"{key}_verification"]
+    
+    prepare_step = pipeline.add(f"{key}:prepare", prepare)
+    gguf_step = pipeline.add(f"{key}:gguf", gguf, deps=[prepare_step])
+    exports = [gguf_step, pipeline.add(f"{key}:coreml", coreml, deps=[prepare_step])]
+    if config.onnx_llm:
+        exports.append(pipeline.add(f"{key}:onnx", onnx, deps=[prepare_step]))
+    # Benchmark / verify start llama-server and time it: exclusive, so no convert or
+    # quantize step competes for the cores while they measure
+    if config.gguf_all_quants and config.gguf_benchmark_val:
+        pipeline.add(f"{key}:quant-benchmark", quant_benchmark, deps=[gguf_step], exclusive=True)
+    if config.verify_exports:
+        # Verify whatever was exported, even if one format failed
+        pipeline.add(f"{key}:verify", verify, deps=[prepare_step], after=exports, exclusive=True)
+    return True
+
+
+def _add_whisper_steps(pipeline: ExportPipeline, config: ExportConfig, cache: Optional[ExportCache],
+                       results: Dict) -> bool:
+    """Add Core ML / ONNX / CTranslate2 (+ RTF) steps for Whisper."""
     whisper_path = Path(config.model_path) / "whisper-english"
-    if whisper_path.exists():
-        print("\n🎤 Exporting Whisper STT Model...")
-        
-        # Core ML for iOS
-        coreml_result = export_whisper_to_coreml(
+    if not whisper_path.exists():
+        print(f"   Whisper model not found at {whisper_path}")
+        return False
+    
+    def coreml():
+        results["whisper_coreml"] = export_whisper_to_coreml(
             str(whisper_path),
             str(Path(config.output_dir) / "coreml"),
             "whisper-english"
         )
-        results["whisper_coreml"] = coreml_result
-        
-        # ONNX for cross-platform
-        onnx_result = export_to_onnx(
-            str(whisper_path),
-            str(Path(config.output_dir) / "onnx"),
-            "whisper-english",
-            config.onnx_opset_version
+        return results["whisper_coreml"]
+    
+    def onnx():
+        onnx_dir = str(Path(config.output_dir) / "onnx")
+        results["whisper_onnx"] = _cached_export(
+            cache, "whisper_onnx", whisper_path, "onnx",
+            {"opset": config.onnx_opset_version, "optimize": config.onnx_optimize,
+             "name": "whisper-english"}, onnx_dir,
+            lambda: export_to_onnx(str(whisper_path), onnx_dir, "whisper-english",
+                                   config.onnx_opset_version, config.onnx_optimize)
         )
-        results["whisper_onnx"] = onnx_result
-    else:
-        print(f"   Whisper model not found at {whisper_path}")
+        return results["whisper_onnx"]
+    
+    # CTranslate2 for faster-whisper (STT server / console)
+    ct2_dir = str(Path(config.output_dir) / "ctranslate2")
+    
+    def ct2(quantization: str):
+        results[f"whisper_ct2_{quantization}"] = _cached_export(
+            cache, f"whisper_ct2_{quantization}", whisper_path, "ctranslate2",
+            {"quantization": quantization, "name": "whisper-english"}, ct2_dir,
+            lambda: export_whisper_to_ctranslate2(
+                str(whisper_path), ct2_dir, "whisper-english", [quantization]
+            )[quantization]
+        )
+        return results[f"whisper_ct2_{quantization}"]
+    
+    def rtf():
+        audio_files = sorted(
+            str(f) for f in Path(config.whisper_reference_audio).iterdir()
+            if f.suffix.lower() in (".wav", ".flac", ".mp3")
+        )
+        rtf_by_quant = {}
+        for quantization in config.whisper_ct2_quantizations:
+            model_dir = results.get(f"whisper_ct2_{quantization}")
+            if model_dir and audio_files:
+                measured = measure_whisper_rtf(model_dir, audio_files, quantization)
+                rtf_by_quant[quantization] = measured
+                print(f"   {quantization}: RTF {measured['rtf']} on {measured['audio_seconds']}s of audio")
+        results["whisper_ct2_rtf"] = rtf_by_quant
+        return rtf_by_quant
+    
+    pipeline.add("whisper:coreml", coreml)
+    pipeline.add("whisper:onnx", onnx)
+    ct2_steps = [
+        pipeline.add(f"whisper:ct2-{quantization}", lambda quantization=quantization: ct2(quantization))
+        for quantization in config.whisper_ct2_quantizations
+    ]
+    if config.whisper_reference_audio:
+        pipeline.add("whisper:rtf", rtf, after=ct2_steps, exclusive=True)
+    return True
+
+
+def _release_artifacts(results: Dict, output_dir: str) -> List[str]:
+    """Exported files/directories under output_dir referenced by results."""
+    root = Path(output_dir).resolve()
+    paths = []
+    
+    def collect(value):
+        if isinstance(value, str):
+            paths.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, list):
+            for row in value:
+                collect(row.get("path") if isinstance(row, dict) else row)
+    
+    for name, value in results.items():
+        if name.endswith(("_verification", "_quant_benchmark", "_rtf")):
+            continue
+        collect(value)
+    artifacts = []
+    for path in paths:
+        resolved = Path(path).resolve()
+        if resolved.exists() and root in resolved.parents:
+            artifacts.append(resolved.relative_to(root).as_posix())
+    return sorted(set(artifacts))
+
+
+def export_all_models(config: ExportConfig):
+    """
+    Export all trained models to mobile formats.
+    
+    Every export is a step in an ExportPipeline: steps of different models run
+    in parallel (config.pipeline_jobs), external tools stream their output to
+    <output_dir>/logs/<step>.log and are killed after config.step_timeout.
+    """
+    
+    print("=" * 60)
+    print("LexiLingo Model Export Pipeline")
+    print("=" * 60)
+    
+    results = StepResults()
+    cache = None
+    if config.use_cache:
+        cache = ExportCache(config.cache_dir or str(Path(config.output_dir) / ".export_cache"))
+    
+    log_dir = Path(config.output_dir) / "logs"
+    pipeline = ExportPipeline(str(log_dir), config.pipeline_jobs, config.step_timeout)
+    
+    # 1. Qwen Grammar, 2. SmolLM Conversation, 3. Whisper STT
+    _add_llm_steps(pipeline, config, cache, results, "qwen", "qwen-grammar")
+    _add_llm_steps(pipeline, config, cache, results, "smolm", "smolm-conversation")
+    _add_whisper_steps(pipeline, config, cache, results)
+    
+    # 4. Adapter-only export (base once + LoRA per task)
+    if config.adapter_export:
+        def adapters():
+            results["adapters"] = _export_adapters_for_config(config, cache)
+            return results["adapters"]
+        pipeline.add("adapters", adapters)
+    
+    # 5. Release manifest (+ delta patch vs the previous release), after every export
+    if config.package_release:
+        from export.delta_update import package_release
+        
+        def release():
+            results["release"] = package_release(
+                config.output_dir,
+                _release_artifacts(results.snapshot(), config.output_dir),
+                config.release_version,
+                config.previous_manifest
+            )
+            return results["release"]
+        pipeline.add("release", release, after=list(pipeline.steps))
+    
+    print(f"\nRunning {len(pipeline.steps)} export steps ({config.pipeline_jobs} in parallel, logs in {log_dir})")
+    started = time.perf_counter()
+    steps = pipeline.run()
+    # Steps that timed out may still be running; their writes are dropped from here on
+    results = results.snapshot()
     
     # Print summary
     print("\n" + "=" * 60)
@@ -492,9 +1485,28 @@ def export_all_models(config: ExportConfig):
     print("=" * 60)
     
     for name, path in results.items():
+        if isinstance(path, (list, dict)):
+            continue
         status = "" if path else ""
         print(f"   {status} {name}: {path or 'Failed'}")
     
+    print_step_report(steps)
+    results["steps"] = steps
+    results["total_seconds"] = round(time.perf_counter() - started, 1)
+    print(f"   Total: {results['total_seconds']}s")
+    
+    if cache is not None:
+        results["cache"] = cache.summary()
+        print(f"   Cache: {results['cache']['hits']} hit(s), {results['cache']['misses']} miss(es)")
+    
+    failed = [name for name, value in results.items()
+              if name.endswith("_verification") and not value["passed"]]
+    failed += [name for name, step in steps.items()
+               if name.endswith(":verify") and step["status"] in ("failed", "timeout")]
+    if failed:
+        results["verification_failed"] = failed
+        print(f"   Verification FAILED: {', '.join(failed)} (see {Path(config.output_dir) / 'verification'})")
+    
     # Save results
     results_file = Path(config.output_dir) / "export_results.json"
     with open(results_file, "w") as f:
@@ -525,7 +1537,7 @@ def main():
     )
     parser.add_argument(
         "--format", type=str,
-        choices=["gguf", "coreml", "onnx"],
+        choices=["gguf", "coreml", "onnx", "onnx-kv", "ctranslate2"],
         help="Export format"
     )
     parser.add_argument(
@@ -533,6 +1545,82 @@ def main():
         default="Q4_K_M",
         help="GGUF quantization level"
     )
+    parser.add_argument(
+        "--all-quants", action="store_true",
+        help="Export every available GGUF quantization (convert once, quantize in parallel)"
+    )
+    parser.add_argument(
+        "--quantizations", type=str, default=None,
+        help="Comma-separated GGUF quantization levels to export in one pass (e.g. Q4_K_M,Q5_K_M,Q8_0)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=0,
+        help="Concurrent llama-quantize jobs for multi-quant export (0 = auto)"
+    )
+    parser.add_argument(
+        "--imatrix-data", type=str, default=None,
+        help="Unified training JSONL used to compute an importance matrix for calibrated quantization"
+    )
+    parser.add_argument(
+        "--imatrix-samples", type=int, default=512,
+        help="Number of calibration samples drawn from --imatrix-data"
+    )
+    parser.add_argument(
+        "--benchmark-val", type=str, default=None,
+        help="Validation JSONL: benchmark and rank exported quants (with --all and --all-quants)"
+    )
+    parser.add_argument(
+        "--adapters", action="store_true",
+        help="Also export base GGUF once + LoRA adapter GGUFs per task (with --all)"
+    )
+    parser.add_argument(
+        "--adapters-dir", type=str, default=None,
+        help="Directory of PEFT adapters, one sub-directory per task (default: <model_path>/adapters)"
+    )
+    parser.add_argument(
+        "--base-model", type=str, default=None,
+        help="Base model path/ID for the adapters (default: from adapter_config.json)"
+    )
+    parser.add_argument(
+        "--onnx-llm", action="store_true",
+        help="Also export Qwen/SmolLM to ONNX with KV cache + int8 (with --all)"
+    )
+    parser.add_argument(
+        "--reference-audio", type=str, default=None,
+        help="Directory of reference audio files for Whisper CTranslate2 real-time factor"
+    )
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="Check parity and latency of each export against the HF model; exit 1 on regression (with --all)"
+    )
+    parser.add_argument(
+        "--max-latency-regression", type=float, default=0.15,
+        help="Allowed per-token latency increase vs the last passing verification (0.15 = 15%%)"
+    )
+    parser.add_argument(
+        "--release", type=str, nargs="?", const="", default=None,
+        help="Write a chunk-hash release manifest (optional version name) for delta updates (with --all)"
+    )
+    parser.add_argument(
+        "--previous-manifest", type=str, default=None,
+        help="manifest.json of the previous release: also write a delta patch against it (with --release)"
+    )
+    parser.add_argument(
+        "--pipeline-jobs", type=int, default=2,
+        help="Export steps to run in parallel across models (with --all)"
+    )
+    parser.add_argument(
+        "--step-timeout", type=float, default=7200,
+        help="Timeout in seconds for each export step; 0 disables it (with --all)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always re-export instead of reusing cached artifacts (with --all)"
+    )
+    parser.add_argument(
+        "--cache-dir", type=str, default=None,
+        help="Export cache directory (default: <output>/.export_cache)"
+    )
     parser.add_argument(
         "--output", type=str,
         default="./exports",
@@ -548,19 +1636,55 @@ def main():
     
     config = ExportConfig(
         output_dir=args.output,
-        gguf_quantization=args.quantization
+        gguf_quantization=args.quantization,
+        gguf_all_quants=args.all_quants or bool(args.quantizations),
+        gguf_parallel_jobs=args.jobs,
+        gguf_imatrix_data=args.imatrix_data,
+        gguf_imatrix_samples=args.imatrix_samples,
+        gguf_benchmark_val=args.benchmark_val,
+        onnx_llm=args.onnx_llm,
+        whisper_reference_audio=args.reference_audio,
+        verify_exports=args.verify,
+        verify_max_latency_regression=args.max_latency_regression,
+        package_release=args.release is not None,
+        release_version=args.release or None,
+        previous_manifest=args.previous_manifest,
+        pipeline_jobs=args.pipeline_jobs,
+        step_timeout=args.step_timeout or None,
+        adapter_export=args.adapters,
+        adapters_dir=args.adapters_dir,
+        base_model_path=args.base_model,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir
     )
+    if args.quantizations:
+        config.gguf_available_quants = [q.strip().upper() for q in args.quantizations.split(",") if q.strip()]
     
     if args.all:
-        export_all_models(config)
+        results = export_all_models(config)
+        if results.get("verification_failed"):
+            sys.exit(1)
     
     elif args.model and args.format:
-        if args.format == "gguf":
+        args.model = prepare_model_dir(args.model, args.output, args.base_model)
+        if args.format == "gguf" and config.gguf_all_quants:
+            export_to_gguf_multi(
+                args.model,
+                args.output,
+                config.gguf_available_quants,
+                args.name,
+                max_workers=args.jobs,
+                imatrix_data=args.imatrix_data,
+                imatrix_samples=args.imatrix_samples
+            )
+        elif args.format == "gguf":
             export_to_gguf(
                 args.model,
                 args.output,
                 args.quantization,
-                args.name
+                args.name,
+                args.imatrix_data,
+                args.imatrix_samples
             )
         elif args.format == "coreml":
             export_to_coreml(
@@ -568,6 +1692,19 @@ def main():
                 args.output,
                 args.name
             )
+        elif args.format == "ctranslate2":
+            export_whisper_to_ctranslate2(
+                args.model,
+                args.output,
+                args.name,
+                reference_audio=args.reference_audio
+            )
+        elif args.format == "onnx-kv":
+            export_to_onnx_kv(
+                args.model,
+                args.output,
+                args.name
+            )
         elif args.format == "onnx":
             export_to_onnx(
                 args.model,
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Export Pipeline - chạy các bước export theo DAG, song song giữa các model
+==========================================================================
+- ExportPipeline: mỗi bước (prepare / gguf / coreml / onnx / verify ...) khai báo
+  dependency; bước nào đủ điều kiện thì chạy ngay trên thread pool, nên GGUF của
+  Qwen, Core ML của SmolLM và CTranslate2 của Whisper chạy cùng lúc.
+- run_logged: chạy tool ngoài (convert_hf_to_gguf.py, llama-quantize, ...) với
+  stdout/stderr stream thẳng vào log của bước hiện tại (không buffer trong RAM)
+  và kill process khi hết timeout của bước.
+- Mọi print() trong một bước cũng được ghi vào log của bước đó.
+- Bước exclusive (đo latency / benchmark) chạy một mình: nó chờ các bước đang chạy
+  xong, và không bước nào khác bắt đầu cho đến khi nó kết thúc, nên số đo không bị
+  convert/quantize chạy song song làm nhiễu.
+
+Report của pipeline (status, seconds, log) được lưu vào export_results.json["steps"].
+
+Lưu ý: timeout chỉ kill được subprocess; bước Python thuần (coremltools, optimum)
+quá hạn được đánh dấu "timeout" và các bước phụ thuộc bị bỏ qua, nhưng thread của
+nó vẫn chạy đến khi xong. Kết quả dùng chung nên là StepResults: ghi từ bước đã bị
+bỏ như vậy bị loại, và snapshot() cho bản copy ổn định để lưu.
+"""
+
+import sys
+import time
+import threading
+import subprocess
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StepTimeout(Exception):
+    """Subprocess bị kill vì bước export hết thời gian."""
+
+
+@dataclass
+class _StepContext:
+    name: str
+    log: Any                    # File handle của log bước (append)
+    log_file: Path
+    deadline: Optional[float]   # time.monotonic() khi bước hết hạn
+    timed_out: bool = False
+    abandoned: bool = False     # Pipeline đã bỏ theo dõi (timeout) nhưng thread còn chạy
+
+
+_current_step: contextvars.ContextVar = contextvars.ContextVar("export_step", default=None)
+
+
+def current_step() -> Optional[_StepContext]:
+    """Context của bước đang chạy trong thread hiện tại (None ngoài pipeline)."""
+    return _current_step.get()
+
+
+class _StepOutput:
+    """sys.stdout/sys.stderr proxy: ghi thêm vào log của bước đang chạy."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        step = _current_step.get()
+        if step is not None:
+            step.log.write(text)
+            step.log.flush()
+        with self.lock:
+            return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class StepResults(dict):
+    """
+    Dict kết quả dùng chung giữa các bước.
+
+    Ghi từ một bước đã bị pipeline bỏ (timeout, thread Python vẫn chạy) bị bỏ
+    qua, để thread đó không sửa kết quả trong lúc chúng được lưu.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            step = _current_step.get()
+            if step is not None and step.abandoned:
+                return
+            super().__setitem__(key, value)
+
+    def snapshot(self) -> Dict:
+        """Bản copy (dict thường) tại thời điểm gọi."""
+        with self._lock:
+            return dict(self)
+
+
+@dataclass
+class LoggedRun:
+    """Kết quả của run_logged."""
+    returncode: int
+    log_file: Optional[Path]
+    tail: str  # Các dòng cuối của log (để in khi lỗi)
+
+
+def _tail(log_file: Path, offset: int, lines: int = 20) -> str:
+    with open(log_file, "r", errors="replace") as f:
+        f.seek(offset)
+        return "".join(deque(f, maxlen=lines))
+
+
+def run_logged(cmd: List[str], log_file: Optional[Path] = None,
+               timeout: Optional[float] = None) -> LoggedRun:
+    """
+    Chạy cmd, stream stdout + stderr vào log file thay vì giữ trong bộ nhớ.
+
+    Args:
+        cmd: Command
+        log_file: File log; mặc định log của bước pipeline hiện tại.
+            Ngoài pipeline và không có log_file: output đi thẳng ra terminal.
+        timeout: Giây; bị giới hạn thêm bởi deadline của bước hiện tại
+
+    Raises:
+        StepTimeout: process bị kill vì quá thời gian
+    """
+    step = _current_step.get()
+    if log_file is None and step is not None:
+        log_file = step.log_file
+    if step is not None and step.deadline is not None:
+        remaining = max(0.0, step.deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+
+    if log_file is None:
+        process = subprocess.Popen(cmd)
+        offset = 0
+    else:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_file, "a") as log:
+            log.write(f"$ {' '.join(str(c) for c in cmd)}\n")
+            offset = log.tell()
+            process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        if step is not None:
+            step.timed_out = True
+        raise StepTimeout(f"{Path(cmd[0]).name} killed after {timeout:.1f}s")
+
+    tail = _tail(log_file, offset) if log_file is not None else ""
+    return LoggedRun(returncode, log_file, tail)
+
+
+@dataclass
+class ExportStep:
+    """Một bước trong DAG export."""
+    name: str
+    fn: Callable[[], Any]
+    deps: List[str] = field(default_factory=list)   # Phải thành công trước
+    after: List[str] = field(default_factory=list)  # Chỉ cần kết thúc trước (thành công hay không)
+    timeout: Optional[float] = None
+    exclusive: bool = False  # Chạy một mình (bước đo latency / benchmark)
+
+
+class ExportPipeline:
+    """
+    Chạy các ExportStep theo thứ tự dependency, song song tối đa max_workers bước.
+
+    Một bước "ok" khi fn trả về giá trị khác None; exception / None là "failed".
+    Bước có dependency không "ok" bị "skipped".
+
+    Example:
+        pipeline = ExportPipeline("./exports/logs", max_workers=2)
+        pipeline.add("qwen:prepare", lambda: prepare_model_dir(...))
+        pipeline.add("qwen:gguf", lambda: export_to_gguf(...), deps=["qwen:prepare"])
+        report = pipeline.run()  # {"qwen:gguf": {"status": "ok", "seconds": 81.2, "log": ...}}
+    """
+
+    def __init__(self, log_dir: str, max_workers: int = 2, default_timeout: Optional[float] = None):
+        self.log_dir = Path(log_dir)
+        self.max_workers = max(1, max_workers)
+        self.default_timeout = default_timeout
+        self.steps: Dict[str, ExportStep] = {}
+        self._contexts: Dict[str, _StepContext] = {}
+
+    def add(self, name: str, fn: Callable[[], Any], deps: Optional[List[str]] = None,
+            after: Optional[List[str]] = None, timeout: Optional[float] = None,
+            exclusive: bool = False) -> str:
+        self.steps[name] = ExportStep(name, fn, list(deps or []), list(after or []), timeout, exclusive)
+        return name
+
+    def _log_file(self, name: str) -> Path:
+        return self.log_dir / f"{name.replace(':', '_').replace('/', '_')}.log"
+
+    def _run_step(self, step: ExportStep, timeout: Optional[float]) -> Any:
+        log_file = self._log_file(step.name)
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        log_file.write_text("")
+        # Append mode: subprocess của bước cũng ghi vào cùng file
+        with open(log_file, "a") as log:
+            context = _StepContext(
+                step.name, log, log_file,
+                time.monotonic() + timeout if timeout else None
+            )
+            self._contexts[step.name] = context
+            token = _current_step.set(context)
+            try:
+                return step.fn()
+            finally:
+                _current_step.reset(token)
+
+    def run(self) -> Dict[str, Dict]:
+        """Chạy toàn bộ DAG; trả về {step: {status, seconds, log, error}}."""
+        for step in self.steps.values():
+            missing = [d for d in step.deps + step.after if d not in self.steps]
+            if missing:
+                raise ValueError(f"Step {step.name} depends on unknown steps: {missing}")
+
+        report: Dict[str, Dict] = {}
+        pending = dict(self.steps)
+        running: Dict[Any, tuple] = {}  # future -> (step, started, timeout)
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = _StepOutput(stdout), _StepOutput(stderr)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                # Bỏ qua các bước có dependency không thành công
+                for name, step in list(pending.items()):
+                    failed = [d for d in step.deps if d in report and report[d]["status"] != "ok"]
+                    if failed:
+                        report[name] = {"status": "skipped", "seconds": 0.0, "log": None,
+                                        "error": f"dependency {failed[0]} {report[failed[0]]['status']}"}
+                        del pending[name]
+
+                for name, step in list(pending.items()):
+                    if len(running) >= self.max_workers:
+                        break
+                    if any(s.exclusive for s, _, _ in running.values()):
+                        break
+                    if all(d in report for d in step.deps + step.after):
+                        if step.exclusive and running:
+                            break  # Chờ các bước đang chạy xong, không mở bước mới
+                        timeout = step.timeout or self.default_timeout
+                        future = pool.submit(contextvars.copy_context().run, self._run_step, step, timeout)
+                        running[future] = (step, time.perf_counter(), timeout)
+                        del pending[name]
+                        print(f"▶️  [{name}] started")
+
+                if not running:
+                    if pending:  # Vòng phụ thuộc
+                        for name in pending:
+                            report[name] = {"status": "skipped", "seconds": 0.0, "log": None,
+                                            "error": "unresolvable dependencies"}
+                        pending.clear()
+                    break
+
+                done, _ = wait(list(running), timeout=1.0, return_when=FIRST_COMPLETED)
+                now = time.perf_counter()
+                for future, (step, started, timeout) in list(running.items()):
+                    if future in done:
+                        report[step.name] = self._finish(step, future, now - started)
+                    elif timeout and now - started > timeout:
+                        # Không dừng được thread Python; bỏ theo dõi, chặn ghi kết quả và đánh dấu timeout
+                        context = self._contexts.get(step.name)
+                        if context is not None:
+                            context.abandoned = True
+                        report[step.name] = {"status": "timeout", "seconds": round(now - started, 1),
+                                             "log": str(self._log_file(step.name)),
+                                             "error": f"exceeded {timeout:.1f}s"}
+                        print(f"⏱️  [{step.name}] timed out after {timeout:.1f}s")
+                    else:
+                        continue
+                    del running[future]
+        finally:
+            pool.shutdown(wait=False)
+            sys.stdout, sys.stderr = stdout, stderr
+
+        return {name: report[name] for name in self.steps if name in report}
+
+    def _finish(self, step: ExportStep, future, seconds: float) -> Dict:
+        entry = {"status": "ok", "seconds": round(seconds, 1),
+                 "log": str(self._log_file(step.name)), "error": None}
+        try:
+            if future.result() is None:
+                entry["status"] = "failed"
+        except StepTimeout as e:
+            entry.update(status="timeout", error=str(e))
+        except Exception as e:
+            entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+        context = self._contexts.get(step.name)
+        if context is not None and context.timed_out and entry["status"] != "timeout":
+            # Hàm export đã tự bắt StepTimeout và trả None
+            entry.update(status="timeout", error=entry["error"] or "subprocess killed at step deadline")
+        icon = "✅" if entry["status"] == "ok" else "❌"
+        print(f"{icon} [{step.name}] {entry['status']} in {entry['seconds']}s")
+        return entry
+
+
+def print_step_report(report: Dict[str, Dict]):
+    """Bảng thời gian / trạng thái của các bước."""
+    print(f"\n   {'Step':32s} {'Time (s)':>9s}  Status")
+    print(f"   {'-' * 32} {'-' * 9}  ------")
+    for name, entry in report.items():
+        print(f"   {name[:32]:32s} {entry['seconds']:9.1f}  {entry['status']}"
+              + (f" ({entry['error']})" if entry.get("error") else ""))
@@ -10,8 +10,9 @@ LexiLingo Client - Gọi model sau khi deploy với llama.cpp
 
 import requests
 import subprocess
+import socket
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator, Callable
 import time
 import os
 from dataclasses import dataclass
@@ -32,9 +33,9 @@ class LexiLingoCliClient:
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Model not found at {self.model_path}")
     
-    def query(self, prompt: str, max_tokens: int = 256) -> str:
+    def query(self, prompt: str, max_tokens: int = 256, timeout: float = 60) -> str:
         """
-        Gọi model với prompt
+        Gọi model với prompt (timeout: giây, tính cho toàn bộ lần chạy llama-cli)
         
         Example:
             client = LexiLingoCliClient("models/lexilingo_q4_km.gguf")
@@ -52,7 +53,7 @@ class LexiLingoCliClient:
             "--log-disable",
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
         if result.returncode != 0:
             raise RuntimeError(f"llama-cli error: {result.stderr}")
         
@@ -68,6 +69,13 @@ class LexiLingoCliClient:
 # CÁCH 2: Server API - REST API (Production-ready)
 # ============================================================================
 
+def _free_port(host: str = "localhost") -> int:
+    """Port TCP đang trống (bind port 0 rồi đọc lại port được cấp)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
 class LexiLingoServerClient:
     """Gọi model qua llama.cpp server (REST API)"""
     
@@ -76,19 +84,51 @@ class LexiLingoServerClient:
                  host: str = "localhost",
                  port: int = 8080,
                  llama_dir: str = "~/Projects/llama.cpp",
-                 auto_start: bool = True):
+                 auto_start: bool = True,
+                 draft_model_path: Optional[str] = None,
+                 draft_max: int = 16,
+                 draft_min: int = 0,
+                 startup_timeout: float = 5.0,
+                 lora_adapters: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            model_path: Path to GGUF model file
+            host: Server host
+            port: Server port (0 = chọn một port trống khi start_server)
+            llama_dir: Directory chứa llama.cpp
+            auto_start: Khởi động server ngay khi tạo client
+            draft_model_path: GGUF nhỏ dùng làm draft model (speculative decoding).
+                Draft phải dùng cùng tokenizer/vocab với model chính.
+            draft_max: Số token draft tối đa mỗi bước
+            draft_min: Số token draft tối thiểu mỗi bước
+            startup_timeout: Thời gian tối đa (giây) chờ server load model xong
+            lora_adapters: {tên: path} các LoRA adapter GGUF load cùng base model.
+                Tất cả được load với scale 0; mỗi request chọn adapter qua tham số adapter=
+        """
         self.model_path = os.path.expanduser(model_path)
         self.host = host
         self.port = port
         self.base_url = f"http://{host}:{port}"
         self.llama_server = os.path.expanduser(f"{llama_dir}/llama-server")
         self.server_process = None
+        self.draft_model_path = os.path.expanduser(draft_model_path) if draft_model_path else None
+        self.draft_max = draft_max
+        self.draft_min = draft_min
+        self.startup_timeout = startup_timeout
+        self.lora_adapters = {
+            name: os.path.expanduser(path) for name, path in (lora_adapters or {}).items()
+        }
+        # Tên adapter -> id trong llama-server (theo thứ tự --lora, cập nhật từ /lora-adapters)
+        self.adapter_ids = {name: i for i, name in enumerate(self.lora_adapters)}
         
         if auto_start:
             self.start_server()
     
     def start_server(self):
         """Khởi động llama.cpp server"""
+        if not self.port:
+            self.port = _free_port(self.host)
+            self.base_url = f"http://{self.host}:{self.port}"
         print(f"🚀 Starting llama.cpp server on {self.host}:{self.port}...")
         
         cmd = [
@@ -101,24 +141,83 @@ class LexiLingoServerClient:
             "--log-disable",
         ]
         
+        # Speculative decoding: draft model nhỏ đề xuất token, model chính verify
+        if self.draft_model_path:
+            print(f"   Draft model: {self.draft_model_path} (draft {self.draft_min}-{self.draft_max})")
+            cmd += [
+                "-md", self.draft_model_path,
+                "--draft-max", str(self.draft_max),
+                "--draft-min", str(self.draft_min),
+            ]
+        
+        # Base model + nhiều LoRA adapter: một process, chọn adapter theo request
+        if self.lora_adapters:
+            print(f"   LoRA adapters: {', '.join(self.lora_adapters)}")
+            for path in self.lora_adapters.values():
+                cmd += ["--lora", path]
+            cmd.append("--lora-init-without-apply")
+        
         self.server_process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
         
-        # Wait for server to start
-        for i in range(10):
+        # Wait for server to start (/health trả 503 trong lúc đang load model)
+        # Process thoát sớm (port đã bị chiếm, model lỗi...) thì /health có thể
+        # đang được một server khác trả lời -> báo lỗi thay vì dùng nhầm server đó
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.server_process.poll() is not None:
+                stderr = self.server_process.stderr.read().decode("utf-8", errors="replace").strip()
+                raise RuntimeError(
+                    f"llama-server exited with code {self.server_process.returncode} "
+                    f"before becoming healthy on port {self.port}: {stderr[-500:]}"
+                )
             try:
                 response = requests.get(f"{self.base_url}/health", timeout=1)
                 if response.status_code == 200:
                     print("✅ Server started successfully")
+                    if self.lora_adapters:
+                        self._sync_adapter_ids()
                     return
             except:
-                time.sleep(0.5)
+                pass
+            time.sleep(0.5)
         
         raise RuntimeError("Server failed to start")
     
+    def _sync_adapter_ids(self):
+        """Đọc id thực tế của từng adapter từ GET /lora-adapters (khớp theo path)"""
+        try:
+            response = requests.get(f"{self.base_url}/lora-adapters", timeout=5)
+            response.raise_for_status()
+            by_path = {os.path.abspath(a["path"]): a["id"] for a in response.json()}
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            return  # Giữ thứ tự --lora
+        for name, path in self.lora_adapters.items():
+            if os.path.abspath(path) in by_path:
+                self.adapter_ids[name] = by_path[os.path.abspath(path)]
+    
+    def _payload(self, prompt: str, max_tokens: int, temperature: float, top_p: float,
+                 adapter: Optional[str]) -> Dict[str, Any]:
+        """Request body cho /v1/chat/completions (kèm scale LoRA nếu chọn adapter)"""
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+        }
+        if self.adapter_ids:
+            if adapter is not None and adapter not in self.adapter_ids:
+                raise ValueError(f"Unknown adapter: {adapter}. Loaded: {sorted(self.adapter_ids)}")
+            # Scale theo từng request: chỉ adapter được chọn có scale 1.0 (None = base model)
+            payload["lora"] = [
+                {"id": adapter_id, "scale": 1.0 if name == adapter else 0.0}
+                for name, adapter_id in self.adapter_ids.items()
+            ]
+        return payload
+    
     def stop_server(self):
         """Dừng server"""
         if self.server_process:
@@ -130,27 +229,74 @@ class LexiLingoServerClient:
               prompt: str,
               max_tokens: int = 256,
               temperature: float = 0.7,
-              top_p: float = 0.9) -> str:
+              top_p: float = 0.9,
+              timeout: float = 60,
+              adapter: Optional[str] = None) -> str:
         """
-        Gọi model qua REST API
+        Gọi model qua REST API (timeout: giây chờ response, adapter: tên LoRA adapter)
         
         Example:
             client = LexiLingoServerClient("models/lexilingo_q4_km.gguf")
             result = client.query("Analyze fluency: The cat sat on the mat.")
             print(result)
         """
+        data = self.complete(prompt, max_tokens, temperature, top_p, timeout, adapter)
+        return data["choices"][0]["message"]["content"]
+    
+    def complete(self,
+                 prompt: str,
+                 max_tokens: int = 256,
+                 temperature: float = 0.7,
+                 top_p: float = 0.9,
+                 timeout: float = 60,
+                 adapter: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Gọi /v1/chat/completions và trả về toàn bộ JSON response
+        
+        llama-server trả thêm field "timings" (predicted_per_second, draft_n,
+        draft_n_accepted, ...) dùng cho benchmark.
+        """
         response = requests.post(
             f"{self.base_url}/v1/chat/completions",
-            json={
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": temperature,
-                "top_p": top_p,
-                "max_tokens": max_tokens,
-            },
-            timeout=60,
+            json=self._payload(prompt, max_tokens, temperature, top_p, adapter),
+            timeout=timeout,
         )
         response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        return response.json()
+    
+    def stream(self,
+               prompt: str,
+               max_tokens: int = 256,
+               temperature: float = 0.7,
+               top_p: float = 0.9,
+               timeout: float = 60,
+               adapter: Optional[str] = None) -> Iterator[str]:
+        """
+        Gọi model với streaming (SSE), yield từng đoạn text khi server sinh ra
+        
+        Example:
+            for piece in client.stream("Correct this sentence: I goes home."):
+                print(piece, end="", flush=True)
+        """
+        with requests.post(
+            f"{self.base_url}/v1/chat/completions",
+            json={**self._payload(prompt, max_tokens, temperature, top_p, adapter), "stream": True},
+            stream=True,
+            timeout=timeout,
+        ) as response:
+            response.raise_for_status()
+            # chunk_size=None: nhận từng event ngay khi server gửi (không buffer 512 bytes)
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                payload = line[len("data: "):].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                choices = chunk.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
     
     def __enter__(self):
         return self
@@ -194,6 +340,15 @@ class ExplanationResult:
     raw_output: str
 
 
+def _default_task_adapters(lora_adapters: Optional[Dict[str, str]],
+                           task_adapters: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Task -> adapter: explicit mapping, else adapters named after a task"""
+    if task_adapters is not None:
+        return dict(task_adapters)
+    tasks = ("fluency", "vocabulary", "grammar", "dialogue", "explanation")
+    return {name: name for name in (lora_adapters or {}) if name in tasks}
+
+
 class LexiLingoClient:
     """
     High-level client cho LexiLingo model
@@ -216,7 +371,11 @@ class LexiLingoClient:
                  mode: str = "server",  # "server" or "cli"
                  llama_dir: str = "~/Projects/llama.cpp",
                  host: str = "localhost",
-                 port: int = 8080):
+                 port: int = 8080,
+                 deadlines: Optional[Dict[str, float]] = None,
+                 lora_adapters: Optional[Dict[str, str]] = None,
+                 task_adapters: Optional[Dict[str, str]] = None,
+                 vocab_prefilter: Optional[Callable[[str], Optional[str]]] = None):
         """
         Args:
             model_path: Path to GGUF model file
@@ -224,16 +383,70 @@ class LexiLingoClient:
             llama_dir: Directory chứa llama.cpp
             host: Server host (only for server mode)
             port: Server port (only for server mode)
+            deadlines: Deadline (giây) cho từng task, ví dụ {"grammar": 5.0};
+                task không có trong dict dùng timeout mặc định của backend
+            lora_adapters: {tên: path} LoRA adapter GGUF load cùng base model
+                (model_path là base GGUF; chỉ dùng với server mode)
+            task_adapters: {task: tên adapter}; mặc định task dùng adapter cùng tên
+            vocab_prefilter: Hàm sentence -> level hoặc None, ví dụ
+                CefrLexicon.default().prefilter() (scripts/cefr_lexicon.py);
+                trả về level thì classify_vocabulary không gọi model
         """
         self.mode = mode
+        self.vocab_prefilter = vocab_prefilter
+        self.owns_backend = True
+        self.deadlines = dict(deadlines or {})
+        self.task_adapters = _default_task_adapters(lora_adapters, task_adapters)
         
         if mode == "server":
-            self.client = LexiLingoServerClient(model_path, host, port, llama_dir)
+            self.client = LexiLingoServerClient(model_path, host, port, llama_dir,
+                                                lora_adapters=lora_adapters)
+        elif lora_adapters:
+            raise ValueError("lora_adapters requires server mode")
         elif mode == "cli":
             self.client = LexiLingoCliClient(model_path, llama_dir)
         else:
             raise ValueError(f"Invalid mode: {mode}. Use 'server' or 'cli'")
     
+    @classmethod
+    def from_backend(cls,
+                     backend,
+                     mode: str = "server",
+                     owns_backend: bool = False,
+                     deadlines: Optional[Dict[str, float]] = None,
+                     task_adapters: Optional[Dict[str, str]] = None,
+                     vocab_prefilter: Optional[Callable[[str], Optional[str]]] = None) -> "LexiLingoClient":
+        """
+        Tạo client từ backend có sẵn (ví dụ server do ModelResidencyManager quản lý)
+        
+        Args:
+            backend: Object có method query(prompt, max_tokens=...)
+            mode: "server" hoặc "cli" (chỉ dùng để biết cách đóng backend)
+            owns_backend: True nếu client được phép stop backend khi close()
+            deadlines: Deadline (giây) cho từng task
+            task_adapters: {task: tên adapter}; mặc định lấy theo adapter của backend
+            vocab_prefilter: Hàm sentence -> level hoặc None (xem __init__)
+        """
+        client = cls.__new__(cls)
+        client.mode = mode
+        client.vocab_prefilter = vocab_prefilter
+        client.owns_backend = owns_backend
+        client.deadlines = dict(deadlines or {})
+        client.task_adapters = _default_task_adapters(getattr(backend, "lora_adapters", None), task_adapters)
+        client.client = backend
+        return client
+    
+    def _query(self, task: str, prompt: str, max_tokens: int) -> str:
+        """Gọi backend, áp dụng deadline và LoRA adapter của task nếu có"""
+        kwargs = {}
+        deadline = self.deadlines.get(task)
+        if deadline is not None:
+            kwargs["timeout"] = deadline
+        adapter = self.task_adapters.get(task)
+        if adapter is not None:
+            kwargs["adapter"] = adapter
+        return self.client.query(prompt, max_tokens=max_tokens, **kwargs)
+    
     # ========================================================================
     # Task 1: Fluency Analysis
     # ========================================================================
@@ -254,7 +467,7 @@ class LexiLingoClient:
             Fluency score: 5.0
         """
         prompt = f"Analyze the fluency of this sentence: {sentence}"
-        raw = self.client.query(prompt, max_tokens=32)
+        raw = self._query("fluency", prompt, max_tokens=32)
         
         # Parse score từ output
         try:
@@ -291,8 +504,13 @@ class LexiLingoClient:
             >>> print(f"Level: {result.level}")
             Level: B2
         """
+        if self.vocab_prefilter is not None:
+            level = self.vocab_prefilter(sentence)
+            if level:
+                return VocabularyResult(level=level, raw_output=f"[lexicon] {level}")
+        
         prompt = f"Classify the vocabulary level: {sentence}"
-        raw = self.client.query(prompt, max_tokens=16)
+        raw = self._query("vocabulary", prompt, max_tokens=16)
         
         # Parse level từ output
         import re
@@ -321,7 +539,7 @@ class LexiLingoClient:
             Corrected: She doesn't like apples.
         """
         prompt = f"Correct this sentence: {sentence}"
-        raw = self.client.query(prompt, max_tokens=128)
+        raw = self._query("grammar", prompt, max_tokens=128)
         
         # Extract corrected sentence (usually first line)
         lines = raw.strip().split('\n')
@@ -354,7 +572,7 @@ class LexiLingoClient:
             Response: I don't have access to real-time weather...
         """
         prompt = f"User: {user_message}"
-        raw = self.client.query(prompt, max_tokens=256)
+        raw = self._query("dialogue", prompt, max_tokens=256)
         
         # Clean response (remove "Assistant:" prefix if present)
         response = raw.strip()
@@ -385,7 +603,7 @@ class LexiLingoClient:
             Explanation: Lỗi: Động từ "goes" không phù hợp với chủ ngữ "I"...
         """
         prompt = f"Error: {error_text} → Correct: {correct_text}\nExplain the grammar error in Vietnamese."
-        raw = self.client.query(prompt, max_tokens=512)
+        raw = self._query("explanation", prompt, max_tokens=512)
         
         return ExplanationResult(explanation=raw.strip(), raw_output=raw)
     
@@ -413,12 +631,11 @@ class LexiLingoClient:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.mode == "server":
-            self.client.stop_server()
+        self.close()
     
     def close(self):
         """Đóng connection (cho server mode)"""
-        if self.mode == "server":
+        if self.mode == "server" and self.owns_backend:
             self.client.stop_server()
 
 
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+LexiLingo Fallback - Deadline + circuit breaker cho model local
+===============================================================
+Một generation local bị treo không được phép chặn caller cả phút:
+
+1. Mỗi task có deadline riêng (mặc định router.fallback.timeout_ms trong llm_config.yaml);
+   local chỉ được dùng primary_budget (tỉ lệ) của deadline, phần còn lại để dành
+   cho endpoint phụ ngay trong cùng request
+2. Lỗi/timeout local được đếm bởi CircuitBreaker
+3. Khi breaker OPEN, request đi thẳng tới endpoint phụ (bất kỳ URL OpenAI-compatible)
+4. Sau reset_timeout, breaker HALF_OPEN cho một request probe về local;
+   probe thành công -> CLOSED, thất bại -> OPEN lại
+
+Example:
+    client = create_fallback_client(
+        "models/lexilingo_q4_km.gguf",
+        config_path="config/llm_config.yaml",
+    )
+    with client:
+        print(client.correct_grammar("She don't like apples.").corrected_sentence)
+        print(client.client.stats())
+
+Dev/test: chạy stub OpenAI-compatible local làm endpoint phụ
+    python export/lexilingo_fallback.py --serve-stub --port 8099
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from export.lexilingo_client import LexiLingoClient, LexiLingoServerClient
+
+
+TASKS = ["fluency", "vocabulary", "grammar", "dialogue", "explanation"]
+
+
+# =============================================================================
+# Circuit Breaker
+# =============================================================================
+class CircuitBreaker:
+    """
+    Circuit breaker 3 trạng thái cho backend local.
+
+    CLOSED: gọi local bình thường, đếm lỗi liên tiếp
+    OPEN: bỏ qua local cho đến khi hết reset_timeout
+    HALF_OPEN: cho phép tối đa half_open_max_calls request probe
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self,
+                 failure_threshold: int = 3,
+                 reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = max(1, int(half_open_max_calls))
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """True nếu request này được phép thử backend local."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._half_open_in_flight = 0
+            if self.state == self.HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                print("🟢 Circuit breaker closed (probe succeeded)")
+            self.state = self.CLOSED
+            self._half_open_in_flight = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"🔴 Circuit breaker opened after {self.consecutive_failures} failure(s)")
+                    self.open_count += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._half_open_in_flight = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_count": self.open_count,
+                "seconds_until_probe": (
+                    max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+                    if self.state == self.OPEN else 0.0
+                ),
+            }
+
+
+# =============================================================================
+# Secondary endpoint (OpenAI-compatible)
+# =============================================================================
+class OpenAICompatibleClient:
+    """
+    Gọi bất kỳ endpoint OpenAI-compatible (/chat/completions).
+
+    Args:
+        base_url: URL gốc kèm version, ví dụ "https://api.openai.com/v1"
+        model: Tên model gửi trong request
+        api_key: API key (Bearer); None nếu endpoint không cần
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 model: str = "",
+                 api_key: Optional[str] = None,
+                 timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def query(self,
+              prompt: str,
+              max_tokens: int = 256,
+              temperature: float = 0.7,
+              top_p: float = 0.9,
+              timeout: Optional[float] = None) -> str:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+        }
+        if self.model:
+            payload["model"] = self.model
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            json=payload,
+            headers=headers,
+            timeout=timeout or self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+
+# =============================================================================
+# Fallback backend
+# =============================================================================
+class FallbackBackend:
+    """
+    Backend cho LexiLingoClient: thử local trong deadline, lỗi thì chuyển sang endpoint phụ.
+
+    Args:
+        primary: LexiLingoServerClient / LexiLingoCliClient (có query(..., timeout=))
+        secondary: OpenAICompatibleClient
+        breaker: CircuitBreaker cho primary
+        default_timeout: Deadline (giây) khi caller không truyền timeout
+        primary_budget: Tỉ lệ deadline dành cho primary (0-1); phần còn lại cho secondary
+    """
+
+    # Lỗi được coi là "local failure" (timeout, lỗi HTTP, process lỗi)
+    LOCAL_ERRORS = (requests.RequestException, subprocess.TimeoutExpired, RuntimeError, KeyError, ValueError)
+
+    def __init__(self,
+                 primary,
+                 secondary: OpenAICompatibleClient,
+                 breaker: Optional[CircuitBreaker] = None,
+                 default_timeout: float = 5.0,
+                 primary_budget: float = 0.6):
+        if not 0.0 < primary_budget <= 1.0:
+            raise ValueError(f"primary_budget must be in (0, 1], got {primary_budget}")
+        self.primary = primary
+        self.secondary = secondary
+        self.breaker = breaker or CircuitBreaker()
+        self.default_timeout = default_timeout
+        self.primary_budget = primary_budget
+        self._lock = threading.Lock()
+        self._counts = {
+            "requests": 0,
+            "primary_ok": 0,
+            "primary_failures": 0,
+            "primary_timeouts": 0,
+            "short_circuited": 0,
+            "fallback_calls": 0,
+            "fallback_failures": 0,
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def query(self, prompt: str, max_tokens: int = 256, timeout: Optional[float] = None, **kwargs) -> str:
+        """
+        Thử primary trong primary_budget của deadline, lỗi/timeout thì gọi secondary
+        với phần deadline còn lại (local treo vẫn fallback được trong cùng request).
+
+        Lỗi ngoài LOCAL_ERRORS (TypeError, IndexError, ...) vẫn được tính cho
+        breaker rồi raise lại, để probe HALF_OPEN không bị treo mãi.
+        """
+        timeout = timeout or self.default_timeout
+        deadline = time.monotonic() + timeout
+        self._count("requests")
+
+        if self.breaker.allow_request():
+            try:
+                result = self.primary.query(prompt, max_tokens=max_tokens,
+                                            timeout=timeout * self.primary_budget, **kwargs)
+            except Exception as e:
+                is_timeout = isinstance(e, (requests.Timeout, subprocess.TimeoutExpired))
+                self._count("primary_timeouts" if is_timeout else "primary_failures")
+                self.breaker.record_failure()
+                if not isinstance(e, self.LOCAL_ERRORS):
+                    raise
+            else:
+                self.breaker.record_success()
+                self._count("primary_ok")
+                return result
+        else:
+            self._count("short_circuited")
+
+        self._count("fallback_calls")
+        kwargs.pop("adapter", None)  # LoRA adapter chỉ có ý nghĩa với llama-server local
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("fallback_failures")
+            raise requests.Timeout(f"Deadline of {timeout:.2f}s exceeded before fallback")
+        try:
+            return self.secondary.query(prompt, max_tokens=max_tokens, timeout=remaining, **kwargs)
+        except Exception:
+            self._count("fallback_failures")
+            raise
+
+    @property
+    def lora_adapters(self) -> Dict[str, str]:
+        """Adapter của primary (để LexiLingoClient.from_backend map task -> adapter)."""
+        return getattr(self.primary, "lora_adapters", {})
+
+    def stats(self) -> Dict:
+        """Trạng thái breaker và tỉ lệ fallback."""
+        with self._lock:
+            counts = dict(self._counts)
+        counts["fallback_rate"] = counts["fallback_calls"] / counts["requests"] if counts["requests"] else 0.0
+        counts["breaker"] = self.breaker.stats()
+        return counts
+
+    def stop_server(self):
+        if hasattr(self.primary, "stop_server"):
+            self.primary.stop_server()
+
+
+# =============================================================================
+# Config helpers
+# =============================================================================
+def load_fallback_settings(config_path: str) -> Dict:
+    """Đọc router.fallback từ llm_config.yaml (timeout_ms, endpoint, breaker...)."""
+    import yaml
+
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    fallback = dict((config.get("router") or {}).get("fallback") or {})
+    fallback.setdefault("enabled", True)
+    fallback.setdefault("timeout_ms", 5000)
+    fallback.setdefault("primary_budget", 0.6)
+    return fallback
+
+
+def create_fallback_client(model_path: str,
+                           config_path: str = str(Path(__file__).parent.parent / "config" / "llm_config.yaml"),
+                           endpoint: Optional[str] = None,
+                           llama_dir: str = "~/Projects/llama.cpp",
+                           port: int = 8080) -> LexiLingoClient:
+    """
+    Tạo LexiLingoClient với deadline theo task và fallback sang endpoint phụ.
+
+    endpoint ghi đè router.fallback.endpoint trong config.
+    """
+    settings = load_fallback_settings(config_path)
+    default_timeout = float(settings["timeout_ms"]) / 1000.0
+    task_timeouts = settings.get("task_timeout_ms") or {}
+    deadlines = {
+        task: float(task_timeouts.get(task, settings["timeout_ms"])) / 1000.0
+        for task in TASKS
+    }
+
+    primary = LexiLingoServerClient(model_path, port=port, llama_dir=llama_dir)
+    endpoint = endpoint or settings.get("endpoint")
+    if not settings.get("enabled", True) or not endpoint:
+        return LexiLingoClient.from_backend(primary, mode="server", owns_backend=True, deadlines=deadlines)
+
+    api_key_env = settings.get("api_key_env")
+    secondary = OpenAICompatibleClient(
+        endpoint,
+        model=settings.get("model", ""),
+        api_key=os.environ.get(api_key_env) if api_key_env else None,
+    )
+    breaker = CircuitBreaker(
+        failure_threshold=settings.get("failure_threshold", 3),
+        reset_timeout=float(settings.get("reset_timeout_s", 30)),
+    )
+    backend = FallbackBackend(primary, secondary, breaker, default_timeout,
+                              primary_budget=float(settings["primary_budget"]))
+    return LexiLingoClient.from_backend(backend, mode="server", owns_backend=True, deadlines=deadlines)
+
+
+# =============================================================================
+# Local OpenAI-compatible stub (dev/test)
+# =============================================================================
+class _StubHandler(BaseHTTPRequestHandler):
+    reply = "Stub response"
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._send({"status": "ok"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.delay:
+            time.sleep(self.delay)
+        self._send({
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _send(self, data: Dict):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub_server(host: str = "localhost",
+                      port: int = 0,
+                      reply: str = "Stub response",
+                      delay: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Chạy stub OpenAI-compatible trong background thread.
+
+    Trả về server; URL dùng cho OpenAICompatibleClient là
+    f"http://{host}:{server.server_address[1]}/v1". Gọi server.shutdown() để dừng.
+    """
+    handler = type("StubHandler", (_StubHandler,), {"reply": reply, "delay": delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="openai-stub", daemon=True)
+    thread.start()
+    return server
+
+
+# =============================================================================
+# CLI Interface
+# =============================================================================
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="LexiLingo client with per-task deadlines and cloud fallback"
+    )
+    parser.add_argument("--model", type=str, help="Path to GGUF model file")
+    parser.add_argument("--config", type=str,
+                        default=str(Path(__file__).parent.parent / "config" / "llm_config.yaml"))
+    parser.add_argument("--endpoint", type=str, default=None,
+                        help="Override fallback endpoint (OpenAI-compatible base URL)")
+    parser.add_argument("--llama-dir", type=str, default="~/Projects/llama.cpp")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--sentence", type=str, default="She don't like apples.")
+    parser.add_argument("--serve-stub", action="store_true",
+                        help="Run a local OpenAI-compatible stub server and block")
+
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        server = start_stub_server(port=args.port)
+        print(f"Stub OpenAI endpoint: http://localhost:{server.server_address[1]}/v1")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    if not args.model:
+        parser.error("--model is required unless --serve-stub is used")
+
+    with create_fallback_client(args.model, args.config, args.endpoint, args.llama_dir, args.port) as client:
+        result = client.correct_grammar(args.sentence)
+        print(f"Corrected: {result.corrected_sentence}")
+        if hasattr(client.client, "stats"):
+            print(json.dumps(client.client.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Streaming LoRA Merge - Merge adapter vào base model từng shard một
+====================================================================
+Thay cho AutoModelForCausalLM.from_pretrained(...) + merge_and_unload():
+
+1. Mở từng shard safetensors của base model bằng safe_open (memory-mapped)
+2. Với mỗi tensor có LoRA: W' = W + scale * (B @ A), tính bằng float32 rồi cast lại dtype gốc
+3. Ghi shard đã merge ngay, giải phóng trước khi sang shard tiếp theo
+4. Copy config / tokenizer / index.json từ base model
+
+Peak memory ~ một shard (+ adapter, thường vài chục MB), nên merge và export
+chạy được trên máy CPU nhỏ.
+
+Usage:
+    python export/merge_lora_streaming.py \\
+        --adapter ./adapters/unified_lora_adapter \\
+        --output ./merged_models/unified_merged
+
+    # Base model lấy từ adapter_config.json (base_model_name_or_path) hoặc chỉ định:
+    python export/merge_lora_streaming.py --adapter ./adapters/grammar \\
+        --base ./models/Qwen2.5-0.5B-Instruct --output ./outputs/qwen-grammar
+"""
+
+import sys
+import json
+import math
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Tiền tố key trong adapter PEFT: base_model.model.<key của base model>
+_PEFT_PREFIX = "base_model.model."
+_WEIGHT_FILES = ("model.safetensors", "model.safetensors.index.json")
+
+
+def _peak_rss_mb() -> float:
+    """Peak RSS của process hiện tại (MB); 0 nếu không đọc được."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux trả KB, macOS trả bytes
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except (ImportError, OSError):
+        return 0.0
+
+
+def resolve_model_dir(model: str) -> Path:
+    """Path local của model; tải config/tokenizer/safetensors từ Hub nếu cần."""
+    if Path(model).exists():
+        return Path(model)
+    from huggingface_hub import snapshot_download
+    return Path(snapshot_download(
+        model,
+        allow_patterns=["*.json", "*.safetensors", "*.model", "*.txt", "*.tiktoken"]
+    ))
+
+
+def _module_scale(config: Dict, module_key: str) -> float:
+    """LoRA scale cho một module (hỗ trợ rank_pattern / alpha_pattern / rslora)."""
+    r = config.get("r", 8)
+    alpha = config.get("lora_alpha", r)
+    for pattern, value in (config.get("rank_pattern") or {}).items():
+        if module_key.endswith(pattern):
+            r = value
+    for pattern, value in (config.get("alpha_pattern") or {}).items():
+        if module_key.endswith(pattern):
+            alpha = value
+    if config.get("use_rslora"):
+        return alpha / math.sqrt(r)
+    return alpha / r
+
+
+def load_adapter(adapter_dir: Path) -> Tuple[Dict, Dict[str, Tuple], Dict[str, object]]:
+    """
+    Đọc adapter PEFT.
+
+    Returns:
+        (adapter_config,
+         {base_key: (A, B, scale)} cho các module LoRA,
+         {base_key: tensor} cho modules_to_save / tensor thay thế toàn bộ)
+    """
+    from safetensors import safe_open
+
+    with open(adapter_dir / "adapter_config.json", "r") as f:
+        config = json.load(f)
+
+    weights_file = adapter_dir / "adapter_model.safetensors"
+    if not weights_file.exists():
+        raise FileNotFoundError(
+            f"{weights_file} not found (adapter_model.bin is not supported; re-save with safe_serialization=True)"
+        )
+
+    pairs: Dict[str, Dict[str, object]] = {}
+    replacements: Dict[str, object] = {}
+    with safe_open(str(weights_file), framework="pt") as f:
+        for key in f.keys():
+            name = key[len(_PEFT_PREFIX):] if key.startswith(_PEFT_PREFIX) else key
+            if ".lora_A." in name or ".lora_B." in name:
+                side = "A" if ".lora_A." in name else "B"
+                module = name.split(f".lora_{side}.")[0]
+                pairs.setdefault(module, {})[side] = f.get_tensor(key)
+            elif "lora_embedding" in name or "lora_magnitude" in name:
+                raise ValueError(f"Unsupported adapter tensor: {key} (embedding LoRA / DoRA)")
+            else:
+                replacements[name] = f.get_tensor(key)
+
+    deltas = {}
+    for module, parts in pairs.items():
+        if "A" not in parts or "B" not in parts:
+            raise ValueError(f"Incomplete LoRA pair for {module}")
+        deltas[f"{module}.weight"] = (parts["A"], parts["B"], _module_scale(config, module))
+    return config, deltas, replacements
+
+
+def _shard_files(base_dir: Path) -> List[str]:
+    index_file = base_dir / "model.safetensors.index.json"
+    if index_file.exists():
+        with open(index_file, "r") as f:
+            weight_map = json.load(f)["weight_map"]
+        return sorted(set(weight_map.values()))
+    if (base_dir / "model.safetensors").exists():
+        return ["model.safetensors"]
+    raise FileNotFoundError(f"No safetensors weights in {base_dir}")
+
+
+def merge_lora_streaming(
+    adapter_path: str,
+    output_path: str,
+    base_model: Optional[str] = None,
+) -> Dict:
+    """
+    Merge LoRA adapter vào base model, từng shard một.
+
+    Args:
+        adapter_path: Thư mục adapter PEFT (adapter_config.json + adapter_model.safetensors)
+        output_path: Thư mục output (HuggingFace format, cùng cấu trúc shard với base)
+        base_model: Path/Hub ID base model; mặc định base_model_name_or_path trong adapter_config.json
+
+    Returns:
+        Thống kê: shards, merged_modules, replaced_tensors, seconds, peak_rss_mb
+    """
+    from safetensors import safe_open
+    from safetensors.torch import save_file
+
+    started = time.perf_counter()
+    adapter_dir = Path(adapter_path)
+    config, deltas, replacements = load_adapter(adapter_dir)
+    base_dir = resolve_model_dir(base_model or config["base_model_name_or_path"])
+    fan_in_fan_out = bool(config.get("fan_in_fan_out", False))
+
+    output_dir = Path(output_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔀 Streaming LoRA merge")
+    print(f"   Base: {base_dir}")
+    print(f"   Adapter: {adapter_dir} ({len(deltas)} LoRA modules, {len(replacements)} full tensors)")
+
+    pending = set(deltas) | set(replacements)
+    shards = _shard_files(base_dir)
+    for i, shard in enumerate(shards, 1):
+        merged = {}
+        with safe_open(str(base_dir / shard), framework="pt") as f:
+            metadata = f.metadata() or {"format": "pt"}
+            for key in f.keys():
+                tensor = f.get_tensor(key)
+                if key in replacements:
+                    tensor = replacements[key].to(tensor.dtype)
+                    pending.discard(key)
+                elif key in deltas:
+                    lora_a, lora_b, scale = deltas[key]
+                    delta = lora_b.float() @ lora_a.float()
+                    if fan_in_fan_out:
+                        delta = delta.T
+                    tensor = (tensor.float() + scale * delta).to(tensor.dtype)
+                    pending.discard(key)
+                merged[key] = tensor
+        save_file(merged, str(output_dir / shard), metadata=metadata)
+        del merged
+        print(f"   [{i}/{len(shards)}] {shard}  peak RSS {_peak_rss_mb():.0f} MB")
+
+    if pending:
+        raise ValueError(f"Adapter tensors not found in base model: {sorted(pending)[:5]}")
+
+    # Config, tokenizer, index.json (tên shard và key không đổi)
+    for item in base_dir.iterdir():
+        if item.is_file() and item.suffix != ".safetensors" and not item.name.endswith((".bin", ".pt", ".gguf")):
+            shutil.copy2(item, output_dir / item.name)
+    # Tokenizer đã fine-tune (nếu có) nằm trong thư mục adapter
+    for name in ("tokenizer.json", "tokenizer_config.json", "special_tokens_map.json", "added_tokens.json"):
+        if (adapter_dir / name).exists():
+            shutil.copy2(adapter_dir / name, output_dir / name)
+
+    stats = {
+        "output": str(output_dir),
+        "shards": len(shards),
+        "merged_modules": len(deltas),
+        "replaced_tensors": len(replacements),
+        "seconds": round(time.perf_counter() - started, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    print(f"✅ Merged model saved to {output_dir} "
+          f"({stats['seconds']}s, peak RSS {stats['peak_rss_mb']:.0f} MB)")
+    return stats
+
+
+def is_adapter_dir(path: str) -> bool:
+    """True nếu path là adapter PEFT (chưa merge)."""
+    return (Path(path) / "adapter_config.json").exists() and not any(
+        (Path(path) / name).exists() for name in _WEIGHT_FILES
+    )
+
+
+# =============================================================================
+# CLI Interface
+# =============================================================================
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Merge a LoRA adapter into its base model shard by shard (low memory)"
+    )
+    parser.add_argument("--adapter", type=str, required=True, help="PEFT adapter directory")
+    parser.add_argument("--output", type=str, required=True, help="Output directory for the merged model")
+    parser.add_argument("--base", type=str, default=None,
+                        help="Base model path or Hub ID (default: from adapter_config.json)")
+    args = parser.parse_args()
+
+    merge_lora_streaming(args.adapter, args.output, args.base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,636 @@
+#!/usr/bin/env python3
+"""
+Model Residency Manager - Quản lý RAM cho nhiều model local
+===========================================================
+Giữ các model GGUF (llama-server) và Whisper trong một ngân sách RAM chung:
+
+1. Load on demand: model chỉ được khởi động khi có request đầu tiên
+2. RSS budget: tổng RSS của các model resident không vượt quá ngân sách
+3. LRU eviction: model ít được dùng gần đây nhất bị dừng trước
+4. Pre-warm: load sẵn các model có traffic cao khi còn RAM trống
+
+Example:
+    manager = ModelResidencyManager.from_config(
+        "config/llm_config.yaml",
+        model_paths={
+            "qwen-grammar": "exports/gguf/qwen-grammar-q4_k_m.gguf",
+            "smolm-conversation": "exports/gguf/smolm-conversation-q4_k_m.gguf",
+        },
+    )
+    with manager.client("qwen-grammar") as client:
+        print(client.correct_grammar("She don't like apples.").corrected_sentence)
+    print(manager.stats())
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from export.lexilingo_client import LexiLingoClient, LexiLingoServerClient
+
+
+_SIZE_UNITS = {
+    "B": 1,
+    "KB": 1024,
+    "MB": 1024 ** 2,
+    "GB": 1024 ** 3,
+    "TB": 1024 ** 4,
+}
+
+
+def parse_size(value) -> int:
+    """
+    Chuyển chuỗi kích thước ("2GB", "1.5GB", "900MB") sang bytes.
+
+    Số không có đơn vị được hiểu là bytes.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B)?\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit or "B"])
+
+
+def format_size(num_bytes: int) -> str:
+    """Định dạng bytes thành chuỗi dễ đọc (MB/GB)."""
+    if num_bytes >= _SIZE_UNITS["GB"]:
+        return f"{num_bytes / _SIZE_UNITS['GB']:.2f} GB"
+    return f"{num_bytes / _SIZE_UNITS['MB']:.1f} MB"
+
+
+def process_rss(pid: Optional[int] = None) -> int:
+    """
+    Đọc RSS (bytes) của một process từ /proc.
+
+    Trả về 0 nếu không đọc được (process đã thoát hoặc không phải Linux).
+    """
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def estimate_ram_bytes(model_path: str, overhead: float = 1.2) -> int:
+    """Ước lượng RAM cần cho một model từ kích thước file (file size * overhead)."""
+    path = Path(os.path.expanduser(model_path))
+    if path.is_dir():
+        size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    elif path.exists():
+        size = path.stat().st_size
+    else:
+        return 0
+    return int(size * overhead)
+
+
+# =============================================================================
+# Model specs & loaders
+# =============================================================================
+@dataclass
+class ModelSpec:
+    """Mô tả một model có thể được load vào RAM."""
+
+    name: str
+    model_path: str
+    kind: str = "llama"  # "llama" (llama-server) hoặc "whisper" (faster-whisper)
+    ram_bytes: int = 0   # Ngân sách RAM khai báo; 0 = ước lượng từ kích thước file
+    port: Optional[int] = None
+    llama_dir: str = "~/Projects/llama.cpp"
+    draft_model_path: Optional[str] = None  # Draft GGUF cho speculative decoding
+    draft_max: int = 16
+    options: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.ram_bytes:
+            self.ram_bytes = estimate_ram_bytes(self.model_path)
+            if self.draft_model_path:
+                self.ram_bytes += estimate_ram_bytes(self.draft_model_path)
+
+
+class ResidentModel:
+    """Một model đang nằm trong RAM (server process hoặc in-process object)."""
+
+    def __init__(self, spec: ModelSpec, handle, pid: Optional[int], rss_bytes: int):
+        self.spec = spec
+        self.handle = handle
+        self.pid = pid
+        self.rss_bytes = rss_bytes
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+    def refresh_rss(self) -> int:
+        """Cập nhật RSS thực tế; giữ giá trị cũ nếu không đo được."""
+        if self.pid:
+            measured = process_rss(self.pid)
+            if measured:
+                self.rss_bytes = measured
+        return self.rss_bytes
+
+    def unload(self):
+        if hasattr(self.handle, "stop_server"):
+            self.handle.stop_server()
+        elif hasattr(self.handle, "close"):
+            self.handle.close()
+        self.handle = None
+
+
+def load_llama_server(spec: ModelSpec):
+    """Loader mặc định cho GGUF: khởi động llama-server riêng cho model."""
+    server = LexiLingoServerClient(
+        spec.model_path,
+        port=spec.port or 8080,
+        llama_dir=spec.llama_dir,
+        draft_model_path=spec.draft_model_path,
+        draft_max=spec.draft_max,
+        **spec.options,
+    )
+    pid = server.server_process.pid if server.server_process else None
+    return server, pid
+
+
+def load_whisper(spec: ModelSpec):
+    """Loader mặc định cho Whisper: faster-whisper chạy trong process hiện tại."""
+    from faster_whisper import WhisperModel
+
+    model = WhisperModel(
+        os.path.expanduser(spec.model_path),
+        device=spec.options.get("device", "cpu"),
+        compute_type=spec.options.get("compute_type", "int8"),
+    )
+    return model, None
+
+
+DEFAULT_LOADERS: Dict[str, Callable] = {
+    "llama": load_llama_server,
+    "whisper": load_whisper,
+}
+
+
+# =============================================================================
+# Residency manager
+# =============================================================================
+@dataclass
+class ModelStats:
+    """Thống kê load/evict cho một model."""
+
+    loads: int = 0
+    evictions: int = 0
+    hits: int = 0
+    requests: int = 0
+    cold_start_seconds: List[float] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        cold = self.cold_start_seconds
+        return {
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "hits": self.hits,
+            "requests": self.requests,
+            "hit_rate": self.hits / self.requests if self.requests else 0.0,
+            "cold_start_ms_total": round(sum(cold) * 1000, 1),
+            "cold_start_ms_avg": round(sum(cold) / len(cold) * 1000, 1) if cold else 0.0,
+            "cold_start_ms_last": round(cold[-1] * 1000, 1) if cold else 0.0,
+        }
+
+
+class ModelResidencyManager:
+    """
+    Load model theo yêu cầu trong một ngân sách RSS và evict theo LRU.
+
+    Args:
+        specs: Danh sách ModelSpec
+        ram_budget_bytes: Tổng RSS tối đa cho các model resident
+        loaders: Map kind -> loader(spec) -> (handle, pid)
+        traffic_half_life: Half-life (giây) của traffic score dùng cho pre-warm
+    """
+
+    def __init__(self,
+                 specs: List[ModelSpec],
+                 ram_budget_bytes: int,
+                 loaders: Optional[Dict[str, Callable]] = None,
+                 traffic_half_life: float = 300.0):
+        self.specs = {spec.name: spec for spec in specs}
+        self.ram_budget_bytes = int(ram_budget_bytes)
+        self.loaders = dict(DEFAULT_LOADERS)
+        self.loaders.update(loaders or {})
+        self.traffic_half_life = traffic_half_life
+
+        self._resident: "OrderedDict[str, ResidentModel]" = OrderedDict()
+        self._stats = {name: ModelStats() for name in self.specs}
+        self._traffic = {name: 0.0 for name in self.specs}
+        self._traffic_updated = time.monotonic()
+        self._lock = threading.RLock()
+        self._loading: Dict[str, threading.Event] = {}  # Guard cho model đang cold start
+        self._reserved_bytes = 0  # RAM khai báo của các model đang load
+        self._prewarm_thread = None
+        self._prewarm_stop = threading.Event()
+
+        for spec in specs:
+            if spec.ram_bytes > self.ram_budget_bytes:
+                raise ValueError(
+                    f"Model {spec.name} needs {format_size(spec.ram_bytes)}, "
+                    f"larger than the RAM budget {format_size(self.ram_budget_bytes)}"
+                )
+
+    @classmethod
+    def from_config(cls,
+                    config_path: str,
+                    model_paths: Dict[str, str],
+                    ram_budget: Optional[str] = None,
+                    **kwargs) -> "ModelResidencyManager":
+        """
+        Tạo manager từ llm_config*.yaml.
+
+        Đọc ngân sách từ section `residency` (ram_budget, models.<name>.ram_usage/kind/port);
+        nếu thiếu thì dùng `models.*.ram_usage` của llm_config.dev.yaml.
+        """
+        import yaml
+
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+
+        residency = config.get("residency") or {}
+        declared = dict(residency.get("models") or {})
+        for key, section in (config.get("models") or {}).items():
+            if isinstance(section, dict) and "ram_usage" in section:
+                declared.setdefault(key, {"ram_usage": section["ram_usage"]})
+
+        base_port = int(residency.get("base_port", 8080))
+        specs = []
+        for index, (name, path) in enumerate(model_paths.items()):
+            entry = declared.get(name) or {}
+            specs.append(ModelSpec(
+                name=name,
+                model_path=path,
+                kind=entry.get("kind", "llama"),
+                ram_bytes=parse_size(entry["ram_usage"]) if "ram_usage" in entry else 0,
+                port=int(entry.get("port", base_port + index)),
+                draft_model_path=entry.get("draft_model"),
+                draft_max=int(entry.get("draft_max", 16)),
+                options=dict(entry.get("options") or {}),
+            ))
+
+        budget = ram_budget or residency.get("ram_budget")
+        if budget is None:
+            budget = sum(spec.ram_bytes for spec in specs)
+        return cls(specs, parse_size(budget), **kwargs)
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+    def resident_bytes(self) -> int:
+        """Tổng RSS hiện tại của các model resident."""
+        with self._lock:
+            return sum(model.refresh_rss() for model in self._resident.values())
+
+    def resident_models(self) -> List[str]:
+        """Tên các model resident, theo thứ tự LRU (cũ nhất trước)."""
+        with self._lock:
+            return list(self._resident.keys())
+
+    def _decay_traffic(self):
+        now = time.monotonic()
+        elapsed = now - self._traffic_updated
+        if elapsed > 0 and self.traffic_half_life > 0:
+            factor = 0.5 ** (elapsed / self.traffic_half_life)
+            for name in self._traffic:
+                self._traffic[name] *= factor
+        self._traffic_updated = now
+
+    def _record_request(self, name: str):
+        self._decay_traffic()
+        self._traffic[name] += 1.0
+        self._stats[name].requests += 1
+
+    # ------------------------------------------------------------------
+    # Load / evict
+    # ------------------------------------------------------------------
+    def _evict_for(self, needed_bytes: int, keep: Optional[str] = None) -> bool:
+        """Evict model LRU (không pin) cho đến khi đủ chỗ cho needed_bytes (gọi khi giữ lock)."""
+        while self.resident_bytes() + self._reserved_bytes + needed_bytes > self.ram_budget_bytes:
+            victim = next(
+                (name for name, model in self._resident.items()
+                 if name != keep and model.in_use == 0),
+                None,
+            )
+            if victim is None:
+                return False
+            self.evict(victim)
+        return True
+
+    def evict(self, name: str):
+        """Dừng một model resident và giải phóng RAM."""
+        with self._lock:
+            model = self._resident.pop(name, None)
+            if model is None:
+                return
+            print(f"♻️  Evicting {name} ({format_size(model.rss_bytes)})")
+            model.unload()
+            self._stats[name].evictions += 1
+
+    def _load(self, name: str, pin: bool = False, prewarm: bool = False) -> ResidentModel:
+        """
+        Khởi động model ngoài lock; gọi khi đang giữ guard self._loading[name].
+
+        Phần RAM khai báo được giữ chỗ (_reserved_bytes) trong lúc load để các
+        load song song khác không vượt ngân sách. prewarm=True: không evict model
+        khác, chỉ dùng phần RAM còn trống.
+        """
+        spec = self.specs[name]
+        with self._lock:
+            if prewarm:
+                fits = self.resident_bytes() + self._reserved_bytes + spec.ram_bytes <= self.ram_budget_bytes
+            else:
+                fits = self._evict_for(spec.ram_bytes)
+            if not fits:
+                raise RuntimeError(
+                    f"Cannot fit {name} ({format_size(spec.ram_bytes)}) in RAM budget: "
+                    f"all resident models are in use"
+                )
+            self._reserved_bytes += spec.ram_bytes
+
+        try:
+            rss_before = process_rss()
+            started = time.perf_counter()
+            handle, pid = self.loaders[spec.kind](spec)
+            cold_start = time.perf_counter() - started
+
+            if pid:
+                rss = process_rss(pid) or spec.ram_bytes
+            else:
+                # In-process model: đo phần RSS tăng thêm của process hiện tại
+                rss = max(process_rss() - rss_before, 0) or spec.ram_bytes
+        finally:
+            with self._lock:
+                self._reserved_bytes -= spec.ram_bytes
+
+        with self._lock:
+            model = ResidentModel(spec, handle, pid, rss)
+            self._resident[name] = model
+            if pin:
+                model.in_use += 1
+            if prewarm:
+                # Pre-warm đưa model vào cuối hàng LRU để không đẩy model đang nóng ra
+                self._resident.move_to_end(name, last=False)
+            self._stats[name].loads += 1
+            self._stats[name].cold_start_seconds.append(cold_start)
+            print(f"📦 Loaded {name} in {cold_start:.2f}s ({format_size(rss)})")
+
+            # RSS thực tế có thể lớn hơn ước lượng -> evict thêm nếu cần
+            if prewarm:
+                if self.resident_bytes() + self._reserved_bytes > self.ram_budget_bytes:
+                    print(f"⚠️  Pre-warmed {name} does not fit the RAM budget, unloading it")
+                    self.evict(name)
+            elif not self._evict_for(0, keep=name):
+                print(
+                    f"⚠️  Over RAM budget after loading {name}: "
+                    f"{format_size(self.resident_bytes())} / {format_size(self.ram_budget_bytes)} "
+                    f"(all other resident models are in use)"
+                )
+        return model
+
+    def _acquire(self, name: str, pin: bool = False) -> ResidentModel:
+        """
+        Model resident (load nếu cần), pin ngay trong lock nếu pin=True.
+
+        Cold start chạy ngoài lock: request tới model đã resident không phải chờ;
+        request cùng model đang load chờ trên guard của model đó.
+        """
+        if name not in self.specs:
+            raise KeyError(f"Unknown model: {name}")
+        recorded = False
+        while True:
+            with self._lock:
+                if not recorded:
+                    self._record_request(name)
+                    recorded = True
+                model = self._resident.get(name)
+                if model is not None:
+                    self._stats[name].hits += 1
+                    self._resident.move_to_end(name)
+                    model.last_used = time.monotonic()
+                    if pin:
+                        model.in_use += 1
+                    return model
+                loading = self._loading.get(name)
+                if loading is None:
+                    loading = self._loading[name] = threading.Event()
+                    break
+            loading.wait()
+
+        try:
+            model = self._load(name, pin=pin)
+        finally:
+            with self._lock:
+                del self._loading[name]
+            loading.set()
+        model.last_used = time.monotonic()
+        return model
+
+    def acquire(self, name: str):
+        """
+        Trả về handle của model, load nếu chưa resident.
+
+        Handle là LexiLingoServerClient (kind="llama") hoặc WhisperModel (kind="whisper").
+        """
+        return self._acquire(name).handle
+
+    @contextmanager
+    def use(self, name: str):
+        """Giữ (pin) model trong suốt block để nó không bị evict."""
+        model = self._acquire(name, pin=True)
+        try:
+            yield model.handle
+        finally:
+            with self._lock:
+                model.in_use -= 1
+
+    @contextmanager
+    def client(self, name: str):
+        """LexiLingoClient dùng server resident của model (không tự stop server)."""
+        with self.use(name) as handle:
+            yield LexiLingoClient.from_backend(handle, mode="server", owns_backend=False)
+
+    # ------------------------------------------------------------------
+    # Pre-warm
+    # ------------------------------------------------------------------
+    def prewarm(self, min_score: float = 1.0) -> List[str]:
+        """
+        Load sẵn các model có traffic score cao nhất khi còn RAM trống.
+
+        Không evict model khác; chỉ dùng phần ngân sách còn lại.
+        """
+        loaded = []
+        with self._lock:
+            self._decay_traffic()
+            candidates = sorted(
+                (name for name in self.specs if name not in self._resident),
+                key=lambda n: self._traffic[n],
+                reverse=True,
+            )
+        for name in candidates:
+            with self._lock:
+                if self._traffic[name] < min_score:
+                    break
+                spec = self.specs[name]
+                if name in self._resident or name in self._loading:
+                    continue
+                if self.resident_bytes() + self._reserved_bytes + spec.ram_bytes > self.ram_budget_bytes:
+                    continue
+                loading = self._loading[name] = threading.Event()
+            try:
+                self._load(name, prewarm=True)
+            except RuntimeError:
+                continue  # Một load song song đã dùng phần RAM trống
+            finally:
+                with self._lock:
+                    del self._loading[name]
+                loading.set()
+            if name in self._resident:
+                loaded.append(name)
+        return loaded
+
+    def start_prewarm_loop(self, interval: float = 30.0, min_score: float = 1.0):
+        """Chạy prewarm() định kỳ trong background thread."""
+        if self._prewarm_thread and self._prewarm_thread.is_alive():
+            return
+        self._prewarm_stop.clear()
+
+        def loop():
+            while not self._prewarm_stop.wait(interval):
+                try:
+                    self.prewarm(min_score)
+                except Exception as e:
+                    print(f"   Pre-warm failed: {e}")
+
+        self._prewarm_thread = threading.Thread(target=loop, name="model-prewarm", daemon=True)
+        self._prewarm_thread.start()
+
+    def stop_prewarm_loop(self):
+        self._prewarm_stop.set()
+        if self._prewarm_thread:
+            self._prewarm_thread.join(timeout=5)
+            self._prewarm_thread = None
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict:
+        """Thống kê load/evict/cold-start cho từng model và tổng."""
+        with self._lock:
+            self._decay_traffic()
+            per_model = {}
+            for name, stat in self._stats.items():
+                entry = stat.to_dict()
+                model = self._resident.get(name)
+                entry["resident"] = model is not None
+                entry["rss_bytes"] = model.refresh_rss() if model else 0
+                entry["declared_bytes"] = self.specs[name].ram_bytes
+                entry["traffic_score"] = round(self._traffic[name], 3)
+                per_model[name] = entry
+            return {
+                "ram_budget_bytes": self.ram_budget_bytes,
+                "resident_bytes": self.resident_bytes(),
+                "resident": list(self._resident.keys()),
+                "loads": sum(s.loads for s in self._stats.values()),
+                "evictions": sum(s.evictions for s in self._stats.values()),
+                "cold_start_ms_total": round(
+                    sum(sum(s.cold_start_seconds) for s in self._stats.values()) * 1000, 1
+                ),
+                "models": per_model,
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("\n" + "=" * 70)
+        print("Model Residency")
+        print("=" * 70)
+        print(f"   Budget:   {format_size(stats['ram_budget_bytes'])}")
+        print(f"   Resident: {format_size(stats['resident_bytes'])} {stats['resident']}")
+        print(f"\n   {'model':24s} {'loads':>6s} {'evict':>6s} {'hit%':>6s} {'cold avg':>10s}")
+        for name, entry in stats["models"].items():
+            print(
+                f"   {name:24s} {entry['loads']:>6d} {entry['evictions']:>6d} "
+                f"{entry['hit_rate'] * 100:>5.1f}% {entry['cold_start_ms_avg']:>8.0f}ms"
+            )
+
+    def shutdown(self):
+        """Dừng pre-warm và unload toàn bộ model."""
+        self.stop_prewarm_loop()
+        with self._lock:
+            for name in list(self._resident.keys()):
+                model = self._resident.pop(name)
+                model.unload()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+# =============================================================================
+# CLI Interface
+# =============================================================================
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        description="Serve local LexiLingo models within a shared RAM budget"
+    )
+    parser.add_argument(
+        "--config", type=str,
+        default=str(Path(__file__).parent.parent / "config" / "llm_config.yaml"),
+        help="LLM config with residency/ram_usage settings"
+    )
+    parser.add_argument(
+        "--model", action="append", default=[], metavar="NAME=PATH",
+        help="Model to manage (repeatable), e.g. qwen-grammar=exports/gguf/qwen-grammar-q4_k_m.gguf"
+    )
+    parser.add_argument(
+        "--ram-budget", type=str, default=None,
+        help="Override total RAM budget (e.g. 2GB)"
+    )
+    parser.add_argument(
+        "--prewarm", action="store_true",
+        help="Pre-warm every model that fits in the budget before exiting"
+    )
+
+    args = parser.parse_args()
+
+    model_paths = {}
+    for item in args.model:
+        name, _, path = item.partition("=")
+        if not path:
+            parser.error(f"Invalid --model value: {item}")
+        model_paths[name] = path
+    if not model_paths:
+        parser.error("At least one --model NAME=PATH is required")
+
+    with ModelResidencyManager.from_config(args.config, model_paths, args.ram_budget) as manager:
+        for name in model_paths:
+            manager.acquire(name)
+        if args.prewarm:
+            manager.prewarm(min_score=0.0)
+        manager.print_stats()
+        print(json.dumps(manager.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Export Verification - Parity và latency của model đã export so với model HF gốc
+================================================================================
+Chạy một bộ golden prompts cố định qua model HuggingFace (tham chiếu) và từng
+bản export (GGUF / ONNX / Core ML), decode greedy:
+
+1. Parity: exact match và độ giống (token-level) của output so với HF;
+   với ONNX / Core ML còn so logits token đầu (max |diff|, top-1)
+2. Latency: first-token và per-token (p50/p95) đặt cạnh HF
+3. Memory: RSS của runtime (llama-server: VmHWM; in-process: RSS tăng thêm)
+
+Export fail nếu parity dưới ngưỡng của format đó, hoặc per-token latency chậm
+hơn baseline (lần verify pass gần nhất) quá --max-latency-regression.
+
+Report: <report_dir>/<name>-verification.json, baseline:
+<report_dir>/<name>-verification-baseline.json (chỉ cập nhật khi pass).
+
+Usage:
+    python export/verify_export.py --hf ./outputs/qwen-grammar --name qwen-grammar \\
+        --exports ./exports/gguf/qwen-grammar-q4_k_m.gguf,./exports/onnx/qwen-grammar-int8 \\
+        --report-dir ./exports/verification
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import difflib
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmark.common import chat_prompts, peak_rss, percentile
+from export.lexilingo_client import LexiLingoServerClient
+
+# Prompt cố định theo từng task của LexiLingoClient (không đổi giữa các lần verify)
+GOLDEN_PROMPTS = [
+    "Correct this sentence: She go to school every day.",
+    "Correct this sentence: I have went to the market yesterday.",
+    "Correct this sentence: He don't like apples.",
+    "Correct this sentence: They was playing football when it start to rain.",
+    "Classify the vocabulary level: The committee postponed the decision indefinitely.",
+    "Classify the vocabulary level: I like my cat.",
+    "Analyze the fluency of this sentence: Yesterday I am go to park with friend.",
+    "User: Hi! Can you help me practice ordering food at a restaurant?",
+    "User: What did you do last weekend?",
+    "Error: She go to school → Correct: She goes to school\nExplain the grammar error in Vietnamese.",
+]
+
+
+@dataclass
+class ParityThresholds:
+    """Ngưỡng parity của một format so với HF."""
+    min_exact_match: float
+    min_similarity: float
+    max_logit_diff: Optional[float] = None  # Chỉ áp dụng cho format trả logits
+
+
+# FP32 ONNX phải gần như trùng HF; bản quantized chỉ cần giữ nội dung
+DEFAULT_THRESHOLDS: Dict[str, ParityThresholds] = {
+    "onnx": ParityThresholds(min_exact_match=0.9, min_similarity=0.95, max_logit_diff=0.05),
+    "onnx-int8": ParityThresholds(min_exact_match=0.5, min_similarity=0.8),
+    "coreml": ParityThresholds(min_exact_match=0.7, min_similarity=0.9, max_logit_diff=0.5),
+    "gguf": ParityThresholds(min_exact_match=0.5, min_similarity=0.8),
+}
+
+
+def _rss_bytes() -> int:
+    """RSS hiện tại (VmRSS, bytes) của process này; 0 nếu không đọc được."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def export_format(path: str) -> Optional[str]:
+    """Format của một bản export theo path (gguf, onnx, onnx-int8, coreml)."""
+    p = Path(path)
+    if p.suffix == ".gguf":
+        return "gguf"
+    if p.suffix in (".mlpackage", ".mlmodel"):
+        return "coreml"
+    if (p / "model.onnx").exists():
+        info_file = p / "onnx_export_info.json"
+        info = json.loads(info_file.read_text()) if info_file.exists() else {}
+        return "onnx-int8" if info.get("quantized") else "onnx"
+    return None
+
+
+# =============================================================================
+# Runners: mỗi runner trả outputs, logits token đầu (nếu có), latency, memory
+# =============================================================================
+def _summarize(outputs: List[str], first_ms: List[float], step_ms: List[float],
+               memory_bytes: int, first_logits: Optional[List] = None) -> Dict:
+    return {
+        "outputs": outputs,
+        "first_logits": first_logits,
+        "first_token_ms_p50": round(percentile(first_ms, 50), 2),
+        "per_token_ms_p50": round(percentile(step_ms, 50), 2),
+        "per_token_ms_p95": round(percentile(step_ms, 95), 2),
+        "memory_mb": round(memory_bytes / 1024 / 1024, 1),
+    }
+
+
+def run_hf(model_path: str, texts: List[str], max_tokens: int) -> Dict:
+    """Greedy decode với transformers (FP32, KV cache), đo từng bước."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    rss_before = _rss_bytes()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32)
+    model.eval()
+    eos = model.generation_config.eos_token_id
+    eos_ids = set(eos if isinstance(eos, list) else [eos]) | {tokenizer.eos_token_id}
+
+    def generate(text: str, n: int):
+        step = tokenizer(text, return_tensors="pt")["input_ids"]
+        past, generated, step_ms, first_logits = None, [], [], None
+        with torch.no_grad():
+            for _ in range(n):
+                started = time.perf_counter()
+                out = model(input_ids=step, past_key_values=past, use_cache=True)
+                step_ms.append((time.perf_counter() - started) * 1000)
+                logits = out.logits[0, -1]
+                if first_logits is None:
+                    first_logits = logits.float().numpy()
+                token = int(logits.argmax())
+                if token in eos_ids:
+                    break
+                generated.append(token)
+                past = out.past_key_values
+                step = torch.tensor([[token]])
+        return generated, step_ms, first_logits
+
+    generate(texts[0], 2)  # warmup
+    outputs, first_ms, step_ms, logits = [], [], [], []
+    for text in texts:
+        ids, steps, first = generate(text, max_tokens)
+        outputs.append(tokenizer.decode(ids, skip_special_tokens=True).strip())
+        first_ms.append(steps[0])
+        step_ms.extend(steps[1:])
+        logits.append(first)
+    memory = _rss_bytes() - rss_before
+
+    del model
+    gc.collect()
+    return _summarize(outputs, first_ms, step_ms, memory, logits)
+
+
+def run_onnx(model_dir: str, texts: List[str], max_tokens: int, threads: int) -> Dict:
+    """Greedy decode trên merged decoder ONNX (KV cache) bằng onnxruntime."""
+    from benchmark.benchmark_onnx_kv_cache import OnnxDecoder
+
+    rss_before = _rss_bytes()
+    decoder = OnnxDecoder(Path(model_dir), threads)
+    decoder.generate(texts[0], 2, use_cache=True)  # warmup
+    outputs, first_ms, step_ms, logits = [], [], [], []
+    for text in texts:
+        ids, steps = decoder.generate(text, max_tokens, use_cache=True)
+        ids = [t for t in ids if t not in decoder.eos_ids]
+        outputs.append(decoder.tokenizer.decode(ids, skip_special_tokens=True).strip())
+        first_ms.append(steps[0])
+        step_ms.extend(steps[1:])
+        logits.append(decoder.prefill_logits(text))
+    memory = _rss_bytes() - rss_before
+
+    del decoder
+    gc.collect()
+    return _summarize(outputs, first_ms, step_ms, memory, logits)
+
+
+def run_coreml(model_file: str, tokenizer, texts: List[str], max_tokens: int) -> Dict:
+    """Greedy decode với Core ML (không KV cache: cả sequence mỗi bước). Chỉ chạy trên macOS."""
+    import numpy as np
+    import coremltools as ct
+
+    rss_before = _rss_bytes()
+    model = ct.models.MLModel(model_file)
+    spec = model.get_spec().description
+    input_names = [i.name for i in spec.input]
+    output_name = spec.output[0].name
+    eos_ids = {tokenizer.eos_token_id}
+
+    def forward(sequence: List[int]):
+        feed = {input_names[0]: np.array([sequence], dtype=np.int32)}
+        if len(input_names) > 1:
+            feed[input_names[1]] = np.ones((1, len(sequence)), dtype=np.int32)
+        return model.predict(feed)[output_name][0, -1]
+
+    outputs, first_ms, step_ms, logits = [], [], [], []
+    for text in texts:
+        sequence = tokenizer(text)["input_ids"]
+        generated, steps = [], []
+        for _ in range(max_tokens):
+            started = time.perf_counter()
+            step_logits = forward(sequence)
+            steps.append((time.perf_counter() - started) * 1000)
+            if not steps[1:]:
+                logits.append(step_logits)
+            token = int(step_logits.argmax())
+            if token in eos_ids:
+                break
+            generated.append(token)
+            sequence.append(token)
+        outputs.append(tokenizer.decode(generated, skip_special_tokens=True).strip())
+        first_ms.append(steps[0])
+        step_ms.extend(steps[1:])
+    memory = _rss_bytes() - rss_before
+
+    del model
+    gc.collect()
+    return _summarize(outputs, first_ms, step_ms, memory, logits)
+
+
+def run_gguf(model_file: str, texts: List[str], max_tokens: int,
+             llama_dir: str, port: int) -> Dict:
+    """Greedy decode qua llama-server /completion (prompt đã áp chat template), latency từ timings."""
+    server = LexiLingoServerClient(model_file, port=port, llama_dir=llama_dir, startup_timeout=120)
+    outputs, first_ms, step_ms = [], [], []
+    try:
+        for text in texts:
+            response = requests.post(
+                f"{server.base_url}/completion",
+                json={"prompt": text, "n_predict": max_tokens, "temperature": 0.0,
+                      "top_k": 1, "cache_prompt": False},
+                timeout=120,
+            )
+            response.raise_for_status()
+            data = response.json()
+            outputs.append(data.get("content", "").strip())
+            timings = data.get("timings") or {}
+            first_ms.append(float(timings.get("prompt_ms") or 0.0))
+            if timings.get("predicted_n"):
+                step_ms.append(float(timings["predicted_per_token_ms"]))
+        memory = peak_rss(server.server_process.pid) if server.server_process else 0
+    finally:
+        server.stop_server()
+    return _summarize(outputs, first_ms, step_ms, memory)
+
+
+# =============================================================================
+# So sánh với HF
+# =============================================================================
+def compare_outputs(reference: List[str], candidate: List[str]) -> Dict:
+    """Exact match (sau normalize) và độ giống theo token giữa output HF và export."""
+    n = max(1, len(reference))
+    exact = sum(1 for a, b in zip(reference, candidate) if _normalize(a) == _normalize(b))
+    similarity = [
+        difflib.SequenceMatcher(None, _normalize(a).split(), _normalize(b).split()).ratio()
+        for a, b in zip(reference, candidate)
+    ]
+    return {
+        "exact_match": round(exact / n, 3),
+        "similarity": round(statistics.mean(similarity), 3) if similarity else 0.0,
+    }
+
+
+def compare_logits(reference: List, candidate: List) -> Dict:
+    """Max |diff| và tỉ lệ trùng top-1 của logits token đầu."""
+    import numpy as np
+
+    diffs, top1 = [], []
+    for a, b in zip(reference, candidate):
+        a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+        n = min(a.shape[-1], b.shape[-1])  # Vocab của graph có thể được pad
+        diffs.append(float(np.abs(a[:n] - b[:n]).max()))
+        top1.append(int(a[:n].argmax()) == int(b[:n].argmax()))
+    return {
+        "max_logit_diff": round(max(diffs), 4) if diffs else None,
+        "top1_match": round(sum(top1) / max(1, len(top1)), 3),
+    }
+
+
+def check_export(report: Dict, thresholds: ParityThresholds, baseline: Optional[Dict],
+                 max_latency_regression: float) -> List[str]:
+    """Danh sách lý do fail (rỗng = pass)."""
+    failures = []
+    parity = report["parity"]
+    if parity["exact_match"] < thresholds.min_exact_match:
+        failures.append(f"exact_match {parity['exact_match']} < {thresholds.min_exact_match}")
+    if parity["similarity"] < thresholds.min_similarity:
+        failures.append(f"similarity {parity['similarity']} < {thresholds.min_similarity}")
+    diff = parity.get("max_logit_diff")
+    if thresholds.max_logit_diff is not None and diff is not None and diff > thresholds.max_logit_diff:
+        failures.append(f"max_logit_diff {diff} > {thresholds.max_logit_diff}")
+
+    if baseline:
+        limit = baseline["latency"]["per_token_ms_p50"] * (1 + max_latency_regression)
+        current = report["latency"]["per_token_ms_p50"]
+        if limit and current > limit:
+            failures.append(
+                f"per_token_ms_p50 {current} > {limit:.2f} "
+                f"(baseline {baseline['latency']['per_token_ms_p50']} + {max_latency_regression:.0%})"
+            )
+    return failures
+
+
+def _latency(run: Dict) -> Dict:
+    return {k: run[k] for k in ("first_token_ms_p50", "per_token_ms_p50", "per_token_ms_p95")}
+
+
+def verify_exports(
+    hf_model_path: str,
+    exports: Dict[str, str],
+    model_name: str,
+    report_dir: str,
+    prompts: Optional[List[str]] = None,
+    max_tokens: int = 32,
+    max_latency_regression: float = 0.15,
+    thresholds: Optional[Dict[str, ParityThresholds]] = None,
+    threads: Optional[int] = None,
+    port: int = 0,
+) -> Dict:
+    """
+    So sánh từng bản export với model HF trên golden prompts.
+
+    Args:
+        hf_model_path: Model HuggingFace gốc (đã merge)
+        exports: {label: path} các bản export (.gguf, thư mục ONNX, .mlpackage)
+        model_name: Tên dùng cho file report / baseline
+        report_dir: Thư mục lưu report và baseline
+        prompts: Golden prompts (mặc định GOLDEN_PROMPTS)
+        max_tokens: Số token decode mỗi prompt
+        max_latency_regression: Cho phép per-token p50 chậm hơn baseline bao nhiêu (0.15 = 15%)
+        thresholds: Ghi đè ngưỡng parity theo format
+
+    Returns:
+        Report: hf, exports{label: parity/latency/memory/status/failures}, passed
+    """
+    from transformers import AutoTokenizer
+
+    prompts = prompts or GOLDEN_PROMPTS
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    threads = threads or os.cpu_count() or 4
+    llama_dir = str(Path(os.environ.get("LLAMA_CPP_PATH", "llama.cpp")) / "build" / "bin")
+    report_path = Path(report_dir)
+    report_path.mkdir(parents=True, exist_ok=True)
+    baseline_file = report_path / f"{model_name}-verification-baseline.json"
+    baseline = json.loads(baseline_file.read_text()) if baseline_file.exists() else {}
+
+    print(f"\n🔎 Verifying exports of {model_name} against {hf_model_path}")
+    tokenizer = AutoTokenizer.from_pretrained(hf_model_path)
+    texts = chat_prompts(tokenizer, prompts)
+
+    hf = run_hf(hf_model_path, texts, max_tokens)
+    print(f"   HF: {hf['per_token_ms_p50']} ms/token, {hf['memory_mb']} MB")
+
+    report = {
+        "model": model_name,
+        "hf_model": hf_model_path,
+        "prompts": len(texts),
+        "max_tokens": max_tokens,
+        "hf": {"latency": _latency(hf), "memory_mb": hf["memory_mb"]},
+        "exports": {},
+    }
+    for label, path in exports.items():
+        fmt = export_format(path) if path else None
+        entry = {"path": path, "format": fmt}
+        report["exports"][label] = entry
+        if fmt is None:
+            entry.update(status="skipped", failures=[f"unknown export format: {path}"])
+            continue
+        if fmt == "coreml" and sys.platform != "darwin":
+            entry.update(status="skipped", failures=["Core ML prediction requires macOS"])
+            continue
+
+        try:
+            if fmt == "gguf":
+                run = run_gguf(path, texts, max_tokens, llama_dir, port)
+            elif fmt == "coreml":
+                run = run_coreml(path, tokenizer, texts, max_tokens)
+            else:
+                run = run_onnx(path, texts, max_tokens, threads)
+        except Exception as e:
+            entry.update(status="fail", failures=[f"runtime error: {e}"])
+            print(f"   ❌ {label}: {e}")
+            continue
+
+        parity = compare_outputs(hf["outputs"], run["outputs"])
+        if run["first_logits"]:
+            parity.update(compare_logits(hf["first_logits"], run["first_logits"]))
+        entry.update(
+            parity=parity,
+            latency=_latency(run),
+            memory_mb=run["memory_mb"],
+            speedup_vs_hf=round(hf["per_token_ms_p50"] / run["per_token_ms_p50"], 2)
+            if run["per_token_ms_p50"] else None,
+            mismatches=[
+                {"prompt": p, "hf": a, "export": b}
+                for p, a, b in zip(prompts, hf["outputs"], run["outputs"])
+                if _normalize(a) != _normalize(b)
+            ][:5],
+        )
+        entry["failures"] = check_export(entry, thresholds[fmt], baseline.get("exports", {}).get(label),
+                                         max_latency_regression)
+        entry["status"] = "fail" if entry["failures"] else "pass"
+        icon = "❌" if entry["failures"] else "✅"
+        print(f"   {icon} {label} [{fmt}]: exact {parity['exact_match']}, similarity {parity['similarity']}, "
+              f"{entry['latency']['per_token_ms_p50']} ms/token, {entry['memory_mb']} MB")
+        for failure in entry["failures"]:
+            print(f"      - {failure}")
+
+    report["passed"] = all(e["status"] != "fail" for e in report["exports"].values())
+    with open(report_path / f"{model_name}-verification.json", "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    # Baseline chỉ tiến lên khi pass, để regression được so với bản tốt gần nhất
+    if report["passed"]:
+        merged = {**baseline.get("exports", {}),
+                  **{k: v for k, v in report["exports"].items() if v["status"] == "pass"}}
+        with open(baseline_file, "w") as f:
+            json.dump({**report, "exports": merged}, f, indent=2, ensure_ascii=False)
+
+    _print_table(report)
+    return report
+
+
+def _print_table(report: Dict):
+    print(f"\n   {'runtime':34s} {'exact':>6s} {'sim':>6s} {'first ms':>9s} {'tok ms':>8s} {'MB':>8s}  status")
+    hf = report["hf"]
+    print(f"   {'HF (reference)':34s} {'':>6s} {'':>6s} {hf['latency']['first_token_ms_p50']:9.1f} "
+          f"{hf['latency']['per_token_ms_p50']:8.2f} {hf['memory_mb']:8.1f}")
+    for label, entry in report["exports"].items():
+        if "parity" not in entry:
+            print(f"   {label[:34]:34s} {'':>6s} {'':>6s} {'':>9s} {'':>8s} {'':>8s}  {entry['status']}")
+            continue
+        print(f"   {label[:34]:34s} {entry['parity']['exact_match']:6.2f} {entry['parity']['similarity']:6.2f} "
+              f"{entry['latency']['first_token_ms_p50']:9.1f} {entry['latency']['per_token_ms_p50']:8.2f} "
+              f"{entry['memory_mb']:8.1f}  {entry['status']}")
+
+
+# =============================================================================
+# CLI Interface
+# =============================================================================
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Verify exported models (GGUF / ONNX / Core ML) against the HF model"
+    )
+    parser.add_argument("--hf", type=str, required=True, help="HuggingFace model directory (reference)")
+    parser.add_argument("--exports", type=str, required=True,
+                        help="Comma-separated export paths (.gguf, ONNX directory, .mlpackage)")
+    parser.add_argument("--name", type=str, required=True, help="Model name for report/baseline files")
+    parser.add_argument("--report-dir", type=str, default="./exports/verification")
+    parser.add_argument("--prompts", type=str, default=None,
+                        help="JSONL of {\"prompt\": ...} golden prompts (default: built-in set)")
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--max-latency-regression", type=float, default=0.15,
+                        help="Allowed per-token latency increase vs baseline (0.15 = 15%%)")
+    parser.add_argument("--port", type=int, default=0, help="llama-server port (0 = any free port)")
+    args = parser.parse_args()
+
+    prompts = None
+    if args.prompts:
+        with open(args.prompts, "r", encoding="utf-8") as f:
+            prompts = [json.loads(line)["prompt"] for line in f if line.strip()]
+    exports = {Path(p.strip()).name: p.strip() for p in args.exports.split(",") if p.strip()}
+
+    report = verify_exports(
+        args.hf, exports, args.name, args.report_dir,
+        prompts=prompts,
+        max_tokens=args.max_tokens,
+        max_latency_regression=args.max_latency_regression,
+        port=args.port
+    )
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
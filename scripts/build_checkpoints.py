@@ -0,0 +1,180 @@
+"""
+Resumable Checkpoints for Dataset Builds
+=========================================
+
+One JSON checkpoint per task (<output_dir>/checkpoints/<task>.json) records,
+at the same instant:
+
+- samples: how many samples the task's JSONL shards hold
+- sources: per source {done, offset, count, extra, stream_state}
+    offset        items fully processed from the source (HF dataset / stream index)
+    count         samples accepted from it (for per-source limits)
+    extra         loop counters a source keeps besides count (e.g. OpenOrca candidates)
+    stream_state  IterableDataset.state_dict() when the datasets version has it
+
+Checkpoints are only written between items: an item counts towards `offset`
+once the consumer asks for the next one, so a save never records an item whose
+samples were not written yet.
+
+On a rerun the shards are truncated back to `samples` (anything written after
+the last checkpoint is dropped), the dedupe state is rebuilt by replaying those
+samples, finished sources are skipped and unfinished ones continue at `offset`
+(load_state_dict / select / skip instead of re-reading the stream from 0).
+
+Used by download_and_inspect_datasets.py.
+"""
+
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class SourceCheckpoint:
+    """Progress of one source inside a task checkpoint."""
+
+    def __init__(self, task: "TaskCheckpoint", name: str, state: Dict):
+        self.task = task
+        self.name = name
+        self.done = bool(state.get("done", False))
+        self.offset = int(state.get("offset", 0))
+        self.count = int(state.get("count", 0))
+        self.extra: Dict[str, Any] = dict(state.get("extra") or {})
+        self.stream_state = state.get("stream_state")
+        self._dataset = None
+
+    def to_dict(self) -> Dict:
+        if self._dataset is not None and hasattr(self._dataset, "state_dict"):
+            try:
+                self.stream_state = self._dataset.state_dict()
+            except Exception:
+                self.stream_state = None
+        return {"done": self.done, "offset": self.offset, "count": self.count, "extra": self.extra,
+                "stream_state": self.stream_state}
+
+    def _resume(self, dataset) -> Any:
+        if self.offset <= 0:
+            return dataset
+        print(f"  ↪️  Resuming {self.name} at item {self.offset:,} ({self.count:,} accepted so far)")
+        if self.stream_state is not None and hasattr(dataset, "load_state_dict"):
+            dataset.load_state_dict(self.stream_state)
+            return dataset
+        if hasattr(dataset, "select") and hasattr(dataset, "__len__"):
+            return dataset.select(range(min(self.offset, len(dataset)), len(dataset)))
+        if hasattr(dataset, "skip"):
+            return dataset.skip(self.offset)
+        return itertools.islice(dataset, self.offset, None)
+
+    def iterate(self, dataset) -> Iterator[Tuple[int, Any]]:
+        """enumerate(dataset) continuing at the checkpointed offset."""
+        dataset = self._resume(dataset)
+        self._dataset = dataset
+        try:
+            for idx, item in enumerate(dataset, start=self.offset):
+                yield idx, item
+                # Back here only after the consumer finished the item
+                self.offset = idx + 1
+                self.task.maybe_save()
+        finally:
+            self._dataset = None
+
+    def accepted(self, n: int = 1):
+        """Call after each sample from this source is added (saved with the next item boundary)."""
+        self.count += n
+        self.task.mark_unsaved(n)
+
+    def finish(self):
+        self.done = True
+        self.task.save()
+
+
+class TaskCheckpoint:
+    """
+    Checkpoint file of one task.
+
+    Example:
+        cp = TaskCheckpoint(out / "checkpoints" / "dialogue.json", fingerprint)
+        writer = ShardedJsonlWriter(shards, "dialogue", resume_count=cp.samples)
+        cp.attach(writer)
+        src = cp.source("OpenOrca")
+        if not src.done:
+            for idx, item in src.iterate(load_dataset(..., streaming=True)):
+                if add(item):
+                    src.accepted()
+            src.finish()
+    """
+
+    def __init__(self, path: Path, fingerprint: Dict, resume: bool = True,
+                 save_every: int = 500, save_seconds: float = 30.0):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.save_every = max(1, save_every)
+        self.save_seconds = save_seconds
+        self.writer = None
+        self.complete = False
+        self.samples = 0
+        self._sources: Dict[str, Dict] = {}
+        self._live: Dict[str, SourceCheckpoint] = {}
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+        state = self._load() if resume else None
+        if state is not None:
+            if state.get("fingerprint") != fingerprint:
+                print(f"  ⚠️  {self.path.name}: build settings changed, starting this task from scratch")
+            else:
+                self.samples = int(state.get("samples", 0))
+                self.complete = bool(state.get("complete", False))
+                self._sources = state.get("sources", {})
+
+    def _load(self) -> Optional[Dict]:
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️  Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+
+    def attach(self, writer):
+        """Shard writer whose sample count is recorded with every save."""
+        self.writer = writer
+
+    def source(self, name: str) -> SourceCheckpoint:
+        if name not in self._live:
+            self._live[name] = SourceCheckpoint(self, name, self._sources.get(name, {}))
+        return self._live[name]
+
+    def mark_unsaved(self, accepted: int = 1):
+        self._unsaved += accepted
+
+    def maybe_save(self, accepted: int = 0):
+        self._unsaved += accepted
+        if self._unsaved >= self.save_every or time.monotonic() - self._last_save >= self.save_seconds:
+            self.save()
+
+    def save(self, complete: bool = False):
+        """Flush the shards, then atomically rewrite the checkpoint."""
+        if self.writer is not None:
+            self.writer.flush()
+            self.samples = len(self.writer)
+        self.complete = self.complete or complete
+        sources = dict(self._sources)
+        sources.update({name: src.to_dict() for name, src in self._live.items()})
+        state = {
+            "fingerprint": self.fingerprint,
+            "samples": self.samples,
+            "complete": self.complete,
+            "sources": sources,
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        self._unsaved = 0
+        self._last_save = time.monotonic()
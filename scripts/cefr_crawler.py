@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Concurrent Cached CEFR Crawler
+===============================
+
+Fetches CEFR word lists from several sources at once and merges them into the
+{level: [{"word", "pos", "definition"}, ...]} structure of crawl_cefr_words.py:
+
+- One pooled requests.Session (keep-alive, retries on 429/5xx) shared by a
+  thread pool; total time is the slowest source, not the sum.
+- Every response is cached on disk (<cache>/<sha1>.body + .json meta). Reruns
+  send If-None-Match / If-Modified-Since and a 304 reuses the cached body;
+  a failed request falls back to the cached copy ("stale").
+- JSON (list of records or {level: [...]}) and CSV payloads are normalized:
+  lowercase words, A1-C2 levels, full POS names; the merge keeps one entry
+  per (word, pos) at its lowest level.
+- Each source reports status, HTTP time, bytes and entries.
+
+Used by crawl_cefr_words.py. A local stand-in serves sample data with
+ETag/Last-Modified for offline runs and tests:
+
+    python scripts/cefr_crawler.py --serve-stub --port 8765
+    python scripts/crawl_cefr_words.py --source http://localhost:8765/cefr.json --source http://localhost:8765/oxford.csv
+"""
+
+import csv
+import hashlib
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2")
+
+DEFAULT_SOURCES = [
+    {"name": "english-words-by-level",
+     "url": "https://raw.githubusercontent.com/ghidinelli/english-words-by-level/master/cefr-vocabulary.json"},
+    {"name": "oxford-5000",
+     "url": "https://raw.githubusercontent.com/eunices/oxford-5000-cefr/master/oxford5000.json"},
+]
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / "datasets" / "cefr" / ".http_cache"
+
+_POS_ALIASES = {
+    "n": "noun", "n.": "noun", "v": "verb", "v.": "verb", "adj": "adjective", "adj.": "adjective",
+    "adv": "adverb", "adv.": "adverb", "prep": "preposition", "prep.": "preposition",
+    "conj": "conjunction", "conj.": "conjunction", "pron": "pronoun", "pron.": "pronoun",
+    "det": "determiner", "det.": "determiner", "num": "number", "exclam": "interjection",
+    "exclam.": "interjection", "exclamation": "interjection",
+    "modal verb": "verb", "auxiliary verb": "verb", "phrasal verb": "verb",
+}
+_WORD_KEYS = ("word", "headword", "Word", "lemma", "term")
+_LEVEL_KEYS = ("level", "cefr", "CEFR", "cefr_level", "Level")
+_POS_KEYS = ("pos", "part_of_speech", "type", "POS", "class")
+_DEF_KEYS = ("definition", "meaning", "gloss", "def")
+
+
+class FetchResult(NamedTuple):
+    name: str
+    url: str
+    status: str          # fetched / not-modified / stale / failed
+    http_status: int     # 0 if no response
+    seconds: float
+    bytes: int
+    entries: List[Dict]
+    error: str = ""
+
+
+# =============================================================================
+# Normalization / merge
+# =============================================================================
+def _first(record: Dict, keys: Iterable[str]) -> str:
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def normalize_entry(word: str, level: str, pos: str = "", definition: str = "") -> Optional[Dict]:
+    """{"word", "level", "pos", "definition"} or None if word/level is unusable."""
+    word = " ".join((word or "").split()).lower()
+    level = (level or "").strip().upper()[:2]
+    if not word or level not in LEVELS:
+        return None
+    pos = " ".join((pos or "").lower().split())
+    pos = _POS_ALIASES.get(pos, pos)
+    return {"word": word, "level": level, "pos": pos, "definition": (definition or "").strip()}
+
+
+def parse_payload(body: bytes, content_type: str = "", url: str = "") -> List[Dict]:
+    """Normalized entries from a JSON or CSV word list."""
+    text = body.decode("utf-8-sig", errors="replace")
+    is_csv = "csv" in content_type or url.lower().endswith(".csv")
+    if not is_csv:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            is_csv = True
+    if is_csv:
+        data = list(csv.DictReader(io.StringIO(text)))
+
+    rows: List[Optional[Dict]] = []
+    if isinstance(data, dict):
+        data = data.get("words", data.get("data", data))
+    if isinstance(data, dict):
+        # {"A1": ["word", {"word": ..., "pos": ...}, ...], ...}
+        for level, items in data.items():
+            for item in items if isinstance(items, list) else []:
+                if isinstance(item, str):
+                    rows.append(normalize_entry(item, level))
+                elif isinstance(item, dict):
+                    rows.append(normalize_entry(_first(item, _WORD_KEYS), _first(item, _LEVEL_KEYS) or level,
+                                                _first(item, _POS_KEYS), _first(item, _DEF_KEYS)))
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                rows.append(normalize_entry(_first(item, _WORD_KEYS), _first(item, _LEVEL_KEYS),
+                                            _first(item, _POS_KEYS), _first(item, _DEF_KEYS)))
+    return [r for r in rows if r]
+
+
+def merge_cefr_data(base: Dict[str, List[Dict]], entries: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """
+    Merge normalized entries into {level: [{"word", "pos", "definition"}]}.
+    One entry per (word, pos): lowest level wins, first non-empty definition is kept.
+    """
+    merged: Dict[tuple, Dict] = {}
+    order: List[tuple] = []
+
+    def add(word: str, level: str, pos: str, definition: str):
+        entry = normalize_entry(word, level, pos, definition)
+        if entry is None:
+            return
+        key = (entry["word"], entry["pos"])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = entry
+            order.append(key)
+            return
+        if LEVELS.index(entry["level"]) < LEVELS.index(current["level"]):
+            current["level"] = entry["level"]
+        if not current["definition"]:
+            current["definition"] = entry["definition"]
+
+    for level, words in base.items():
+        for w in words:
+            add(w.get("word", ""), level, w.get("pos", ""), w.get("definition", ""))
+    for e in entries:
+        add(e["word"], e["level"], e.get("pos", ""), e.get("definition", ""))
+
+    out: Dict[str, List[Dict]] = {level: [] for level in LEVELS}
+    for key in order:
+        e = merged[key]
+        out[e["level"]].append({"word": e["word"], "pos": e["pos"], "definition": e["definition"]})
+    return out
+
+
+# =============================================================================
+# HTTP cache + fetching
+# =============================================================================
+class HttpCache:
+    """Disk cache of response bodies with their ETag / Last-Modified validators."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.body", self.directory / f"{key}.json"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        body_path, meta_path = self._paths(url)
+        if not (body_path.exists() and meta_path.exists()):
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            meta["body"] = body_path.read_bytes()
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, body: bytes, headers: Dict[str, str]):
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type", ""),
+            "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        # Body first, meta last: a meta file always describes a complete body
+        for path, data in ((body_path, body), (meta_path, json.dumps(meta, indent=2).encode("utf-8"))):
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+
+    def validators(self, cached: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+
+def make_session(pool_size: int = 8, retries: int = 2):
+    """requests.Session with a connection pool sized for the worker threads."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET"]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "LexiLingo-CEFR-crawler/1.0"
+    return session
+
+
+def fetch_source(session, source: Dict[str, str], cache: Optional[HttpCache], timeout: float = 10.0) -> FetchResult:
+    """Fetch one source (conditional GET when cached) and parse its entries."""
+    name, url = source.get("name") or source["url"], source["url"]
+    cached = cache.get(url) if cache else None
+    started = time.perf_counter()
+    try:
+        response = session.get(url, headers=cache.validators(cached) if cache else {}, timeout=timeout)
+        seconds = time.perf_counter() - started
+        if response.status_code == 304 and cached:
+            body, status, content_type = cached["body"], "not-modified", cached.get("content_type", "")
+        elif response.status_code == 200:
+            body, status, content_type = response.content, "fetched", response.headers.get("Content-Type", "")
+            if cache:
+                cache.put(url, body, response.headers)
+        else:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return FetchResult(name, url, status, response.status_code, seconds, len(body),
+                           parse_payload(body, content_type, url))
+    except Exception as e:
+        seconds = time.perf_counter() - started
+        if cached:
+            body = cached["body"]
+            return FetchResult(name, url, "stale", 0, seconds, len(body),
+                               parse_payload(body, cached.get("content_type", ""), url), str(e))
+        return FetchResult(name, url, "failed", 0, seconds, 0, [], str(e))
+
+
+def fetch_sources(
+    sources: List[Dict[str, str]],
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    workers: int = 4,
+    timeout: float = 10.0,
+    session=None,
+) -> List[FetchResult]:
+    """Fetch all sources concurrently over one pooled session; results in source order."""
+    if not sources:
+        return []
+    workers = max(1, min(workers, len(sources)))
+    cache = HttpCache(cache_dir) if cache_dir else None
+    own_session = session is None
+    session = session or make_session(pool_size=workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda s: fetch_source(session, s, cache, timeout), sources))
+    finally:
+        if own_session:
+            session.close()
+
+
+def print_report(results: List[FetchResult], total_seconds: float):
+    """Per-source timing table."""
+    print(f"\n{'Source':28s} {'Status':13s} {'HTTP':>5s} {'Time':>8s} {'KB':>8s} {'Entries':>8s}")
+    for r in results:
+        print(f"{r.name[:28]:28s} {r.status:13s} {r.http_status or '-':>5} {r.seconds:>7.2f}s "
+              f"{r.bytes / 1024:>8.1f} {len(r.entries):>8,}" + (f"  ({r.error})" if r.error else ""))
+    sequential = sum(r.seconds for r in results)
+    print(f"Total: {total_seconds:.2f}s wall (sum of sources {sequential:.2f}s)")
+
+
+# =============================================================================
+# Local HTTP stand-in (dev/test)
+# =============================================================================
+STUB_FILES = {
+    "/cefr.json": ("application/json", json.dumps([
+        {"word": "Hello", "level": "a1", "pos": "exclam", "definition": "used as a greeting"},
+        {"word": "negotiate", "level": "B2", "pos": "v."},
+        {"word": "ubiquitous", "level": "C2", "pos": "adj"},
+    ]).encode("utf-8")),
+    "/oxford.csv": ("text/csv", b"headword,CEFR,type\nhello,A2,exclamation\nenvironment,B1,noun\nnegotiate,B1,verb\n"),
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    files: Dict[str, tuple] = STUB_FILES
+    delay = 0.0
+    last_modified = formatdate(usegmt=True)
+    hits: Dict[str, int] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path not in self.files:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content_type, body = self.files[self.path]
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag or (
+                not self.headers.get("If-None-Match") and self.headers.get("If-Modified-Since") == self.last_modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server(host: str = "localhost", port: int = 0,
+                      files: Optional[Dict[str, tuple]] = None, delay: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Serve word lists with ETag/Last-Modified in a background thread.
+
+    files: {path: (content type, body bytes)}; server.RequestHandlerClass.hits
+    counts requests per path. Call server.shutdown() to stop.
+    """
+    handler = type("StubHandler", (_StubHandler,), {"files": dict(files or STUB_FILES), "delay": delay, "hits": {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="cefr-stub", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local CEFR word-list server for crawler runs without network.")
+    parser.add_argument("--serve-stub", action="store_true", help="Serve sample word lists and block")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if not args.serve_stub:
+        parser.error("use crawl_cefr_words.py to crawl; this CLI only runs --serve-stub")
+    server = start_stub_server(port=args.port)
+    base = f"http://localhost:{server.server_address[1]}"
+    print(f"Stub CEFR sources: {', '.join(base + path for path in STUB_FILES)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
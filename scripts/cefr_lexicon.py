@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+CEFR Lexicon Index + Batch Sentence Profiler
+=============================================
+
+Compiles the CEFR word list (ENGLISH_CERF_WORDS.csv from crawl_cefr_words.py,
+or its built-in dataset when the CSV is missing) into one dict of
+surface form -> level code (0 = A1 ... 5 = C2):
+
+- Inflections are generated at build time (plural / 3rd person, past, -ing,
+  comparative, plus common irregular forms), so a lookup is one dict hit per
+  token and needs no lemmatizer at runtime.
+- A word listed at several levels keeps the lowest one; listed words win over
+  generated inflections.
+- The compiled index is saved as a small .npz (sorted words + uint8 levels)
+  and reloaded in milliseconds. It carries a format VERSION; an index from
+  another version (or an unreadable one) is rebuilt instead of loaded.
+
+A sentence's level is the `coverage` quantile (default 0.9) of its rated
+token levels, so one rare word does not make the whole sentence C2. Unlisted
+long words (>= 9 letters) count as B2, other unlisted words are not rated.
+profile_batch() does the per-sentence quantiles with numpy for whole batches.
+
+Usage:
+    from cefr_lexicon import CefrLexicon
+    lexicon = CefrLexicon.default()
+    lexicon.estimate("The phenomenon is fascinating.")   # -> "B2"
+    lexicon.estimate_batch(sentences)
+
+    python scripts/cefr_lexicon.py --build
+    python scripts/cefr_lexicon.py --profile sentences.txt
+"""
+
+import argparse
+import csv
+import re
+import threading
+import time
+import zipfile
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+VERSION = 1  # Bump when the compiled index (inflections, tokens, levels) changes
+LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2")
+LEVEL_CODES = {level: i for i, level in enumerate(LEVELS)}
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CSV = REPO_ROOT / "datasets" / "cefr" / "ENGLISH_CERF_WORDS.csv"
+DEFAULT_INDEX = REPO_ROOT / "datasets" / "cefr" / "cefr_lexicon.npz"
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:-[a-z]+)*")
+_CLITICS = {"s", "t", "d", "m", "ll", "re", "ve"}
+_UNLISTED_LONG = LEVEL_CODES["B2"]
+_VOWELS = set("aeiou")
+
+_IRREGULAR = {
+    "be": ["am", "is", "are", "was", "were", "been", "being"],
+    "have": ["has", "had", "having"],
+    "do": ["does", "did", "done", "doing"],
+    "go": ["goes", "went", "gone"],
+    "make": ["made"], "take": ["took", "taken"], "come": ["came"], "say": ["said"],
+    "become": ["became"], "begin": ["began", "begun"], "find": ["found"], "give": ["gave", "given"],
+    "leave": ["left"], "tell": ["told"], "write": ["wrote", "written"], "see": ["saw", "seen"],
+    "know": ["knew", "known"], "think": ["thought"], "bring": ["brought"], "buy": ["bought"],
+    "build": ["built"], "run": ["ran"], "win": ["won"], "lose": ["lost"], "hold": ["held"],
+    "lead": ["led"], "meet": ["met"], "send": ["sent"], "spend": ["spent"], "stand": ["stood"],
+    "fall": ["fell", "fallen"], "grow": ["grew", "grown"], "choose": ["chose", "chosen"],
+    "drive": ["drove", "driven"], "speak": ["spoke", "spoken"], "eat": ["ate", "eaten"],
+    "drink": ["drank", "drunk"], "get": ["got", "gotten"], "feel": ["felt"], "keep": ["kept"],
+    "sleep": ["slept"], "teach": ["taught"], "catch": ["caught"], "fight": ["fought"],
+    "sell": ["sold"], "sit": ["sat"], "pay": ["paid"], "read": [], "put": [], "cut": [], "let": [],
+    "child": ["children"], "person": ["people"], "man": ["men"], "woman": ["women"],
+    "foot": ["feet"], "tooth": ["teeth"], "mouse": ["mice"],
+    "good": ["better", "best"], "bad": ["worse", "worst"], "far": ["further", "furthest"],
+}
+
+
+def _cvc(word: str) -> bool:
+    return (len(word) >= 3 and word[-1] not in _VOWELS and word[-1] not in "wxy"
+            and word[-2] in _VOWELS and word[-3] not in _VOWELS)
+
+
+def inflections(word: str, pos: str = "") -> List[str]:
+    """Likely inflected forms of a lemma (over-generation is harmless for lookup)."""
+    word = word.lower()
+    pos = (pos or "").lower()
+    forms = list(_IRREGULAR.get(word, []))
+    if " " in word or not word.isalpha():
+        return forms
+    stem_y = word[:-1] if word.endswith("y") and len(word) > 2 and word[-2] not in _VOWELS else None
+    if pos in ("noun", "verb", ""):
+        if word.endswith(("s", "x", "z", "ch", "sh", "o")):
+            forms.append(word + "es")
+        else:
+            forms.append(stem_y + "ies" if stem_y else word + "s")
+    if pos in ("verb", ""):
+        if word.endswith("e"):
+            forms += [word + "d", word[:-1] + "ing" if not word.endswith("ee") else word + "ing"]
+        elif stem_y:
+            forms += [stem_y + "ied", word + "ing"]
+        else:
+            forms += [word + "ed", word + "ing"]
+            if _cvc(word):
+                forms += [word + word[-1] + "ed", word + word[-1] + "ing"]
+        if word.endswith("ie"):
+            forms.append(word[:-2] + "ying")
+    if pos in ("adjective", "") and len(word) <= 7:
+        if word.endswith("e"):
+            forms += [word + "r", word + "st"]
+        elif stem_y:
+            forms += [stem_y + "ier", stem_y + "iest"]
+        else:
+            forms += [word + "er", word + "est"]
+            if _cvc(word):
+                forms += [word + word[-1] + "er", word + word[-1] + "est"]
+    return forms
+
+
+def builtin_entries() -> List[Tuple[str, str, str]]:
+    """(word, level, part_of_speech) rows of crawl_cefr_words' built-in dataset."""
+    try:
+        from crawl_cefr_words import create_comprehensive_cefr_dataset
+    except ImportError:  # Imported as scripts.cefr_lexicon (benchmarks, export)
+        from scripts.crawl_cefr_words import create_comprehensive_cefr_dataset
+    data = create_comprehensive_cefr_dataset()
+    return [(w["word"], level, w.get("pos", "")) for level, words in data.items() for w in words]
+
+
+def csv_entries(path: Path) -> List[Tuple[str, str, str]]:
+    """(word, level, part_of_speech) rows of ENGLISH_CERF_WORDS.csv."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [(r.get("word"), r.get("cefr_level"), r.get("part_of_speech")) for r in csv.DictReader(f)]
+
+
+class CefrLexicon:
+    """
+    Surface form -> CEFR level index with a batch sentence profiler.
+
+    Example:
+        lexicon = CefrLexicon.from_csv("datasets/cefr/ENGLISH_CERF_WORDS.csv")
+        lexicon.save("datasets/cefr/cefr_lexicon.npz")
+        lexicon.profile("She analyses the data carefully.")
+    """
+
+    _default: Optional["CefrLexicon"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, index: Dict[str, int], lemmas: int = 0):
+        self.index = index
+        self.lemmas = lemmas
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self.index
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, str, str]]) -> "CefrLexicon":
+        """Build from (word, level, part_of_speech) rows."""
+        listed: Dict[str, int] = {}
+        by_pos: Dict[Tuple[str, str], int] = {}
+        for word, level, pos in entries:
+            word = (word or "").strip().lower()
+            code = LEVEL_CODES.get((level or "").strip().upper())
+            if not word or code is None:
+                continue
+            listed[word] = min(code, listed.get(word, code))
+            key = (word, (pos or "").strip().lower())
+            by_pos[key] = min(code, by_pos.get(key, code))
+
+        # Inflections take the level of their part of speech ("train" noun A1, verb A2)
+        index: Dict[str, int] = {}
+        for (word, pos), code in by_pos.items():
+            for form in inflections(word, pos):
+                if form not in listed:
+                    index[form] = min(code, index.get(form, code))
+        index.update(listed)
+        return cls(index, lemmas=len(listed))
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "CefrLexicon":
+        """Build from ENGLISH_CERF_WORDS.csv (word, cefr_level, part_of_speech, definition)."""
+        return cls.from_entries(csv_entries(path))
+
+    @classmethod
+    def from_builtin(cls) -> "CefrLexicon":
+        """Build from crawl_cefr_words.create_comprehensive_cefr_dataset()."""
+        return cls.from_entries(builtin_entries())
+
+    def save(self, path: Path):
+        """Compact on-disk index: sorted words as one UTF-8 blob + uint8 levels."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        words = sorted(self.index)
+        np.savez_compressed(
+            path,
+            words=np.frombuffer("\n".join(words).encode("utf-8"), dtype=np.uint8),
+            levels=np.array([self.index[w] for w in words], dtype=np.uint8),
+            lemmas=np.array([self.lemmas], dtype=np.int64),
+            version=np.array([VERSION], dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "CefrLexicon":
+        with np.load(path) as data:
+            version = int(data["version"][0]) if "version" in data.files else 0
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported version {version}")
+            words = data["words"].tobytes().decode("utf-8").split("\n")
+            levels = data["levels"].tolist()
+            lemmas = int(data["lemmas"][0])
+        return cls(dict(zip(words, levels)), lemmas=lemmas)
+
+    @classmethod
+    def default(cls, csv_path: Path = DEFAULT_CSV, index_path: Path = DEFAULT_INDEX) -> "CefrLexicon":
+        """
+        Shared lexicon: the compiled index if it is newer than the CSV and of
+        the current VERSION, else rebuilt from the CSV (or the built-in list)
+        and saved when possible.
+        """
+        with cls._default_lock:
+            if cls._default is not None:
+                return cls._default
+            csv_path, index_path = Path(csv_path), Path(index_path)
+            csv_mtime = csv_path.stat().st_mtime if csv_path.exists() else 0.0
+            lexicon = None
+            if index_path.exists() and index_path.stat().st_mtime >= csv_mtime:
+                try:
+                    lexicon = cls.load(index_path)
+                except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                    print(f"⚠️  Rebuilding CEFR index: {e}")
+            if lexicon is None:
+                lexicon = cls.from_csv(csv_path) if csv_path.exists() else cls.from_builtin()
+                try:
+                    lexicon.save(index_path)
+                except OSError:
+                    pass
+            cls._default = lexicon
+            return lexicon
+
+    # --- Lookup / profiling ---
+
+    def level(self, word: str) -> Optional[str]:
+        code = self.index.get(word.lower())
+        return None if code is None else LEVELS[code]
+
+    def _codes(self, text: str) -> List[int]:
+        """Level code per word token; -1 = unrated."""
+        get = self.index.get
+        return [get(t, _UNLISTED_LONG if len(t) >= 9 else -1)
+                for t in _TOKEN_RE.findall((text or "").lower()) if t not in _CLITICS]
+
+    def profile_batch(self, sentences: List[str], coverage: float = 0.9) -> Dict[str, np.ndarray]:
+        """
+        Profile many sentences at once.
+
+        Returns arrays (one entry per sentence):
+            level     int8  level code at the coverage quantile (-1 = no rated words)
+            tokens    int32 word tokens
+            rated     int32 tokens with a level
+            coverage  float rated / tokens
+            histogram int32 [n, 6] rated tokens per level
+        """
+        codes = [self._codes(s) for s in sentences]
+        n = len(codes)
+        tokens = np.fromiter((len(c) for c in codes), dtype=np.int32, count=n)
+        flat = np.fromiter(chain.from_iterable(codes), dtype=np.int8, count=int(tokens.sum()))
+        seg = np.repeat(np.arange(n), tokens)
+        keep = flat >= 0
+        flat, seg = flat[keep], seg[keep]
+
+        rated = np.bincount(seg, minlength=n).astype(np.int32)
+        histogram = np.zeros((n, len(LEVELS)), dtype=np.int32)
+        np.add.at(histogram, (seg, flat), 1)
+
+        level = np.full(n, -1, dtype=np.int8)
+        if flat.size:
+            ordered = flat[np.lexsort((flat, seg))]
+            starts = np.concatenate(([0], np.cumsum(rated)[:-1]))
+            k = np.maximum(np.ceil(coverage * rated).astype(np.int64) - 1, 0)
+            has = rated > 0
+            level[has] = ordered[(starts + k)[has]]
+        return {
+            "level": level,
+            "tokens": tokens,
+            "rated": rated,
+            "coverage": np.divide(rated, np.maximum(tokens, 1), dtype=np.float64),
+            "histogram": histogram,
+        }
+
+    def estimate_batch(self, sentences: List[str], coverage: float = 0.9,
+                       min_rated: int = 1) -> List[Optional[str]]:
+        """Level per sentence; None when fewer than min_rated words have a level."""
+        result = self.profile_batch(sentences, coverage)
+        return [LEVELS[code] if code >= 0 and rated >= min_rated else None
+                for code, rated in zip(result["level"].tolist(), result["rated"].tolist())]
+
+    def estimate(self, sentence: str, coverage: float = 0.9, min_rated: int = 1) -> Optional[str]:
+        return self.estimate_batch([sentence], coverage, min_rated)[0]
+
+    def profile(self, sentence: str, coverage: float = 0.9) -> Dict:
+        """Level, coverage and the hardest listed words of one sentence."""
+        result = self.profile_batch([sentence], coverage)
+        code = int(result["level"][0])
+        words = [t for t in _TOKEN_RE.findall((sentence or "").lower()) if t in self.index]
+        hard = sorted(set(words), key=lambda w: self.index[w], reverse=True)
+        return {
+            "level": LEVELS[code] if code >= 0 else None,
+            "tokens": int(result["tokens"][0]),
+            "rated": int(result["rated"][0]),
+            "coverage": round(float(result["coverage"][0]), 3),
+            "histogram": dict(zip(LEVELS, result["histogram"][0].tolist())),
+            "hard_words": [(w, LEVELS[self.index[w]]) for w in hard[:5]],
+        }
+
+    def prefilter(self, min_coverage: float = 0.8, min_rated: int = 3, coverage: float = 0.9):
+        """
+        Callable(sentence) -> level or None for LexiLingoClient(vocab_prefilter=...):
+        answers only when enough of the sentence is in the lexicon, otherwise
+        the model is asked.
+        """
+        def check(sentence: str) -> Optional[str]:
+            result = self.profile_batch([sentence], coverage)
+            if result["rated"][0] < min_rated or result["coverage"][0] < min_coverage:
+                return None
+            return LEVELS[int(result["level"][0])]
+        return check
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CEFR lexicon index and profile sentences.")
+    parser.add_argument("--csv", type=Path, default=DEFAULT_CSV, help="CEFR word list CSV (default: built-in list if missing)")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX, help="Compiled index (.npz)")
+    parser.add_argument("--build", action="store_true", help="Rebuild the compiled index")
+    parser.add_argument("--profile", type=Path, default=None, help="Text file, one sentence per line")
+    parser.add_argument("--coverage", type=float, default=0.9, help="Quantile of word levels used as sentence level")
+    args = parser.parse_args()
+
+    if args.build:
+        started = time.perf_counter()
+        lexicon = CefrLexicon.from_csv(args.csv) if args.csv.exists() else CefrLexicon.from_builtin()
+        lexicon.save(args.index)
+        print(f"✅ {lexicon.lemmas:,} lemmas -> {len(lexicon):,} forms in {time.perf_counter() - started:.2f}s")
+        print(f"💾 Saved to: {args.index} ({args.index.stat().st_size / 1024:.1f} KB)")
+    else:
+        lexicon = CefrLexicon.default(args.csv, args.index)
+
+    if args.profile:
+        with open(args.profile, "r", encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+        started = time.perf_counter()
+        levels = lexicon.estimate_batch(sentences, args.coverage)
+        elapsed = time.perf_counter() - started
+        print(f"📊 {len(sentences):,} sentences in {elapsed:.3f}s ({len(sentences) / max(elapsed, 1e-9):,.0f}/s)")
+        for level in LEVELS + (None,):
+            print(f"  {level or 'unrated':8s} {levels.count(level):>7,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped CEFR Lexicon (serving-time lookup)
+=================================================
+
+Compiles ENGLISH_CERF_WORDS.csv (or the built-in list of crawl_cefr_words.py)
+into one read-only binary file that worker processes mmap instead of parsing:
+
+    magic "CEFRMMAP" | uint32 header length | JSON header | sections (64-byte aligned)
+
+    keys         S<width>[n]   sorted lowercase surface forms (lemmas + inflections)
+    key_level    uint8[n]      level code per key (listed word wins over inflection)
+    entry_start  uint32[n+1]   entries of key i = entries[entry_start[i]:entry_start[i+1]]
+    entries      n_entries x (lemma: uint32 key index, level: uint8, pos: uint8, inflected: uint8)
+
+Keys are fixed-width, so np.searchsorted does exact lookups, whole batches
+and prefix ranges directly on the mapped array. Opening the file is a header
+read plus one mmap; pages come from the OS page cache and are shared by every
+process, with no per-process copy. Pickling a MappedCefrLexicon sends only
+its path, so pools reopen it cheaply.
+
+Usage:
+    from cefr_mmap import MappedCefrLexicon
+    lexicon = MappedCefrLexicon.open()               # compiles the CSV if needed
+    lexicon.level("studies")                          # -> "A2"
+    lexicon.lookup("saw", pos="verb")                 # [CefrEntry(word='saw', lemma='see', ...)]
+    lexicon.prefix("environ", pos="noun")
+    CefrLexicon(lexicon).prefilter()                  # sentence profiler on top (cefr_lexicon.py)
+
+    python scripts/cefr_mmap.py --build
+    python scripts/cefr_mmap.py --lookup saw studies --prefix environ
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    from cefr_lexicon import DEFAULT_CSV, LEVEL_CODES, LEVELS, builtin_entries, csv_entries, inflections
+except ImportError:  # Imported as scripts.cefr_mmap (benchmarks, export)
+    from scripts.cefr_lexicon import DEFAULT_CSV, LEVEL_CODES, LEVELS, builtin_entries, csv_entries, inflections
+
+DEFAULT_MAPPED = DEFAULT_CSV.with_name("cefr_lexicon.mmap")
+
+MAGIC = b"CEFRMMAP"
+VERSION = 1
+_ALIGN = 64
+_NO_LEVEL = 255
+ENTRY_DTYPE = np.dtype([("lemma", "<u4"), ("level", "u1"), ("pos", "u1"), ("inflected", "u1"), ("_pad", "u1")])
+
+
+class CefrEntry(NamedTuple):
+    word: str        # Surface form that was looked up
+    lemma: str       # Listed word it belongs to
+    level: str       # A1 ... C2
+    pos: str         # Part of speech of the listed word ("" if unknown)
+    inflected: bool  # True if word is a generated inflection of lemma
+
+
+def compile_entries(entries: Iterable[Tuple[str, str, str]], path: Path) -> Dict:
+    """Write the mapped lexicon for (word, level, part_of_speech) rows; returns the header."""
+    listed: Dict[Tuple[str, str], int] = {}
+    for word, level, pos in entries:
+        word = (word or "").strip().lower()
+        code = LEVEL_CODES.get((level or "").strip().upper())
+        if not word or code is None:
+            continue
+        key = (word, (pos or "").strip().lower())
+        listed[key] = min(code, listed.get(key, code))
+
+    # (surface form, lemma, pos, inflected) -> lowest level
+    forms: Dict[Tuple[str, str, str, int], int] = {}
+    for (word, pos), code in listed.items():
+        for form, inflected in [(word, 0)] + [(f, 1) for f in inflections(word, pos)]:
+            k = (form, word, pos, inflected)
+            forms[k] = min(code, forms.get(k, code))
+
+    keys = sorted({form for form, _, _, _ in forms})
+    key_id = {k: i for i, k in enumerate(keys)}
+    pos_names = sorted({pos for _, _, pos, _ in forms})
+    pos_id = {p: i for i, p in enumerate(pos_names)}
+
+    per_key: List[List[Tuple[int, int, int, int]]] = [[] for _ in keys]
+    for (form, lemma, pos, inflected), code in forms.items():
+        per_key[key_id[form]].append((inflected, code, key_id[lemma], pos_id[pos]))
+    entry_start = np.zeros(len(keys) + 1, dtype="<u4")
+    rows = []
+    key_level = np.full(len(keys), _NO_LEVEL, dtype=np.uint8)
+    for i, items in enumerate(per_key):
+        items.sort()  # Listed words first, then by level
+        rows.extend((lemma, code, pos, inflected, 0) for inflected, code, lemma, pos in items)
+        entry_start[i + 1] = len(rows)
+        best_inflected = items[0][0]
+        key_level[i] = min(code for inflected, code, _, _ in items if inflected == best_inflected)
+    entries_arr = np.array(rows, dtype=ENTRY_DTYPE)
+
+    width = max((len(k.encode("utf-8")) for k in keys), default=1)
+    sections = {
+        "keys": np.array([k.encode("utf-8") for k in keys], dtype=f"S{width}"),
+        "key_level": key_level,
+        "entry_start": entry_start,
+        "entries": entries_arr,
+    }
+    header = {
+        "version": VERSION,
+        "keys": len(keys),
+        "lemmas": len({w for w, _ in listed}),
+        "width": width,
+        "pos": pos_names,
+        "levels": list(LEVELS),
+        "sections": {},
+    }
+    # Section offsets depend on the header length, which depends on the offsets
+    for _ in range(3):
+        blob = json.dumps(header).encode("utf-8")
+        offset = _aligned(len(MAGIC) + 4 + len(blob))
+        for name, arr in sections.items():
+            header["sections"][name] = {"offset": offset, "dtype": arr.dtype.descr if arr.dtype.names else arr.dtype.str,
+                                        "count": int(arr.shape[0])}
+            offset = _aligned(offset + arr.nbytes)
+    blob = json.dumps(header).encode("utf-8")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(blob)) + blob)
+        for name, arr in sections.items():
+            f.write(b"\0" * (header["sections"][name]["offset"] - f.tell()))
+            f.write(arr.tobytes())
+    # Atomic, so workers that already mapped the old file keep a consistent view
+    os.replace(tmp, path)
+    return header
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def compile_csv(csv_path: Path = DEFAULT_CSV, path: Path = DEFAULT_MAPPED) -> Dict:
+    """Compile ENGLISH_CERF_WORDS.csv (built-in list if the CSV is missing)."""
+    csv_path = Path(csv_path)
+    return compile_entries(csv_entries(csv_path) if csv_path.exists() else builtin_entries(), path)
+
+
+class MappedCefrLexicon(Mapping):
+    """
+    Read-only, memory-mapped CEFR lexicon.
+
+    As a Mapping it is surface form -> level code (0 = A1 ... 5 = C2), so
+    CefrLexicon(mapped) profiles sentences on top of it.
+    """
+
+    def __init__(self, path: Path = DEFAULT_MAPPED):
+        """Map path; ValueError if it is empty, truncated, not a lexicon or another VERSION."""
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty file
+                raise ValueError(f"{self.path} is empty") from None
+        try:
+            if self._mm[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a compiled CEFR lexicon")
+            (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+            start = len(MAGIC) + 4
+            self.header = json.loads(self._mm[start:start + header_len].decode("utf-8"))
+            if self.header.get("version") != VERSION:
+                raise ValueError(f"{self.path}: unsupported version {self.header.get('version')}")
+            self.pos_names: List[str] = self.header["pos"]
+            self._pos_id = {p: i for i, p in enumerate(self.pos_names)}
+            self.keys = self._section("keys")
+            self.key_level = self._section("key_level")
+            self.entry_start = self._section("entry_start")
+            self.entries = self._section("entries")
+            self.lemmas = self.header["lemmas"]
+        except (struct.error, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.keys = self.key_level = self.entry_start = self.entries = None
+            self._mm.close()
+            if isinstance(e, ValueError) and str(self.path) in str(e):
+                raise  # Checks above
+            raise ValueError(f"{self.path}: truncated or corrupt CEFR lexicon ({e})") from e
+
+    def _section(self, name: str) -> np.ndarray:
+        spec = self.header["sections"][name]
+        dtype = np.dtype([tuple(d) for d in spec["dtype"]]) if isinstance(spec["dtype"], list) else np.dtype(spec["dtype"])
+        return np.frombuffer(self._mm, dtype=dtype, count=spec["count"], offset=spec["offset"])
+
+    @classmethod
+    def open(cls, path: Path = DEFAULT_MAPPED, csv_path: Path = DEFAULT_CSV) -> "MappedCefrLexicon":
+        """
+        Open path, compiling it first if it is missing or older than the CSV,
+        and recompiling it if it cannot be read (other VERSION, bad magic, truncated).
+        """
+        path, csv_path = Path(path), Path(csv_path)
+        if not path.exists() or (csv_path.exists() and csv_path.stat().st_mtime > path.stat().st_mtime):
+            compile_csv(csv_path, path)
+        try:
+            return cls(path)
+        except ValueError as e:
+            print(f"⚠️  Recompiling CEFR lexicon: {e}")
+            compile_csv(csv_path, path)
+            return cls(path)
+
+    def close(self):
+        # Arrays hold views into the mapping; drop them before closing it
+        self.keys = self.key_level = self.entry_start = self.entries = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # Views handed out to callers still exist; the mapping closes with them
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __reduce__(self):
+        return (self.__class__, (str(self.path),))
+
+    # --- Mapping protocol (surface form -> level code) ---
+
+    def _find(self, word: str) -> int:
+        key = word.lower().encode("utf-8")
+        if not key or len(key) > self.keys.dtype.itemsize:
+            return -1
+        i = int(np.searchsorted(self.keys, key))
+        return i if i < len(self.keys) and self.keys[i] == key else -1
+
+    def __getitem__(self, word: str) -> int:
+        i = self._find(word)
+        if i < 0:
+            raise KeyError(word)
+        return int(self.key_level[i])
+
+    def get(self, word: str, default=None):
+        i = self._find(word)
+        return default if i < 0 else int(self.key_level[i])
+
+    def __contains__(self, word) -> bool:
+        return isinstance(word, str) and self._find(word) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (k.decode("utf-8") for k in self.keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # --- Lookups ---
+
+    def _entries(self, i: int, word: str, pos: Optional[str]) -> List[CefrEntry]:
+        rows = self.entries[self.entry_start[i]:self.entry_start[i + 1]]
+        if pos is not None:
+            pid = self._pos_id.get(pos.lower())
+            if pid is None:
+                return []
+            rows = rows[rows["pos"] == pid]
+        return [CefrEntry(word, self.keys[r["lemma"]].decode("utf-8"), LEVELS[r["level"]],
+                          self.pos_names[r["pos"]], bool(r["inflected"])) for r in rows]
+
+    def lookup(self, word: str, pos: Optional[str] = None) -> List[CefrEntry]:
+        """All entries for a word or inflection (listed ones first), optionally one POS."""
+        i = self._find(word)
+        return [] if i < 0 else self._entries(i, word.lower(), pos)
+
+    def level(self, word: str, pos: Optional[str] = None) -> Optional[str]:
+        if pos is None:
+            code = self.get(word)
+            return None if code is None else LEVELS[code]
+        entries = self.lookup(word, pos)
+        return entries[0].level if entries else None
+
+    def lemmas_of(self, word: str, pos: Optional[str] = None) -> List[str]:
+        """Listed words that `word` is (an inflection of)."""
+        return list(dict.fromkeys(e.lemma for e in self.lookup(word, pos)))
+
+    def levels_batch(self, words: List[str]) -> np.ndarray:
+        """Level codes for many words in one searchsorted call; -1 = not in lexicon."""
+        width = self.keys.dtype.itemsize
+        encoded = [w.lower().encode("utf-8") for w in words]
+        query = np.array([e if len(e) <= width else b"" for e in encoded], dtype=self.keys.dtype)
+        idx = np.minimum(np.searchsorted(self.keys, query), len(self.keys) - 1)
+        found = (self.keys[idx] == query) & (query != b"")
+        return np.where(found, self.key_level[idx].astype(np.int16), -1)
+
+    def prefix(self, prefix: str, pos: Optional[str] = None, limit: int = 50,
+               listed_only: bool = True) -> List[CefrEntry]:
+        """Entries whose word starts with prefix (alphabetical), e.g. for autocomplete."""
+        key = prefix.lower().encode("utf-8")
+        width = self.keys.dtype.itemsize
+        if len(key) > width:
+            return []
+        lo = int(np.searchsorted(self.keys, key))
+        hi = int(np.searchsorted(self.keys, key + b"\xff" * (width - len(key)), side="right")) if key else len(self.keys)
+        out: List[CefrEntry] = []
+        for i in range(lo, hi):
+            for entry in self._entries(i, self.keys[i].decode("utf-8"), pos):
+                if listed_only and entry.inflected:
+                    continue
+                out.append(entry)
+                if len(out) >= limit:
+                    return out
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile / query the memory-mapped CEFR lexicon.")
+    parser.add_argument("--csv", type=Path, default=DEFAULT_CSV, help="CEFR word list CSV (default: built-in list if missing)")
+    parser.add_argument("--path", type=Path, default=DEFAULT_MAPPED, help="Compiled lexicon file")
+    parser.add_argument("--build", action="store_true", help="Recompile from the CSV")
+    parser.add_argument("--lookup", nargs="*", default=[], help="Words to look up")
+    parser.add_argument("--prefix", type=str, default=None, help="List listed words with this prefix")
+    parser.add_argument("--pos", type=str, default=None, help="Only this part of speech (noun, verb, ...)")
+    args = parser.parse_args()
+
+    if args.build:
+        started = time.perf_counter()
+        header = compile_csv(args.csv, args.path)
+        print(f"✅ {header['lemmas']:,} lemmas -> {header['keys']:,} keys in {time.perf_counter() - started:.2f}s")
+        print(f"💾 Saved to: {args.path} ({args.path.stat().st_size / 1024:.1f} KB)")
+
+    started = time.perf_counter()
+    lexicon = MappedCefrLexicon.open(args.path, args.csv)
+    print(f"📂 Opened {args.path.name}: {len(lexicon):,} keys in {(time.perf_counter() - started) * 1000:.2f} ms")
+    for word in args.lookup:
+        entries = lexicon.lookup(word, args.pos)
+        print(f"  {word}: " + (", ".join(f"{e.lemma}/{e.pos or '?'} {e.level}{' (inflected)' if e.inflected else ''}"
+                                         for e in entries) or "not found"))
+    if args.prefix is not None:
+        for e in lexicon.prefix(args.prefix, args.pos):
+            print(f"  {e.word:20s} {e.level}  {e.pos}")
+    lexicon.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,46 +3,34 @@ Script to crawl CEFR English words data
 CEFR Levels: A1, A2, B1, B2, C1, C2
 """
 
+import argparse
 import csv
-import requests
-from bs4 import BeautifulSoup
 import json
 import time
 from pathlib import Path
 
-def crawl_cefr_from_englishprofile():
+try:
+    from cefr_crawler import DEFAULT_CACHE_DIR, DEFAULT_SOURCES, fetch_sources, merge_cefr_data, print_report
+except ImportError:  # Imported as scripts.crawl_cefr_words (cefr_lexicon from benchmarks/export)
+    from scripts.cefr_crawler import DEFAULT_CACHE_DIR, DEFAULT_SOURCES, fetch_sources, merge_cefr_data, print_report
+
+def crawl_cefr_from_englishprofile(sources=None, cache_dir=DEFAULT_CACHE_DIR, workers=4, timeout=10.0):
     """
     Crawl CEFR words from English Profile or similar sources
-    """
-    # This is a comprehensive list based on English Profile and Cambridge English
-    # The data structure includes word, CEFR level, part of speech, and definition
-    
-    cefr_words = []
-    
-    # Since direct crawling might be blocked, we'll use a known dataset
-    # Oxford 3000 and 5000 words mapped to CEFR levels
     
-    print("Attempting to fetch CEFR vocabulary data...")
-    
-    # Try fetching from GitHub repositories with CEFR data
-    urls = [
-        "https://raw.githubusercontent.com/ghidinelli/english-words-by-level/master/cefr-vocabulary.json",
-        "https://raw.githubusercontent.com/eunices/oxford-5000-cefr/master/oxford5000.json"
-    ]
+    All sources are fetched concurrently over one pooled session; responses are
+    cached on disk and revalidated with ETag/Last-Modified (see cefr_crawler.py).
+    Returns normalized entries ({"word", "level", "pos", "definition"}) from
+    every source that answered (or had a cached copy).
+    """
+    sources = sources or DEFAULT_SOURCES
+    print(f"Attempting to fetch CEFR vocabulary data from {len(sources)} source(s)...")
     
-    for url in urls:
-        try:
-            print(f"Trying URL: {url}")
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"Successfully fetched data from {url}")
-                return data
-        except Exception as e:
-            print(f"Failed to fetch from {url}: {e}")
-            continue
+    started = time.perf_counter()
+    results = fetch_sources(sources, cache_dir=cache_dir, workers=workers, timeout=timeout)
+    print_report(results, time.perf_counter() - started)
     
-    return None
+    return [entry for result in results for entry in result.entries]
 
 def create_comprehensive_cefr_dataset():
     """
@@ -2427,20 +2415,39 @@ def save_to_csv(cefr_data, output_path):
     print(f"Total: {total_words} words")
 
 def main():
+    parser = argparse.ArgumentParser(description="Crawl CEFR word lists and build ENGLISH_CERF_WORDS.csv")
+    parser.add_argument("--source", action="append", default=None,
+                        help="Word list URL (JSON or CSV); repeatable, replaces the default sources")
+    parser.add_argument("--workers", type=int, default=4, help="Sources fetched in parallel")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--cache-dir", type=str, default=str(DEFAULT_CACHE_DIR), help="HTTP cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Always download in full, keep no cache")
+    parser.add_argument("--offline", action="store_true", help="Skip crawling, use the built-in dataset only")
+    args = parser.parse_args()
+    
     print("Starting CEFR vocabulary data crawling...")
     
     # Try to fetch from online sources first
-    online_data = crawl_cefr_from_englishprofile()
+    online_data = []
+    if not args.offline:
+        sources = [{"name": url.rsplit("/", 1)[-1], "url": url} for url in args.source] if args.source else None
+        online_data = crawl_cefr_from_englishprofile(
+            sources,
+            cache_dir=None if args.no_cache else Path(args.cache_dir),
+            workers=args.workers,
+            timeout=args.timeout,
+        )
+    
+    # Create comprehensive dataset
+    cefr_data = create_comprehensive_cefr_dataset()
     
     if online_data:
-        print("Successfully fetched data from online source")
-        # Process online data here if needed
+        print(f"Successfully fetched {len(online_data)} entries from online sources")
+        # Merge with the built-in list: one entry per (word, pos), lowest level wins
+        cefr_data = merge_cefr_data(cefr_data, online_data)
     else:
         print("Using comprehensive built-in dataset")
     
-    # Create comprehensive dataset
-    cefr_data = create_comprehensive_cefr_dataset()
-    
     # Define output path
     output_path = Path(__file__).parent.parent / 'datasets' / 'cefr' / 'ENGLISH_CERF_WORDS.csv'
     output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -2448,6 +2455,11 @@ def main():
     # Save to CSV
     save_to_csv(cefr_data, output_path)
     
+    # Compile the memory-mapped lookup file used at serving time (cefr_mmap.py)
+    from cefr_mmap import DEFAULT_MAPPED, compile_csv
+    header = compile_csv(output_path, output_path.with_name(DEFAULT_MAPPED.name))
+    print(f"Compiled lookup index: {header['keys']} keys ({header['lemmas']} lemmas)")
+    
     print("\n✅ CEFR data crawling completed successfully!")
     print(f"📁 Data saved to: {output_path}")
 
@@ -18,10 +18,20 @@ import os
 import re
 import argparse
 import hashlib
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datasets import load_dataset
-import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+from jsonl_shards import JsonlShards, ShardedJsonlWriter, external_shuffle
+from near_dedupe import NearDuplicateIndex
+from build_checkpoints import SourceCheckpoint, TaskCheckpoint
+from m2_corpus import find_m2_files, iter_m2_corpus
+from grammar_errors import RULES, ErrorInjector, split_quotas
+from cefr_lexicon import CefrLexicon
 import random
 
 # Configuration
@@ -35,6 +45,14 @@ BASE_TARGETS = {
     "dialogue": 4000,
 }
 
+# Task -> DatasetDownloader method building it
+TASK_BUILDERS = {
+    "fluency": "download_fluency_data",
+    "grammar": "download_grammar_data",
+    "vocabulary": "download_vocabulary_data",
+    "dialogue": "download_dialogue_data",
+}
+
 
 def normalize_text(text: str) -> str:
     if text is None:
@@ -58,15 +76,17 @@ def split_sentences(text: str) -> List[str]:
     return parts
 
 
-def pick_context(text: str, min_sents: int, max_sents: int) -> str:
+def pick_context(text: str, min_sents: int, max_sents: int, rng: Optional[random.Random] = None) -> str:
+    """Random window of min_sents..max_sents sentences (rng: module `random` by default)."""
+    rng = rng or random
     sents = split_sentences(text)
     if not sents:
         return ""
-    k = random.randint(max(1, min_sents), max(1, max_sents))
+    k = rng.randint(max(1, min_sents), max(1, max_sents))
     k = min(k, len(sents))
     start = 0
     if len(sents) > k:
-        start = random.randint(0, len(sents) - k)
+        start = rng.randint(0, len(sents) - k)
     return " ".join(sents[start : start + k]).strip()
 
 
@@ -80,46 +100,18 @@ def looks_english(text: str, max_non_ascii_ratio: float = 0.2) -> bool:
         return False
 
 
-def apply_m2_edits(sentence: str, edits: List[str]) -> str:
-    """Apply all M2 'A ' edits to a sentence and return corrected sentence.
-
-    This is a simplified applier (space-token based). Good enough to produce a full corrected string
-    and avoid the previous bug where 'corrected' was only a replacement fragment.
+def estimate_vocab_level(text: str) -> Tuple[str, str]:
     """
-    tokens = sentence.split()
-    parsed = []
-    for line in edits:
-        if not line.startswith("A "):
-            continue
-        try:
-            # A start end|||type|||correction|||...
-            head, rest = line[2:].split("|||", 1)
-            span = head.split()
-            start = int(span[0])
-            end = int(span[1])
-            parts = line.split("|||")
-            err_type = parts[1].strip() if len(parts) > 1 else "unknown"
-            corr = parts[2].strip() if len(parts) > 2 else ""
-            parsed.append((start, end, err_type, corr))
-        except Exception:
-            continue
-
-    # apply from right to left so offsets stay valid
-    parsed.sort(key=lambda x: (x[0], x[1]), reverse=True)
-    for start, end, _, corr in parsed:
-        start = max(0, min(start, len(tokens)))
-        end = max(0, min(end, len(tokens)))
-        if end < start:
-            start, end = end, start
-        if corr == "-NONE-" or corr == "":
-            repl = []
-        else:
-            repl = corr.split()
-        tokens[start:end] = repl
-    return " ".join(tokens).strip()
+    (CEFR level, method): the level (A1-C2) comes from the CEFR word list
+    ("lexicon"), or from the length heuristic ("length") if no word is rated.
+    """
+    level = CefrLexicon.default().estimate(text)
+    if level:
+        return level, "lexicon"
+    return _length_vocab_level(text), "length"
 
 
-def estimate_vocab_level(text: str) -> str:
+def _length_vocab_level(text: str) -> str:
     """Heuristic CEFR-ish level estimator (A2/B1/B2)."""
     words = re.findall(r"[A-Za-z']+", (text or "").lower())
     if not words:
@@ -145,6 +137,14 @@ class DatasetDownloader:
         dedupe_global: bool = False,
         allow_exceed: bool = False,
         min_input_chars: int = 5,
+        shard_size: int = 50_000,
+        shuffle_bucket_size: int = 100_000,
+        near_dup_threshold: float = 0.0,
+        resume: bool = False,
+        checkpoint_every: int = 500,
+        m2_workers: int = 0,
+        inject_workers: int = 0,
+        seed: int = 42,
     ):
         self.output_dir = output_dir
         self.output_dir.mkdir(exist_ok=True)  # Ensure folder exists
@@ -157,26 +157,127 @@ class DatasetDownloader:
         self.min_input_chars = max(1, int(min_input_chars))
         self._seen_by_task = {k: set() for k in targets.keys()}
         self._seen_global = set()
+        # Task builders may run in parallel threads; guards the dedupe sets and progress
+        self._lock = threading.Lock()
+        self.progress = {k: 0 for k in targets.keys()}
+        # MinHash-LSH near-duplicate indexes (0 = exact dedupe only); same seed so
+        # one signature works for the task index and the global one
+        self.near_dup_threshold = near_dup_threshold
+        self._near_by_task = {}
+        self._near_global = None
+        if near_dup_threshold > 0:
+            self._near_by_task = {k: NearDuplicateIndex(near_dup_threshold) for k in targets.keys()}
+            if dedupe_global:
+                self._near_global = NearDuplicateIndex(near_dup_threshold)
+        self.near_dup_dropped = {k: 0 for k in targets.keys()}
+        # Samples stream to compact JSONL shards instead of in-memory lists
+        self.shard_dir = self.output_dir / "shards"
+        self.shard_size = shard_size
+        self.shuffle_bucket_size = shuffle_bucket_size
+        # Per-source checkpoints (checkpoints/<task>.json) so a rerun resumes
+        self.checkpoint_dir = self.output_dir / "checkpoints"
+        self.resume = resume
+        self.checkpoint_every = checkpoint_every
+        self._checkpoints: Dict[str, TaskCheckpoint] = {}
+        self._writers: Dict[str, ShardedJsonlWriter] = {}
+        # Worker processes for the local M2 corpus (0 = one per CPU)
+        self.m2_workers = m2_workers or None
+        # Worker processes for synthetic error injection (0 = one per CPU)
+        self.inject_workers = inject_workers or None
+        self.seed = seed
+        self._rngs: Dict[str, random.Random] = {}
+
+    def _rng(self, task: str) -> random.Random:
+        """Seeded RNG of one task builder, so parallel builders stay reproducible."""
+        return self._rngs.setdefault(task, random.Random(f"{self.seed}:{task}"))
+
+    def _fingerprint(self, task: str) -> Dict:
+        """Settings a checkpoint is only valid for."""
+        return {
+            "target": self.targets.get(task),
+            "context_sentences": [self.min_context_sentences, self.max_context_sentences],
+            "dedupe_global": self.dedupe_global,
+            "allow_exceed": self.allow_exceed,
+            "min_input_chars": self.min_input_chars,
+            "near_dup_threshold": self.near_dup_threshold,
+        }
+
+    def _open_task(self, task: str):
+        """Checkpoint + shard writer of a task; on resume, replays kept samples into the dedupe state."""
+        checkpoint = TaskCheckpoint(
+            self.checkpoint_dir / f"{task}.json",
+            self._fingerprint(task),
+            resume=self.resume,
+            save_every=self.checkpoint_every,
+        )
+        writer = ShardedJsonlWriter(self.shard_dir, task, shard_size=self.shard_size, resume_count=checkpoint.samples)
+        checkpoint.attach(writer)
+        if len(writer):
+            for item in writer:
+                self._accept(task, item["input"], near=(item.get("metadata") or {}).get("source") != "synthetic")
+            print(f"↪️  [{task}] resuming with {len(writer):,} checkpointed samples")
+        self._checkpoints[task] = checkpoint
+        self._writers[task] = writer
+
+    def _task_writer(self, task: str) -> ShardedJsonlWriter:
+        if task not in self._writers:
+            self._open_task(task)
+        return self._writers[task]
+
+    def _source(self, task: str, name: str) -> SourceCheckpoint:
+        src = self._checkpoints[task].source(name)
+        if src.done:
+            print(f"\n⏭️  {name}: already complete ({src.count:,} samples), skipping")
+        return src
+
+    def _close_task_writer(self, data: ShardedJsonlWriter, task: str):
+        self._checkpoints[task].save(complete=True)
+        data.close()
+        print(f"\n✅ Total {task} samples: {len(data)}")
+        if self.near_dup_threshold > 0:
+            print(f"🔎 Near-duplicates dropped (Jaccard >= {self.near_dup_threshold}): {self.near_dup_dropped.get(task, 0)}")
+        print(f"💾 Saved to: {self.shard_dir}/{task}-*.jsonl ({len(data.paths)} shard(s))")
 
     def _dedupe_key(self, task: str, input_text: str) -> str:
         return stable_hash(f"{task}::{normalize_text(input_text)}")
 
-    def _add_sample(self, out_list: List[Dict], task: str, input_text: str, output: Dict, metadata: Dict) -> bool:
+    def _accept(self, task: str, input_text: str, near: bool = True) -> bool:
+        """Dedupe check-and-insert (exact, global, near-duplicate unless near=False); True if new."""
+        key = self._dedupe_key(task, input_text)
+        gk = stable_hash(normalize_text(input_text)) if self.dedupe_global else None
+        near_index = self._near_by_task.get(task) if near else None
+        # Signature outside the lock: it is the expensive part
+        signature = near_index.signature(input_text) if near_index is not None else None
+        # Check-and-insert must be atomic across task threads
+        with self._lock:
+            if key in self._seen_by_task.get(task, set()):
+                return False
+            if gk is not None and gk in self._seen_global:
+                return False
+            if signature is not None:
+                if near_index.contains(signature) or (
+                    self._near_global is not None and self._near_global.contains(signature)
+                ):
+                    self.near_dup_dropped[task] = self.near_dup_dropped.get(task, 0) + 1
+                    return False
+                near_index.insert(signature)
+                if self._near_global is not None:
+                    self._near_global.insert(signature)
+            if gk is not None:
+                self._seen_global.add(gk)
+            self._seen_by_task.setdefault(task, set()).add(key)
+            self.progress[task] = self.progress.get(task, 0) + 1
+        return True
+
+    def _add_sample(self, out_list: ShardedJsonlWriter, task: str, input_text: str, output: Dict, metadata: Dict) -> bool:
         input_text = (input_text or "").strip()
         if not input_text:
             return False
         if len(input_text) < self.min_input_chars:
             return False
-        key = self._dedupe_key(task, input_text)
-        if key in self._seen_by_task.get(task, set()):
+        # Templated synthetic rows are near-duplicates of each other by design: exact dedupe only
+        if not self._accept(task, input_text, near=(metadata or {}).get("source") != "synthetic"):
             return False
-        if self.dedupe_global:
-            gk = stable_hash(normalize_text(input_text))
-            if gk in self._seen_global:
-                return False
-            self._seen_global.add(gk)
-
-        self._seen_by_task.setdefault(task, set()).add(key)
         md = dict(metadata or {})
         # always keep original/raw text for traceability
         md.setdefault("raw_text", input_text)
@@ -188,7 +289,7 @@ class DatasetDownloader:
         })
         return True
         
-    def download_fluency_data(self) -> List[Dict]:
+    def download_fluency_data(self) -> ShardedJsonlWriter:
         """
         Download Fluency Scoring Dataset
         Target: 1,500 samples
@@ -197,6 +298,7 @@ class DatasetDownloader:
         - GLUE SST-2 (sentiment) - use as fluency proxy
         - Local wi_locness for learner text
         """
+        rng = self._rng("fluency")
         print("\n" + "="*70)
         print("📊 TASK 1: FLUENCY SCORING")
         print("="*70)
@@ -204,146 +306,153 @@ class DatasetDownloader:
         print(f"Target: {target:,} samples")
         print("Sources: CoLA + SST-2 + wi_locness")
         
-        fluency_data = []
+        fluency_data = self._task_writer("fluency")
         
         # Source 1: CoLA dataset (grammaticality judgments as fluency proxy)
-        try:
-            print("\n⏳ [1/3] Loading CoLA dataset...")
-            take = min(5000, max(1000, int(target * 0.6)))
-            cola_dataset = load_dataset("nyu-mll/glue", "cola", split=f"train[:{take}]")
+        src = self._source("fluency", "CoLA")
+        if not src.done:
+            try:
+                print("\n⏳ [1/3] Loading CoLA dataset...")
+                take = min(5000, max(1000, int(target * 0.6)))
+                cola_dataset = load_dataset("nyu-mll/glue", "cola", split=f"train[:{take}]")
             
-            for idx, item in enumerate(cola_dataset):
-                sentence = item['sentence']
-                label = item['label']  # 0 = ungrammatical, 1 = grammatical
+                for idx, item in src.iterate(cola_dataset):
+                    sentence = item['sentence']
+                    label = item['label']  # 0 = ungrammatical, 1 = grammatical
                 
-                # Map grammaticality to fluency score
-                if label == 1:
-                    fluency_score = round(random.uniform(0.75, 0.95), 2)
-                    reasoning = "Grammatically correct with natural structure"
-                else:
-                    fluency_score = round(random.uniform(0.30, 0.65), 2)
-                    reasoning = "Contains grammatical issues affecting fluency"
+                    # Map grammaticality to fluency score
+                    if label == 1:
+                        fluency_score = round(rng.uniform(0.75, 0.95), 2)
+                        reasoning = "Grammatically correct with natural structure"
+                    else:
+                        fluency_score = round(rng.uniform(0.30, 0.65), 2)
+                        reasoning = "Contains grammatical issues affecting fluency"
                 
-                self._add_sample(
-                    fluency_data,
-                    "fluency",
-                    sentence,
-                    {"fluency_score": fluency_score, "reasoning": reasoning},
-                    {"source": "CoLA", "grammatical": bool(label), "index": idx, "raw_text": sentence},
-                )
+                    if self._add_sample(
+                        fluency_data,
+                        "fluency",
+                        sentence,
+                        {"fluency_score": fluency_score, "reasoning": reasoning},
+                        {"source": "CoLA", "grammatical": bool(label), "index": idx, "raw_text": sentence},
+                    ):
+                        src.accepted()
             
-            print(f"  ✅ Loaded {len(fluency_data)} samples from CoLA")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples from CoLA")
             
-        except Exception as e:
-            print(f"  ⚠️  Error loading CoLA: {e}")
+            except Exception as e:
+                print(f"  ⚠️  Error loading CoLA: {e}")
         
         # Source 2: SST-2 sentiment dataset (use well-formed sentences as high fluency)
-        try:
-            print("\n⏳ [2/3] Loading SST-2 dataset...")
-            take = min(5000, max(300, int(target * 0.2)))
-            sst_dataset = load_dataset("nyu-mll/glue", "sst2", split=f"train[:{take}]")
+        src = self._source("fluency", "SST-2")
+        if not src.done:
+            try:
+                print("\n⏳ [2/3] Loading SST-2 dataset...")
+                take = min(5000, max(300, int(target * 0.2)))
+                sst_dataset = load_dataset("nyu-mll/glue", "sst2", split=f"train[:{take}]")
             
-            for idx, item in enumerate(sst_dataset):
-                sentence = item['sentence']
+                for idx, item in src.iterate(sst_dataset):
+                    sentence = item['sentence']
                 
-                # SST-2 sentences are well-formed, so assign high fluency
-                fluency_score = round(random.uniform(0.80, 0.95), 2)
-                reasoning = "Clear and fluent expression with natural word flow"
+                    # SST-2 sentences are well-formed, so assign high fluency
+                    fluency_score = round(rng.uniform(0.80, 0.95), 2)
+                    reasoning = "Clear and fluent expression with natural word flow"
                 
-                self._add_sample(
-                    fluency_data,
-                    "fluency",
-                    sentence,
-                    {"fluency_score": fluency_score, "reasoning": reasoning},
-                    {"source": "SST-2", "index": idx, "raw_text": sentence},
-                )
+                    if self._add_sample(
+                        fluency_data,
+                        "fluency",
+                        sentence,
+                        {"fluency_score": fluency_score, "reasoning": reasoning},
+                        {"source": "SST-2", "index": idx, "raw_text": sentence},
+                    ):
+                        src.accepted()
             
-            print(f"  ✅ Loaded {len(sst_dataset)} samples from SST-2")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples from SST-2")
             
-        except Exception as e:
-            print(f"  ⚠️  Error loading SST-2: {e}")
+            except Exception as e:
+                print(f"  ⚠️  Error loading SST-2: {e}")
         
         # Source 3: Use local wi_locness learner corpus for low-fluency examples
-        try:
-            print("\n⏳ [3/3] Loading wi_locness for learner text...")
-            local_path = Path("../datasets/wi+locness/m2")
-            if local_path.exists():
-                m2_files = list(local_path.glob("*.dev.*.m2"))[:1]  # Use dev set
-                
-                for m2_file in m2_files:
-                    with open(m2_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                    
-                    current_sent = None
-                    error_count = 0
-                    
-                    for line in lines[:200]:  # Limit to 200
-                        line = line.strip()
-                        if line.startswith('S '):
-                            if current_sent and error_count > 0:
-                                # Calculate fluency based on error count
-                                fluency_score = max(0.30, 0.90 - (error_count * 0.15))
-                                fluency_score = round(fluency_score, 2)
-                                
-                                self._add_sample(
-                                    fluency_data,
-                                    "fluency",
-                                    current_sent,
-                                    {
-                                        "fluency_score": fluency_score,
-                                        "reasoning": f"Learner text with {error_count} identified errors",
-                                    },
-                                    {
-                                        "source": "wi_locness_learner",
-                                        "error_count": error_count,
-                                        "raw_text": current_sent,
-                                    },
-                                )
-                            
-                            current_sent = line[2:]
-                            error_count = 0
-                        elif line.startswith('A ') and current_sent:
-                            error_count += 1
-                
-                print(f"  ✅ Loaded {sum(1 for x in fluency_data if x['metadata']['source']=='wi_locness_learner')} samples from wi_locness")
-            else:
-                print(f"  ⚠️  Local wi_locness not found")
+        src = self._source("fluency", "wi_locness_learner")
+        if not src.done:
+            try:
+                print("\n⏳ [3/3] Loading wi_locness for learner text...")
+                local_path = Path("../datasets/wi+locness/m2")
+                if local_path.exists():
+                    # Learner sentences from the dev set; error count = first annotator's edits
+                    max_learner = max(50, target // 5)
+                    records = iter_m2_corpus(find_m2_files(local_path, "dev"), self.m2_workers, annotators="first")
+                    for _, rec in src.iterate(records):
+                        if src.count >= max_learner:
+                            break
+                        error_count = len(rec.edit_types)
+                        if error_count == 0:
+                            continue
+                        # Calculate fluency based on error count
+                        fluency_score = max(0.30, 0.90 - (error_count * 0.15))
+                        fluency_score = round(fluency_score, 2)
+
+                        if self._add_sample(
+                            fluency_data,
+                            "fluency",
+                            rec.source,
+                            {
+                                "fluency_score": fluency_score,
+                                "reasoning": f"Learner text with {error_count} identified errors",
+                            },
+                            {
+                                "source": "wi_locness_learner",
+                                "error_count": error_count,
+                                "raw_text": rec.source,
+                            },
+                        ):
+                            src.accepted()
+
+                    src.finish()
+                    print(f"  ✅ Loaded {src.count} samples from wi_locness")
+                else:
+                    print(f"  ⚠️  Local wi_locness not found")
                 
-        except Exception as e:
-            print(f"  ⚠️  Error loading wi_locness: {e}")
+            except Exception as e:
+                print(f"  ⚠️  Error loading wi_locness: {e}")
         
         # Fill remaining with synthetic if needed
         # Add real-text passages for longer context diversity (WikiText)
-        try:
-            if len(fluency_data) < target:
-                print("\n⏳ [extra] Loading WikiText for longer-context fluency...")
-                wikitext = load_dataset("wikitext", "wikitext-103-v1", split="train", streaming=True)
-                count = 0
-                for idx, item in enumerate(wikitext):
-                    if len(fluency_data) >= target:
-                        break
-                    text = (item.get("text") or "").strip()
-                    if len(text) < 80 or not looks_english(text, 0.15):
-                        continue
-                    ctx = pick_context(text, self.min_context_sentences, self.max_context_sentences)
-                    if len(ctx.split()) < 8:
-                        continue
-                    fluency_score = round(random.uniform(0.82, 0.97), 2)
-                    reasoning = "Real-world text snippet; generally fluent"
-                    if self._add_sample(
-                        fluency_data,
-                        "fluency",
-                        ctx,
-                        {"fluency_score": fluency_score, "reasoning": reasoning},
-                        {"source": "WikiText", "index": idx, "raw_text": text, "context_sentences": len(split_sentences(ctx))},
-                    ):
-                        count += 1
-                    if count >= max(500, int(target * 0.2)):
-                        # don't overdo this source
-                        break
-                print(f"  ✅ Added {count} samples from WikiText")
-        except Exception as e:
-            print(f"  ⚠️  Error loading WikiText: {e}")
+        src = self._source("fluency", "WikiText")
+        if not src.done:
+            try:
+                if len(fluency_data) < target:
+                    print("\n⏳ [extra] Loading WikiText for longer-context fluency...")
+                    wikitext = load_dataset("wikitext", "wikitext-103-v1", split="train", streaming=True)
+                    count = src.count
+                    for idx, item in src.iterate(wikitext):
+                        if len(fluency_data) >= target:
+                            break
+                        text = (item.get("text") or "").strip()
+                        if len(text) < 80 or not looks_english(text, 0.15):
+                            continue
+                        ctx = pick_context(text, self.min_context_sentences, self.max_context_sentences, rng=rng)
+                        if len(ctx.split()) < 8:
+                            continue
+                        fluency_score = round(rng.uniform(0.82, 0.97), 2)
+                        reasoning = "Real-world text snippet; generally fluent"
+                        if self._add_sample(
+                            fluency_data,
+                            "fluency",
+                            ctx,
+                            {"fluency_score": fluency_score, "reasoning": reasoning},
+                            {"source": "WikiText", "index": idx, "raw_text": text, "context_sentences": len(split_sentences(ctx))},
+                        ):
+                            src.accepted()
+                            count += 1
+                        if count >= max(500, int(target * 0.2)):
+                            # don't overdo this source
+                            break
+                    src.finish()
+                    print(f"  ✅ Added {count} samples from WikiText")
+            except Exception as e:
+                print(f"  ⚠️  Error loading WikiText: {e}")
 
         remaining = max(0, target - len(fluency_data))
         if remaining > 0:
@@ -352,13 +461,7 @@ class DatasetDownloader:
             for s in synthetic:
                 self._add_sample(fluency_data, "fluency", s["input"], s["output"], s.get("metadata", {}))
         
-        # Save to JSON
-        output_file = self.output_dir / "fluency_data.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(fluency_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n✅ Total fluency samples: {len(fluency_data)}")
-        print(f"💾 Saved to: {output_file}")
+        self._close_task_writer(fluency_data, "fluency")
         
         # Show source distribution
         sources = {}
@@ -387,6 +490,7 @@ class DatasetDownloader:
     
     def _create_fallback_fluency_data_partial(self, count: int) -> List[Dict]:
         """Create specific number of synthetic fluency samples"""
+        rng = self._rng("fluency")
         # more diverse synthetic pool to reduce duplicates
         subjects = ["I", "You", "He", "She", "We", "They", "My friend", "The student", "My teacher"]
         verbs = ["go", "study", "like", "want", "need", "enjoy", "visit", "watch", "play", "read"]
@@ -400,21 +504,21 @@ class DatasetDownloader:
         
         fluency_data = []
         for i in range(count):
-            sub = random.choice(subjects)
-            sub2 = random.choice([s for s in subjects if s != sub])
-            verb = random.choice(verbs)
-            obj = random.choice(objects)
-            time = random.choice(times)
-            template, reason = random.choice(patterns)
+            sub = rng.choice(subjects)
+            sub2 = rng.choice([s for s in subjects if s != sub])
+            verb = rng.choice(verbs)
+            obj = rng.choice(objects)
+            time = rng.choice(times)
+            template, reason = rng.choice(patterns)
             sent = template.format(subj=sub, subj2=sub2, verb=verb, obj=obj, time=time).strip()
             # inject small mistakes for lower scores sometimes
-            if random.random() < 0.35:
+            if rng.random() < 0.35:
                 sent = sent.replace("yesterday", "yesterday")
-                if "go" in sent and random.random() < 0.5:
+                if "go" in sent and rng.random() < 0.5:
                     sent = sent.replace(" go ", " goes ")
-                if sent.lower().startswith("he ") and random.random() < 0.5:
+                if sent.lower().startswith("he ") and rng.random() < 0.5:
                     sent = sent.replace("He ", "He ").replace("want", "want")
-            score = round(random.uniform(0.55, 0.95), 2)
+            score = round(rng.uniform(0.55, 0.95), 2)
             fluency_data.append({
                 "task": "fluency",
                 "input": sent,
@@ -424,7 +528,7 @@ class DatasetDownloader:
         
         return fluency_data
     
-    def download_grammar_data(self) -> List[Dict]:
+    def download_grammar_data(self) -> ShardedJsonlWriter:
         """
         Download Grammar Correction Dataset
         Target: 7,000 samples (expanded)
@@ -434,6 +538,7 @@ class DatasetDownloader:
         - FCE corpus: 2,000 samples
         - Synthetic errors: 1,500 samples
         """
+        rng = self._rng("grammar")
         print("\n" + "="*70)
         print("📊 TASK 2: GRAMMAR CORRECTION")
         print("="*70)
@@ -441,56 +546,47 @@ class DatasetDownloader:
         print(f"Target: {target:,} samples")
         print("Sources: wi_locness (local) + CoNLL-2014 + FCE + Synthetic")
         
-        grammar_data = []
+        grammar_data = self._task_writer("grammar")
         
         # Source 1: Local wi_locness dataset
-        print("\n⏳ Loading wi_locness (local)...")
-        try:
-            local_path = Path("../datasets/wi+locness/m2")
-            if local_path.exists():
-                m2_files = list(local_path.glob("*.train.*.m2"))
-                for m2_file in m2_files[:3]:  # ABC.train files
-                    print(f"  Reading: {m2_file.name}")
-                    with open(m2_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        
-                    # Parse M2 format by sentence blocks
-                    current_sent = None
-                    current_edits = []
-                    for raw_line in lines:
-                        line = raw_line.rstrip("\n")
-                        if line.startswith('S '):
-                            current_sent = line[2:].strip()
-                            current_edits = []
-                        elif line.startswith('A ') and current_sent:
-                            current_edits.append(line.strip())
-                        elif line.strip() == "" and current_sent is not None:
-                            corrected_full = apply_m2_edits(current_sent, current_edits)
-                            if corrected_full and corrected_full != current_sent:
-                                self._add_sample(
-                                    grammar_data,
-                                    "grammar",
-                                    current_sent,
-                                    {
-                                        "corrected": corrected_full,
-                                        "explanation": "Learner sentence corrected (M2 edits applied)",
-                                    },
-                                    {"source": "wi_locness", "file": m2_file.name, "raw_text": current_sent},
-                                )
-                            current_sent = None
-                            current_edits = []
+        src = self._source("grammar", "wi_locness")
+        if not src.done:
+            print("\n⏳ Loading wi_locness (local)...")
+            try:
+                local_path = Path("../datasets/wi+locness/m2")
+                if local_path.exists():
+                    # All train files, parsed in worker processes; one reference per sentence
+                    m2_files = find_m2_files(local_path, "train")
+                    print(f"  Reading: {', '.join(f.name for f in m2_files)}")
+                    records = iter_m2_corpus(m2_files, self.m2_workers, annotators="first")
+                    for _, rec in src.iterate(records):
+                        if rec.edit_types and rec.corrected != rec.source:
+                            if self._add_sample(
+                                grammar_data,
+                                "grammar",
+                                rec.source,
+                                {
+                                    "corrected": rec.corrected,
+                                    "explanation": "Learner sentence corrected (M2 edits applied)",
+                                },
+                                {
+                                    "source": "wi_locness",
+                                    "file": rec.file,
+                                    "edit_types": list(rec.edit_types),
+                                    "raw_text": rec.source,
+                                },
+                            ):
+                                src.accepted()
 
-                            if (not self.allow_exceed) and len(grammar_data) >= target:
-                                break
+                        if (not self.allow_exceed) and len(grammar_data) >= target:
+                            break
 
-                    if (not self.allow_exceed) and len(grammar_data) >= target:
-                        break
-                
-                print(f"  ✅ Loaded from local: {len(grammar_data)} samples")
-            else:
-                print(f"  ⚠️  Local wi_locness not found at {local_path}")
-        except Exception as e:
-            print(f"  ❌ Error loading local wi_locness: {e}")
+                    src.finish()
+                    print(f"  ✅ Loaded from local: {src.count} samples")
+                else:
+                    print(f"  ⚠️  Local wi_locness not found at {local_path}")
+            except Exception as e:
+                print(f"  ❌ Error loading local wi_locness: {e}")
         
         # Source 2: CoNLL-2014 - DISABLED (deprecated dataset scripts)
         # print("\n⏳ Loading CoNLL-2014...")
@@ -501,81 +597,81 @@ class DatasetDownloader:
         # Dataset scripts no longer supported by HuggingFace
         
         # Source 2: Synthetic grammar errors (to fill to 7000)
-        print("\n⏳ Generating synthetic grammar errors (diverse, real-text based)...")
-        synthetic_target = max(0, target - len(grammar_data)) if not self.allow_exceed else 0
-        if synthetic_target > 0:
-            # stream real text and inject errors to create diverse incorrect inputs
-            error_types = ["DET", "PREP", "SVA", "TENSE", "PLURAL"]
-            count = 0
-            try:
-                stream = load_dataset("wikitext", "wikitext-103-v1", split="train", streaming=True)
-                for idx, item in enumerate(stream):
-                    if count >= synthetic_target:
-                        break
-                    raw = (item.get("text") or "").strip()
-                    if len(raw) < 120 or not looks_english(raw, 0.15):
-                        continue
-                    base = pick_context(raw, max(1, self.min_context_sentences), max(1, self.max_context_sentences))
-                    if len(base.split()) < 10:
-                        continue
-                    # choose an error injection
-                    et = random.choice(error_types)
-                    incorrect = base
-                    explanation = ""
-                    if et == "DET":
-                        incorrect = re.sub(r"\b(a|an|the)\b\s+", "", base, count=1, flags=re.IGNORECASE)
-                        explanation = "Article (a/an/the) missing"
-                    elif et == "PREP":
-                        incorrect = re.sub(r"\b(in|on|at|to|for|with)\b", "in", base, count=1, flags=re.IGNORECASE)
-                        explanation = "Preposition misuse"
-                    elif et == "SVA":
-                        incorrect = re.sub(r"\b(he|she|it)\s+have\b", r"\1 have", base, flags=re.IGNORECASE)
-                        incorrect = re.sub(r"\b(he|she|it)\s+has\b", r"\1 have", incorrect, flags=re.IGNORECASE)
-                        explanation = "Subject-verb agreement error"
-                    elif et == "TENSE":
-                        incorrect = re.sub(r"\bwent\b", "go", base, flags=re.IGNORECASE)
-                        incorrect = re.sub(r"\bwas\b", "is", incorrect, flags=re.IGNORECASE)
-                        explanation = "Tense error"
-                    elif et == "PLURAL":
-                        incorrect = re.sub(r"\b(children|people|men|women)\b", "child", base, flags=re.IGNORECASE)
-                        explanation = "Number/pluralization error"
+        src = self._source("grammar", "synthetic")
+        if not src.done:
+            print("\n⏳ Generating synthetic grammar errors (diverse, real-text based)...")
+            synthetic_target = max(0, target - len(grammar_data)) if not self.allow_exceed else 0
+            if synthetic_target > 0:
+                # stream real text; every rule is tried per sentence and the type
+                # furthest below its quota wins, so matching sentences are never wasted
+                injector = ErrorInjector(
+                    split_quotas(src.count + synthetic_target, list(RULES)),
+                    workers=self.inject_workers,
+                    seed=self.seed,
+                )
+                if src.count:
+                    # Resume: per-type counts of the synthetic samples already in the shards
+                    for item in grammar_data:
+                        meta = item.get("metadata", {})
+                        if meta.get("source") == "synthetic" and meta.get("error_type") in injector.counts:
+                            injector.commit(meta["error_type"])
 
-                    incorrect = incorrect.strip()
-                    if not incorrect or incorrect == base or len(incorrect.split()) < 6:
-                        continue
+                def bases():
+                    for idx, item in src.iterate(stream):
+                        raw = (item.get("text") or "").strip()
+                        if len(raw) < 120 or not looks_english(raw, 0.15):
+                            continue
+                        base = pick_context(raw, max(1, self.min_context_sentences), max(1, self.max_context_sentences), rng=rng)
+                        if len(base.split()) < 10:
+                            continue
+                        yield idx, raw, base
 
-                    if self._add_sample(
-                        grammar_data,
-                        "grammar",
-                        incorrect,
-                        {"corrected": base, "explanation": explanation or f"Synthetic error: {et}"},
-                        {"source": "synthetic", "index": idx, "error_type": et, "raw_text": raw, "context_sentences": len(split_sentences(base))},
-                    ):
-                        count += 1
-                print(f"  ✅ Generated synthetic: {count} samples")
-            except Exception as e:
-                print(f"  ⚠️  Error generating real-text synthetic grammar: {e}")
-        
-        # Save to JSON
-        output_file = self.output_dir / "grammar_data.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(grammar_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n✅ Total grammar samples: {len(grammar_data)}")
-        print(f"💾 Saved to: {output_file}")
+                try:
+                    stream = load_dataset("wikitext", "wikitext-103-v1", split="train", streaming=True)
+                    # Note: batches are read ahead of the checkpoint, so a crash skips (never repeats) a few texts
+                    for (idx, raw, base), cands in injector.map(bases(), key=lambda x: x[2]):
+                        if injector.done:
+                            break
+                        choice = injector.choose(cands)
+                        if choice is None:
+                            continue
+                        et, incorrect = choice
+                        if len(incorrect.split()) < 6:
+                            continue
+
+                        if self._add_sample(
+                            grammar_data,
+                            "grammar",
+                            incorrect,
+                            {"corrected": base, "explanation": injector.explanations[et]},
+                            {"source": "synthetic", "index": idx, "error_type": et, "raw_text": raw, "context_sentences": len(split_sentences(base))},
+                        ):
+                            injector.commit(et)
+                            src.accepted()
+                    src.finish()
+                    print(f"  ✅ Generated synthetic: {src.count} samples "
+                          f"({injector.texts_seen:,} texts, {injector.texts_without_match:,} without a matching rule, "
+                          f"{injector.texts_quota_full:,} only matching full quotas)")
+                    print("     " + ", ".join(f"{k}={v}" for k, v in injector.counts.items()))
+                except Exception as e:
+                    print(f"  ⚠️  Error generating real-text synthetic grammar: {e}")
+        
+        self._close_task_writer(grammar_data, "grammar")
         
         # Show samples by source
         print("\n📋 Sample data by source:")
         sources = {}
+        counts = {}
         for item in grammar_data:
             src = item['metadata']['source']
+            counts[src] = counts.get(src, 0) + 1
             if src not in sources:
                 sources[src] = []
             if len(sources[src]) < 2:
                 sources[src].append(item)
         
         for src, samples in sources.items():
-            print(f"\n{src.upper()} ({sum(1 for x in grammar_data if x['metadata']['source'] == src)} samples):")
+            print(f"\n{src.upper()} ({counts[src]} samples):")
             for i, sample in enumerate(samples):
                 print(f"  {i+1}. Input: {sample['input'][:60]}...")
                 print(f"     Corrected: {sample['output']['corrected'][:60]}...")
@@ -584,7 +680,7 @@ class DatasetDownloader:
         self.stats['grammar'] = len(grammar_data)
         return grammar_data
     
-    def download_vocabulary_data(self) -> List[Dict]:
+    def download_vocabulary_data(self) -> ShardedJsonlWriter:
         """
         Download Vocabulary Classification Dataset
         Target: 2,500 samples
@@ -593,6 +689,7 @@ class DatasetDownloader:
         - News articles (complex = B2)
         - SNLI dataset (various complexity levels)
         """
+        rng = self._rng("vocabulary")
         print("\n" + "="*70)
         print("📊 TASK 3: VOCABULARY CLASSIFICATION")
         print("="*70)
@@ -600,7 +697,7 @@ class DatasetDownloader:
         print(f"Target: {target:,} samples")
         print("Sources: Simple Wikipedia + SNLI + News")
         
-        vocab_data = []
+        vocab_data = self._task_writer("vocabulary")
 
         def add_from_wikitext(max_to_add: int):
             """Fallback real-text source when wikipedia simple isn't available."""
@@ -608,109 +705,124 @@ class DatasetDownloader:
                 print("\n⏳ [fallback] Loading WikiText for vocabulary passages...")
                 stream = load_dataset("wikitext", "wikitext-103-v1", split="train", streaming=True)
                 added = 0
-                for idx, item in enumerate(stream):
+                # Shared offset across fallback calls: later calls continue the stream
+                src = self._checkpoints["vocabulary"].source("WikiText")
+                for idx, item in src.iterate(stream):
                     if added >= max_to_add or len(vocab_data) >= target:
                         break
                     raw = (item.get("text") or "").strip()
                     if len(raw) < 120 or not looks_english(raw, 0.15):
                         continue
-                    ctx = pick_context(raw, self.min_context_sentences, self.max_context_sentences)
+                    ctx = pick_context(raw, self.min_context_sentences, self.max_context_sentences, rng=rng)
                     if len(ctx.split()) < 12:
                         continue
-                    level = estimate_vocab_level(ctx)
+                    level, method = estimate_vocab_level(ctx)
                     if self._add_sample(
                         vocab_data,
                         "vocabulary",
                         ctx,
-                        {"level": level, "key_words": f"Real-world text (WikiText); heuristic level={level}"},
+                        {"level": level, "key_words": f"Real-world text (WikiText); {method} level={level}"},
                         {"source": "WikiText", "index": idx, "raw_text": raw, "context_sentences": len(split_sentences(ctx))},
                     ):
                         added += 1
+                        src.accepted()
                 print(f"  ✅ Added {added} samples from WikiText")
             except Exception as e:
                 print(f"  ⚠️  Error loading WikiText for vocabulary: {e}")
         
         # Source 1: Simple Wikipedia (A2-B1 level)
-        try:
-            print("\n⏳ [1/3] Loading Simple Wikipedia...")
-            take = min(8000, max(800, int(target * 0.5)))
-            wiki_dataset = load_dataset("wikipedia", "20220301.simple", split=f"train[:{take}]")
+        src = self._source("vocabulary", "Simple Wikipedia")
+        if not src.done:
+            try:
+                print("\n⏳ [1/3] Loading Simple Wikipedia...")
+                take = min(8000, max(800, int(target * 0.5)))
+                wiki_dataset = load_dataset("wikipedia", "20220301.simple", split=f"train[:{take}]")
             
-            for idx, item in enumerate(wiki_dataset):
-                text = item['text']
-                ctx = pick_context(text, self.min_context_sentences, self.max_context_sentences)
-                if len(ctx.split()) > 8:
-                    level = estimate_vocab_level(ctx)
-                    self._add_sample(
-                        vocab_data,
-                        "vocabulary",
-                        ctx,
-                        {"level": level, "key_words": f"Real-world text; heuristic level={level}"},
-                        {"source": "Simple Wikipedia", "index": idx, "raw_text": text, "context_sentences": len(split_sentences(ctx))},
-                    )
+                for idx, item in src.iterate(wiki_dataset):
+                    text = item['text']
+                    ctx = pick_context(text, self.min_context_sentences, self.max_context_sentences, rng=rng)
+                    if len(ctx.split()) > 8:
+                        level, method = estimate_vocab_level(ctx)
+                        if self._add_sample(
+                            vocab_data,
+                            "vocabulary",
+                            ctx,
+                            {"level": level, "key_words": f"Real-world text; {method} level={level}"},
+                            {"source": "Simple Wikipedia", "index": idx, "raw_text": text, "context_sentences": len(split_sentences(ctx))},
+                        ):
+                            src.accepted()
             
-            print(f"  ✅ Loaded {sum(1 for x in vocab_data if x['metadata']['source']=='Simple Wikipedia')} samples")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples")
             
-        except Exception as e:
-            print(f"  ⚠️  Error loading Simple Wikipedia: {e}")
-            # Fallback to a supported dataset for real passages
-            add_from_wikitext(max_to_add=max(500, int(target * 0.4)))
+            except Exception as e:
+                print(f"  ⚠️  Error loading Simple Wikipedia: {e}")
+                # Fallback to a supported dataset for real passages
+                add_from_wikitext(max_to_add=max(500, int(target * 0.4)))
         
         # Source 2: SNLI dataset (natural language inference - varied complexity)
-        try:
-            print("\n⏳ [2/3] Loading SNLI dataset...")
-            take = min(20000, max(2510, int(target * 0.7)))
-            snli_dataset = load_dataset("snli", split=f"train[:{take}]")
+        src = self._source("vocabulary", "SNLI")
+        if not src.done:
+            try:
+                print("\n⏳ [2/3] Loading SNLI dataset...")
+                take = min(20000, max(2510, int(target * 0.7)))
+                snli_dataset = load_dataset("snli", split=f"train[:{take}]")
             
-            for idx, item in enumerate(snli_dataset):
-                if len(vocab_data) >= target:
-                    break
-                premise = item['premise']
-                if len(premise.split()) > 6:
-                    level = estimate_vocab_level(premise)
-                    self._add_sample(
-                        vocab_data,
-                        "vocabulary",
-                        premise,
-                        {"level": level, "key_words": f"Caption-like text; heuristic level={level}"},
-                        {"source": "SNLI", "index": idx, "word_count": len(premise.split()), "raw_text": premise},
-                    )
+                for idx, item in src.iterate(snli_dataset):
+                    if len(vocab_data) >= target:
+                        break
+                    premise = item['premise']
+                    if len(premise.split()) > 6:
+                        level, method = estimate_vocab_level(premise)
+                        if self._add_sample(
+                            vocab_data,
+                            "vocabulary",
+                            premise,
+                            {"level": level, "key_words": f"Caption-like text; {method} level={level}"},
+                            {"source": "SNLI", "index": idx, "word_count": len(premise.split()), "raw_text": premise},
+                        ):
+                            src.accepted()
                 
             
-            print(f"  ✅ Loaded {sum(1 for x in vocab_data if x['metadata']['source']=='SNLI')} samples")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples")
             
-        except Exception as e:
-            print(f"  ❌ Error loading SNLI: {e}")
+            except Exception as e:
+                print(f"  ❌ Error loading SNLI: {e}")
         
         # Add a "real text" news-like source for B2-ish variety (AG News)
-        try:
-            if len(vocab_data) < target:
-                print("\n⏳ [3/3] Loading AG News for longer contexts...")
-                ag = load_dataset("ag_news", split="train", streaming=True)
-                count = 0
-                for idx, item in enumerate(ag):
-                    if len(vocab_data) >= target:
-                        break
-                    text = (item.get("text") or "").strip()
-                    if len(text) < 80 or not looks_english(text, 0.1):
-                        continue
-                    ctx = pick_context(text, max(1, self.min_context_sentences), max(1, self.max_context_sentences))
-                    if len(ctx.split()) < 12:
-                        continue
-                    level = "B2" if estimate_vocab_level(ctx) in ("B1", "B2") else "B1"
-                    if self._add_sample(
-                        vocab_data,
-                        "vocabulary",
-                        ctx,
-                        {"level": level, "key_words": "News-like text (AG News)"},
-                        {"source": "AG News", "index": idx, "raw_text": text, "context_sentences": len(split_sentences(ctx))},
-                    ):
-                        count += 1
-                    if count >= max(300, int(target * 0.2)):
-                        break
-                print(f"  ✅ Added {count} samples from AG News")
-        except Exception as e:
-            print(f"  ⚠️  Error loading AG News: {e}")
+        src = self._source("vocabulary", "AG News")
+        if not src.done:
+            try:
+                if len(vocab_data) < target:
+                    print("\n⏳ [3/3] Loading AG News for longer contexts...")
+                    ag = load_dataset("ag_news", split="train", streaming=True)
+                    count = src.count
+                    for idx, item in src.iterate(ag):
+                        if len(vocab_data) >= target:
+                            break
+                        text = (item.get("text") or "").strip()
+                        if len(text) < 80 or not looks_english(text, 0.1):
+                            continue
+                        ctx = pick_context(text, max(1, self.min_context_sentences), max(1, self.max_context_sentences), rng=rng)
+                        if len(ctx.split()) < 12:
+                            continue
+                        level = max(estimate_vocab_level(ctx)[0], "B1")  # News text is at least B1
+                        if self._add_sample(
+                            vocab_data,
+                            "vocabulary",
+                            ctx,
+                            {"level": level, "key_words": "News-like text (AG News)"},
+                            {"source": "AG News", "index": idx, "raw_text": text, "context_sentences": len(split_sentences(ctx))},
+                        ):
+                            src.accepted()
+                            count += 1
+                        if count >= max(300, int(target * 0.2)):
+                            break
+                    src.finish()
+                    print(f"  ✅ Added {count} samples from AG News")
+            except Exception as e:
+                print(f"  ⚠️  Error loading AG News: {e}")
 
         # If still short, create synthetic
         if len(vocab_data) < target:
@@ -733,19 +845,14 @@ class DatasetDownloader:
                     if len(vocab_data) == before:
                         break
         
-        print(f"\n✅ Total vocabulary samples: {len(vocab_data)}")
-        
-        # Save to JSON
-        output_file = self.output_dir / "vocabulary_data.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(vocab_data, f, ensure_ascii=False, indent=2)
-        print(f"💾 Saved to: {output_file}")
+        self._close_task_writer(vocab_data, "vocabulary")
         
         self.stats['vocabulary'] = len(vocab_data)
         return vocab_data
     
     def _create_fallback_vocabulary_data_partial(self, count: int) -> List[Dict]:
         """Create specific number of synthetic vocabulary samples"""
+        rng = self._rng("vocabulary")
         # Diverse templated sentences so dedupe doesn't collapse to ~10 rows
         a2_verbs = ["like", "want", "need", "have", "go", "play", "eat", "watch", "read"]
         a2_nouns = ["apples", "music", "school", "a book", "a movie", "my family", "the park", "coffee"]
@@ -757,16 +864,16 @@ class DatasetDownloader:
         
         vocab_data = []
         for i in range(count):
-            r = random.random()
+            r = rng.random()
             if r < 0.34:
                 level = "A2"
-                sentence = f"I {random.choice(a2_verbs)} {random.choice(a2_nouns)} {random.choice(['today','every day','on weekends'])}."
+                sentence = f"I {rng.choice(a2_verbs)} {rng.choice(a2_nouns)} {rng.choice(['today','every day','on weekends'])}."
             elif r < 0.67:
                 level = "B1"
-                sentence = f"We should {random.choice(b1_verbs)} {random.choice(b1_nouns)} {random.choice(connectors)} it is important."
+                sentence = f"We should {rng.choice(b1_verbs)} {rng.choice(b1_nouns)} {rng.choice(connectors)} it is important."
             else:
                 level = "B2"
-                sentence = f"They will {random.choice(b2_verbs)} {random.choice(b2_nouns)} {random.choice(connectors)} the situation changes."
+                sentence = f"They will {rng.choice(b2_verbs)} {rng.choice(b2_nouns)} {rng.choice(connectors)} the situation changes."
 
             words = f"Synthetic template; intended level={level}"
             vocab_data.append({
@@ -809,7 +916,7 @@ class DatasetDownloader:
         self.stats['vocabulary'] = len(vocab_data)
         return vocab_data
     
-    def download_dialogue_data(self) -> List[Dict]:
+    def download_dialogue_data(self) -> ShardedJsonlWriter:
         """
         Download Dialogue Generation Dataset
         Target: 4,000 samples
@@ -818,6 +925,7 @@ class DatasetDownloader:
         - Dialogsum (dialogue summarization)
         - Anthropic HH-RLHF (helpful harmless)
         """
+        rng = self._rng("dialogue")
         print("\n" + "="*70)
         print("📊 TASK 4: DIALOGUE GENERATION")
         print("="*70)
@@ -825,169 +933,183 @@ class DatasetDownloader:
         print(f"Target: {target:,} samples")
         print("Sources: OpenOrca + Dialogsum + Anthropic HH")
         
-        dialogue_data = []
+        dialogue_data = self._task_writer("dialogue")
         
         # Source 1: Open-Orca/OpenOrca dataset (instruction following)
-        try:
-            print("\n⏳ [1/3] Loading OpenOrca dataset...")
-            orca = load_dataset("Open-Orca/OpenOrca", split="train", streaming=True)
+        src = self._source("dialogue", "OpenOrca")
+        if not src.done:
+            try:
+                print("\n⏳ [1/3] Loading OpenOrca dataset...")
+                orca = load_dataset("Open-Orca/OpenOrca", split="train", streaming=True)
             
-            # Keywords to filter out non-English or translation tasks
-            translation_keywords = [
-                'translate', 'translation', 'turkish', 'french', 'german', 'spanish', 
-                'italian', 'chinese', 'japanese', 'arabic', 'russian', 'portuguese',
-                'hindi', 'korean', 'vietnamese', 'polish', 'dutch', 'swedish',
-                'translate to', 'translate this', 'said in', 'how do you say',
-                'language:', 'Turkish:', 'French:', 'German:', 'Spanish:'
-            ]
+                # Keywords to filter out non-English or translation tasks
+                translation_keywords = [
+                    'translate', 'translation', 'turkish', 'french', 'german', 'spanish', 
+                    'italian', 'chinese', 'japanese', 'arabic', 'russian', 'portuguese',
+                    'hindi', 'korean', 'vietnamese', 'polish', 'dutch', 'swedish',
+                    'translate to', 'translate this', 'said in', 'how do you say',
+                    'language:', 'Turkish:', 'French:', 'German:', 'Spanish:'
+                ]
             
-            # allocate roughly 50% of dialogue target to OpenOrca
-            limit = max(500, int(target * 0.5))
-            count = 0
-            for idx, item in enumerate(orca):
-                if count >= limit:
-                    break
+                # allocate roughly 50% of dialogue target to OpenOrca
+                limit = max(500, int(target * 0.5))
+                # Items that passed the filters (accepted or not), as in the limit check below
+                count = src.extra.get("candidates", 0)
+                for idx, item in src.iterate(orca):
+                    if count >= limit:
+                        break
                     
-                question = item.get('question', '')
-                response = item.get('response', '')
+                    question = item.get('question', '')
+                    response = item.get('response', '')
                 
-                if not question or not response or len(response) < 50:
-                    continue
-                
-                # Filter: Skip translation tasks
-                question_lower = question.lower()
-                if any(kw in question_lower for kw in translation_keywords):
-                    continue
+                    if not question or not response or len(response) < 50:
+                        continue
                 
-                # Filter: Check if English (basic ASCII check + common English words)
-                try:
-                    # Check for excessive non-ASCII characters (>20% is suspicious)
-                    non_ascii = sum(1 for c in question if ord(c) > 127)
-                    if non_ascii / len(question) > 0.2:
+                    # Filter: Skip translation tasks
+                    question_lower = question.lower()
+                    if any(kw in question_lower for kw in translation_keywords):
                         continue
+                
+                    # Filter: Check if English (basic ASCII check + common English words)
+                    try:
+                        # Check for excessive non-ASCII characters (>20% is suspicious)
+                        non_ascii = sum(1 for c in question if ord(c) > 127)
+                        if non_ascii / len(question) > 0.2:
+                            continue
                     
-                    non_ascii_resp = sum(1 for c in response if ord(c) > 127)
-                    if non_ascii_resp / len(response) > 0.2:
+                        non_ascii_resp = sum(1 for c in response if ord(c) > 127)
+                        if non_ascii_resp / len(response) > 0.2:
+                            continue
+                    except:
                         continue
-                except:
-                    continue
                 
-                # Simulate student context
-                fluency = round(random.uniform(0.5, 0.95), 2)
-                level = random.choice(['A2', 'B1', 'B2'])
-                errors = random.choice(['None', 'Grammar error', 'Vocabulary issue'])
+                    # Simulate student context
+                    fluency = round(rng.uniform(0.5, 0.95), 2)
+                    level = rng.choice(['A2', 'B1', 'B2'])
+                    errors = rng.choice(['None', 'Grammar error', 'Vocabulary issue'])
                 
-                # Increase context length: 200 → 500 for question, 300 → 600 for response
-                dialogue_input = f"{question[:500]} | fluency:{fluency} | level:{level} | errors:{errors}"
+                    # Increase context length: 200 → 500 for question, 300 → 600 for response
+                    dialogue_input = f"{question[:500]} | fluency:{fluency} | level:{level} | errors:{errors}"
 
-                self._add_sample(
-                    dialogue_data,
-                    "dialogue",
-                    dialogue_input,
-                    {"response": response[:600]},
-                    {"source": "OpenOrca", "index": idx, "raw_text": question, "raw_response": response[:1200]},
-                )
-                count += 1
+                    if self._add_sample(
+                        dialogue_data,
+                        "dialogue",
+                        dialogue_input,
+                        {"response": response[:600]},
+                        {"source": "OpenOrca", "index": idx, "raw_text": question, "raw_response": response[:1200]},
+                    ):
+                        src.accepted()
+                    count += 1
+                    src.extra["candidates"] = count
             
-            print(f"  ✅ Loaded {sum(1 for x in dialogue_data if x['metadata']['source']=='OpenOrca')} samples")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples")
             
-        except Exception as e:
-            print(f"  ⚠️  Error loading OpenOrca: {e}")
+            except Exception as e:
+                print(f"  ⚠️  Error loading OpenOrca: {e}")
         
         # Source 2: knkarthick/dialogsum dataset (dialogue summarization)
-        try:
-            print("\n⏳ [2/3] Loading Dialogsum dataset...")
-            limit = max(300, int(target * 0.35))
-            dialogsum = load_dataset("knkarthick/dialogsum", split=f"train[:{limit}]")
+        src = self._source("dialogue", "Dialogsum")
+        if not src.done:
+            try:
+                print("\n⏳ [2/3] Loading Dialogsum dataset...")
+                limit = max(300, int(target * 0.35))
+                dialogsum = load_dataset("knkarthick/dialogsum", split=f"train[:{limit}]")
             
-            for idx, item in enumerate(dialogsum):
-                dialogue_text = item.get('dialogue', '')
-                summary = item.get('summary', '')
+                for idx, item in src.iterate(dialogsum):
+                    dialogue_text = item.get('dialogue', '')
+                    summary = item.get('summary', '')
                 
-                if not dialogue_text or not summary or len(dialogue_text) < 50:
-                    continue
+                    if not dialogue_text or not summary or len(dialogue_text) < 50:
+                        continue
                 
-                # Filter: Check if English (should be mostly ASCII)
-                try:
-                    non_ascii = sum(1 for c in dialogue_text if ord(c) > 127)
-                    if non_ascii / len(dialogue_text) > 0.15:
+                    # Filter: Check if English (should be mostly ASCII)
+                    try:
+                        non_ascii = sum(1 for c in dialogue_text if ord(c) > 127)
+                        if non_ascii / len(dialogue_text) > 0.15:
+                            continue
+                    except:
                         continue
-                except:
-                    continue
                 
-                # Extract first turn as student question
-                lines = dialogue_text.strip().split('\n')
-                student_input = lines[0] if lines else dialogue_text[:150]
+                    # Extract first turn as student question
+                    lines = dialogue_text.strip().split('\n')
+                    student_input = lines[0] if lines else dialogue_text[:150]
                 
-                # Simulate student context
-                fluency = round(random.uniform(0.5, 0.95), 2)
-                level = random.choice(['A2', 'B1', 'B2'])
-                errors = random.choice(['None', 'Grammar error'])
+                    # Simulate student context
+                    fluency = round(rng.uniform(0.5, 0.95), 2)
+                    level = rng.choice(['A2', 'B1', 'B2'])
+                    errors = rng.choice(['None', 'Grammar error'])
                 
-                # Increase context length: 200 → 500, 300 → 600
-                dialogue_input = f"{student_input[:500]} | fluency:{fluency} | level:{level} | errors:{errors}"
+                    # Increase context length: 200 → 500, 300 → 600
+                    dialogue_input = f"{student_input[:500]} | fluency:{fluency} | level:{level} | errors:{errors}"
 
-                self._add_sample(
-                    dialogue_data,
-                    "dialogue",
-                    dialogue_input,
-                    {"response": summary[:600]},
-                    {"source": "Dialogsum", "index": idx, "raw_text": dialogue_text, "raw_response": summary[:1200]},
-                )
+                    if self._add_sample(
+                        dialogue_data,
+                        "dialogue",
+                        dialogue_input,
+                        {"response": summary[:600]},
+                        {"source": "Dialogsum", "index": idx, "raw_text": dialogue_text, "raw_response": summary[:1200]},
+                    ):
+                        src.accepted()
             
-            print(f"  ✅ Loaded {sum(1 for x in dialogue_data if x['metadata']['source']=='Dialogsum')} samples")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples")
             
-        except Exception as e:
-            print(f"  ⚠️  Error loading Dialogsum: {e}")
+            except Exception as e:
+                print(f"  ⚠️  Error loading Dialogsum: {e}")
         
         # Source 3: Anthropic/hh-rlhf (helpful harmless)
-        try:
-            print("\n⏳ [3/3] Loading Anthropic HH-RLHF dataset...")
-            limit = max(200, int(target * 0.15))
-            hh_rlhf = load_dataset("Anthropic/hh-rlhf", split=f"train[:{limit}]", data_dir="harmless-base")
+        src = self._source("dialogue", "Anthropic-HH")
+        if not src.done:
+            try:
+                print("\n⏳ [3/3] Loading Anthropic HH-RLHF dataset...")
+                limit = max(200, int(target * 0.15))
+                hh_rlhf = load_dataset("Anthropic/hh-rlhf", split=f"train[:{limit}]", data_dir="harmless-base")
             
-            for idx, item in enumerate(hh_rlhf):
-                chosen = item.get('chosen', '')
+                for idx, item in src.iterate(hh_rlhf):
+                    chosen = item.get('chosen', '')
                 
-                if not chosen or len(chosen) < 50:
-                    continue
+                    if not chosen or len(chosen) < 50:
+                        continue
                 
-                # Parse conversation format
-                parts = chosen.split('\n\nAssistant:')
-                if len(parts) >= 2:
-                    human_part = parts[0].replace('\n\nHuman:', '').strip()
-                    assistant_part = parts[1].strip()
+                    # Parse conversation format
+                    parts = chosen.split('\n\nAssistant:')
+                    if len(parts) >= 2:
+                        human_part = parts[0].replace('\n\nHuman:', '').strip()
+                        assistant_part = parts[1].strip()
                     
-                    if not human_part or not assistant_part:
-                        continue
+                        if not human_part or not assistant_part:
+                            continue
                     
-                    # Filter: Check if English
-                    try:
-                        non_ascii_human = sum(1 for c in human_part if ord(c) > 127)
-                        if non_ascii_human / len(human_part) > 0.15:
+                        # Filter: Check if English
+                        try:
+                            non_ascii_human = sum(1 for c in human_part if ord(c) > 127)
+                            if non_ascii_human / len(human_part) > 0.15:
+                                continue
+                        except:
                             continue
-                    except:
-                        continue
                     
-                    fluency = round(random.uniform(0.5, 0.95), 2)
-                    level = random.choice(['A2', 'B1', 'B2'])
-                    errors = random.choice(['None', 'Grammar error'])
+                        fluency = round(rng.uniform(0.5, 0.95), 2)
+                        level = rng.choice(['A2', 'B1', 'B2'])
+                        errors = rng.choice(['None', 'Grammar error'])
                     
-                    # Increase context length: 200 → 500, 300 → 600
-                    dialogue_input = f"{human_part[:500]} | fluency:{fluency} | level:{level} | errors:{errors}"
+                        # Increase context length: 200 → 500, 300 → 600
+                        dialogue_input = f"{human_part[:500]} | fluency:{fluency} | level:{level} | errors:{errors}"
 
-                    self._add_sample(
-                        dialogue_data,
-                        "dialogue",
-                        dialogue_input,
-                        {"response": assistant_part[:600]},
-                        {"source": "Anthropic-HH", "index": idx, "raw_text": human_part, "raw_response": assistant_part[:1200]},
-                    )
+                        if self._add_sample(
+                            dialogue_data,
+                            "dialogue",
+                            dialogue_input,
+                            {"response": assistant_part[:600]},
+                            {"source": "Anthropic-HH", "index": idx, "raw_text": human_part, "raw_response": assistant_part[:1200]},
+                        ):
+                            src.accepted()
             
-            print(f"  ✅ Loaded {sum(1 for x in dialogue_data if x['metadata']['source']=='Anthropic-HH')} samples")
+                src.finish()
+                print(f"  ✅ Loaded {src.count} samples")
             
-        except Exception as e:
-            print(f"  ⚠️  Error loading Anthropic HH: {e}")
+            except Exception as e:
+                print(f"  ⚠️  Error loading Anthropic HH: {e}")
         
         # Fill remaining with synthetic if needed
         remaining = max(0, target - len(dialogue_data))
@@ -997,13 +1119,7 @@ class DatasetDownloader:
             for s in synthetic:
                 self._add_sample(dialogue_data, "dialogue", s["input"], s["output"], s.get("metadata", {}))
         
-        # Save to JSON
-        output_file = self.output_dir / "dialogue_data.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(dialogue_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n✅ Total dialogue samples: {len(dialogue_data)}")
-        print(f"💾 Saved to: {output_file}")
+        self._close_task_writer(dialogue_data, "dialogue")
         
         # Show source distribution
         sources = {}
@@ -1109,54 +1225,98 @@ class DatasetDownloader:
         self.stats['dialogue'] = len(dialogue_data)
         return dialogue_data
     
+    def _report_progress(self, stop: threading.Event, interval: float):
+        """Print accepted/target per task until stop is set."""
+        while not stop.wait(interval):
+            with self._lock:
+                counts = dict(self.progress)
+            parts = [
+                f"{task} {counts.get(task, 0):,}/{target:,} ({counts.get(task, 0) / max(1, target) * 100:.0f}%)"
+                for task, target in self.targets.items()
+            ]
+            print(f"\n⏳ Progress: {' | '.join(parts)}", flush=True)
+
+    def download_all(self, jobs: int = 4, progress_interval: float = 15.0) -> Dict[str, ShardedJsonlWriter]:
+        """
+        Build every task, running up to `jobs` task builders concurrently.
+
+        Builders mostly wait on HuggingFace downloads/streaming, so threads are
+        enough; the dedupe state is shared through _add_sample. Each builder
+        draws from its own seeded RNG, so a build is reproducible with --seed at
+        any jobs value (except the cross-task order of --dedupe-global, which
+        depends on thread timing; use jobs=1 for that).
+        """
+        builders = {task: getattr(self, name) for task, name in TASK_BUILDERS.items() if task in self.targets}
+        started = time.perf_counter()
+        # Resume every task before any builder runs, so global dedupe sees all kept samples
+        for task in builders:
+            self._task_writer(task)
+        if jobs <= 1:
+            results = {task: build() for task, build in builders.items()}
+        else:
+            stop = threading.Event()
+            monitor = threading.Thread(target=self._report_progress, args=(stop, progress_interval), daemon=True)
+            monitor.start()
+            try:
+                with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="dataset") as pool:
+                    futures = {task: pool.submit(build) for task, build in builders.items()}
+                    results = {task: future.result() for task, future in futures.items()}
+            finally:
+                stop.set()
+                monitor.join()
+        self.build_seconds = round(time.perf_counter() - started, 1)
+        print(f"\n⏱️  Built {len(results)} tasks in {self.build_seconds}s ({jobs} parallel)")
+        return results
+
     def create_unified_dataset(self, fluency_data, grammar_data, vocab_data, dialogue_data):
-        """Combine all tasks into unified training dataset"""
+        """
+        Combine all task shards into the unified training dataset.
+
+        Streams shards -> external shuffle -> unified_training_data.jsonl, then one
+        more streaming pass writes the JSON array (kept for the notebooks) and CSV.
+        Per-task dedupe already happened in _add_sample, so nothing is held in memory.
+        """
         print("\n" + "="*70)
         print("📦 CREATING UNIFIED DATASET")
         print("="*70)
         
-        unified_data = fluency_data + grammar_data + vocab_data + dialogue_data
-
-        # Final dedupe pass (per-task normalized input)
-        seen = set()
-        deduped = []
-        for item in unified_data:
-            task = item.get("task", "")
-            inp = item.get("input", "")
-            k = stable_hash(f"{task}::{normalize_text(inp)}")
-            if k in seen:
-                continue
-            seen.add(k)
-            deduped.append(item)
-        unified_data = deduped
-        
-        # Shuffle
-        random.shuffle(unified_data)
+        tasks = [fluency_data, grammar_data, vocab_data, dialogue_data]
+        jsonl_file = self.output_dir / "unified_training_data.jsonl"
+        count = external_shuffle(
+            (line for data in tasks for line in data.iter_lines()),
+            jsonl_file,
+            total=sum(len(data) for data in tasks),
+            bucket_size=self.shuffle_bucket_size,
+        )
         
-        # Save unified dataset
         output_file = self.output_dir / "unified_training_data.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(unified_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n✅ Unified dataset created: {len(unified_data)} samples")
-        print(f"💾 Saved to: {output_file}")
-        
-        # Create CSV for easy inspection
-        csv_data = []
-        for item in unified_data:
-            csv_data.append({
-                'task': item['task'],
-                'input': item['input'][:100],
-                'output': str(item['output'])[:100],
-                'source': item['metadata'].get('source', 'unknown')
-            })
-        
-        df = pd.DataFrame(csv_data)
         csv_file = self.output_dir / "unified_training_data.csv"
-        df.to_csv(csv_file, index=False, encoding='utf-8')
+        with open(jsonl_file, 'r', encoding='utf-8') as src, \
+                open(output_file, 'w', encoding='utf-8') as out, \
+                open(csv_file, 'w', encoding='utf-8', newline='') as csv_out:
+            writer = csv.DictWriter(csv_out, fieldnames=['task', 'input', 'output', 'source'])
+            writer.writeheader()
+            out.write("[\n")
+            for i, line in enumerate(src):
+                if i:
+                    out.write(",\n")
+                out.write(line.rstrip("\n"))
+                # CSV for easy inspection
+                item = json.loads(line)
+                writer.writerow({
+                    'task': item['task'],
+                    'input': item['input'][:100],
+                    'output': str(item['output'])[:100],
+                    'source': item['metadata'].get('source', 'unknown')
+                })
+            out.write("\n]\n")
+        
+        print(f"\n✅ Unified dataset created: {count} samples")
+        print(f"💾 Saved to: {jsonl_file}")
+        print(f"💾 JSON array saved to: {output_file}")
         print(f"💾 CSV saved to: {csv_file}")
         
-        return unified_data
+        return JsonlShards([jsonl_file], count)
     
     def print_summary(self, unified_data):
         """Print comprehensive summary of downloaded datasets"""
@@ -1189,7 +1349,7 @@ class DatasetDownloader:
         # Files created
         print("\n📁 Files Created:")
         print(f"  {self.output_dir}/")
-        for file in sorted(self.output_dir.glob("*.json")):
+        for file in sorted(self.output_dir.glob("*.json*")):
             size_mb = file.stat().st_size / 1024 / 1024
             print(f"    ├── {file.name:30s} ({size_mb:.2f} MB)")
         for file in sorted(self.output_dir.glob("*.csv")):
@@ -1203,7 +1363,7 @@ class DatasetDownloader:
         print("\n🚀 Next Steps:")
         print("  1. Inspect data quality:")
         print(f"     cd {self.output_dir}")
-        print("     cat fluency_data.json | jq '.[0:5]'  # View samples")
+        print("     head -5 shards/fluency-00000.jsonl | jq .  # View samples")
         print("     cat unified_training_data.csv | head -20  # Quick preview")
         print("")
         print("  2. Upload to Google Drive:")
@@ -1214,8 +1374,8 @@ class DatasetDownloader:
         print("     from google.colab import drive")
         print("     drive.mount('/content/drive')")
         print("     !tar -xzf '/content/drive/MyDrive/LexiLingo/training_data/datasets.tar.gz'")
-        print("     with open('downloaded_datasets/unified_training_data.json') as f:")
-        print("         data = json.load(f)")
+        print("     from datasets import load_dataset")
+        print("     data = load_dataset('json', data_files='downloaded_datasets/unified_training_data.jsonl', split='train')")
         print("")
         print("  4. Run training:")
         print("     # Use v1.4 notebook with loaded data")
@@ -1229,9 +1389,17 @@ def main():
     parser.add_argument("--min-context-sentences", type=int, default=1, help="Min sentences per sample context")
     parser.add_argument("--max-context-sentences", type=int, default=2, help="Max sentences per sample context")
     parser.add_argument("--dedupe-global", action="store_true", help="Also dedupe across tasks (stricter; may reduce total)")
+    parser.add_argument("--near-dup-threshold", type=float, default=0.0, help="MinHash-LSH Jaccard threshold (5-char shingles) for near-duplicate removal, e.g. 0.5; synthetic rows are only exact-deduped (default 0 = exact dedupe only)")
     parser.add_argument("--allow-exceed", action="store_true", help="Allow exceeding per-task targets when sources provide more")
     parser.add_argument("--min-input-chars", type=int, default=5, help="Drop samples with very short input strings")
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--shard-size", type=int, default=50_000, help="Samples per JSONL shard file")
+    parser.add_argument("--shuffle-bucket-size", type=int, default=100_000, help="Samples held in memory per bucket during the unified shuffle")
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints/ and rebuild every source from scratch")
+    parser.add_argument("--checkpoint-every", type=int, default=500, help="Save source checkpoints every N accepted samples")
+    parser.add_argument("--m2-workers", type=int, default=0, help="Processes for parsing local M2 files (0 = one per CPU)")
+    parser.add_argument("--inject-workers", type=int, default=0, help="Processes for synthetic grammar error injection (0 = one per CPU)")
+    parser.add_argument("--jobs", type=int, default=len(TASK_BUILDERS), help="Task builders to run in parallel (each task has its own seeded RNG; use 1 with --dedupe-global for a reproducible build)")
     parser.add_argument("--yes", action="store_true", help="Skip confirmation prompt")
     args = parser.parse_args()
 
@@ -1269,16 +1437,21 @@ def main():
         dedupe_global=args.dedupe_global,
         allow_exceed=args.allow_exceed,
         min_input_chars=args.min_input_chars,
+        shard_size=args.shard_size,
+        shuffle_bucket_size=args.shuffle_bucket_size,
+        near_dup_threshold=args.near_dup_threshold,
+        resume=not args.fresh,
+        checkpoint_every=args.checkpoint_every,
+        m2_workers=args.m2_workers,
+        inject_workers=args.inject_workers,
+        seed=args.seed,
     )
     
-    fluency_data = downloader.download_fluency_data()
-    grammar_data = downloader.download_grammar_data()
-    vocab_data = downloader.download_vocabulary_data()
-    dialogue_data = downloader.download_dialogue_data()
+    data = downloader.download_all(jobs=args.jobs)
     
     # Create unified dataset
     unified_data = downloader.create_unified_dataset(
-        fluency_data, grammar_data, vocab_data, dialogue_data
+        data["fluency"], data["grammar"], data["vocabulary"], data["dialogue"]
     )
     
     # Print summary
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Synthetic Grammar Error Injection
+==================================
+
+Turns correct sentences into (incorrect, corrected) training pairs:
+
+- Each error type is an ErrorRule with precompiled patterns; a rule picks one
+  random match and replaces it (case kept). New types plug in via
+  register_rule() or by passing rules=[...] to ErrorInjector.
+- For every text *all* rules are tried and every applicable error is returned
+  as a candidate, so a sentence is only wasted when no rule matches at all.
+- ErrorInjector.choose() takes the candidate type furthest below its quota,
+  which keeps the error mix balanced without rejecting samples. Types whose
+  quota is met are never chosen (unless allow_overflow), and the injector is
+  done once every quota is met.
+- ErrorInjector.map() computes candidates in batches across worker
+  processes, in input order, a few batches ahead of the consumer. Each text
+  gets its own seeded RNG, so output does not depend on batch size or workers.
+
+Used by download_and_inspect_datasets.py (grammar task, synthetic source), and
+as a CLI over a text file (one sentence per line):
+
+    python scripts/grammar_errors.py sentences.txt --total 7000 --out synthetic.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# The builder calls this from task threads; fork there can copy held locks into children
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+Replacement = Union[Dict[str, Union[str, List[str]]], Callable[[str, random.Random], Optional[str]]]
+
+
+def _match_case(original: str, replacement: str) -> str:
+    if original.isupper() and len(original) > 1:
+        return replacement.upper()
+    if original[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+class ErrorRule:
+    """
+    One error type: name, explanation and precompiled (pattern, replacement, group).
+
+    replacement is a dict keyed by the lowercased matched text (value: string or
+    list of choices) or a function(word, rng) -> str/None. Only `group` of the
+    match is replaced, so context words can anchor a pattern without changing.
+    """
+
+    def __init__(self, name: str, explanation: str, patterns: List[Tuple[str, Replacement, int]]):
+        self.name = name
+        self.explanation = explanation
+        self.patterns = [(re.compile(p, re.IGNORECASE), repl, group) for p, repl, group in patterns]
+
+    def _replacement(self, replacement: Replacement, word: str, rng: random.Random) -> Optional[str]:
+        if callable(replacement):
+            return replacement(word, rng)
+        choice = replacement.get(word.lower())
+        if isinstance(choice, list):
+            choice = rng.choice(choice)
+        return choice
+
+    def apply(self, text: str, rng: random.Random) -> Optional[str]:
+        """Text with one randomly chosen match corrupted, or None if nothing matches."""
+        matches = [(m, repl, group) for pattern, repl, group in self.patterns for m in pattern.finditer(text)]
+        while matches:
+            m, repl, group = matches.pop(rng.randrange(len(matches)))
+            word = m.group(group)
+            new = self._replacement(repl, word, rng)
+            if new is None or new.lower() == word.lower():
+                continue
+            start, end = m.span(group)
+            rest = text[end:]
+            if new == "":
+                # Dropped word: move its capital letter to the next word
+                rest = rest.lstrip()
+                if word[:1].isupper():
+                    rest = rest[:1].upper() + rest[1:]
+                return (text[:start] + rest).strip()
+            return text[:start] + _match_case(word, new) + rest
+        return None
+
+
+# --- Replacement functions (module level so rules pickle into worker processes) ---
+
+def _drop(word: str, rng: random.Random) -> str:
+    return ""
+
+
+def _strip_plural(word: str, rng: random.Random) -> Optional[str]:
+    if word.lower().endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.lower().endswith("ss"):
+        return None
+    return word[:-1]
+
+
+def _third_person(word: str, rng: random.Random) -> str:
+    if word.lower().endswith(("s", "sh", "ch", "x", "o")):
+        return word + "es"
+    return word + "s"
+
+
+_PREPOSITIONS = ["in", "on", "at", "to", "for", "with", "of", "from", "by", "about"]
+_PREP_CONFUSIONS = {p: [q for q in _PREPOSITIONS if q != p] for p in _PREPOSITIONS}
+
+_PAST_TO_PRESENT = {
+    "went": "go", "was": "is", "were": "are", "had": "have", "did": "do", "made": "make",
+    "took": "take", "came": "come", "said": "say", "became": "become", "began": "begin",
+    "found": "find", "gave": "give", "left": "leave", "told": "tell", "wrote": "write",
+    "saw": "see", "knew": "know", "thought": "think", "brought": "bring", "bought": "buy",
+    "built": "build", "ran": "run", "won": "win", "lost": "lose", "held": "hold",
+    "led": "lead", "met": "meet", "sent": "send", "spent": "spend", "stood": "stand",
+    "fell": "fall", "grew": "grow", "chose": "choose", "drove": "drive", "spoke": "speak",
+}
+
+_IRREGULAR_PLURALS = {
+    "children": "child", "people": "person", "men": "man", "women": "woman",
+    "feet": "foot", "teeth": "tooth", "mice": "mouse", "geese": "goose",
+}
+
+_COMPARATIVES = {
+    "better": "more good", "worse": "more bad", "bigger": "more big", "larger": "more large",
+    "smaller": "more small", "higher": "more high", "lower": "more low", "longer": "more long",
+    "greater": "more great", "older": "more old", "younger": "more young", "easier": "more easy",
+    "best": "most good", "worst": "most bad", "largest": "most large", "biggest": "most big",
+}
+
+
+def _alternation(words: Iterable[str]) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+DEFAULT_RULES: List[ErrorRule] = [
+    ErrorRule("DET", "Article (a/an/the) missing", [
+        (r"\b(a|an|the)\s+(?=\w)", _drop, 1),
+    ]),
+    ErrorRule("DET_FORM", "Wrong article form (a/an)", [
+        (r"\b(a|an)\s+(?=[a-z])", {"a": "an", "an": "a"}, 1),
+    ]),
+    ErrorRule("PREP", "Preposition misuse", [
+        (rf"\b({_alternation(_PREPOSITIONS)})\b", _PREP_CONFUSIONS, 1),
+    ]),
+    ErrorRule("SVA", "Subject-verb agreement error", [
+        (r"\b(?:he|she|it|this|that|there)\s+(is|was|has|does)\b",
+         {"is": "are", "was": "were", "has": "have", "does": "do"}, 1),
+        (r"\b(?:they|we|you|these|those)\s+(are|were|have|do)\b",
+         {"are": "is", "were": "was", "have": "has", "do": "does"}, 1),
+    ]),
+    ErrorRule("TENSE", "Tense error", [
+        (rf"\b({_alternation(_PAST_TO_PRESENT)})\b", _PAST_TO_PRESENT, 1),
+    ]),
+    ErrorRule("PLURAL", "Number/pluralization error", [
+        (rf"\b({_alternation(_IRREGULAR_PLURALS)})\b", _IRREGULAR_PLURALS, 1),
+        (r"\b(?:many|several|few|two|three|four|five|these|those|both|various)\s+([a-z]{3,}s)\b", _strip_plural, 1),
+    ]),
+    ErrorRule("VERB_FORM", "Verb form error after modal", [
+        (r"\b(?:can|could|will|would|should|must|may|might)\s+"
+         r"(?!not\b|also\b|never\b|still\b|only\b|even\b|often\b|always\b|have\b|be\b)([a-z]{3,})\b", _third_person, 1),
+    ]),
+    ErrorRule("PRON", "Pronoun case error", [
+        (r"\b(?:to|for|with|by|from|about|gave|told|saw|asked|helped)\s+(him|them|us|me)\b",
+         {"him": "he", "them": "they", "us": "we", "me": "I"}, 1),
+    ]),
+    ErrorRule("COMP", "Comparative/superlative form error", [
+        (rf"\b({_alternation(_COMPARATIVES)})\b", _COMPARATIVES, 1),
+    ]),
+]
+
+RULES: Dict[str, ErrorRule] = {rule.name: rule for rule in DEFAULT_RULES}
+
+
+def register_rule(rule: ErrorRule):
+    """Add or replace an error type used by ErrorInjector() by default."""
+    RULES[rule.name] = rule
+
+
+def split_quotas(total: int, names: List[str], weights: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Split total samples over error types (evenly, or proportional to weights)."""
+    weights = {n: float((weights or {}).get(n, 1.0)) for n in names}
+    norm = sum(weights.values()) or 1.0
+    quotas = {n: int(total * w / norm) for n, w in weights.items()}
+    for n in sorted(names, key=lambda n: weights[n], reverse=True)[:max(0, total - sum(quotas.values()))]:
+        quotas[n] += 1
+    return quotas
+
+
+def candidates(text: str, rules: List[ErrorRule], seed: int = 0) -> Dict[str, str]:
+    """{error type: incorrect text} for every rule that applies to text."""
+    rng = random.Random(f"{seed}:{text}")
+    out = {}
+    for rule in rules:
+        incorrect = rule.apply(text, rng)
+        if incorrect:
+            out[rule.name] = incorrect
+    return out
+
+
+def _candidates_batch(task: Tuple[List[str], List[ErrorRule], int]) -> List[Dict[str, str]]:
+    texts, rules, seed = task
+    return [candidates(text, rules, seed) for text in texts]
+
+
+class ErrorInjector:
+    """
+    Quota-driven error injection.
+
+    Example:
+        injector = ErrorInjector(split_quotas(7000, list(RULES)), workers=4)
+        for base, cands in injector.map(sentences):
+            choice = injector.choose(cands)
+            if choice and keep(choice[1]):
+                injector.commit(choice[0])
+            if injector.done:
+                break
+    """
+
+    def __init__(self, quotas: Dict[str, int], rules: Optional[List[ErrorRule]] = None,
+                 workers: Optional[int] = 1, batch_size: int = 256, seed: int = 0,
+                 allow_overflow: bool = False):
+        self.rules = [r for r in (rules or list(RULES.values())) if r.name in quotas]
+        missing = set(quotas) - {r.name for r in self.rules}
+        if missing:
+            raise ValueError(f"no rule for error types: {sorted(missing)}")
+        self.quotas = dict(quotas)
+        self.counts = {name: 0 for name in quotas}
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.seed = seed
+        self.allow_overflow = allow_overflow  # Go past full quotas until the total is reached
+        self.rng = random.Random(seed)
+        self.texts_seen = 0
+        self.texts_without_match = 0
+        self.texts_quota_full = 0
+        self.explanations = {r.name: r.explanation for r in self.rules}
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def done(self) -> bool:
+        if self.allow_overflow:
+            return self.total >= sum(self.quotas.values())
+        return all(self.counts[n] >= q for n, q in self.quotas.items())
+
+    def commit(self, name: str, n: int = 1):
+        """Count an accepted sample of this error type."""
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def choose(self, cands: Dict[str, str]) -> Optional[Tuple[str, str]]:
+        """(error type, incorrect text) with the largest remaining quota; None if no rule applied
+        or every applicable type already met its quota (and allow_overflow is off)."""
+        self.texts_seen += 1
+        if not cands:
+            self.texts_without_match += 1
+            return None
+        best = max(self.quotas[n] - self.counts[n] for n in cands)
+        if best <= 0 and not self.allow_overflow:
+            self.texts_quota_full += 1
+            return None
+        name = self.rng.choice(sorted(n for n in cands if self.quotas[n] - self.counts[n] == best))
+        return name, cands[name]
+
+    def map(self, items: Iterable[Any], key: Callable[[Any], str] = lambda x: x) -> Iterator[Tuple[Any, Dict[str, str]]]:
+        """(item, candidates of key(item)) in input order, computed in worker batches."""
+        def batches():
+            batch = []
+            for item in items:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        if self.workers <= 1:
+            for batch in batches():
+                yield from zip(batch, _candidates_batch(([key(x) for x in batch], self.rules, self.seed)))
+            return
+
+        pending = deque()
+        remaining = batches()
+        context = multiprocessing.get_context(_START_METHOD)
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            try:
+                for batch in remaining:
+                    task = ([key(x) for x in batch], self.rules, self.seed)
+                    pending.append((batch, pool.submit(_candidates_batch, task)))
+                    if len(pending) >= self.workers * 2:
+                        break
+                while pending:
+                    batch, future = pending.popleft()
+                    results = future.result()
+                    nxt = next(remaining, None)
+                    if nxt is not None:
+                        task = ([key(x) for x in nxt], self.rules, self.seed)
+                        pending.append((nxt, pool.submit(_candidates_batch, task)))
+                    yield from zip(batch, results)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inject synthetic grammar errors into correct sentences.")
+    parser.add_argument("input", type=Path, help="Text file, one correct sentence per line")
+    parser.add_argument("--out", type=Path, required=True, help="Output JSONL (input/corrected/error_type)")
+    parser.add_argument("--total", type=int, default=7000, help="Samples to generate")
+    parser.add_argument("--types", type=str, default=",".join(RULES), help="Comma-separated error types")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--allow-overflow", action="store_true",
+                        help="Keep going past full per-type quotas until --total is reached")
+    args = parser.parse_args()
+
+    names = [t.strip() for t in args.types.split(",") if t.strip()]
+    injector = ErrorInjector(split_quotas(args.total, names), workers=args.workers,
+                             batch_size=args.batch_size, seed=args.seed, allow_overflow=args.allow_overflow)
+    print(f"💉 Error types: {', '.join(names)} | target {args.total:,} | workers {injector.workers}")
+
+    started = time.perf_counter()
+    with open(args.input, "r", encoding="utf-8") as f, open(args.out, "w", encoding="utf-8") as out:
+        sentences = (line.strip() for line in f if line.strip())
+        for base, cands in injector.map(sentences):
+            choice = injector.choose(cands)
+            if choice is None:
+                continue
+            et, incorrect = choice
+            out.write(json.dumps({"input": incorrect, "corrected": base, "error_type": et,
+                                  "explanation": injector.explanations[et]}, ensure_ascii=False) + "\n")
+            injector.commit(et)
+            if injector.done:
+                break
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {injector.total:,} samples from {injector.texts_seen:,} sentences "
+          f"({injector.texts_without_match:,} without a match, {injector.texts_quota_full:,} only matching full quotas) "
+          f"in {elapsed:.2f}s")
+    for name in names:
+        print(f"  {name:10s} {injector.counts[name]:>7,} / {injector.quotas[name]:,}")
+    print(f"💾 Saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
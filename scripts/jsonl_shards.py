@@ -0,0 +1,207 @@
+"""
+Streaming JSONL Shards for Dataset Builds
+==========================================
+
+Keeps dataset builds at bounded memory regardless of target size:
+
+- JsonlShards: read-only view over JSONL files (len / iteration from disk).
+- ShardedJsonlWriter: list-like sink (append / len / iter) that writes each
+  accepted sample as one compact JSON line and rotates to a new shard every
+  `shard_size` lines. Only the first few samples stay in memory for previews.
+- external_shuffle: two-pass external-memory shuffle. Pass 1 scatters lines
+  into random bucket files, pass 2 shuffles each bucket in RAM and appends it
+  to the output, so peak memory is about one bucket (`bucket_size` lines).
+
+Used by download_and_inspect_datasets.py for the per-task shards and the
+unified training file.
+"""
+
+import json
+import math
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def iter_jsonl(paths: Iterable[Path]) -> Iterator[Dict]:
+    """Yield records from JSONL files in order."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class JsonlShards:
+    """Read-only JSONL files with a known sample count; iteration streams from disk."""
+
+    def __init__(self, paths: List[Path], count: int):
+        self.paths = [Path(p) for p in paths]
+        self._count = count
+
+    def flush(self):
+        pass
+
+    def __len__(self) -> int:
+        return self._count
+
+    def iter_lines(self) -> Iterator[str]:
+        """Raw JSON lines (newline-terminated) across all shards."""
+        self.flush()
+        for path in self.paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield line if line.endswith("\n") else line + "\n"
+
+    def __iter__(self) -> Iterator[Dict]:
+        self.flush()
+        return iter_jsonl(self.paths)
+
+
+class ShardedJsonlWriter(JsonlShards):
+    """
+    Append-only JSONL sink split into shards: <directory>/<prefix>-00000.jsonl, ...
+
+    Behaves like the sample lists it replaces: append(), len(), iteration
+    (streamed back from disk) and indexing into the first `keep_head` samples.
+    With resume_count > 0 the existing shards are kept, cut back to their first
+    resume_count samples, and appending continues after them.
+
+    Example:
+        with ShardedJsonlWriter(out_dir / "shards", "grammar") as data:
+            data.append({"task": "grammar", "input": "...", ...})
+        print(len(data), data.paths)
+    """
+
+    def __init__(self, directory: Path, prefix: str, shard_size: int = 50_000, keep_head: int = 3,
+                 resume_count: int = 0):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.shard_size = max(1, int(shard_size))
+        self.keep_head = keep_head
+        self.directory.mkdir(parents=True, exist_ok=True)
+        super().__init__([], 0)
+        self.head: List[Dict] = []
+        self._in_shard = 0
+        self._file = None
+        existing = sorted(self.directory.glob(f"{prefix}-*.jsonl"))
+        if resume_count > 0:
+            self._resume(existing, resume_count)
+        else:
+            # Stale shards from an earlier run would otherwise be merged again
+            for old in existing:
+                old.unlink()
+
+    def _resume(self, existing: List[Path], resume_count: int):
+        """Keep the first resume_count complete lines; drop everything after."""
+        for path in existing:
+            if self._count >= resume_count:
+                path.unlink()
+                continue
+            lines = 0
+            with open(path, "r+b") as f:
+                pos = 0
+                for raw in f:
+                    if self._count >= resume_count or not raw.endswith(b"\n"):
+                        break
+                    if len(self.head) < self.keep_head:
+                        self.head.append(json.loads(raw))
+                    pos += len(raw)
+                    lines += 1
+                    self._count += 1
+                f.truncate(pos)
+            self.paths.append(path)
+            self._in_shard = lines
+        if self.paths:
+            self._file = open(self.paths[-1], "a", encoding="utf-8")
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        path = self.directory / f"{self.prefix}-{len(self.paths):05d}.jsonl"
+        self.paths.append(path)
+        self._file = open(path, "w", encoding="utf-8")
+        self._in_shard = 0
+
+    def append(self, record: Dict):
+        if self._file is None or self._in_shard >= self.shard_size:
+            self._rotate()
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._in_shard += 1
+        self._count += 1
+        if len(self.head) < self.keep_head:
+            self.head.append(record)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getitem__(self, index: int) -> Dict:
+        if -self._count <= index < 0:
+            index += self._count
+        if 0 <= index < len(self.head):
+            return self.head[index]
+        raise IndexError(f"only the first {len(self.head)} samples are kept in memory")
+
+
+def external_shuffle(
+    lines: Iterable[str],
+    output_path: Path,
+    total: int,
+    bucket_size: int = 100_000,
+    rng: Optional[random.Random] = None,
+    tmp_dir: Optional[Path] = None,
+) -> int:
+    """
+    Shuffle newline-terminated lines into output_path without loading them all.
+
+    Args:
+        lines: Lines to shuffle (each ending with "\\n")
+        output_path: Output JSONL file
+        total: Expected number of lines (upper bound is fine); sets the bucket count
+        bucket_size: Target lines per bucket, i.e. the in-memory working set
+        rng: Random source (module `random` by default, so random.seed applies)
+        tmp_dir: Where bucket files go (default: next to output_path)
+
+    Returns:
+        Number of lines written
+    """
+    rng = rng or random
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    n_buckets = max(1, math.ceil(max(0, total) / max(1, bucket_size)))
+    work_dir = Path(tempfile.mkdtemp(prefix=".shuffle-", dir=str(tmp_dir or output_path.parent)))
+    try:
+        buckets = [open(work_dir / f"bucket-{i:05d}.jsonl", "w", encoding="utf-8") for i in range(n_buckets)]
+        try:
+            for line in lines:
+                buckets[rng.randrange(n_buckets)].write(line)
+        finally:
+            for bucket in buckets:
+                bucket.close()
+
+        count = 0
+        with open(output_path, "w", encoding="utf-8") as out:
+            for i in range(n_buckets):
+                with open(work_dir / f"bucket-{i:05d}.jsonl", "r", encoding="utf-8") as f:
+                    chunk = f.readlines()
+                rng.shuffle(chunk)
+                out.writelines(chunk)
+                count += len(chunk)
+        return count
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
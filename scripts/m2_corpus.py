@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Streaming M2 Corpus Parser (W&I+LOCNESS / BEA-2019)
+====================================================
+
+Parses M2 files into (source, corrected, edit types) records:
+
+- Edits are grouped by annotator id (last ||| field) and applied per annotator,
+  left to right with an offset, as in the official BEA scripts; `noop` lines
+  mean "this annotator made no change".
+- Files are split into ~1 MB byte ranges at sentence-block boundaries and
+  parsed in worker processes; records come back in file order, a few chunks
+  ahead of the consumer, so the whole corpus streams without being loaded.
+- find_m2_files() skips combined files (ABC.train..., ABCN.dev...) when the
+  per-level files they concatenate are present, so nothing is parsed twice.
+
+Usage:
+    from m2_corpus import find_m2_files, iter_m2_corpus
+    for rec in iter_m2_corpus(find_m2_files("../datasets/wi+locness/m2", "train")):
+        rec.source, rec.corrected, rec.edit_types
+
+    python scripts/m2_corpus.py ../datasets/wi+locness/m2 --split dev --out dev_m2.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+NOOP_TYPES = {"noop"}
+# The builder calls this from task threads; fork there can copy held locks into children
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class M2Record(NamedTuple):
+    source: str                  # Original (tokenized) learner sentence
+    corrected: str               # Sentence after this annotator's edits
+    edit_types: Tuple[str, ...]  # e.g. ("M:VERB:FORM", "U:PREP"); empty = no change
+    annotator: int
+    file: str                    # M2 file name (A/B/C/N prefix = CEFR band / native)
+    offset: int                  # Byte offset of the S line in the file
+
+
+def apply_edits(tokens: List[str], edits: List[Tuple[int, int, str]]) -> str:
+    """Apply one annotator's (start, end, correction) edits to the source tokens."""
+    out = list(tokens)
+    shift = 0
+    for start, end, correction in sorted(edits, key=lambda e: (e[0], e[1])):
+        repl = [] if correction in ("", "-NONE-") else correction.split()
+        out[start + shift:end + shift] = repl
+        shift += len(repl) - (end - start)
+    return " ".join(out)
+
+
+def parse_block(lines: List[str], file: str = "", offset: int = 0, annotators: str = "all") -> List[M2Record]:
+    """
+    One M2 sentence block (S line + A lines) -> one record per annotator.
+
+    annotators: "all" (one record per annotator id) or "first" (lowest id only)
+    """
+    if not lines or not lines[0].startswith("S "):
+        return []
+    source = lines[0][2:].strip()
+    tokens = source.split()
+    by_annotator: Dict[int, List[Tuple[int, int, str, str]]] = {}
+    for line in lines[1:]:
+        if not line.startswith("A "):
+            continue
+        fields = line[2:].split("|||")
+        try:
+            start, end = (int(x) for x in fields[0].split())
+            annotator = int(fields[5]) if len(fields) > 5 else 0
+        except ValueError:
+            continue
+        edits = by_annotator.setdefault(annotator, [])
+        err_type = fields[1].strip() if len(fields) > 1 else "UNK"
+        if err_type in NOOP_TYPES or start < 0:
+            continue
+        edits.append((start, end, err_type, fields[2].strip() if len(fields) > 2 else ""))
+    if not by_annotator:
+        by_annotator = {0: []}
+
+    ids = sorted(by_annotator)
+    if annotators == "first":
+        ids = ids[:1]
+    records = []
+    for annotator in ids:
+        edits = by_annotator[annotator]
+        corrected = apply_edits(tokens, [(s, e, c) for s, e, _, c in edits]) if edits else source
+        records.append(M2Record(source, corrected, tuple(t for _, _, t, _ in edits), annotator, file, offset))
+    return records
+
+
+def iter_m2_file(path: Path, annotators: str = "all", start: int = 0, end: Optional[int] = None) -> Iterator[M2Record]:
+    """Stream records from one M2 file (optionally a byte range starting at a block)."""
+    path = Path(path)
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        block: List[str] = []
+        block_offset = pos
+        for raw in f:
+            if end is not None and pos >= end:
+                break
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if line.strip():
+                if not block:
+                    block_offset = pos
+                block.append(line)
+            elif block:
+                yield from parse_block(block, path.name, block_offset, annotators)
+                block = []
+            pos += len(raw)
+        if block:
+            yield from parse_block(block, path.name, block_offset, annotators)
+
+
+def _chunk_ranges(path: Path, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Split a file into byte ranges that start at sentence-block boundaries."""
+    size = path.stat().st_size
+    bounds = [0]
+    with open(path, "rb") as f:
+        target = chunk_bytes
+        while target < size:
+            f.seek(target)
+            f.readline()  # Finish the line the seek landed in
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    break
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            target = pos + chunk_bytes
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _parse_chunk(task: Tuple[str, int, int, str]) -> List[M2Record]:
+    path, start, end, annotators = task
+    return list(iter_m2_file(Path(path), annotators, start, end))
+
+
+def find_m2_files(root: Path, split: Optional[str] = None) -> List[Path]:
+    """
+    M2 files under root (e.g. split="train" -> *.train.*.m2), without combined
+    files whose per-level parts exist (ABC.train = A.train + B.train + C.train).
+    """
+    root = Path(root)
+    files = sorted(root.glob(f"*.{split}.*.m2" if split else "*.m2"))
+    keep = []
+    for f in files:
+        prefix = f.name.split(".", 1)[0]
+        rest = f.name[len(prefix):]
+        if len(prefix) > 1 and all((root / f"{part}{rest}").exists() for part in prefix):
+            continue
+        keep.append(f)
+    return keep
+
+
+def iter_m2_corpus(
+    paths: Iterable[Path],
+    workers: Optional[int] = None,
+    annotators: str = "all",
+    chunk_bytes: int = 1 << 20,
+) -> Iterator[M2Record]:
+    """
+    Stream records from many M2 files, parsing chunks in worker processes.
+
+    Records are yielded in file order; at most 2 x workers chunks are in
+    flight, and breaking out of the loop cancels the rest.
+    """
+    tasks = [(str(p), a, b, annotators) for p in paths for a, b in _chunk_ranges(Path(p), chunk_bytes)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield from _parse_chunk(task)
+        return
+
+    pending = deque()
+    remaining = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_START_METHOD)) as pool:
+        try:
+            for task in remaining:
+                pending.append(pool.submit(_parse_chunk, task))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                records = pending.popleft().result()
+                task = next(remaining, None)
+                if task is not None:
+                    pending.append(pool.submit(_parse_chunk, task))
+                yield from records
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse W&I+LOCNESS M2 files into source/corrected pairs.")
+    parser.add_argument("root", type=Path, help="Directory with *.m2 files (e.g. ../datasets/wi+locness/m2)")
+    parser.add_argument("--split", type=str, default=None, help="train / dev (default: all files)")
+    parser.add_argument("--annotators", choices=["all", "first"], default="all")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--out", type=Path, default=None, help="Write records as JSONL")
+    args = parser.parse_args()
+
+    files = find_m2_files(args.root, args.split)
+    if not files:
+        print(f"❌ No M2 files found in {args.root}")
+        return
+    print(f"📂 {len(files)} M2 file(s): {', '.join(f.name for f in files)}")
+
+    started = time.perf_counter()
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    count = changed = 0
+    types: Dict[str, int] = {}
+    try:
+        for rec in iter_m2_corpus(files, args.workers, args.annotators):
+            count += 1
+            if rec.edit_types:
+                changed += 1
+            for t in rec.edit_types:
+                types[t] = types.get(t, 0) + 1
+            if out is not None:
+                out.write(json.dumps(rec._asdict(), ensure_ascii=False) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {count:,} records ({changed:,} with edits) in {elapsed:.2f}s")
+    print("📊 Top edit types:")
+    for t, n in sorted(types.items(), key=lambda x: x[1], reverse=True)[:10]:
+        print(f"  {t:20s} {n:>7,}")
+    if args.out:
+        print(f"💾 Saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
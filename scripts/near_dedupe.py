@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Detection with MinHash + LSH
+============================================
+
+Exact dedupe (md5 of normalized text) misses samples that differ by a word or
+two (OpenOrca paraphrases, synthetic grammar errors on the same WikiText
+sentence, Dialogsum turns). NearDuplicateIndex catches those in one streaming
+pass:
+
+- Each text -> character 5-gram shingles of its normalized words -> MinHash
+  signature (num_perm uint32). Word 3-grams change too many shingles per
+  edited word: one substitution in a 20-word sentence drops Jaccard to ~0.6.
+  With 5-char shingles it mostly stays above 0.5, while unrelated sentences
+  stay below ~0.15, hence the 0.5 default threshold.
+- The signature is cut into `bands` x `rows`; two texts become candidates when
+  any band matches. bands/rows are picked from the Jaccard threshold by
+  minimizing false positives + false negatives of the LSH S-curve.
+- Only band hashes are kept (one int per band per accepted sample), never the
+  texts or full signatures, so memory stays small for millions of samples.
+
+Used by download_and_inspect_datasets.py (per task + optional global), and as a
+CLI over existing JSONL files:
+
+    python scripts/near_dedupe.py downloaded_datasets/unified_training_data.jsonl \\
+        -o downloaded_datasets/unified_near_dedup.jsonl --threshold 0.5 --scope task
+"""
+
+import argparse
+import json
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _integrate(f, a: float, b: float, steps: int = 100) -> float:
+    if b <= a:
+        return 0.0
+    width = (b - a) / steps
+    return sum(f(a + (i + 0.5) * width) for i in range(steps)) * width
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows <= num_perm minimizing the area of false
+    positives (below threshold) + false negatives (above threshold).
+    """
+    best, best_error = (1, num_perm), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        def prob(s, b=bands, r=rows):
+            return 1.0 - (1.0 - s ** r) ** b
+        error = _integrate(prob, 0.0, threshold) + _integrate(lambda s: 1.0 - prob(s), threshold, 1.0)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+def shingles(text: str, ngram: int = 5) -> List[str]:
+    """Character n-grams of the lowercased words joined by spaces; short texts fall back to one shingle."""
+    normalized = " ".join(_WORD_RE.findall((text or "").lower()))
+    if len(normalized) <= ngram:
+        return [normalized] if normalized else []
+    return [normalized[i:i + ngram] for i in range(len(normalized) - ngram + 1)]
+
+
+class NearDuplicateIndex:
+    """
+    Streaming MinHash-LSH index.
+
+    Example:
+        index = NearDuplicateIndex(threshold=0.5)
+        index.add("My brother wants to become a doctor when he grows up .")   # True  (new)
+        index.add("My brother want to become a doctor when he grows up .")    # False (near-duplicate)
+        index.add("The football match was cancelled because of heavy rain .") # True  (new)
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 128, ngram: int = 5, seed: int = 1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._buckets: List[set] = [set() for _ in range(self.bands)]
+        self.size = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature (uint32[num_perm]); None for texts without words."""
+        grams = shingles(text, self.ngram)
+        if not grams:
+            return None
+        hv = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+        # Universal hashing (a*x + b) mod p, one row per permutation; overflow wraps like datasketch
+        with np.errstate(over="ignore"):
+            phv = np.bitwise_and((np.outer(hv, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return phv.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        r = self.rows
+        return [hash(signature[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def contains(self, signature: np.ndarray) -> bool:
+        """True if any band collides with an indexed sample."""
+        return any(key in bucket for key, bucket in zip(self._band_keys(signature), self._buckets))
+
+    def insert(self, signature: np.ndarray):
+        for key, bucket in zip(self._band_keys(signature), self._buckets):
+            bucket.add(key)
+        self.size += 1
+
+    def add(self, text: str) -> bool:
+        """Insert text unless it near-duplicates an indexed one; True if inserted."""
+        signature = self.signature(text)
+        if signature is None:
+            return True
+        if self.contains(signature):
+            return False
+        self.insert(signature)
+        return True
+
+
+def dedupe_jsonl(
+    inputs: Iterable[Path],
+    output: Path,
+    threshold: float = 0.5,
+    scope: str = "task",
+    field: str = "input",
+    num_perm: int = 128,
+    ngram: int = 5,
+) -> Dict[str, int]:
+    """
+    Stream JSONL records from inputs to output, dropping near-duplicates of `field`.
+
+    scope="task" keeps one index per record["task"]; "global" uses a single index.
+    Returns {"kept": n, "dropped": m}.
+    """
+    indexes: Dict[str, NearDuplicateIndex] = {}
+    kept = dropped = 0
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as out:
+        for path in inputs:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    key = record.get("task", "") if scope == "task" else ""
+                    if key not in indexes:
+                        indexes[key] = NearDuplicateIndex(threshold, num_perm, ngram)
+                    if indexes[key].add(str(record.get(field, ""))):
+                        out.write(line if line.endswith("\n") else line + "\n")
+                        kept += 1
+                    else:
+                        dropped += 1
+    return {"kept": kept, "dropped": dropped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drop near-duplicate samples from JSONL files (MinHash-LSH).")
+    parser.add_argument("inputs", nargs="+", type=Path, help="Input JSONL files (e.g. shards/*.jsonl)")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="Output JSONL file")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Jaccard similarity (5-char shingles) treated as duplicate")
+    parser.add_argument("--scope", choices=["task", "global"], default="task", help="Dedupe within each task or across all")
+    parser.add_argument("--field", type=str, default="input", help="Record field to compare")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations")
+    parser.add_argument("--ngram", type=int, default=5, help="Character n-gram shingle size")
+    args = parser.parse_args()
+
+    bands, rows = lsh_params(args.threshold, args.num_perm)
+    print(f"🔎 MinHash-LSH: threshold={args.threshold}, {bands} bands x {rows} rows, scope={args.scope}")
+    result = dedupe_jsonl(args.inputs, args.output, args.threshold, args.scope, args.field, args.num_perm, args.ngram)
+    total = result["kept"] + result["dropped"]
+    print(f"✅ Kept {result['kept']:,}/{total:,} samples, dropped {result['dropped']:,} near-duplicates")
+    print(f"💾 Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests cho scripts/cefr_crawler.py: fetch lần đầu (200), chạy lại với cache
+(304), server tắt thì dùng bản cache ("stale"), và merge giữ level thấp nhất.
+
+    python -m pytest test/test_cefr_crawler.py -q
+"""
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from cefr_crawler import fetch_sources, make_session, merge_cefr_data, start_stub_server  # noqa: E402
+
+
+def _sources(server):
+    base = f"http://localhost:{server.server_address[1]}"
+    return [{"name": "cefr", "url": f"{base}/cefr.json"}, {"name": "oxford", "url": f"{base}/oxford.csv"}]
+
+
+def test_fetch_then_not_modified_then_stale(tmp_path):
+    cache_dir = tmp_path / "cache"
+    server = start_stub_server(port=0)
+    try:
+        sources = _sources(server)
+        first = fetch_sources(sources, cache_dir=cache_dir)
+        assert [(r.status, r.http_status) for r in first] == [("fetched", 200), ("fetched", 200)]
+        assert [len(r.entries) for r in first] == [3, 3]
+
+        again = fetch_sources(sources, cache_dir=cache_dir)
+        assert [(r.status, r.http_status) for r in again] == [("not-modified", 304), ("not-modified", 304)]
+        assert [r.entries for r in again] == [r.entries for r in first]
+        assert server.RequestHandlerClass.hits == {"/cefr.json": 2, "/oxford.csv": 2}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    session = make_session(retries=0)
+    try:
+        stale = fetch_sources(sources, cache_dir=cache_dir, timeout=2.0, session=session)
+    finally:
+        session.close()
+    assert [r.status for r in stale] == ["stale", "stale"]
+    assert all(r.error for r in stale)
+    assert [r.entries for r in stale] == [r.entries for r in first]
+
+
+def test_fetch_without_cache_or_server_fails(tmp_path):
+    server = start_stub_server(port=0)
+    sources = _sources(server)
+    server.shutdown()
+    server.server_close()
+
+    session = make_session(retries=0)
+    try:
+        results = fetch_sources(sources, cache_dir=tmp_path / "cache", timeout=2.0, session=session)
+    finally:
+        session.close()
+    assert [(r.status, r.entries) for r in results] == [("failed", []), ("failed", [])]
+
+
+def test_merge_keeps_lowest_level_per_word_and_pos():
+    base = {"B1": [{"word": "negotiate", "pos": "verb", "definition": ""}]}
+    entries = [
+        {"word": "negotiate", "level": "B2", "pos": "verb", "definition": "discuss to reach an agreement"},
+        {"word": "hello", "level": "A2", "pos": "interjection", "definition": ""},
+        {"word": "hello", "level": "A1", "pos": "interjection", "definition": "used as a greeting"},
+        {"word": "environment", "level": "B1", "pos": "noun", "definition": ""},
+    ]
+    merged = merge_cefr_data(base, entries)
+
+    assert merged["A1"] == [{"word": "hello", "pos": "interjection", "definition": "used as a greeting"}]
+    assert merged["A2"] == []
+    assert merged["B1"] == [
+        {"word": "negotiate", "pos": "verb", "definition": "discuss to reach an agreement"},
+        {"word": "environment", "pos": "noun", "definition": ""},
+    ]
+    assert merged["B2"] == []
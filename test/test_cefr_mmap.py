@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests cho scripts/cefr_mmap.py: MappedCefrLexicon.open() compile lại file
+không đọc được (rỗng, sai magic, bị cắt, VERSION khác) thay vì raise.
+
+    python -m pytest test/test_cefr_mmap.py -q
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from cefr_mmap import MappedCefrLexicon  # noqa: E402
+
+
+def _corrupt(data: bytes, kind: str) -> bytes:
+    if kind == "empty":
+        return b""
+    if kind == "magic":
+        return b"NOTCEFR!" + data[8:]
+    if kind == "truncated":
+        return data[:len(data) // 2]
+    i = data.index(b'"version": ')
+    return data[:i] + b'"version": 0' + data[i + len(b'"version": 1'):]
+
+
+@pytest.mark.parametrize("kind", ["empty", "magic", "truncated", "version"])
+def test_open_recompiles_unreadable_file(tmp_path, kind):
+    path, csv_path = tmp_path / "cefr.mmap", tmp_path / "missing.csv"
+    with MappedCefrLexicon.open(path, csv_path) as lexicon:
+        expected = (len(lexicon), lexicon.level("studies"))
+
+    path.write_bytes(_corrupt(path.read_bytes(), kind))
+    with pytest.raises(ValueError):
+        MappedCefrLexicon(path)
+    with MappedCefrLexicon.open(path, csv_path) as lexicon:
+        assert (len(lexicon), lexicon.level("studies")) == expected
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests cho scripts/grammar_errors.py: ErrorInjector không chọn loại lỗi đã đủ
+quota, và chỉ done khi mọi quota đều đủ.
+
+    python -m pytest test/test_grammar_errors.py -q
+"""
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from grammar_errors import ErrorInjector  # noqa: E402
+
+CANDS = {"DET_FORM": "I saw a elephant .", "TENSE": "I see an elephant ."}
+
+
+def test_full_quota_is_never_chosen():
+    injector = ErrorInjector({"DET_FORM": 1, "TENSE": 2})
+    injector.commit("DET_FORM")
+    for _ in range(5):
+        assert injector.choose(CANDS)[0] == "TENSE"
+    assert injector.choose({"DET_FORM": CANDS["DET_FORM"]}) is None
+    assert injector.texts_quota_full == 1
+
+
+def test_done_only_when_every_quota_is_met():
+    injector = ErrorInjector({"DET_FORM": 1, "TENSE": 1})
+    injector.commit("DET_FORM", 2)
+    assert not injector.done
+    injector.commit("TENSE")
+    assert injector.done
+    assert injector.choose(CANDS) is None
+
+
+def test_allow_overflow_fills_total_from_any_type():
+    injector = ErrorInjector({"DET_FORM": 1, "TENSE": 1}, allow_overflow=True)
+    injector.commit("DET_FORM")
+    assert injector.choose({"DET_FORM": CANDS["DET_FORM"]}) == ("DET_FORM", CANDS["DET_FORM"])
+    injector.commit("DET_FORM")
+    assert injector.done
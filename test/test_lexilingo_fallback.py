@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests cho export/lexilingo_fallback.py: chuyển trạng thái CircuitBreaker và
+fallback sang stub OpenAI-compatible local (start_stub_server).
+
+    python -m pytest test/test_lexilingo_fallback.py -q
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from export.lexilingo_fallback import (  # noqa: E402
+    CircuitBreaker,
+    FallbackBackend,
+    OpenAICompatibleClient,
+    start_stub_server,
+)
+
+
+class FakePrimary:
+    """Primary giả: trả về reply hoặc raise error (có thể đổi giữa các request).
+
+    Như requests, delay vượt timeout thì chờ đúng timeout rồi raise requests.Timeout.
+    """
+
+    def __init__(self, reply="local", error=None, delay=0.0):
+        self.reply = reply
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def query(self, prompt, max_tokens=256, timeout=None, **kwargs):
+        self.calls += 1
+        if timeout is not None and self.delay > timeout:
+            time.sleep(timeout)
+            raise requests.Timeout(f"no reply within {timeout:.2f}s")
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server(reply="cloud")
+    yield OpenAICompatibleClient(f"http://localhost:{server.server_address[1]}/v1")
+    server.shutdown()
+    server.server_close()
+
+
+def test_breaker_opens_after_threshold_and_probes_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()  # Probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()  # Chỉ một probe cùng lúc
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.open_count == 1
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.allow_request()
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_count == 2
+    assert not breaker.allow_request()
+
+
+def test_primary_failure_falls_back_then_short_circuits(stub):
+    primary = FakePrimary(error=requests.ConnectionError("local down"))
+    backend = FallbackBackend(primary, stub, CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    assert backend.query("hi") == "cloud"
+    assert backend.query("hi") == "cloud"
+    assert backend.breaker.state == CircuitBreaker.OPEN
+    assert backend.query("hi") == "cloud"
+    assert primary.calls == 2  # Request thứ 3 không chạm tới local
+
+    stats = backend.stats()
+    assert stats["primary_failures"] == 2
+    assert stats["short_circuited"] == 1
+    assert stats["fallback_calls"] == 3
+    assert stats["fallback_rate"] == 1.0
+
+
+def test_probe_success_returns_to_local(stub):
+    primary = FakePrimary(error=requests.ConnectionError("local down"))
+    backend = FallbackBackend(primary, stub, CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    assert backend.query("hi") == "cloud"
+    assert backend.breaker.state == CircuitBreaker.OPEN
+
+    primary.error = None
+    time.sleep(0.06)
+    assert backend.query("hi") == "local"
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_probe_error_does_not_wedge_breaker(stub):
+    primary = FakePrimary(error=requests.ConnectionError("local down"))
+    backend = FallbackBackend(primary, stub, CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    backend.query("hi")
+
+    primary.error = TypeError("bug in primary")
+    time.sleep(0.06)
+    with pytest.raises(TypeError):
+        backend.query("hi")  # Probe lỗi ngoài LOCAL_ERRORS
+    assert backend.breaker.state == CircuitBreaker.OPEN
+
+    primary.error = None
+    time.sleep(0.06)
+    assert backend.query("hi") == "local"  # Breaker vẫn probe lại được
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_fallback_uses_remaining_deadline():
+    server = start_stub_server(reply="cloud", delay=2.0)
+    try:
+        secondary = OpenAICompatibleClient(f"http://localhost:{server.server_address[1]}/v1", timeout=30.0)
+        primary = FakePrimary(error=requests.ConnectionError("local down"), delay=0.1)
+        backend = FallbackBackend(primary, secondary, CircuitBreaker(failure_threshold=5))
+
+        started = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            backend.query("hi", timeout=0.5)
+        assert time.monotonic() - started < 1.5
+        assert backend.stats()["fallback_failures"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_hung_primary_falls_back_within_same_request(stub):
+    primary = FakePrimary(delay=60.0)  # Local treo
+    backend = FallbackBackend(primary, stub, CircuitBreaker(failure_threshold=5), primary_budget=0.5)
+
+    started = time.monotonic()
+    assert backend.query("hi", timeout=1.0) == "cloud"
+    assert time.monotonic() - started < 1.0
+    assert backend.breaker.state == CircuitBreaker.CLOSED  # Chưa đủ lỗi để mở breaker
+    stats = backend.stats()
+    assert stats["primary_timeouts"] == 1
+    assert stats["fallback_calls"] == 1
+    assert stats["fallback_failures"] == 0
+
+
+def test_primary_budget_must_be_a_fraction(stub):
+    with pytest.raises(ValueError):
+        FallbackBackend(FakePrimary(), stub, primary_budget=0.0)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests cho scripts/near_dedupe.py: MinHash-LSH phải bắt được câu chỉ khác một
+từ, và giữ lại các câu khác nhau.
+
+    python -m pytest test/test_near_dedupe.py -q
+"""
+
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from near_dedupe import NearDuplicateIndex, dedupe_jsonl, shingles  # noqa: E402
+
+DISTINCT = [
+    "She goes to school every day .",
+    "I have been living in London for three years .",
+    "The weather was terrible so we stayed at home and watched films .",
+    "Could you tell me where the nearest train station is ?",
+    "The results of the experiment were published in a scientific journal last month .",
+    "Learning a new language requires patience and a lot of practice .",
+    "If I had more free time , I would travel around the world .",
+    "The restaurant near my house serves delicious Italian food at reasonable prices .",
+    "The football match was cancelled because of heavy rain .",
+    "Please remember to turn off the lights when you leave the room .",
+]
+
+
+def test_docstring_example():
+    index = NearDuplicateIndex(threshold=0.5)
+    assert index.add("My brother wants to become a doctor when he grows up .")
+    assert not index.add("My brother want to become a doctor when he grows up .")
+    assert index.add("The football match was cancelled because of heavy rain .")
+
+
+def test_one_word_substitution_in_long_sentence_is_caught_at_every_position():
+    words = ("The government should invest more money in public transport and renewable "
+             "energy because cities are growing quickly every single year").split()
+    assert len(words) == 20
+    for position in range(len(words)):
+        index = NearDuplicateIndex(threshold=0.5)
+        index.add(" ".join(words))
+        edited = list(words)
+        edited[position] = "elephant"
+        assert not index.add(" ".join(edited)), f"missed substitution at word {position}"
+
+
+def test_distinct_sentences_are_kept():
+    index = NearDuplicateIndex(threshold=0.5)
+    assert all(index.add(text) for text in DISTINCT)
+    assert index.size == len(DISTINCT)
+
+
+def test_shingles_are_character_ngrams_of_normalized_words():
+    assert shingles("Hi,  THERE!", ngram=5) == ["hi th", "i the", " ther", "there"]
+    assert shingles("ok", ngram=5) == ["ok"]
+    assert shingles("...", ngram=5) == []
+
+
+def test_dedupe_jsonl_scopes(tmp_path):
+    records = [
+        {"task": "grammar", "input": "My brother wants to become a doctor when he grows up ."},
+        {"task": "grammar", "input": "My brother want to become a doctor when he grows up ."},
+        {"task": "fluency", "input": "My brother wants to become a doctor when he grows up ."},
+    ]
+    source = tmp_path / "in.jsonl"
+    source.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+    assert dedupe_jsonl([source], tmp_path / "task.jsonl", scope="task") == {"kept": 2, "dropped": 1}
+    assert dedupe_jsonl([source], tmp_path / "global.jsonl", scope="global") == {"kept": 1, "dropped": 2}
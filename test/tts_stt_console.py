@@ -10,6 +10,9 @@ import wave
 from pathlib import Path
 from datetime import datetime
 
+REPO_ROOT = Path(__file__).resolve().parent.parent
+STT_CONFIG = REPO_ROOT / "config" / "stt_config.yaml"
+
 # Change to backend directory
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
@@ -64,6 +67,30 @@ def load_tts_model():
         return None
 
 
+def get_stt_settings():
+    """
+    STT model từ config/stt_config.yaml (faster_whisper section)
+    
+    Trả về (model, compute_type): model_path CTranslate2 đã export nếu có,
+    ngược lại large-v3 từ Hub (như trước khi có model export).
+    """
+    settings = {}
+    try:
+        import yaml
+        with open(STT_CONFIG, "r", encoding="utf-8") as f:
+            settings = (yaml.safe_load(f) or {}).get("faster_whisper", {})
+    except Exception:
+        pass
+    
+    compute_type = settings.get("compute_type", "int8")
+    model_path = settings.get("model_path")
+    if model_path:
+        local = (REPO_ROOT / model_path).resolve()
+        if (local / "model.bin").exists():
+            return str(local), compute_type
+    return "large-v3", compute_type
+
+
 def load_stt_model():
     """Load STT (Faster-Whisper) model"""
     global stt_model
@@ -72,11 +99,12 @@ def load_stt_model():
         return stt_model
     
     try:
-        print("🔄 Loading STT model (Faster-Whisper large-v3)...")
+        model, compute_type = get_stt_settings()
+        print(f"🔄 Loading STT model (Faster-Whisper {model}, {compute_type})...")
         print("⚠️  This may take 20-30 seconds on first load...")
         from faster_whisper import WhisperModel
         
-        stt_model = WhisperModel("large-v3", device="cpu", compute_type="int8")
+        stt_model = WhisperModel(model, device="cpu", compute_type=compute_type)
         print("✅ STT model loaded successfully")
         return stt_model
         
@@ -336,11 +364,12 @@ def show_system_info():
         print(f"   ❌ TTS (Piper): Not found")
     
     # STT
-    stt_model_dir = "./models/whisper/models--Systran--faster-whisper-large-v3"
-    if os.path.exists(stt_model_dir):
-        print(f"   ✅ STT (Whisper large-v3): Installed")
+    stt_model_name, compute_type = get_stt_settings()
+    if os.path.isdir(stt_model_name):
+        size = sum(f.stat().st_size for f in Path(stt_model_name).iterdir() if f.is_file()) / (1024 * 1024)
+        print(f"   ✅ STT (Whisper {Path(stt_model_name).name}, {compute_type}): {size:.2f} MB")
     else:
-        print(f"   ❌ STT (Whisper large-v3): Not found")
+        print(f"   ⚠️  STT: local CTranslate2 model not found, using Hub model '{stt_model_name}'")
     
     # Dependencies
     print("\n📚 DEPENDENCIES:")